@@ -5,5 +5,6 @@ Analytics Module
 from .data_exporter import DataExporter
 from .dashboard_generator import DashboardGenerator
 from .report_generator import ReportGenerator
+from .radar_renderer import RadarRenderer
 
-__all__ = ['DataExporter', 'DashboardGenerator', 'ReportGenerator']
+__all__ = ['DataExporter', 'DashboardGenerator', 'ReportGenerator', 'RadarRenderer']
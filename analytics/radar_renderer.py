@@ -0,0 +1,219 @@
+"""
+Radar Renderer Module
+Vẽ sân mini (tactical view) với vị trí cầu thủ và vệt di chuyển lên video, phần sân tĩnh chỉ vẽ một lần
+"""
+
+import cv2
+import numpy as np
+from utils import OverlayCompositor
+
+
+class RadarRenderer:
+    """
+    Vẽ radar vị trí cầu thủ ở góc trên bên phải khung hình.
+
+    Trước đây render_position_radar_video vẽ lại toàn bộ sân (đường biên, vòng tròn, vòng cấm) cho từng khung hình,
+    copy cả khung hình để làm nền trong suốt và giữ vệt di chuyển bằng list với pop(0):
+    - Nền sân, khung viền và tiêu đề là một lớp tĩnh của OverlayCompositor: vẽ một lần cho mỗi kích thước khung hình,
+      mỗi khung hình chỉ trộn trên vùng ROI của radar
+    - Tọa độ sân (mét) của tất cả cầu thủ trong khung hình được đổi sang pixel bằng một phép nhân/cộng trên mảng NumPy
+    - Marker cầu thủ (chấm màu đội + viền trắng) là sprite vẽ sẵn, đặt lên khung hình cùng lúc cho mọi cầu thủ
+    - Vệt di chuyển nằm trong ring buffer NumPy kích thước cố định (mỗi track một dòng), không cấp phát lại theo khung hình
+    """
+
+    BACKGROUND_COLOR = (34, 139, 34)  # sân cỏ
+    LINE_COLOR = (255, 255, 255)
+    TRAIL_COLOR = (255, 255, 0)
+
+    def __init__(self, pitch_size=(200, 130), pitch_dimensions=(105, 68), margin=20, trail_length=30, team_colors=None, capacity=64):
+        """
+        Args:
+            pitch_size: (rộng, cao) của sân mini trên khung hình (pixel)
+            pitch_dimensions: (dài, rộng) của sân thật (mét), tọa độ position_transformed
+            margin: khoảng cách từ radar tới cạnh trên và cạnh phải của khung hình (pixel)
+            trail_length: số điểm tối đa của vệt di chuyển mỗi cầu thủ
+            team_colors: {team: màu BGR} của marker, mặc định đội 1 đỏ, đội 2 xanh
+            capacity: số track ban đầu của ring buffer, tăng gấp đôi khi cần
+        """
+        self.pitch_size = tuple(int(value) for value in pitch_size)
+        self.pitch_dimensions = pitch_dimensions
+        self.margin = margin
+        self.trail_length = trail_length
+        self.team_colors = team_colors or {1: (0, 0, 255), 2: (255, 0, 0)}
+        self.overlay_compositor = OverlayCompositor()
+
+        # đường kẻ sân thiết kế cho sân mini 200x130 và co giãn theo pitch_size
+        width, height = self.pitch_size
+        sx, sy = width / 200, height / 130
+        self.pitch_margin = (int(round(10 * sx)), int(round(10 * sy)))
+        self.line_width = max(1, int(round(2 * min(sx, sy))))
+        self.circle_radius = int(round(15 * min(sx, sy)))
+        self.box_size = (int(round(40 * sx)), int(round(40 * sy)), int(round(90 * sy)))
+
+        # marker: chấm bán kính 3 và viền trắng bán kính 4, lưu dạng (dy, dx, màu) của các pixel được vẽ
+        self.markers = {team: self._make_marker(color) for team, color in self.team_colors.items()}
+
+        # ring buffer của vệt di chuyển: points[slot, i] là điểm thứ i, head là vị trí ghi tiếp theo, count là số điểm đã có
+        self.trail_slots = {} # track_id -> slot
+        capacity = max(capacity, 1)
+        self.trail_points = np.zeros((capacity, trail_length, 2), dtype=np.int32)
+        self.trail_head = np.zeros(capacity, dtype=np.int64)
+        self.trail_count = np.zeros(capacity, dtype=np.int64)
+
+    @classmethod
+    def _make_marker(cls, color, radius=3, outline_radius=4):
+        size = 2 * outline_radius + 1
+        sprite = np.zeros((size, size, 3), dtype=np.uint8)
+        mask = np.zeros((size, size), dtype=np.uint8)
+        center = (outline_radius, outline_radius)
+        cv2.circle(sprite, center, radius, color, -1)
+        cv2.circle(mask, center, radius, 255, -1)
+        cv2.circle(sprite, center, outline_radius, cls.LINE_COLOR, 1)
+        cv2.circle(mask, center, outline_radius, 255, 1)
+        dy, dx = np.nonzero(mask)
+        return dy - outline_radius, dx - outline_radius, sprite[dy, dx]
+
+    def get_offset(self, frame_shape):
+        # góc trên trái của sân mini trên khung hình
+        return frame_shape[1] - self.pitch_size[0] - self.margin, self.margin
+
+    def get_roi(self, frame_shape):
+        # vùng radar trên khung hình: nền trong suốt (cách sân 5 pixel), viền và tiêu đề phía trên
+        x_offset, y_offset = self.get_offset(frame_shape)
+        width, height = self.pitch_size
+        return (max(x_offset - 5, 0), max(y_offset - 25, 0),
+                min(x_offset + width + 6, frame_shape[1]), min(y_offset + height + 6, frame_shape[0]))
+
+    def draw_background(self, frame, x_offset, y_offset):
+        '''
+        Phần tĩnh của radar tại (x_offset, y_offset): nền đen trong suốt, sân cỏ với đường biên, đường giữa sân, vòng tròn giữa sân,
+        hai vòng cấm, khung viền trắng và tiêu đề. Đây là các lệnh vẽ cũ của draw_mini_pitch, chỉ chạy một lần cho mỗi kích thước khung hình.
+        '''
+        width, height = self.pitch_size
+        margin_x, margin_y = self.pitch_margin
+        box_x, box_y1, box_y2 = self.box_size
+
+        mini_pitch = np.zeros((height, width, 3), dtype=np.uint8)
+        mini_pitch[:] = self.BACKGROUND_COLOR
+        cv2.rectangle(mini_pitch, (margin_x, margin_y), (width-margin_x, height-margin_y), self.LINE_COLOR, self.line_width)
+        cv2.line(mini_pitch, (width//2, margin_y), (width//2, height-margin_y), self.LINE_COLOR, 1)
+        cv2.circle(mini_pitch, (width//2, height//2), self.circle_radius, self.LINE_COLOR, 1)
+        cv2.rectangle(mini_pitch, (margin_x, box_y1), (box_x, box_y2), self.LINE_COLOR, 1)
+        cv2.rectangle(mini_pitch, (width-box_x, box_y1), (width-margin_x, box_y2), self.LINE_COLOR, 1)
+
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (x_offset-5, y_offset-5), (x_offset+width+5, y_offset+height+5), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
+        # sân mini có thể nằm một phần ngoài canvas của ROI (khung hình nhỏ hơn radar)
+        x1, y1 = max(x_offset, 0), max(y_offset, 0)
+        x2, y2 = min(x_offset + width, frame.shape[1]), min(y_offset + height, frame.shape[0])
+        if x1 < x2 and y1 < y2:
+            frame[y1:y2, x1:x2] = mini_pitch[y1-y_offset:y2-y_offset, x1-x_offset:x2-x_offset]
+        cv2.rectangle(frame, (x_offset-2, y_offset-2), (x_offset+width+2, y_offset+height+2), self.LINE_COLOR, 2)
+        cv2.putText(frame, "Tactical View", (x_offset, y_offset-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.LINE_COLOR, 2)
+        return frame
+
+    def project(self, positions):
+        '''
+        Đổi tọa độ sân (mét) sang pixel trên sân mini cho tất cả cầu thủ cùng lúc.
+
+        Args:
+            positions: mảng/list (N, 2) các vị trí (x, y) theo mét
+
+        Returns:
+            Mảng int (M, 2) pixel (tương đối với góc sân mini) của các vị trí nằm trong sân
+        '''
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        length, width = self.pitch_dimensions
+        inside = (positions[:, 0] >= 0) & (positions[:, 0] <= length) & (positions[:, 1] >= 0) & (positions[:, 1] <= width)
+        dimensions = np.array(self.pitch_dimensions, dtype=np.float64)
+        margin = np.array(self.pitch_margin, dtype=np.float64)
+        # cùng phép tính với cách cũ: (x / 105) * (rộng - 2 * lề) + lề, cắt phần thập phân
+        return ((positions[inside] / dimensions) * (np.array(self.pitch_size) - 2 * margin) + margin).astype(np.int64)
+
+    def draw(self, frame, team_positions):
+        '''
+        logic hàm này là:
+        1. Trộn lớp tĩnh (nền, sân, viền, tiêu đề) vào khung hình, chỉ trên vùng ROI
+        2. Đổi vị trí của mọi cầu thủ sang pixel trên sân mini (project)
+        3. Đặt marker của tất cả cầu thủ cùng lúc, theo thứ tự đội trong team_positions (cầu thủ sau vẽ đè cầu thủ trước như cv2.circle)
+
+        Args:
+            frame: khung hình (được vẽ trực tiếp)
+            team_positions: {team: list (x, y) vị trí theo mét}
+
+        Returns:
+            frame
+        '''
+        x_offset, y_offset = self.get_offset(frame.shape)
+        self.overlay_compositor.compose(frame, ('radar', frame.shape[:2]), self.get_roi(frame.shape),
+                                        lambda canvas, dx, dy: self.draw_background(canvas, x_offset + dx, y_offset + dy))
+
+        rows, cols, colors = [], [], []
+        for team, positions in team_positions.items():
+            points = self.project(positions)
+            if len(points) == 0:
+                continue
+            dy, dx, sprite = self.markers[team]
+            rows.append((points[:, 1:2] + y_offset + dy[None, :]).reshape(-1))
+            cols.append((points[:, 0:1] + x_offset + dx[None, :]).reshape(-1))
+            colors.append(np.tile(sprite, (len(points), 1)))
+        if rows:
+            rows, cols, colors = np.concatenate(rows), np.concatenate(cols), np.concatenate(colors)
+            # marker bị cắt ở cạnh sân mini như khi vẽ lên ảnh sân mini trước đây
+            width, height = self.pitch_size
+            inside = ((rows >= max(y_offset, 0)) & (rows < min(y_offset + height, frame.shape[0]))
+                      & (cols >= max(x_offset, 0)) & (cols < min(x_offset + width, frame.shape[1])))
+            frame[rows[inside], cols[inside]] = colors[inside]
+        return frame
+
+    def _get_trail_slots(self, track_ids):
+        # slot của từng track trong ring buffer, thêm slot mới (tăng gấp đôi dung lượng khi cần)
+        slots = []
+        for track_id in track_ids:
+            slot = self.trail_slots.get(track_id)
+            if slot is None:
+                slot = len(self.trail_slots)
+                self.trail_slots[track_id] = slot
+                if slot >= len(self.trail_head):
+                    self.trail_points = np.concatenate([self.trail_points, np.zeros_like(self.trail_points)])
+                    self.trail_head = np.concatenate([self.trail_head, np.zeros_like(self.trail_head)])
+                    self.trail_count = np.concatenate([self.trail_count, np.zeros_like(self.trail_count)])
+            slots.append(slot)
+        return np.array(slots, dtype=np.int64)
+
+    def update_trails(self, track_ids, points):
+        '''
+        Thêm điểm mới (pixel trên khung hình) vào vệt di chuyển của các track, mỗi track tối đa trail_length điểm gần nhất.
+
+        Args:
+            track_ids: list track_id (không trùng nhau)
+            points: list/mảng (N, 2) điểm tương ứng
+        '''
+        if len(track_ids) == 0:
+            return
+        slots = self._get_trail_slots(track_ids)
+        self.trail_points[slots, self.trail_head[slots]] = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+        self.trail_head[slots] = (self.trail_head[slots] + 1) % self.trail_length
+        self.trail_count[slots] = np.minimum(self.trail_count[slots] + 1, self.trail_length)
+
+    def get_trail(self, track_id):
+        # các điểm của vệt di chuyển theo thứ tự thời gian, mảng (số điểm, 2)
+        slot = self.trail_slots.get(track_id)
+        if slot is None:
+            return np.zeros((0, 2), dtype=np.int32)
+        count = self.trail_count[slot]
+        order = (self.trail_head[slot] - count + np.arange(count)) % self.trail_length
+        return self.trail_points[slot, order]
+
+    def draw_trails(self, frame, color=None):
+        # vẽ vệt di chuyển của mọi track có từ 2 điểm trở lên bằng một lệnh cv2.polylines
+        num_slots = len(self.trail_slots)
+        counts = self.trail_count[:num_slots]
+        slots = np.nonzero(counts >= 2)[0]
+        if len(slots) == 0:
+            return frame
+        order = (self.trail_head[slots, None] - counts[slots, None] + np.arange(self.trail_length)[None, :]) % self.trail_length
+        trails = self.trail_points[slots[:, None], order]
+        cv2.polylines(frame, [trail[:count] for trail, count in zip(trails, counts[slots])], False, color or self.TRAIL_COLOR, 1)
+        return frame
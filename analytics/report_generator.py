@@ -434,10 +434,48 @@ class ReportGenerator:
         html += """
                     </tbody>
                 </table>
+"""
+        html += self._generate_rolling_possession_table(team_comparison)
+        html += """
             </div>
 """
         return html
     
+    def _generate_rolling_possession_table(self, team_comparison):
+        """Tạo bảng tỉ lệ kiểm soát bóng cả trận và trong 1/5/15 phút cuối (từ PossessionTimeline của TeamComparisonAnalyzer)"""
+        timeline = getattr(team_comparison, 'possession_timeline', None)
+        if timeline is None or len(timeline) == 0:
+            return ""
+        
+        rows = [('Full Match', timeline.get_possession())]
+        rows += [(f'Last {minutes} min', possession) for minutes, possession in team_comparison.rolling_possession.items()]
+        
+        html = """
+                <h3>Possession Timeline</h3>
+                <table>
+                    <thead>
+                        <tr>
+                            <th>Window</th>
+                            <th>Team 1</th>
+                            <th>Team 2</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+"""
+        for label, possession in rows:
+            html += f"""
+                        <tr>
+                            <td><strong>{label}</strong></td>
+                            <td>{possession.get(1, 0.0):.1f}%</td>
+                            <td>{possession.get(2, 0.0):.1f}%</td>
+                        </tr>
+"""
+        html += """
+                    </tbody>
+                </table>
+"""
+        return html
+    
     def _generate_mvp_section(self, mvp_analysis):
         """Tạo phần MVP"""
         if not hasattr(mvp_analysis, 'mvp_data') or not mvp_analysis.mvp_data:
@@ -0,0 +1,86 @@
+"""
+Script to benchmark per-frame detection latency of the inference backends (trackers/inference_backends.py)
+
+Each backend (torch, onnx, openvino, optionally their INT8 exports) runs the same frames through
+BatchInferenceEngine, the same path Tracker uses. Frames are read from the input video, or random
+frames are used when the video is not available.
+"""
+import argparse
+import os
+import time
+import numpy as np
+from trackers.inference_backends import INFERENCE_BACKENDS, load_detection_model, get_missing_requirements
+from trackers.batch_inference import BatchInferenceEngine
+from utils import VideoFrameReader
+
+def load_frames(video_path, num_frames):
+    """Read the first frames of the video, or make random 1080p frames if the video is missing"""
+    if os.path.exists(video_path):
+        with VideoFrameReader(video_path, max_frames=num_frames) as reader:
+            return list(reader)
+    print(f"Video not found: {video_path}, using random frames")
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8) for _ in range(num_frames)]
+
+def benchmark_backend(model_path, backend, int8, frames, batch_size, imgsz, warmup=2):
+    """Return latency statistics (ms per frame) of one backend"""
+    model, backend = load_detection_model(model_path, backend=backend, int8=int8, imgsz=imgsz) # backend actually loaded (torch if libraries are missing)
+    int8 = int8 and backend != 'torch'
+    engine = BatchInferenceEngine(model, batch_size=batch_size, imgsz=imgsz, device='cpu', overlap=False, adaptive=False,
+                                  letterbox_auto=backend == 'torch')
+
+    engine.predict_batch(frames[:batch_size] * warmup) # warm-up, not timed
+
+    latencies = []
+    for start in range(0, len(frames), batch_size):
+        batch = frames[start:start + batch_size]
+        batch_start = time.perf_counter()
+        engine.predict_batch(batch)
+        latencies.append(1000 * (time.perf_counter() - batch_start) / len(batch))
+
+    return {
+        'backend': backend + (' int8' if int8 else ''),
+        'mean_ms': float(np.mean(latencies)),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'fps': 1000 / float(np.mean(latencies)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark detection inference backends on CPU')
+    parser.add_argument('--model', type=str, default='models/best.pt')
+    parser.add_argument('--video', type=str, default='input_videos/08fd33_4.mp4')
+    parser.add_argument('--backends', type=str, nargs='+', default=INFERENCE_BACKENDS, choices=INFERENCE_BACKENDS)
+    parser.add_argument('--int8', action='store_true', help='Also benchmark the INT8 exports of onnx/openvino')
+    parser.add_argument('--frames', type=int, default=40)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--imgsz', type=int, default=640)
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames)
+
+    configs = [(backend, False) for backend in args.backends]
+    if args.int8:
+        configs += [(backend, True) for backend in args.backends if backend != 'torch']
+
+    results = []
+    for backend, int8 in configs:
+        missing = get_missing_requirements(backend)
+        if missing:
+            print(f"Skipping {backend}: missing {', '.join(missing)}")
+            continue
+        results.append(benchmark_backend(args.model, backend, int8, frames, args.batch_size, args.imgsz))
+
+    print("\n" + "="*80)
+    print(f"INFERENCE LATENCY ({len(frames)} frames, batch size {args.batch_size}, imgsz {args.imgsz}, CPU)")
+    print("="*80)
+    print("\n{:<16} {:>12} {:>12} {:>12} {:>10}".format("Backend", "Mean (ms)", "P50 (ms)", "P95 (ms)", "FPS"))
+    print("-"*80)
+    for result in results:
+        print("{:<16} {:>12.1f} {:>12.1f} {:>12.1f} {:>10.1f}".format(
+            result['backend'], result['mean_ms'], result['p50_ms'], result['p95_ms'], result['fps']))
+
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Script to measure the speed/accuracy trade-off of keyframe detection (trackers/keyframe_propagator.py)
+
+Every configuration tracks the same frames with Tracker.iter_frame_tracks. Running YOLO on every frame is the
+reference; for the keyframe configurations the player/referee/ball boxes of each frame are matched to the
+reference boxes (IoU + Hungarian) to report the mean IoU and the recall at IoU 0.5, together with the fraction
+of frames that ran detection and the wall time.
+"""
+import argparse
+import time
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from trackers import Tracker
+from utils import VideoFrameReader, get_bbox_iou_matrix
+
+CONFIGS = [
+    ('every frame', dict(keyframe_interval=1)),
+    ('interval 2', dict(keyframe_interval=2)),
+    ('interval 3', dict(keyframe_interval=3)),
+    ('interval 5', dict(keyframe_interval=5)),
+    ('interval 5 motion', dict(keyframe_interval=5, propagation='motion')),
+    ('interval 5 adaptive', dict(keyframe_interval=5, max_camera_motion=20, max_uncertainty=0.25)),
+]
+
+def frame_boxes(frame_tracks):
+    """All boxes of one frame as an (N, 4) array"""
+    boxes = [track['bbox'] for object_tracks in frame_tracks.values() for track in object_tracks.values()]
+    return np.array(boxes, dtype=float).reshape(-1, 4)
+
+def run_config(model_path, video_path, max_frames, options):
+    """Track the video with one configuration, return per-frame boxes, detection calls and wall time"""
+    tracker = Tracker(model_path, **options)
+    boxes = []
+    with VideoFrameReader(video_path, max_frames=max_frames) as reader:
+        start = time.perf_counter()
+        for _, _, frame_tracks in tracker.iter_frame_tracks(reader):
+            boxes.append(frame_boxes(frame_tracks))
+        elapsed = time.perf_counter() - start
+    return boxes, tracker.inference_engine.frames_processed, elapsed
+
+def compare_boxes(reference, boxes, iou_threshold=0.5):
+    """Mean IoU of the matched reference boxes and recall at iou_threshold over all frames"""
+    ious = []
+    for reference_boxes, frame_boxes_ in zip(reference, boxes):
+        iou = np.zeros(len(reference_boxes))
+        if len(reference_boxes) > 0 and len(frame_boxes_) > 0:
+            iou_matrix = get_bbox_iou_matrix(reference_boxes, frame_boxes_)
+            rows, cols = linear_sum_assignment(-iou_matrix)
+            iou[rows] = iou_matrix[rows, cols]
+        ious.append(iou)
+    ious = np.concatenate(ious) if ious else np.zeros(0)
+    if len(ious) == 0:
+        return 0.0, 0.0
+    return float(ious.mean()), float((ious >= iou_threshold).mean())
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark keyframe detection against detection on every frame')
+    parser.add_argument('--model', type=str, default='models/best.pt')
+    parser.add_argument('--video', type=str, default='input_videos/08fd33_4.mp4')
+    parser.add_argument('--frames', type=int, default=300, help='Number of frames to process')
+    args = parser.parse_args()
+
+    results = []
+    reference = None
+    for name, options in CONFIGS:
+        boxes, detection_calls, elapsed = run_config(args.model, args.video, args.frames, options)
+        if reference is None:
+            reference = boxes
+        mean_iou, recall = compare_boxes(reference, boxes)
+        results.append({
+            'config': name,
+            'keyframe_ratio': detection_calls / len(boxes) if boxes else 0.0,
+            'fps': len(boxes) / elapsed if elapsed > 0 else 0.0,
+            'mean_iou': mean_iou,
+            'recall': recall,
+        })
+
+    print("\n" + "="*80)
+    print(f"KEYFRAME DETECTION ({len(reference)} frames, reference: YOLO on every frame)")
+    print("="*80)
+    print("\n{:<22} {:>14} {:>10} {:>12} {:>14}".format("Config", "Detected (%)", "FPS", "Mean IoU", "Recall@0.5"))
+    print("-"*80)
+    for result in results:
+        print("{:<22} {:>13.1%} {:>10.1f} {:>12.3f} {:>13.1%}".format(
+            result['config'], result['keyframe_ratio'], result['fps'], result['mean_iou'], result['recall']))
+
+    return results
+
+if __name__ == '__main__':
+    main()
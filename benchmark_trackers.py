@@ -0,0 +1,108 @@
+"""
+Script to benchmark the tracker backends (trackers/tracker_backends.py) against each other on the stub video
+
+The detections are replayed from stubs/track_stubs.pkl, so YOLO is not needed and every backend sees exactly
+the same input. The stub track IDs are used as ground truth for the ID metrics. Detections are randomly dropped,
+jittered and given a confidence score to imitate a real detector.
+The csrt backend needs the video frames, so it only runs when the input video exists.
+"""
+import argparse
+import os
+import pickle
+import time
+import numpy as np
+from trackers.tracker_backends import TRACKER_BACKENDS, create_tracker_backend
+from utils import VideoFrameReader
+
+CLASS_IDS = {'ball': 0, 'player': 2, 'referee': 3} # same class ids as models/best.pt
+
+def build_detections(tracks, drop_rate=0.05, jitter=2.0, seed=0):
+    """Turn stub tracks into per-frame detections (boxes, confidences, class ids, ground-truth ids)"""
+    rng = np.random.default_rng(seed)
+    detections = []
+    for frame_num in range(len(tracks['players'])):
+        boxes, confidences, class_ids, gt_ids = [], [], [], []
+        for object_name, class_name in (('players', 'player'), ('referees', 'referee'), ('ball', 'ball')):
+            for track_id, track in tracks[object_name][frame_num].items():
+                if rng.random() < drop_rate:
+                    continue
+                boxes.append(np.array(track['bbox']) + rng.normal(0, jitter, 4))
+                # some detections fall below the 0.5 threshold, only bytetrack uses them
+                confidences.append(rng.uniform(0.3, 0.5) if rng.random() < 0.1 else rng.uniform(0.5, 1.0))
+                class_ids.append(CLASS_IDS[class_name])
+                gt_ids.append(int(track_id) if object_name != 'ball' else -1)
+        detections.append((np.array(boxes).reshape(-1, 4), np.array(confidences), np.array(class_ids), np.array(gt_ids)))
+    return detections
+
+def benchmark_backend(name, detections, frames=None):
+    """Run one backend over all frames and return throughput and ID metrics"""
+    backend = create_tracker_backend(name)
+    last_predicted = {} # ground-truth id -> last predicted id
+    id_switches = 0
+    predicted_ids = set()
+    matched = 0
+    total = 0
+
+    start = time.perf_counter()
+    for frame_num, (boxes, confidences, class_ids, gt_ids) in enumerate(detections):
+        frame = frames[frame_num] if frames is not None else None
+        track_ids = backend.track(frame, boxes, confidences, class_ids)
+        for gt_id, track_id in zip(gt_ids, track_ids):
+            if gt_id == -1:
+                continue
+            total += 1
+            if track_id == -1:
+                continue
+            matched += 1
+            predicted_ids.add(track_id)
+            if gt_id in last_predicted and last_predicted[gt_id] != track_id:
+                id_switches += 1
+            last_predicted[gt_id] = track_id
+    elapsed = time.perf_counter() - start
+
+    return {
+        'backend': name,
+        'fps': len(detections) / elapsed if elapsed > 0 else 0.0,
+        'ms_per_frame': 1000 * elapsed / len(detections),
+        'id_switches': id_switches,
+        'unique_ids': len(predicted_ids),
+        'coverage': matched / total if total > 0 else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tracker backends')
+    parser.add_argument('--stub', type=str, default='stubs/track_stubs.pkl', help='Stub tracks used as detections and ground truth')
+    parser.add_argument('--video', type=str, default='input_videos/08fd33_4.mp4', help='Video of the stub, needed for the csrt backend')
+    parser.add_argument('--backends', type=str, nargs='+', default=list(TRACKER_BACKENDS), choices=list(TRACKER_BACKENDS))
+    parser.add_argument('--drop-rate', type=float, default=0.05, help='Fraction of detections randomly dropped')
+    args = parser.parse_args()
+
+    with open(args.stub, 'rb') as f:
+        tracks = pickle.load(f)
+    detections = build_detections(tracks, drop_rate=args.drop_rate)
+    gt_ids = {int(track_id) for frame_track in tracks['players'] + tracks['referees'] for track_id in frame_track}
+
+    frames = None
+    if os.path.exists(args.video):
+        frames = VideoFrameReader(args.video, max_frames=len(detections), cache_size=1)
+
+    print("="*80)
+    print(f"TRACKER BACKEND BENCHMARK ({len(detections)} frames, {len(gt_ids)} ground-truth IDs)")
+    print("="*80)
+    print("\n{:<12} {:>10} {:>14} {:>12} {:>12} {:>10}".format("Backend", "FPS", "ms/frame", "ID switches", "Unique IDs", "Coverage"))
+    print("-"*80)
+
+    results = []
+    for name in args.backends:
+        if name == 'csrt' and frames is None:
+            print(f"{name:<12} skipped, video not found: {args.video}")
+            continue
+        result = benchmark_backend(name, detections, frames=frames if name == 'csrt' else None) # frames are read one by one from the reader
+        results.append(result)
+        print("{:<12} {:>10.1f} {:>14.3f} {:>12} {:>12} {:>9.1%}".format(
+            result['backend'], result['fps'], result['ms_per_frame'], result['id_switches'], result['unique_ids'], result['coverage']))
+
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+from .camera_movement_estimator import CameraMovementEstimator
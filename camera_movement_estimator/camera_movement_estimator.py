@@ -4,32 +4,46 @@ import numpy as np
 import os
 import sys 
 sys.path.append('../')
-from utils import measure_distance,measure_xy_distance
+from utils import measure_xy_distance, OverlayCompositor, RenderProfile
+from track_store import ObjectTracks
 
 class CameraMovementEstimator(): # lớp để ước lượng chuyển động của camera
     '''
     Lớp này sử dụng thuật toán Lucas-Kanade Optical Flow để ước lượng chuyển động của camera giữa các khung hình trong video.
     Quá trình hoạt động của lớp này bao gồm các bước chính sau:
     1. Khởi tạo các tham số cần thiết cho thuật toán Lucas-Kanade Optical Flow, bao gồm kích thước cửa sổ, mức độ phân cấp và tiêu chí dừng.
-    2. Chuyển đổi khung hình đầu tiên sang thang độ xám và xác định các điểm đặc trưng (features) trong khung hình này để theo dõi.
+    2. Chuyển đổi khung hình đầu tiên sang thang độ xám và xác định các điểm đặc trưng (features) trong khung hình này để theo dõi,
+       mặt nạ điểm đặc trưng tạo từ kích thước khung hình (bỏ viền) và bỏ các bbox cầu thủ, trọng tài, bóng (nếu có tracks).
     3. Duyệt qua từng khung hình trong video, chuyển đổi chúng sang thang độ xám và sử dụng thuật toán Lucas-Kanade để tính toán vị trí mới của các điểm đặc trưng trong khung hình hiện tại.
-    4. Tính toán khoảng cách di chuyển của các điểm đặc trưng và xác định chuyển động của camera dựa trên điểm có khoảng cách di chuyển lớn nhất.
-    5. Cập nhật vị trí của các điểm đặc trưng và khung hình trước để sử dụng trong vòng lặp tiếp theo.
-    6. Lưu trữ và trả về danh sách chuyển động của camera cho từng khung hình trong video.
-    7. Cung cấp phương thức để vẽ thông tin chuyển động của camera lên các khung hình.
+    4. Ước lượng phép biến đổi partial affine (dịch chuyển, xoay, zoom) hoặc homography giữa hai khung hình bằng RANSAC trên tất cả các điểm,
+       chuyển động camera là dịch chuyển của tâm khung hình theo phép biến đổi đó (số đông các điểm, không phải điểm di chuyển nhiều nhất),
+       tỉ lệ điểm inlier được lưu lại cho từng khung hình.
+    5. Tiếp tục theo dõi các điểm inlier, chỉ xác định lại điểm đặc trưng khi còn quá ít điểm hoặc tỉ lệ inlier quá thấp,
+       tỉ lệ inlier quá thấp (camera lia quá nhanh so với cửa sổ Lucas-Kanade) thì dùng phase correlation của cả khung hình.
+    6. Lưu trữ và trả về danh sách chuyển động camera cho từng khung hình trong video.
+    7. Cung cấp phương thức để vẽ thông tin chuyển động camera lên các khung hình.
     
     '''
-    def __init__(self,frame):
+    MOTION_MODELS = ('partial_affine', 'homography')
+
+    def __init__(self,frame, motion_model='partial_affine', ransac_threshold=3.0, min_features=20, min_inlier_ratio=0.5, border_ratio=0.02, bbox_padding=10):
         '''
         logic đoạn này là:
         1. Khởi tạo các tham số cần thiết cho thuật toán Lucas-Kanade Optical Flow, bao gồm kích thước cửa sổ, mức độ phân cấp và tiêu chí dừng.
-        2. Tạo mặt nạ để giới hạn khu vực tìm kiếm các điểm đặc trưng, tránh các vùng không mong muốn như biên của khung hình.
-        3. Cấu hình các tham số để xác định các điểm đặc trưng trong khung hình đầu tiên.
-        4. Chuyển đổi khung hình đầu tiên sang thang độ xám để chuẩn bị cho việc theo dõi các điểm đặc trưng.
-        5. Xác định các điểm đặc trưng trong khung hình đầu tiên sử dụng các tham số đã cấu hình.
+        2. Tạo mặt nạ theo kích thước khung hình để giới hạn khu vực tìm kiếm các điểm đặc trưng, tránh biên của khung hình.
+        3. Cấu hình các tham số để xác định các điểm đặc trưng và ước lượng phép biến đổi bằng RANSAC.
 
         '''
-        self.minimum_distance = 5
+        if motion_model not in self.MOTION_MODELS:
+            raise ValueError(f"❌ Mô hình chuyển động camera không hợp lệ: {motion_model}, chọn một trong {self.MOTION_MODELS}")
+        self.minimum_distance = 0.5 # chuyển động nhỏ hơn ngưỡng này (pixel) coi như camera đứng yên (rung dưới 1 pixel)
+        self.motion_model = motion_model
+        self.ransac_threshold = ransac_threshold # sai số tối đa (pixel) để một điểm là inlier của phép biến đổi
+        self.min_features = min_features # còn ít điểm đang theo dõi hơn số này thì xác định lại điểm đặc trưng
+        self.min_inlier_ratio = min_inlier_ratio # tỉ lệ inlier thấp hơn (nhiều điểm nằm trên cầu thủ, mất dấu) thì xác định lại điểm đặc trưng
+        self.bbox_padding = bbox_padding # nới rộng bbox của các đối tượng khi loại khỏi mặt nạ (pixel)
+        self.overlay_compositor = OverlayCompositor() # nền bán trong suốt của thông tin chuyển động camera vẽ sẵn một lần
+        self.min_phase_response = 0.05 # độ tin cậy tối thiểu của phase correlation khi RANSAC thất bại
 
         self.lk_params = dict(
             winSize = (15,15),
@@ -37,21 +51,22 @@ class CameraMovementEstimator(): # lớp để ước lượng chuyển động
             criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT,10,0.03)
         ) # tham số cho thuật toán Lucas-Kanade Optical Flow
 
-        # Tạo mặt nạ để giới hạn khu vực tìm kiếm các điểm đặc trưng
-        first_frame_grayscale = cv2.cvtColor(frame,cv2.COLOR_BGR2GRAY)
-        mask_features = np.zeros_like(first_frame_grayscale) #
-        mask_features[:,0:20] = 1
-        mask_features[:,900:1050] = 1
+        # Tạo mặt nạ để giới hạn khu vực tìm kiếm các điểm đặc trưng: cả khung hình trừ một viền border_ratio theo kích thước khung hình
+        self.frame_height, self.frame_width = frame.shape[:2]
+        self.border = int(round(border_ratio * min(self.frame_height, self.frame_width)))
+        self.mask_features = np.zeros((self.frame_height, self.frame_width), dtype=np.uint8)
+        self.mask_features[self.border:self.frame_height - self.border, self.border:self.frame_width - self.border] = 1
 
         self.features = dict(
             maxCorners = 100,
             qualityLevel = 0.3,
             minDistance =3,
-            blockSize = 7,
-            mask = mask_features
-        ) # tạo mặt nạ để tránh các vùng không mong muốn như biên của khung hình
+            blockSize = 7
+        ) # tham số của goodFeaturesToTrack, mặt nạ được tạo cho từng lần xác định điểm đặc trưng (bỏ bbox các đối tượng)
+
+        self.reset() # trạng thái theo dõi (khung hình trước và các điểm đặc trưng) cho get_frame_movement
 
-    def add_adjust_positions_to_tracks(self,tracks, camera_movement_per_frame): # hàm để điều chỉnh vị trí các đối tượng trong tracks dựa trên chuyển động camera
+    def add_adjust_positions_to_tracks(self,tracks, camera_movement_per_frame, accumulate=False): # hàm để điều chỉnh vị trí các đối tượng trong tracks dựa trên chuyển động camera
         '''
         logic hàm này là:
         1. Duyệt qua từng loại đối tượng trong tracks (ví dụ: cầu thủ, bóng).
@@ -59,8 +74,19 @@ class CameraMovementEstimator(): # lớp để ước lượng chuyển động
         3. Lấy chuyển động của camera tại khung hình hiện tại từ danh sách camera_movement_per_frame.
         4. Tính toán vị trí đã được điều chỉnh của đối tượng bằng cách trừ chuyển động của camera khỏi vị trí ban đầu.
         5. Lưu trữ vị trí đã được điều chỉnh vào tracks để sử dụng sau này.
+        accumulate=True: dùng chuyển động cộng dồn từ khung hình đầu tiên (get_accumulated_movement), position_adjusted là vị trí
+        trong hệ tọa độ ảnh của khung hình đầu tiên (điểm đứng yên trên sân có cùng position_adjusted ở mọi khung hình).
         '''
+        camera_movement_per_frame = np.asarray(camera_movement_per_frame, dtype=np.float64).reshape(-1, 2)
+        if accumulate: # vị trí ở khung hình đầu = vị trí hiện tại + chuyển động cộng dồn (chuyển động là vị trí cũ - vị trí mới của điểm đặc trưng)
+            camera_movement_per_frame = -self.get_accumulated_movement(camera_movement_per_frame)
         for object, object_tracks in tracks.items():
+            if isinstance(object_tracks, ObjectTracks): # tracks dạng cột: trừ chuyển động camera cho tất cả các dòng cùng lúc
+                positions, has_position = object_tracks.column('position')
+                rows = np.flatnonzero(has_position)
+                camera_movement = camera_movement_per_frame[object_tracks.frame_index()[rows]]
+                object_tracks.set_column('position_adjusted', positions[rows] - camera_movement, rows)
+                continue
             for frame_num, track in enumerate(object_tracks):
                 for track_id, track_info in track.items():
                     position = track_info['position'] # vị trí ban đầu của đối tượng
@@ -68,104 +94,202 @@ class CameraMovementEstimator(): # lớp để ước lượng chuyển động
                     position_adjusted = (position[0]-camera_movement[0],position[1]-camera_movement[1]) # vị trí đã được điều chỉnh của đối tượng
                     # (x,y) của vị trí ban đầu trừ đi (x,y) của chuyển động camera
                     tracks[object][frame_num][track_id]['position_adjusted'] = position_adjusted
-                    
 
+    @staticmethod
+    def get_accumulated_movement(camera_movement_per_frame):
+        # chuyển động camera cộng dồn từ khung hình đầu tiên tới từng khung hình
+        return np.cumsum(np.asarray(camera_movement_per_frame, dtype=np.float64).reshape(-1, 2), axis=0)
+
+    def get_params(self): # tham số ảnh hưởng đến kết quả, dùng cho khóa của StageCache
+        return dict(lk_params=self.lk_params, features=self.features, minimum_distance=self.minimum_distance, motion_model=self.motion_model,
+                    ransac_threshold=self.ransac_threshold, min_features=self.min_features, min_inlier_ratio=self.min_inlier_ratio,
+                    border=self.border, bbox_padding=self.bbox_padding, min_phase_response=self.min_phase_response)
+
+    def get_cache_key(self, cache, video_path, num_frames, parents=()): # khóa của bước chuyển động camera trong StageCache: nội dung video + tham số optical flow
+        # parents là khóa của bước tracking khi bbox các đối tượng được loại khỏi mặt nạ điểm đặc trưng
+        return cache.make_key('camera_movement', files=[video_path], parents=parents, params=dict(self.get_params(), num_frames=num_frames))
 
-    def get_camera_movement(self,frames,read_from_stub=False, stub_path=None): # hàm để ước lượng chuyển động camera giữa các khung hình trong video
+    def get_camera_movement(self,frames,read_from_stub=False, stub_path=None, cache=None, video_path=None, tracks=None, tracks_key=None): # hàm để ước lượng chuyển động camera giữa các khung hình trong video
         '''
         logic đoạn này là:
         1. Kiểm tra nếu có đọc từ stub không, nếu có và file stub tồn tại thì đọc dữ liệu chuyển động camera từ file stub và trả về.
-        2. Khởi tạo danh sách camera_movement để lưu chuyển động camera cho từng khung hình, ban đầu tất cả đều là (0,0).
+        2. Khởi tạo danh sách camera_movement để lưu chuyển động camera cho từng khung hình, khung hình đầu tiên là (0,0).
         3. Chuyển đổi khung hình đầu tiên sang thang độ xám và xác định các điểm đặc trưng trong khung hình này để theo dõi.
-        4. Duyệt qua từng khung hình trong video, chuyển đổi chúng sang thang độ xám và sử dụng thuật toán Lucas-Kanade để tính toán vị trí mới của các điểm đặc trưng trong khung hình hiện tại.
-        5. Tính toán khoảng cách di chuyển của các điểm đặc trưng và xác định chuyển động của camera dựa trên điểm có khoảng cách di chuyển lớn nhất.
-        6. Nếu khoảng cách di chuyển lớn hơn ngưỡng minimum_distance, cập nhật chuyển động camera cho khung hình hiện tại và xác định lại các điểm đặc trưng để theo dõi.       
-        7. Cập nhật khung hình trước để sử dụng trong vòng lặp tiếp theo.
-        8. Lưu trữ dữ liệu chuyển động camera vào file stub nếu đường dẫn stub_path được cung cấp.
-        9. Trả về danh sách chuyển động camera cho từng khung hình trong video.
+        4. Duyệt qua từng khung hình trong video, theo dõi các điểm đặc trưng bằng Lucas-Kanade và ước lượng phép biến đổi bằng RANSAC (get_frame_movement).
+        5. Nếu có tracks thì bbox của cầu thủ, trọng tài và bóng ở khung hình đó không được dùng để tìm điểm đặc trưng.
+        6. Lưu trữ dữ liệu chuyển động camera vào file stub nếu đường dẫn stub_path được cung cấp.
+        7. Trả về danh sách chuyển động camera cho từng khung hình trong video.
         
         '''
+        # cache là StageCache (utils/stage_cache.py), kết quả được lưu theo nội dung video thay vì một file stub cố định
+        # tracks_key là khóa StageCache của tracks (kết quả phụ thuộc vào bbox của tracks)
+        if cache is not None and cache.enabled:
+            video_path = video_path or getattr(frames, 'video_path', None)
+            if video_path is not None:
+                key = self.get_cache_key(cache, video_path, len(frames), parents=[tracks_key] if tracks is not None and tracks_key else ())
+                return cache.get_or_compute(key, lambda: self.get_camera_movement(frames, tracks=tracks))
+            print("⚠️ Không biết đường dẫn video của frames, không dùng cache cho chuyển động camera")
+
         # Read the stub 
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path,'rb') as f:
                 return pickle.load(f)
 
-        camera_movement = [[0,0]]*len(frames) # khởi tạo danh sách chuyển động camera cho từng khung hình, ban đầu tất cả đều là (0,0)
+        # frames có thể là list hoặc VideoFrameReader, chỉ duyệt tuần tự một lần nên không cần giữ toàn bộ video trong bộ nhớ
+        self.reset()
+        camera_movement = [] # chuyển động camera cho từng khung hình, khung hình đầu tiên là (0,0)
+        for frame_num, frame in enumerate(frames):
+            frame_bboxes = None
+            if tracks is not None:
+                frame_bboxes = self.get_frame_bboxes({object: object_tracks[frame_num] for object, object_tracks in tracks.items() if frame_num < len(object_tracks)})
+            camera_movement.append(self.get_frame_movement(frame, frame_bboxes))
+
+        # phần mở file stub để lưu chuyển động camera
+        if stub_path is not None:
+            with open(stub_path,'wb') as f:
+                pickle.dump(camera_movement,f)
+
+        return camera_movement
+
+    @staticmethod
+    def get_frame_bboxes(frame_tracks):
+        # bbox của tất cả các đối tượng (cầu thủ, trọng tài, bóng) của một khung hình, frame_tracks là {object: {track_id: track_info}}
+        return [track_info['bbox'] for object_track in frame_tracks.values() for track_info in object_track.values() if 'bbox' in track_info]
+    
+    def reset(self):
+        # xóa trạng thái theo dõi, khung hình tiếp theo đưa vào get_frame_movement sẽ được coi là khung hình đầu tiên
+        self.old_gray = None
+        self.old_features = None
+        self.inlier_ratios = [] # tỉ lệ inlier của phép biến đổi ở từng khung hình (từ khung hình thứ hai)
+        self.num_redetections = 0 # số lần xác định lại điểm đặc trưng (không tính khung hình đầu tiên)
+        self.num_fallbacks = 0 # số khung hình dùng phase correlation thay cho RANSAC
 
-        old_gray = cv2.cvtColor(frames[0],cv2.COLOR_BGR2GRAY) # chuyển đổi khung hình đầu tiên sang thang độ xám
-        old_features = cv2.goodFeaturesToTrack(old_gray,**self.features) # xác định các điểm đặc trưng trong khung hình đầu tiên để theo dõi
+    def stats(self):
+        return {
+            'frames': len(self.inlier_ratios) + (self.old_gray is not None),
+            'redetections': self.num_redetections,
+            'fallbacks': self.num_fallbacks,
+            'mean_inlier_ratio': float(np.mean(self.inlier_ratios)) if self.inlier_ratios else None,
+            'min_inlier_ratio': float(np.min(self.inlier_ratios)) if self.inlier_ratios else None,
+        }
 
-        
-        # lặp qua từng khung hình trong video
+    def detect_features(self, frame_gray, exclude_bboxes=None):
+        # xác định điểm đặc trưng trong mặt nạ theo kích thước khung hình, bỏ bbox (đã nới rộng) của các đối tượng đang chuyển động
+        mask = self.mask_features
+        if exclude_bboxes is not None and len(exclude_bboxes) > 0:
+            mask = mask.copy()
+            for x1, y1, x2, y2 in np.asarray(exclude_bboxes, dtype=np.float64).reshape(-1, 4):
+                mask[max(int(y1) - self.bbox_padding, 0):max(int(y2) + self.bbox_padding, 0),
+                     max(int(x1) - self.bbox_padding, 0):max(int(x2) + self.bbox_padding, 0)] = 0
+        return cv2.goodFeaturesToTrack(frame_gray, mask=mask, **self.features)
+
+    def estimate_transform(self, old_points, new_points):
+        # phép biến đổi từ khung hình trước sang khung hình hiện tại bằng RANSAC, trả về (ma trận 3x3, mask inlier) hoặc (None, None)
+        if self.motion_model == 'homography':
+            if len(old_points) < 4:
+                return None, None
+            matrix, inliers = cv2.findHomography(old_points, new_points, cv2.RANSAC, self.ransac_threshold)
+        else:
+            if len(old_points) < 3:
+                return None, None
+            matrix, inliers = cv2.estimateAffinePartial2D(old_points, new_points, method=cv2.RANSAC, ransacReprojThreshold=self.ransac_threshold)
+            matrix = None if matrix is None else np.vstack([matrix, [0.0, 0.0, 1.0]])
+        if matrix is None:
+            return None, None
+        return matrix, inliers.ravel().astype(bool)
+
+    def get_frame_movement(self,frame, exclude_bboxes=None): # hàm ước lượng chuyển động camera của một khung hình so với khung hình trước đó, dùng cho cả get_camera_movement và pipeline streaming
         '''
-        logic phần này lặp qua từng khung hình trong video để ước lượng chuyển động camera giữa các khung hình:
-        1. Chuyển đổi khung hình hiện tại sang thang độ xám
+        logic phần này ước lượng chuyển động camera giữa khung hình trước và khung hình hiện tại:
+        1. Chuyển đổi khung hình hiện tại sang thang độ xám, nếu là khung hình đầu tiên thì chỉ xác định các điểm đặc trưng
         2. Sử dụng thuật toán Lucas-Kanade để tính toán vị trí mới của các điểm đặc trưng trong khung hình hiện tại
-        3. Tính toán khoảng cách di chuyển của các điểm đặc trưng và xác định chuyển động của camera dựa trên điểm có khoảng cách di chuyển lớn nhất
-        4. Nếu khoảng cách di chuyển lớn hơn ngưỡng minimum_distance, cập nhật chuyển động camera cho khung hình hiện tại và xác định lại các điểm đặc trưng để theo dõi       
-        5. Cập nhật khung hình trước để sử dụng trong vòng lặp tiếp theo
+        3. Ước lượng phép biến đổi bằng RANSAC trên tất cả các điểm theo dõi được, chuyển động camera là (vị trí cũ - vị trí mới) của tâm khung hình
+        4. Giữ lại các điểm inlier để theo dõi tiếp, còn quá ít điểm hoặc tỉ lệ inlier thấp thì xác định lại điểm đặc trưng (bỏ bbox exclude_bboxes)
+           tỉ lệ inlier thấp thì chuyển động camera lấy từ phase correlation của cả khung hình
+        5. Cập nhật khung hình trước để sử dụng cho lần gọi tiếp theo
         
         '''
-        for frame_num in range(1,len(frames)):
-            frame_gray = cv2.cvtColor(frames[frame_num],cv2.COLOR_BGR2GRAY) # chuyển đổi khung hình hiện tại sang thang độ xám
-            # sử dụng thuật toán Lucas-Kanade để tính toán vị trí mới của các điểm đặc trưng trong khung hình hiện tại
+        frame_gray = cv2.cvtColor(frame,cv2.COLOR_BGR2GRAY) # chuyển đổi khung hình hiện tại sang thang độ xám
+        if self.old_gray is None: # khung hình đầu tiên không có chuyển động camera
+            self.old_gray = frame_gray
+            self.old_features = self.detect_features(frame_gray, exclude_bboxes) # xác định các điểm đặc trưng trong khung hình đầu tiên để theo dõi
+            return [0,0]
+
+        movement = [0,0] # mặc định không có chuyển động camera cho khung hình hiện tại
+        inlier_ratio = 0.0
+        if self.old_features is not None and len(self.old_features) > 0:
             # calcOpticalFlowPyrLK trả về vị trí mới của các điểm đặc trưng, trạng thái (thành công hay không) và lỗi
-            # thuật toán LUcas-Kanade Optical Flow thể hiện ở đâu? thể hiện ở chỗ sử dụng hàm cv2.calcOpticalFlowPyrLK để theo dõi các điểm đặc trưng giữa hai khung hình liên tiếp
-            new_features, _,_ = cv2.calcOpticalFlowPyrLK(old_gray,frame_gray,old_features,None,**self.lk_params)
-
-            max_distance = 0
-            camera_movement_x, camera_movement_y = 0,0 # khởi tạo chuyển động camera là 0
-
-            for i, (new,old) in enumerate(zip(new_features,old_features)): # duyệt qua từng điểm đặc trưng mới và cũ
-                new_features_point = new.ravel() # ravel() để chuyển đổi mảng 2D thành 1D
-                old_features_point = old.ravel()
-
-                distance = measure_distance(new_features_point,old_features_point) # tính khoảng cách di chuyển của điểm đặc trưng
-                if distance>max_distance: # nếu khoảng cách di chuyển lớn hơn khoảng cách lớn nhất hiện tại
-                    max_distance = distance # cập nhật khoảng cách lớn nhất
-                    camera_movement_x,camera_movement_y = measure_xy_distance(old_features_point, new_features_point ) # cập nhật chuyển động camera dựa trên điểm có khoảng cách di chuyển lớn nhất
-            
-            if max_distance > self.minimum_distance: # nếu khoảng cách di chuyển lớn hơn ngưỡng minimum_distance
-                 # cập nhật chuyển động camera cho khung hình hiện tại
-                camera_movement[frame_num] = [camera_movement_x,camera_movement_y]
-                old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features) # xác định lại các điểm đặc trưng để theo dõi
-
-            old_gray = frame_gray.copy() # cập nhật khung hình trước để sử dụng trong vòng lặp tiếp theo
-            # frame_gray.copy() để tránh tham chiếu đến cùng một vùng nhớ
-        
-        # phần mở file stub để lưu chuyển động camera
-        if stub_path is not None:
-            with open(stub_path,'wb') as f:
-                pickle.dump(camera_movement,f)
+            new_features, status, _ = cv2.calcOpticalFlowPyrLK(self.old_gray,frame_gray,self.old_features,None,**self.lk_params)
+            tracked = status.ravel() == 1
+            old_points = self.old_features[tracked].reshape(-1, 2)
+            new_points = new_features[tracked].reshape(-1, 2)
+            matrix, inliers = self.estimate_transform(old_points, new_points)
+            self.old_features = None
+            if matrix is not None:
+                inlier_ratio = float(inliers.sum()) / len(tracked) # trên tất cả các điểm đang theo dõi, kể cả điểm bị mất dấu
+                center = np.array([[[self.frame_width / 2, self.frame_height / 2]]], dtype=np.float64)
+                moved_center = cv2.perspectiveTransform(center, matrix)[0, 0]
+                camera_movement_x, camera_movement_y = measure_xy_distance(center[0, 0], moved_center) # vị trí cũ - vị trí mới của tâm khung hình
+                if np.hypot(camera_movement_x, camera_movement_y) > self.minimum_distance:
+                    movement = [float(camera_movement_x), float(camera_movement_y)]
+                # tiếp tục theo dõi các điểm inlier còn nằm trong khung hình
+                kept = new_points[inliers]
+                inside = (kept[:, 0] >= 0) & (kept[:, 0] < self.frame_width) & (kept[:, 1] >= 0) & (kept[:, 1] < self.frame_height)
+                self.old_features = kept[inside].reshape(-1, 1, 2).astype(np.float32)
+        if inlier_ratio < self.min_inlier_ratio: # optical flow mất dấu (camera lia quá nhanh, cắt cảnh): dịch chuyển toàn ảnh bằng phase correlation
+            (shift_x, shift_y), response = cv2.phaseCorrelate(self.old_gray.astype(np.float32), frame_gray.astype(np.float32))
+            if response > self.min_phase_response:
+                movement = [float(-shift_x), float(-shift_y)] if np.hypot(shift_x, shift_y) > self.minimum_distance else [0,0]
+                self.num_fallbacks += 1
+        self.inlier_ratios.append(inlier_ratio)
 
-        return camera_movement
+        if self.old_features is None or len(self.old_features) < self.min_features or inlier_ratio < self.min_inlier_ratio:
+            self.old_features = self.detect_features(frame_gray, exclude_bboxes) # xác định lại các điểm đặc trưng để theo dõi
+            self.num_redetections += 1
+
+        self.old_gray = frame_gray.copy() # cập nhật khung hình trước để sử dụng trong lần gọi tiếp theo
+        # frame_gray.copy() để tránh tham chiếu đến cùng một vùng nhớ
+        return movement
     
+    @staticmethod
+    def draw_camera_movement_background(frame, dx, dy): # vẽ nền thông tin chuyển động camera, tọa độ trên khung hình + (dx, dy)
+        overlay = frame.copy()
+        cv2.rectangle(overlay,(dx,dy),(500 + dx,100 + dy),(255,255,255),-1)
+        # vẽ hình chữ nhật cho camera movement X,Y đúng ko ? 
+        
+        alpha =0.6 # độ trong suốt của hình chữ nhật
+        cv2.addWeighted(overlay,alpha,frame,1-alpha,0,frame) # kết hợp hình chữ nhật với khung hình gốc để tạo hiệu ứng trong suốt
+        return frame
+
+    def draw_frame_camera_movement(self, frame, camera_movement, render_profile=None): # vẽ thông tin chuyển động camera trực tiếp lên một khung hình
+        # bảng gắn với góc trên bên trái, tọa độ trên khung hình tham chiếu 1920x1080 được đổi theo kích thước frame (xem utils/render_profile.py)
+        render_profile = render_profile or RenderProfile()
+        hud_scale = render_profile.get_hud_scale(frame.shape)
+        self.overlay_compositor.compose(frame, 'camera_movement', (0, 0, 501, 101), self.draw_camera_movement_background,
+                                        scale=hud_scale, position=render_profile.get_hud_point(frame.shape, 'top_left', (0, 0)))
+
+        x_movement, y_movement = camera_movement
+        thickness = render_profile.thickness(3, hud_scale)
+        frame = cv2.putText(frame,f"Camera Movement X: {x_movement:.2f}",render_profile.get_hud_point(frame.shape, 'top_left', (10,30)), cv2.FONT_HERSHEY_SIMPLEX,hud_scale,(0,0,0),thickness)
+        frame = cv2.putText(frame,f"Camera Movement Y: {y_movement:.2f}",render_profile.get_hud_point(frame.shape, 'top_left', (10,60)), cv2.FONT_HERSHEY_SIMPLEX,hud_scale,(0,0,0),thickness)
+        return frame
+
     def draw_camera_movement(self,frames, camera_movement_per_frame):
         '''
         logic đoạn này là:
         1. Duyệt qua từng khung hình và chuyển động camera tương ứng trong danh sách camera_movement_per_frame.
         2. Tạo một bản sao của khung hình hiện tại để vẽ thông tin lên đó.
-        3. Tạo một lớp phủ (overlay) để vẽ nền cho thông tin chuyển động camera.
-        4. Vẽ một hình chữ nhật trắng làm nền cho thông tin chuyển động camera.
-        5. Sử dụng cv2.putText để vẽ thông tin chuyển động camera (tọa độ X và Y) lên khung hình tại vị trí đã định.
-        6. Lưu trữ khung hình đã được vẽ thông tin vào danh sách output_frames.
-        7. Trả về danh sách khung hình đã được vẽ thông tin chuyển động camera.
+        3. Trộn nền trắng bán trong suốt (vẽ sẵn một lần bằng OverlayCompositor) vào vùng ROI của nó trên khung hình.
+        4. Sử dụng cv2.putText để vẽ thông tin chuyển động camera (tọa độ X và Y) lên khung hình tại vị trí đã định.
+        5. Lưu trữ khung hình đã được vẽ thông tin vào danh sách output_frames.
+        6. Trả về danh sách khung hình đã được vẽ thông tin chuyển động camera.
         '''
         output_frames=[]
 
         for frame_num, frame in enumerate(frames):
             frame= frame.copy()
 
-            overlay = frame.copy()
-            cv2.rectangle(overlay,(0,0),(500,100),(255,255,255),-1)
-            # vẽ hình chữ nhật cho camera movement X,Y đúng ko ? 
-            
-            alpha =0.6 # độ trong suốt của hình chữ nhật
-            cv2.addWeighted(overlay,alpha,frame,1-alpha,0,frame) # kết hợp hình chữ nhật với khung hình gốc để tạo hiệu ứng trong suốt
-
-            x_movement, y_movement = camera_movement_per_frame[frame_num] # lấy chuyển động camera tại khung hình hiện tại
-            frame = cv2.putText(frame,f"Camera Movement X: {x_movement:.2f}",(10,30), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
-            frame = cv2.putText(frame,f"Camera Movement Y: {y_movement:.2f}",(10,60), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
+            frame = self.draw_frame_camera_movement(frame, camera_movement_per_frame[frame_num]) # chuyển động camera tại khung hình hiện tại
 
             output_frames.append(frame) 
 
@@ -6,6 +6,9 @@ Phân tích và so sánh hiệu suất giữa 2 đội bóng
 import numpy as np
 import cv2
 from collections import defaultdict
+import sys
+sys.path.append('../')
+from player_ball_assigner import PossessionTimeline
 
 
 class TeamComparisonAnalyzer:
@@ -16,6 +19,8 @@ class TeamComparisonAnalyzer:
     def __init__(self):
         self.team_stats = {}
         self.team_possession_by_zone = {}
+        self.possession_timeline = None  # PossessionTimeline của trận, dùng chung với renderer và report
+        self.rolling_possession = {}  # tỉ lệ kiểm soát bóng trong 1/5/15 phút cuối trận
         
     def analyze_teams(self, tracks, team_ball_control):
         """
@@ -23,11 +28,15 @@ class TeamComparisonAnalyzer:
         
         Args:
             tracks: Dictionary chứa tracking data
-            team_ball_control: Array chứa thông tin đội kiểm soát bóng
+            team_ball_control: Array chứa thông tin đội kiểm soát bóng (hoặc PossessionTimeline)
         
         Returns:
             Dictionary chứa thống kê của cả 2 đội
         """
+        if not isinstance(team_ball_control, PossessionTimeline):
+            team_ball_control = PossessionTimeline(team_ball_control)
+        self.possession_timeline = team_ball_control
+
         # Khởi tạo stats cho 2 đội
         self.team_stats = {
             1: self._init_team_stats(1),
@@ -70,16 +79,15 @@ class TeamComparisonAnalyzer:
                         self.team_stats[team]['ball_touches'] += 1
                     
                     self.team_stats[team]['possession_frames'] += 1
-            
-            # Phân tích kiểm soát bóng
-            if frame_num < len(team_ball_control):
-                controlling_team = team_ball_control[frame_num]
-                if controlling_team in [1, 2]:
-                    self.team_stats[controlling_team]['ball_control_frames'] += 1
+        
+        # Phân tích kiểm soát bóng: số frame kiểm soát bóng của từng đội lấy từ tổng tiền tố (chỉ tính các frame có tracks)
+        ball_control_frames = self.possession_timeline.get_counts(total_frames - 1)
+        self.rolling_possession = self.possession_timeline.get_rolling_possession(total_frames - 1)
         
         # Tính toán các chỉ số cuối cùng
         for team in [1, 2]:
             stats = self.team_stats[team]
+            stats['ball_control_frames'] = ball_control_frames[team]
             
             # Số lượng cầu thủ
             stats['num_players'] = len(stats['active_players'])
@@ -243,6 +251,9 @@ class TeamComparisonAnalyzer:
             export_stats = stats.copy()
             # Chuyển set thành list để serialize JSON
             export_stats['active_players'] = list(stats['active_players'])
+            # Tỉ lệ kiểm soát bóng trong 1/5/15 phút cuối trận
+            export_stats['rolling_possession'] = {f'last_{minutes}_min': possession.get(team_id, 0.0)
+                                                  for minutes, possession in self.rolling_possession.items()}
             export_data[f'team_{team_id}'] = export_stats
         
         return export_data
@@ -6,7 +6,7 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils import read_video, save_video
+from utils import read_video, save_video, StageCache
 from trackers import Tracker
 from team_assigner import TeamAssigner
 from camera_movement_estimator import CameraMovementEstimator
@@ -45,23 +45,18 @@ def demo_position_radar_from_video(video_path, output_dir='output_videos/positio
     sample_frames = min(500, len(video_frames))
     print(f"    → Processing {sample_frames} frames for demo...")
     
-    # Use stub if available to avoid re-tracking
-    stub_path = 'stubs/track_stubs.pkl'
-    tracks = tracker.get_object_tracks(video_frames[:sample_frames], 
-                                       read_from_stub=True,
-                                       stub_path=stub_path)
+    # Use the stage cache to avoid re-tracking, keyed by video content, model weights and parameters
+    tracks = tracker.get_object_tracks(video_frames[:sample_frames],
+                                       cache=StageCache(),
+                                       video_path=video_path)
     print("    ✓ Tracking completed")
     
     # Step 3: Assign teams
     print("\n[3/6] Assigning teams...")
     team_assigner = TeamAssigner()
-    team_assigner.assign_team_color(video_frames[0], tracks['players'][0])
     
-    for frame_num, player_track in enumerate(tracks['players']):
-        for player_id, track in player_track.items():
-            team = team_assigner.get_player_team(video_frames[frame_num], 
-                                                 track['bbox'], 
-                                                 player_id)
+    for frame_num, player_teams in enumerate(team_assigner.assign_teams(video_frames, tracks['players'])):
+        for player_id, team in player_teams.items():
             tracks['players'][frame_num][player_id]['team'] = team
             tracks['players'][frame_num][player_id]['team_color'] = team_assigner.team_colors[team]
     
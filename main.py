@@ -1,14 +1,15 @@
 import argparse
-from utils import read_video, save_video
-from trackers import Tracker
+from utils import VideoFrameReader, AsyncVideoWriter, StageCache, RenderProfile
+from trackers import Tracker, BallInterpolator
 import cv2
-import numpy as np
 from team_assigner import TeamAssigner
 from player_ball_assigner import PlayerBallAssigner
 from camera_movement_estimator import CameraMovementEstimator
-from view_transformer import ViewTransformer
+from view_transformer import ViewTransformer, PitchRegistration
 from speed_and_distance_estimator import SpeedAndDistance_Estimator
 from player_stats_analyzer import PlayerStatsAnalyzer
+from pipeline import StreamingPipeline, SegmentParallelPipeline, AnnotationEngine
+from track_store import TrackStore
 
 # Import các module mới cho case studies và analytics
 from case_studies import TeamComparisonAnalyzer, MVPAnalyzer, TacticalAnalyzer
@@ -27,18 +28,55 @@ logic của hàm main:
 9. Phân tích và thống kê các chỉ số của cầu thủ (số lần chạm bóng, tỉ lệ giữ bóng, quãng đường, tốc độ)
 10. Vẽ kết quả đầu ra lên các khung hình video (bao gồm bảng thống kê)
 11. Lưu video kết quả và export bảng thống kê ra file
+Chế độ --streaming chạy các bước 2-8 và 10-11 cho từng khung hình trong một lượt (xem pipeline/streaming_pipeline.py),
+bảng thống kê không được vẽ lên video vì cần số liệu của cả trận
+Tùy chọn --workers N chạy bước 2-3 (detection, tracking, chuyển động camera) song song trên N tiến trình theo từng đoạn video
+rồi ghép kết quả lại (xem pipeline/segment_pipeline.py), các bước còn lại giữ nguyên
+Tùy chọn --keyframe-interval N chỉ chạy YOLO mỗi N khung hình, bbox ở các khung hình giữa được dịch chuyển bằng optical flow
+(xem trackers/keyframe_propagator.py), --adaptive-keyframes chạy YOLO thêm khi camera chuyển động mạnh hoặc bbox bị mất dấu
+Tùy chọn --pitch-registration ước lượng homography cho từng khung hình từ đường kẻ sân (camera lia/zoom, góc quay khác video mẫu)
+thay cho 4 góc sân cố định của ViewTransformer, sai số chiếu lại được in ra (xem view_transformer/pitch_registration.py),
+--pitch-keypoints tên=x,y cho homography ban đầu từ các điểm đặc trưng trên khung hình đầu tiên khi góc quay khác xa video mẫu
+Tùy chọn --render-profile proxy/draft vẽ và ghi video ở 1/2 hoặc 1/4 độ phân giải (bản xem nhanh), HUD theo bố cục chuẩn hóa (xem utils/render_profile.py)
+Kết quả các bước 2-8 được lưu trong cache theo nội dung video, trọng số mô hình và tham số (--cache-dir, --cache-size, --no-cache),
+chạy lại trên cùng video thì chỉ chạy phần phân tích và vẽ
 
 '''
 def main():
     # Read Video
     parser = argparse.ArgumentParser(description='Football Analysis AI')
     parser.add_argument('--input', type=str, default='input_videos/08fd33_4.mp4', help='Đường dẫn đến video đầu vào')
+    parser.add_argument('--streaming', action='store_true', help='Xử lý từng khung hình trong một lượt với bộ nhớ cố định, ghi video ngay khi xử lý xong')
+    parser.add_argument('--tracker', type=str, default='kalman', choices=['kalman', 'iou', 'bytetrack', 'csrt'], help='Thuật toán gán id theo dõi (xem trackers/tracker_backends.py)')
+    parser.add_argument('--batch-size', type=int, default=20, help='Số khung hình tối đa mỗi lô inference, tự giảm khi thiếu bộ nhớ')
+    parser.add_argument('--frame-memory', type=float, default=None, help='Bộ nhớ mỗi khung hình khi inference (MB) để giới hạn kích thước lô, mặc định đo sau lô đầu tiên')
+    parser.add_argument('--imgsz', type=int, default=640, help='Độ phân giải đầu vào của YOLO')
+    parser.add_argument('--half', action='store_true', help='Inference fp16 (chỉ có tác dụng trên GPU)')
+    parser.add_argument('--device', type=str, default=None, help="Thiết bị inference, ví dụ 'cpu' hoặc 'cuda:0' (mặc định ultralytics tự chọn)")
+    parser.add_argument('--inference-backend', type=str, default='torch', choices=['torch', 'onnx', 'openvino'], help='Chạy YOLO bằng PyTorch, ONNX Runtime hoặc OpenVINO (export một lần từ models/best.pt)')
+    parser.add_argument('--int8', action='store_true', help='Lượng tử hóa INT8 khi export sang ONNX/OpenVINO')
+    parser.add_argument('--keyframe-interval', type=int, default=1, help='Chỉ chạy YOLO mỗi N khung hình, các khung hình ở giữa dịch chuyển bbox bằng optical flow')
+    parser.add_argument('--adaptive-keyframes', action='store_true', help='Chạy YOLO thêm khi camera chuyển động mạnh hoặc optical flow mất dấu nhiều bbox')
+    parser.add_argument('--workers', type=int, default=1, help='Số tiến trình xử lý song song các đoạn video (detection, tracking, chuyển động camera)')
+    parser.add_argument('--cache-dir', type=str, default='stubs/cache', help='Thư mục cache kết quả các bước (theo nội dung video, mô hình và tham số)')
+    parser.add_argument('--cache-size', type=int, default=2048, help='Dung lượng tối đa của cache (MB), vượt quá thì xóa kết quả lâu không dùng nhất')
+    parser.add_argument('--no-cache', action='store_true', help='Không đọc/ghi cache, chạy lại tất cả các bước')
+    parser.add_argument('--team-sample-frames', type=int, default=30, help='Số khung hình trải đều video dùng để học màu áo của hai đội')
+    parser.add_argument('--team-refit-interval', type=int, default=None, help='Streaming: học lại màu áo hai đội mỗi N khung hình (mặc định chỉ học một lần khi đã có đủ cầu thủ)')
+    parser.add_argument('--speed-smoothing', type=str, default=None, choices=['savgol', 'ema'], help='Làm mượt vị trí trước khi tính tốc độ (Savitzky-Golay hoặc EMA) để bớt các đỉnh tốc độ do rung')
+    parser.add_argument('--ball-interpolation', type=str, default='linear', choices=['linear', 'spline', 'kalman'], help='Cách nội suy vị trí bóng ở các khung hình không phát hiện được bóng')
+    parser.add_argument('--ball-max-gap', type=int, default=None, help='Không nội suy khoảng trống dài hơn N khung hình (mặc định không giới hạn, streaming giới hạn ở 24)')
+    parser.add_argument('--pitch-registration', action='store_true', help='Ước lượng homography cho từng khung hình từ đường kẻ sân thay cho 4 góc sân cố định')
+    parser.add_argument('--pitch-keypoints', type=str, nargs='+', default=None, metavar='TÊN=X,Y',
+                        help='Ít nhất 4 điểm đặc trưng của sân trên khung hình đầu tiên (tên trong PITCH_KEYPOINTS, tọa độ pixel) để tính homography ban đầu')
+    parser.add_argument('--pitch-keyframe-interval', type=int, default=25, help='Số khung hình giữa hai lần hiệu chỉnh homography bằng đường kẻ sân')
+    parser.add_argument('--render-profile', type=str, default='full', choices=list(RenderProfile.PROFILES), help='Độ phân giải vẽ và ghi video: full (gốc), proxy (1/2) hoặc draft (1/4) để xem nhanh, video proxy/draft có hậu tố tên profile')
     args = parser.parse_args()
     
     video_path = args.input
     
     try:
-        video_frames = read_video(video_path)
+        video_frames = VideoFrameReader(video_path) # đọc video dạng streaming, không nạp toàn bộ khung hình vào bộ nhớ
     except FileNotFoundError as e:
         print(f"\n{e}")
         print(f"\n💡 Hướng dẫn: Vui lòng đặt file video vào thư mục 'input_videos/' hoặc cập nhật đường dẫn trong main.py")
@@ -51,52 +89,131 @@ def main():
         return
 
     # Initialize Tracker, tracker là đối tượng dùng để theo dõi các đối tượng trong video, tracks là dữ liệu theo dõi các đối tượng
-    tracker = Tracker('models/best.pt') 
-    tracks = tracker.get_object_tracks(video_frames,
-                                       read_from_stub=True,
-                                       stub_path='stubs/track_stubs.pkl')
-    # Get object positions 
-    tracker.add_position_to_tracks(tracks)
+    # tùy chọn inference theo lô và inference backend (xem trackers/batch_inference.py, trackers/inference_backends.py)
+    inference_options = dict(batch_size=args.batch_size, imgsz=args.imgsz, half=args.half, device=args.device,
+                             inference_backend=args.inference_backend, int8=args.int8,
+                             frame_memory=None if args.frame_memory is None else args.frame_memory * 1024 * 1024)
+    # chế độ keyframe (xem trackers/keyframe_propagator.py), ngưỡng thích ứng: camera dịch chuyển hơn 20 pixel hoặc hơn 25% bbox bị mất dấu
+    inference_options.update(keyframe_interval=args.keyframe_interval)
+    if args.adaptive_keyframes:
+        inference_options.update(max_camera_motion=20, max_uncertainty=0.25)
+    tracker = Tracker('models/best.pt', tracker_backend=args.tracker, **inference_options) 
+    # homography cho từng khung hình (xem view_transformer/pitch_registration.py), mặc định dùng 4 góc sân cố định của ViewTransformer
+    pitch_registration = None
+    if args.pitch_registration and args.pitch_keypoints: # homography ban đầu từ các điểm đặc trưng nhập tay thay cho 4 góc sân của video mẫu
+        pitch_keypoints = {name: tuple(float(value) for value in point.split(',')) for name, point in (keypoint.split('=') for keypoint in args.pitch_keypoints)}
+        pitch_registration = PitchRegistration.from_keypoints(pitch_keypoints, keyframe_interval=args.pitch_keyframe_interval)
+    elif args.pitch_registration:
+        pitch_registration = PitchRegistration(keyframe_interval=args.pitch_keyframe_interval)
+    # nội suy bóng trên mảng NumPy: tuyến tính, spline hoặc Kalman, khoảng trống dài hơn --ball-max-gap thì bỏ qua (xem trackers/ball_interpolator.py)
+    ball_interpolator = BallInterpolator(method=args.ball_interpolation, max_gap=args.ball_max_gap)
+    # độ phân giải của video đầu ra (xem utils/render_profile.py), proxy/draft vẽ và mã hóa ở độ phân giải thấp để xem nhanh
+    render_profile = RenderProfile(args.render_profile)
+    output_video_path = render_profile.get_output_path('output_videos/output_video.avi')
+
+    if args.streaming: # mỗi khung hình đi qua tất cả các bước rồi được ghi ra video ngay
+        streaming_pipeline = StreamingPipeline(tracker,
+                                               TeamAssigner(num_sample_frames=args.team_sample_frames, refit_interval=args.team_refit_interval),
+                                               PlayerBallAssigner(),
+                                               ViewTransformer(),
+                                               SpeedAndDistance_Estimator(smoothing=args.speed_smoothing),
+                                               pitch_registration=pitch_registration,
+                                               ball_interpolator=ball_interpolator,
+                                               render_profile=render_profile)
+        tracks, team_ball_control = streaming_pipeline.run(video_frames, output_video_path)
+        run_analytics(tracks, team_ball_control)
+        return
 
     # camera movement estimator
     camera_movement_estimator = CameraMovementEstimator(video_frames[0]) # object này dùng để ước lượng chuyển động camera
-    
-    # object  camera_movement_per_frame lưu chuyển động camera cho từng khung hình
-    camera_movement_per_frame = camera_movement_estimator.get_camera_movement(video_frames,
-                                                                                read_from_stub=True,# tham số này cho biết có đọc từ stub không,stub là dữ liệu đã được tính toán trước để tiết kiệm thời gian
-                                                                                stub_path='stubs/camera_movement_stub.pkl') # đường dẫn đến file stub
+    # Speed and distance estimator, dựa đoán tốc độ và khoảng cách
+    speed_and_distance_estimator = SpeedAndDistance_Estimator(smoothing=args.speed_smoothing)
+    # màu áo hai đội học từ nhiều khung hình, đội của mỗi cầu thủ được bầu chọn lại theo thời gian (xem team_assigner/team_assigner.py)
+    team_assigner = TeamAssigner(num_sample_frames=args.team_sample_frames)
+
+    # cache kết quả các bước theo nội dung video, trọng số mô hình và tham số (xem utils/stage_cache.py),
+    # chạy lại với cùng video và tham số thì bỏ qua detection, tracking, chuyển động camera và gán đội/bóng
+    stage_cache = StageCache(args.cache_dir, max_size=args.cache_size * 1024**2, enabled=not args.no_cache)
+
+    if args.workers > 1: # chia video thành các đoạn và xử lý song song, kết quả được ghép lại thành tracks và chuyển động camera của cả video
+        segment_pipeline = SegmentParallelPipeline('models/best.pt', num_workers=args.workers, tracker_backend=args.tracker, inference_options=inference_options)
+        segment_key = stage_cache.make_key('segment_tracking', files=[video_path, 'models/best.pt'],
+                                           params=dict(tracker.cache_params, num_frames=len(video_frames), num_workers=args.workers,
+                                                       segment_length=segment_pipeline.segment_length, overlap=segment_pipeline.overlap,
+                                                       camera_movement=camera_movement_estimator.get_params()))
+        tracks, camera_movement_per_frame = stage_cache.get_or_compute(segment_key, lambda: segment_pipeline.run(video_path, len(video_frames)))
+        upstream_keys = [segment_key]
+    else:
+        tracks = tracker.get_object_tracks(video_frames, cache=stage_cache)
+        tracks_key = tracker.get_cache_key(stage_cache, video_path, len(video_frames))
+
+        # object  camera_movement_per_frame lưu chuyển động camera cho từng khung hình
+        # RANSAC trên tất cả các điểm đặc trưng, bbox của các đối tượng trong tracks không được dùng để tìm điểm đặc trưng
+        camera_movement_per_frame = camera_movement_estimator.get_camera_movement(video_frames, cache=stage_cache, tracks=tracks, tracks_key=tracks_key)
+        upstream_keys = [tracks_key, camera_movement_estimator.get_cache_key(stage_cache, video_path, len(video_frames), parents=[tracks_key])]
+        if camera_movement_estimator.stats()['frames'] > 0: # không in khi lấy từ cache
+            print(f"⚙️ Camera movement: {camera_movement_estimator.stats()}")
+
+    homographies = None
+    if pitch_registration is not None:
+        homographies = pitch_registration.get_homographies(video_frames, cache=stage_cache)
+        upstream_keys.append(pitch_registration.get_cache_key(stage_cache, video_path, len(video_frames)))
+        print(f"⚙️ Pitch registration: {pitch_registration.stats()}")
+
+    # vị trí, biến đổi góc nhìn, nội suy bóng, tốc độ, gán đội và gán bóng, khóa cache phụ thuộc vào khóa của các bước trước
+    annotate_key = stage_cache.make_key('annotated_tracks', parents=upstream_keys,
+                                        params=dict(speed_and_distance_estimator.get_params(), **team_assigner.get_params(), **PlayerBallAssigner().get_params(),
+                                                    **ball_interpolator.get_params()))
+    tracks, team_ball_control = stage_cache.get_or_compute(annotate_key, lambda: annotate_tracks(video_frames, tracks, camera_movement_per_frame, tracker,
+                                                                                                 camera_movement_estimator, speed_and_distance_estimator,
+                                                                                                 team_assigner, ball_interpolator, homographies))
+
+
+    # Phân tích, case studies, export, dashboard và report
+    stats_analyzer = run_analytics(tracks, team_ball_control)
+
+
+    # Draw output , vẽ kết quả đầu ra
+    # tất cả các lớp chú thích (tracks, kiểm soát bóng, chuyển động camera, tốc độ và quãng đường, bảng thống kê nhỏ ở góc video)
+    # được vẽ lên một bản sao của từng khung hình trong một lượt, khung hình được ghi ngay sau khi vẽ (xem pipeline/annotation_engine.py),
+    # việc mã hóa chạy song song trên luồng nền của AsyncVideoWriter
+    print("Đang vẽ chú thích và thống kê lên video...")
+    annotation_engine = AnnotationEngine.from_components(tracker, camera_movement_estimator, speed_and_distance_estimator, stats_analyzer,
+                                                         render_profile=render_profile)
+    with AsyncVideoWriter(output_video_path, fps=video_frames.fps, codec=video_frames.codec) as video_writer:
+        annotation_engine.render(video_frames, tracks, team_ball_control, camera_movement_per_frame, video_writer)
+    print(f"⚙️ Annotation ({render_profile.name}): {annotation_engine.stats()}")
+    print(f"✅ Video lưu tại: {output_video_path}")
+
+def annotate_tracks(video_frames, tracks, camera_movement_per_frame, tracker, camera_movement_estimator, speed_and_distance_estimator, team_assigner, ball_interpolator=None, homographies=None):
+    # hàm này thêm vị trí, tốc độ, đội và cầu thủ giữ bóng vào tracks rồi trả về (tracks, team_ball_control), kết quả được lưu trong StageCache
+    tracks = TrackStore.from_dict(tracks) # tracks dạng cột (xem track_store/track_store.py), vẫn truy cập được như dictionary
+    # Get object positions 
+    tracker.add_position_to_tracks(tracks)
     camera_movement_estimator.add_adjust_positions_to_tracks(tracks,camera_movement_per_frame) # điều chỉnh vị trí các đối tượng trong tracks dựa trên chuyển động camera
 
 
     # View Trasnformer, làm biến đổi góc nhìn từ góc nhìn camera sang góc nhìn từ trên xuống
     view_transformer = ViewTransformer() # khởi tạo đối tượng ViewTransformer
+    if homographies is not None: # homography của từng khung hình đã tính cả chuyển động camera nên biến đổi thẳng vị trí trên ảnh
+        view_transformer.set_homographies(homographies, position_key='position')
     view_transformer.add_transformed_position_to_tracks(tracks) # thêm vị trí đã biến đổi vào tracks
 
     # Interpolate Ball Positions, interpolate là nội suy, tức là ước lượng vị trí bóng ở những khung hình mà bóng không được phát hiện
-    tracks["ball"] = tracker.interpolate_ball_positions(tracks["ball"]) # nội suy vị trí bóng trong tracks
+    tracks["ball"] = tracker.interpolate_ball_positions(tracks["ball"], ball_interpolator) # nội suy vị trí bóng trong tracks, có cờ interpolated cho từng khung hình
     # Nội suy là cách ước tính giá trị nằm giữa 2 giá trị đã biết, trong trường hợp này là vị trí bóng trong các khung hình mà bóng không được phát hiện
     
     
     
     # Speed and distance estimator, dựa đoán tốc độ và khoảng cách
-    speed_and_distance_estimator = SpeedAndDistance_Estimator()
     speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks)
 
     # Assign Player Teams, gán đội cho cầu thủ
-    team_assigner = TeamAssigner() 
-    team_assigner.assign_team_color(video_frames[0], # sử dụng khung hình đầu tiên để gán màu đội
-                                    tracks['players'][0])
+    player_teams_per_frame = team_assigner.assign_teams(video_frames, tracks['players']) # học màu áo từ nhiều khung hình rồi bầu chọn đội cho từng track
     # track['players'] là danh sách các cầu thủ được theo dõi trong từng khung hình
     
-    for frame_num, player_track in enumerate(tracks['players']):# với mỗi khung hình và các cầu thủ trong khung hình đó
-        for player_id, track in player_track.items():# với mỗi cầu thủ trong khung hình đó
-            # player_track.items() trả về cả key và value trong dictionary
-            team = team_assigner.get_player_team(video_frames[frame_num],   
-                                                 track['bbox'],
-                                                 player_id)
-            # gọi hàm get_player_team để xác định đội của cầu thủ dựa trên khung hình hiện tại, bounding box và id cầu thủ
-            # video_frames[frame_num] là khung hình hiện tại
-            # track['bbox'] là bounding box của cầu thủ trong khung hình đó
+    for frame_num, player_teams in enumerate(player_teams_per_frame):# với mỗi khung hình và đội của các cầu thủ trong khung hình đó
+        for player_id, team in player_teams.items():# với mỗi cầu thủ trong khung hình đó
             # player_id là id của cầu thủ
             
             tracks['players'][frame_num][player_id]['team'] = team  # gán đội cho cầu thủ trong tracks
@@ -110,23 +227,14 @@ def main():
     
     # Assign Ball Aquisition, acquisition là sự chiếm hữu
     player_assigner =PlayerBallAssigner() # khởi tạo đối tượng PlayerBallAssigner để gán cầu thủ có bóng
-    team_ball_control= [] # danh sách lưu đội kiểm soát bóng trong từng khung hình
-    for frame_num, player_track in enumerate(tracks['players']): # với mỗi khung hình và các cầu thủ trong khung hình đó
-        ball_bbox = tracks['ball'][frame_num][1]['bbox'] # lấy bounding box của bóng trong khung hình đó
-        assigned_player = player_assigner.assign_ball_to_player(player_track, ball_bbox)
-        # [1] là vì trong tracks['ball'][frame_num] có thể có nhiều đối tượng, ta lấy đối tượng thứ nhất (bóng)
-        # ['bbox'] là bounding box của bóng trong khung hình đó
-        
-        
-        if assigned_player != -1: # nếu có cầu thủ được gán bóng
-            tracks['players'][frame_num][assigned_player]['has_ball'] = True # gán cầu thủ có bóng
-            team_ball_control.append(tracks['players'][frame_num][assigned_player]['team']) # lưu đội của cầu thủ có bóng
-        else:
-            # If no player has the ball, keep the last team that had it (or use 0 if first frame)
-            team_ball_control.append(team_ball_control[-1] if len(team_ball_control) > 0 else 0) # nếu không có cầu thủ nào có bóng, giữ đội cuối cùng có bóng (hoặc dùng 0 nếu là khung hình đầu tiên)
-    team_ball_control= np.array(team_ball_control) # chuyển danh sách thành mảng numpy
+    # khoảng cách tới bóng của tất cả cầu thủ trong cả video được tính cùng lúc, có hysteresis để bóng không nhảy qua lại giữa hai cầu thủ đứng gần nhau
+    # gán has_ball cho cầu thủ có bóng và trả về team_ball_control (đội kiểm soát bóng ở từng khung hình, không ai có bóng thì giữ đội cuối cùng)
+    team_ball_control = player_assigner.assign_ball_possession(tracks)
 
+    return tracks, team_ball_control
 
+def run_analytics(tracks, team_ball_control):
+    # hàm này chạy phần phân tích sau khi đã có tracks và team_ball_control, dùng chung cho chế độ thường và chế độ streaming
     # Phân tích và thống kê các chỉ số cầu thủ
     print("Đang phân tích thống kê cầu thủ...")
     stats_analyzer = PlayerStatsAnalyzer()
@@ -290,28 +398,7 @@ def main():
         print(f"   - PDF Report: {pdf_report_path}")
     print("\n" + "="*80 + "\n")
 
-
-    # Draw output , vẽ kết quả đầu ra
-    ## Draw object Tracks
-    output_video_frames = tracker.draw_annotations(video_frames, tracks,team_ball_control)
-
-    ## Draw Camera movement
-    output_video_frames = camera_movement_estimator.draw_camera_movement(output_video_frames,camera_movement_per_frame)
-
-    ## Draw Speed and Distance
-    speed_and_distance_estimator.draw_speed_and_distance(output_video_frames,tracks)
-    
-    ## Draw Player Stats on frames (vẽ bảng thống kê nhỏ lên góc video)
-    print("Đang vẽ thống kê lên video...")
-    for frame_num, frame in enumerate(output_video_frames):
-        output_video_frames[frame_num] = stats_analyzer.draw_stats_on_frame(
-            frame, 
-            position=(10, frame.shape[0] - 270),  # Tăng từ 200 lên 270 để hiển thị đủ 5 cầu thủ
-            max_players=5
-        )
-
-    # Save video
-    save_video(output_video_frames, 'output_videos/output_video.avi')
+    return stats_analyzer
 
 if __name__ == '__main__': # nếu file này được chạy trực tiếp, thì gọi hàm main
     main()
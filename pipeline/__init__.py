@@ -0,0 +1,3 @@
+from .streaming_pipeline import StreamingPipeline
+from .segment_pipeline import SegmentParallelPipeline
+from .annotation_engine import AnnotationEngine
@@ -0,0 +1,103 @@
+import time
+import sys
+sys.path.append('../')
+from player_ball_assigner import PossessionTimeline
+from utils import RenderProfile
+
+class AnnotationEngine(): # vẽ tất cả các lớp chú thích lên một khung hình trong một lần duyệt
+    '''
+    Trước đây main.py vẽ video qua nhiều lượt trên toàn bộ video: Tracker.draw_annotations (copy mọi khung hình),
+    draw_camera_movement (copy thêm lần nữa), draw_speed_and_distance rồi vòng vẽ bảng thống kê.
+    AnnotationEngine giữ một danh sách các lớp (layer) theo thứ tự vẽ:
+    - Mỗi lớp là (tên, draw), draw(frame, context) vẽ trực tiếp lên frame và trả về frame,
+      context là dictionary {'frame_num', 'tracks' (tracks của khung hình), 'possession' (PossessionTimeline), 'camera_movement'}
+    - annotate_frame() copy khung hình một lần (thu nhỏ theo render_profile nếu là proxy/draft) rồi áp dụng lần lượt tất cả các lớp
+    - render() đọc, vẽ và ghi từng khung hình ngay (AsyncVideoWriter) nên bộ nhớ chỉ giữ khung hình đang vẽ và hàng đợi của writer
+    Thêm/bỏ lớp bằng register()/unregister(), các lớp mặc định được tạo bởi from_components().
+    '''
+    def __init__(self, render_profile=None):
+        self.layers = [] # [(tên, draw)] theo thứ tự vẽ
+        self.render_profile = render_profile or RenderProfile() # độ phân giải của khung hình đầu ra, xem utils/render_profile.py
+        self.reset()
+
+    def reset(self):
+        self.num_frames = 0
+        self.layer_time = {} # tên lớp -> tổng thời gian vẽ (giây)
+
+    @classmethod
+    def from_components(cls, tracker, camera_movement_estimator=None, speed_and_distance_estimator=None, stats_analyzer=None, stats_max_players=5,
+                        render_profile=None):
+        '''
+        Các lớp mặc định theo đúng thứ tự vẽ cũ: cầu thủ (ellipse + tam giác người giữ bóng), trọng tài, bóng, kiểm soát bóng,
+        chuyển động camera, tốc độ/quãng đường, bảng thống kê (góc dưới bên trái). Thành phần nào là None thì bỏ lớp tương ứng.
+        '''
+        engine = cls(render_profile)
+        profile = engine.render_profile
+        engine.register('players', lambda frame, context: tracker.draw_players(frame, context['tracks']['players'], profile))
+        engine.register('referees', lambda frame, context: tracker.draw_referees(frame, context['tracks']['referees'], profile))
+        engine.register('ball', lambda frame, context: tracker.draw_ball(frame, context['tracks']['ball'], profile))
+        engine.register('team_ball_control', lambda frame, context: tracker.draw_team_ball_control(frame, context['frame_num'], context['possession'], profile))
+        if camera_movement_estimator is not None:
+            engine.register('camera_movement', lambda frame, context: camera_movement_estimator.draw_frame_camera_movement(frame, context['camera_movement'], profile))
+        if speed_and_distance_estimator is not None:
+            engine.register('speed_and_distance', lambda frame, context: speed_and_distance_estimator.draw_frame_speed_and_distance(frame, context['tracks'], profile))
+        if stats_analyzer is not None:
+            # góc dưới bên trái, cách đáy khung hình tham chiếu 1920x1080 270 pixel để hiển thị đủ 5 cầu thủ
+            engine.register('player_stats', lambda frame, context: stats_analyzer.draw_stats_on_frame(frame, position=(10, RenderProfile.REFERENCE_SIZE[1] - 270),
+                                                                                                      max_players=stats_max_players, render_profile=profile))
+        return engine
+
+    @property
+    def layer_names(self):
+        return [name for name, _ in self.layers]
+
+    def register(self, name, draw, before=None):
+        # thêm lớp name (thay lớp cùng tên nếu đã có), before là tên lớp mà lớp mới được vẽ trước nó (mặc định vẽ sau cùng)
+        self.unregister(name)
+        names = self.layer_names
+        if before is not None and before not in names:
+            raise ValueError(f"❌ Không có lớp chú thích {before}, các lớp hiện có: {names}")
+        index = names.index(before) if before is not None else len(self.layers)
+        self.layers.insert(index, (name, draw))
+
+    def unregister(self, name):
+        self.layers = [(layer_name, draw) for layer_name, draw in self.layers if layer_name != name]
+
+    def annotate_frame(self, frame, context):
+        # copy (hoặc thu nhỏ) khung hình một lần rồi vẽ lần lượt tất cả các lớp lên bản sao
+        frame = self.render_profile.resize_frame(frame)
+        for name, draw in self.layers:
+            start = time.perf_counter()
+            frame = draw(frame, context)
+            self.layer_time[name] = self.layer_time.get(name, 0.0) + time.perf_counter() - start
+        self.num_frames += 1
+        return frame
+
+    def render(self, video_frames, tracks, team_ball_control, camera_movement_per_frame, video_writer):
+        '''
+        logic hàm này là:
+        1. Duyệt từng khung hình của video (VideoFrameReader hoặc list khung hình)
+        2. Lấy tracks của khung hình đó và tạo context (PossessionTimeline tính một lần cho cả video)
+        3. Vẽ tất cả các lớp bằng annotate_frame() và ghi ngay bằng video_writer.write()
+        Trả về số khung hình đã ghi.
+        '''
+        num_frames = 0
+        possession = team_ball_control if isinstance(team_ball_control, PossessionTimeline) else PossessionTimeline(team_ball_control)
+        for frame_num, frame in enumerate(video_frames):
+            frame_tracks = {object_name: object_tracks[frame_num] for object_name, object_tracks in tracks.items()}
+            context = {
+                'frame_num': frame_num,
+                'tracks': frame_tracks,
+                'possession': possession,
+                'camera_movement': camera_movement_per_frame[frame_num],
+            }
+            video_writer.write(self.annotate_frame(frame, context))
+            num_frames += 1
+        return num_frames
+
+    def stats(self):
+        # thời gian vẽ trung bình của từng lớp (ms/khung hình)
+        return {
+            'frames': self.num_frames,
+            'layer_ms': {name: 1000 * total / max(self.num_frames, 1) for name, total in self.layer_time.items()},
+        }
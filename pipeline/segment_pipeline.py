@@ -0,0 +1,156 @@
+import sys
+import os
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+sys.path.append('../')
+from utils import VideoFrameReader, get_bbox_iou_matrix
+from camera_movement_estimator import CameraMovementEstimator
+from track_store import TrackStore
+
+def process_segment(video_path, model_path, start, stop, tracker_backend='kalman', inference_options=None):
+    '''
+    Hàm chạy trong tiến trình con, xử lý các khung hình [start, stop) của video:
+    1. Mở video riêng và chỉ đọc tuần tự đoạn cần xử lý
+    2. Detection + tracking với một Tracker riêng (id của đoạn bắt đầu lại từ 1, sẽ được đổi sang id chung ở bước ghép)
+    3. Ước lượng chuyển động camera cho từng khung hình của đoạn
+    Chỉ trả về tracks và chuyển động camera (không trả về khung hình) để dữ liệu gửi về tiến trình chính nhỏ
+    '''
+    from trackers import Tracker # import trong tiến trình con để tiến trình chính không phải nạp YOLO
+
+    tracker = Tracker(model_path, tracker_backend=tracker_backend, **(inference_options or {}))
+    camera_movement_estimator = None
+    tracks = TrackStore() # dạng cột nên dữ liệu gửi về tiến trình chính nhỏ hơn list các dictionary
+    camera_movement = []
+
+    with VideoFrameReader(video_path) as reader:
+        for frame_num, frame, frame_tracks in tracker.iter_frame_tracks(reader.iter_frames(start, stop)):
+            for object_name in tracks:
+                tracks[object_name].append(frame_tracks[object_name])
+
+            if camera_movement_estimator is None: # khung hình đầu tiên của đoạn dùng để tạo mặt nạ điểm đặc trưng
+                camera_movement_estimator = CameraMovementEstimator(frame)
+            camera_movement.append(camera_movement_estimator.get_frame_movement(frame, CameraMovementEstimator.get_frame_bboxes(frame_tracks)))
+
+    return {'start': start, 'stop': stop, 'tracks': tracks, 'camera_movement': camera_movement}
+
+class SegmentParallelPipeline(): # chạy detection, tracking và chuyển động camera song song trên nhiều đoạn video
+    '''
+    Pipeline này dùng cho tùy chọn --workers của main.py với các video dài (cả trận đấu):
+    1. Chia video thành các đoạn liên tiếp, mỗi đoạn được xử lý thêm overlap khung hình phía trước (đoạn chồng lấn)
+    2. Mỗi đoạn chạy process_segment trong một tiến trình của ProcessPoolExecutor
+    3. Ghép kết quả theo thứ tự đoạn:
+       - id của đoạn sau được đổi sang id chung bằng cách so khớp bbox (IoU) trên các khung hình chồng lấn với đoạn trước
+       - id không khớp được cấp id mới, tiếp nối id lớn nhất đã dùng (bộ đếm id của Tracker trong mỗi tiến trình là riêng)
+       - chuyển động camera của các khung hình chồng lấn bị bỏ đi, các khung hình này chỉ dùng để khởi động
+         trạng thái optical flow, nhờ vậy khung hình đầu tiên của đoạn được so với đúng khung hình trước nó
+    Kết quả có cùng cấu trúc với Tracker.get_object_tracks và CameraMovementEstimator.get_camera_movement,
+    các bước còn lại (vị trí, biến đổi góc nhìn, nội suy bóng, tốc độ, gán đội) chạy trên kết quả đã ghép như chế độ thường.
+    '''
+    def __init__(self, model_path, num_workers=None, segment_length=None, overlap=24, min_iou=0.3, tracker_backend='kalman', inference_options=None):
+        self.model_path = model_path
+        self.tracker_backend = tracker_backend # tracker backend dùng trong mỗi tiến trình (xem trackers/tracker_backends.py)
+        self.inference_options = inference_options or {} # batch_size, imgsz, half, device, inference_backend, int8, keyframe_interval, ... cho Tracker của mỗi tiến trình
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.segment_length = segment_length # số khung hình mỗi đoạn, mặc định chia đều cho num_workers
+        self.overlap = overlap # số khung hình chồng lấn giữa hai đoạn liên tiếp
+        self.min_iou = min_iou # IoU trung bình tối thiểu trên các khung hình chồng lấn để coi là cùng một đối tượng
+
+    def split_segments(self, num_frames):
+        # trả về danh sách (start, owned_start, stop): đoạn xử lý [start, stop), các khung hình [start, owned_start) là phần chồng lấn
+        segment_length = self.segment_length or math.ceil(num_frames / self.num_workers)
+        segment_length = max(segment_length, 1)
+        segments = []
+        for owned_start in range(0, num_frames, segment_length):
+            start = max(0, owned_start - self.overlap)
+            stop = min(num_frames, owned_start + segment_length)
+            segments.append((start, owned_start, stop))
+        return segments
+
+    def run(self, video_path, num_frames):
+        '''
+        logic hàm này là:
+        1. Chia video thành các đoạn có chồng lấn
+        2. Gửi từng đoạn cho process pool, tiến trình dùng 'spawn' để không sao chép trạng thái CUDA/YOLO của tiến trình chính
+        3. Ghép kết quả các đoạn thành tracks và camera_movement_per_frame của cả video
+        '''
+        segments = self.split_segments(num_frames)
+        print(f"⚙️ Chia video {num_frames} frames thành {len(segments)} đoạn, chạy trên {self.num_workers} tiến trình")
+
+        with ProcessPoolExecutor(max_workers=self.num_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(process_segment, video_path, self.model_path, start, stop, self.tracker_backend, self.inference_options) for start, _, stop in segments]
+            results = [future.result() for future in futures]
+
+        return self.merge_segments(results, [owned_start for _, owned_start, _ in segments])
+
+    def merge_segments(self, results, owned_starts):
+        '''
+        Ghép kết quả các đoạn (theo thứ tự) thành tracks và camera_movement_per_frame của cả video:
+        1. Đoạn đầu tiên không có phần chồng lấn, các id được cấp lần lượt từ 1
+        2. Với mỗi đoạn sau, so khớp id với tracks đã ghép trên các khung hình chồng lấn, mỗi loại đối tượng một lần
+        3. Đổi id của đoạn theo bảng ánh xạ, id không khớp được cấp id mới
+        4. Chỉ thêm các khung hình từ owned_start trở đi, phần chồng lấn đã có kết quả của đoạn trước
+        '''
+        tracks = TrackStore()
+        camera_movement = []
+        next_id = 1 # id chung tiếp theo, players và referees dùng chung bộ đếm giống Tracker
+
+        for result, owned_start in zip(results, owned_starts):
+            segment_tracks = result['tracks']
+            num_overlap = owned_start - result['start']
+
+            id_map = {}
+            for object_name in ('players', 'referees'):
+                previous_frames = tracks[object_name][result['start']:owned_start]
+                overlap_frames = segment_tracks[object_name][:num_overlap]
+                id_map.update(self.match_track_ids(previous_frames, overlap_frames))
+
+            for object_name in ('players', 'referees'):
+                for frame_track in segment_tracks[object_name]:
+                    for track_id in frame_track:
+                        if track_id not in id_map: # đối tượng mới xuất hiện trong đoạn này
+                            id_map[track_id] = next_id
+                            next_id += 1
+
+            for object_name, object_tracks in segment_tracks.items():
+                for frame_track in object_tracks[num_overlap:]:
+                    if object_name == 'ball': # bóng luôn có id 1
+                        tracks[object_name].append(frame_track)
+                    else:
+                        tracks[object_name].append({id_map[track_id]: track for track_id, track in frame_track.items()})
+            camera_movement += result['camera_movement'][num_overlap:]
+
+        return tracks, camera_movement
+
+    def match_track_ids(self, previous_frames, segment_frames):
+        '''
+        So khớp id của đoạn mới với id chung trên các khung hình chồng lấn:
+        1. Cộng dồn IoU giữa bbox của từng cặp (id chung, id của đoạn) trên tất cả khung hình chồng lấn
+        2. Dùng thuật toán Hungarian để chọn các cặp có tổng IoU lớn nhất, mỗi id chỉ được ghép một lần
+        3. Chỉ giữ các cặp có IoU trung bình từ min_iou trở lên
+        Trả về dictionary {id của đoạn: id chung}
+        '''
+        if not previous_frames or not segment_frames:
+            return {}
+
+        previous_ids = sorted({track_id for frame_track in previous_frames for track_id in frame_track})
+        segment_ids = sorted({track_id for frame_track in segment_frames for track_id in frame_track})
+        if not previous_ids or not segment_ids:
+            return {}
+
+        previous_index = {track_id: i for i, track_id in enumerate(previous_ids)}
+        segment_index = {track_id: i for i, track_id in enumerate(segment_ids)}
+        iou_sum = np.zeros((len(previous_ids), len(segment_ids)))
+        for previous_track, segment_track in zip(previous_frames, segment_frames):
+            if not previous_track or not segment_track:
+                continue
+            rows = [previous_index[track_id] for track_id in previous_track]
+            cols = [segment_index[track_id] for track_id in segment_track]
+            iou_sum[np.ix_(rows, cols)] += get_bbox_iou_matrix([info['bbox'] for info in previous_track.values()],
+                                                               [info['bbox'] for info in segment_track.values()])
+
+        mean_iou = iou_sum / len(segment_frames)
+        rows, cols = linear_sum_assignment(-mean_iou) # Hungarian: chọn cặp có tổng IoU lớn nhất
+        return {segment_ids[col]: previous_ids[row] for row, col in zip(rows, cols) if mean_iou[row, col] >= self.min_iou}
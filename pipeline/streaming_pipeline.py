@@ -0,0 +1,177 @@
+import sys
+from collections import deque
+import numpy as np
+sys.path.append('../')
+from utils import AsyncVideoWriter
+from camera_movement_estimator import CameraMovementEstimator
+from speed_and_distance_estimator import OnlineSpeedAndDistance_Estimator
+from trackers import OnlineBallInterpolator
+from player_ball_assigner import PossessionTimeline
+from .annotation_engine import AnnotationEngine
+from track_store import TrackStore
+
+class StreamingPipeline(): # pipeline xử lý video theo từng khung hình trong một lượt duy nhất
+    '''
+    Pipeline này dùng cho chế độ --streaming của main.py, thay vì chạy từng bước trên toàn bộ video:
+    1. Detection + tracking theo lô nhỏ (Tracker.iter_frame_tracks, có thể chỉ chạy YOLO ở các khung hình chính)
+    2. Vị trí, chuyển động camera, biến đổi góc nhìn và gán đội được tính ngay cho từng khung hình
+    3. Nội suy vị trí bóng bằng OnlineBallInterpolator, nhìn trước tối đa ball_gap_window khung hình
+    4. Gán bóng cho cầu thủ và cập nhật đội kiểm soát bóng
+    5. Tốc độ và quãng đường tính bằng OnlineSpeedAndDistance_Estimator (bộ đệm vòng cho từng cầu thủ, trễ tối đa frame_window khung hình)
+    6. Vẽ chú thích và ghi khung hình ra video ngay khi khung hình đi hết các bước
+    Số khung hình giữ trong bộ nhớ chỉ phụ thuộc vào kích thước các bộ đệm, không phụ thuộc vào độ dài video.
+    '''
+    def __init__(self, tracker, team_assigner, player_assigner, view_transformer, speed_and_distance_estimator, ball_gap_window=24, keep_tracks=True,
+                 pitch_registration=None, ball_interpolator=None, render_profile=None):
+        self.tracker = tracker
+        self.team_assigner = team_assigner
+        self.player_assigner = player_assigner
+        self.view_transformer = view_transformer
+        self.speed_and_distance_estimator = speed_and_distance_estimator
+        self.online_speed_estimator = OnlineSpeedAndDistance_Estimator(speed_and_distance_estimator) # cùng frame_window, frame_rate và kiểu làm mượt
+        self.ball_gap_window = ball_gap_window # số khung hình tối đa chờ bóng xuất hiện lại để nội suy
+        # cùng cách nội suy với BallInterpolator (tuyến tính, spline, Kalman), khoảng trống dài hơn ball_gap_window thì không nội suy
+        self.ball_interpolator = OnlineBallInterpolator(ball_interpolator, lookahead=ball_gap_window)
+        self.keep_tracks = keep_tracks # giữ lại tracks (không giữ khung hình) để chạy phân tích sau khi xử lý xong video
+        self.pitch_registration = pitch_registration # PitchRegistration, homography của từng khung hình (chưa làm mượt vì không nhìn trước)
+        self.render_profile = render_profile # độ phân giải của video đầu ra (RenderProfile), None là độ phân giải gốc
+
+    def run(self, video_frames, output_video_path):
+        '''
+        logic hàm này là:
+        1. Duyệt từng khung hình cùng kết quả detection, tính các thông tin không cần nhìn trước
+        2. Đưa khung hình qua bộ đệm nội suy bóng, rồi gán bóng cho cầu thủ
+        3. Đưa khung hình qua bộ đệm tốc độ, khung hình nào xong thì vẽ và ghi ra video ngay
+        4. Hết video thì xả các bộ đệm theo đúng thứ tự
+        5. Trả về tracks và team_ball_control để dùng cho phần phân tích
+        '''
+        self.camera_movement_estimator = None
+        if self.pitch_registration is not None:
+            self.pitch_registration.reset()
+        self.ball_interpolator.reset()
+        self.team_assigner.reset()
+        self.ball_pending = deque() # các khung hình đang chờ nội suy bóng, theo đúng thứ tự đưa vào ball_interpolator
+        self.online_speed_estimator.reset()
+        self.speed_pending = deque() # các khung hình đang chờ tính tốc độ, theo đúng thứ tự đưa vào online_speed_estimator
+        self.team_ball_control = [] # đội kiểm soát bóng ở mỗi khung hình, thêm theo thứ tự gán bóng (không cần biết trước độ dài video)
+        self.possession = PossessionTimeline() # bộ đếm kiểm soát bóng, thêm từng khung hình theo thứ tự gán bóng
+        self.last_team = 0 # đội kiểm soát bóng gần nhất, 0 nếu chưa có
+        self.player_assigner.reset() # trạng thái hysteresis của người giữ bóng
+        self.tracks = TrackStore() # tracks dạng cột, mỗi khung hình đã ghi được thêm vào cuối
+        # ghi video trên luồng nền, fps và codec lấy từ video nguồn; with để luồng ghi luôn được đóng và file video được giải phóng kể cả khi có lỗi
+        with AsyncVideoWriter(output_video_path,
+                              fps=getattr(video_frames, 'fps', 24),
+                              codec=getattr(video_frames, 'codec', 'XVID')) as self.writer:
+            for frame_num, frame, frame_tracks in self.tracker.iter_frame_tracks(video_frames):
+                record = self.process_frame(frame_num, frame, frame_tracks)
+                for ball_ready in self.push_ball(record):
+                    self.assign_ball(ball_ready)
+                    for speed_ready in self.push_speed(ball_ready):
+                        self.write_frame(speed_ready)
+
+            # xả các bộ đệm khi hết video
+            for ball_ready in self.flush_ball():
+                self.assign_ball(ball_ready)
+                for speed_ready in self.push_speed(ball_ready):
+                    self.write_frame(speed_ready)
+            for speed_ready in self.flush_speed():
+                self.write_frame(speed_ready)
+
+        print(f"✅ Đã xử lý streaming {len(self.tracks['players'])} frames, video lưu tại: {output_video_path}")
+
+        return self.tracks, np.array(self.team_ball_control, dtype=int)
+
+    def process_frame(self, frame_num, frame, frame_tracks):
+        # các bước chỉ cần khung hình hiện tại: vị trí, chuyển động camera, biến đổi góc nhìn, gán đội (frame_tracks đã được gán id)
+        window = {object_name: [object_track] for object_name, object_track in frame_tracks.items()} # tracks một khung hình để dùng lại các hàm xử lý tracks
+        self.tracker.add_position_to_tracks(window)
+
+        if self.camera_movement_estimator is None:
+            self.camera_movement_estimator = CameraMovementEstimator(frame)
+            # các lớp chú thích vẽ trong một lần duyệt (không có bảng thống kê vì cần số liệu của cả trận)
+            self.annotation_engine = AnnotationEngine.from_components(self.tracker, self.camera_movement_estimator, self.speed_and_distance_estimator,
+                                                                      render_profile=self.render_profile)
+        camera_movement = self.camera_movement_estimator.get_frame_movement(frame, CameraMovementEstimator.get_frame_bboxes(frame_tracks)) # bỏ bbox các đối tượng khỏi mặt nạ điểm đặc trưng
+        self.camera_movement_estimator.add_adjust_positions_to_tracks(window, [camera_movement])
+        if self.pitch_registration is not None: # homography của khung hình này thay cho 4 góc sân cố định
+            self.view_transformer.set_homographies([self.pitch_registration.update(frame)], position_key='position')
+            self.view_transformer.add_transformed_position_to_tracks(window)
+        else:
+            self.view_transformer.add_transformed_position_to_tracks(window, start_frame=frame_num) # ma trận riêng của khung hình frame_num (nếu có)
+
+        # không nhìn trước được nên màu áo của hai đội được học từ các khung hình đầu tiên có đủ cầu thủ (có loại bỏ ngoại lai),
+        # trước đó cầu thủ có đội 0 và màu mặc định khi vẽ
+        self.team_assigner.update_team_model(frame, frame_tracks['players'], frame_num)
+        # đội được bầu chọn lại theo các phiếu đã có tới khung hình này
+        for player_id, team in self.team_assigner.get_player_teams(frame, frame_tracks['players'], frame_num).items():
+            track = frame_tracks['players'][player_id]
+            track['team'] = team
+            if team in self.team_assigner.team_colors:
+                track['team_color'] = self.team_assigner.team_colors[team]
+
+        return {
+            'frame_num': frame_num,
+            'frame': frame,
+            'tracks': frame_tracks,
+            'camera_movement': camera_movement
+        }
+
+    def push_ball(self, record):
+        # bộ đệm nội suy bóng: ball_interpolator trả về các khung hình đã có bbox bóng cuối cùng theo thứ tự nên lấy từ đầu hàng đợi
+        self.ball_pending.append(record)
+        ball = record['tracks']['ball'].get(1)
+        ready = self.ball_interpolator.push(None if ball is None else ball['bbox'])
+        return [self.set_ball_bbox(self.ball_pending.popleft(), ball_bbox, interpolated) for _, ball_bbox, interpolated in ready]
+
+    def flush_ball(self):
+        # hết video: khoảng trống ở cuối giữ vị trí bóng cuối cùng (nếu không dài hơn ball_gap_window)
+        return [self.set_ball_bbox(self.ball_pending.popleft(), ball_bbox, interpolated) for _, ball_bbox, interpolated in self.ball_interpolator.flush()]
+
+    def set_ball_bbox(self, record, ball_bbox, interpolated):
+        ball_track = record['tracks']['ball']
+        if interpolated:
+            record['tracks']['ball'] = {1: {"bbox": ball_bbox, "interpolated": True}}
+        elif 1 in ball_track:
+            ball_track[1]['interpolated'] = False
+        return record
+
+    def assign_ball(self, record):
+        # gán bóng cho cầu thủ gần nhất (cùng hysteresis với PlayerBallAssigner.assign_ball_possession) và cập nhật đội kiểm soát bóng
+        player_track = record['tracks']['players']
+        ball = record['tracks']['ball'].get(1)
+        assigned_player = self.player_assigner.assign_possession_to_frame(player_track, None if ball is None else ball['bbox'])
+
+        if assigned_player != -1:
+            player_track[assigned_player]['has_ball'] = True
+            self.last_team = player_track[assigned_player].get('team', 0)
+        # nếu không có cầu thủ nào có bóng, giữ đội cuối cùng có bóng
+        self.team_ball_control.append(self.last_team)
+        self.possession.append(self.last_team)
+
+    def push_speed(self, record):
+        # chỉ tính cho players, bỏ qua ball và referees; estimator trả về các khung hình đã xong theo thứ tự nên lấy từ đầu hàng đợi
+        self.speed_pending.append(record)
+        ready = self.online_speed_estimator.push(record['tracks']['players'])
+        return [self.speed_pending.popleft() for _ in ready]
+
+    def flush_speed(self):
+        ready = self.online_speed_estimator.flush()
+        return [self.speed_pending.popleft() for _ in ready]
+
+    def write_frame(self, record):
+        # vẽ chú thích lên khung hình đã hoàn tất và ghi ra video
+        frame_num = record['frame_num']
+        frame_tracks = record['tracks']
+        context = {
+            'frame_num': frame_num,
+            'tracks': frame_tracks,
+            'possession': self.possession,
+            'camera_movement': record['camera_movement'],
+        }
+        frame = self.annotation_engine.annotate_frame(record['frame'], context) # một bản sao, vẽ tất cả các lớp
+
+        self.writer.write(frame)
+
+        if self.keep_tracks:
+            for object_name, object_track in frame_tracks.items():
+                self.tracks[object_name].append(object_track)
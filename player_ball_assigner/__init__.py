@@ -0,0 +1,2 @@
+from .player_ball_assigner import PlayerBallAssigner
+from .possession_timeline import PossessionTimeline
@@ -1,27 +1,159 @@
-import sys 
+import numpy as np
+import sys
 sys.path.append('../')
-from utils import get_center_of_bbox, measure_distance
+from utils import get_center_of_bbox
+from track_store import ObjectTracks
 
 class PlayerBallAssigner(): # lớp để gán bóng cho cầu thủ gần nhất
-    def __init__(self):
+    '''
+    Khoảng cách từ bóng tới cầu thủ là khoảng cách nhỏ hơn từ tâm bbox bóng tới hai góc dưới (hai chân) của bbox cầu thủ,
+    cầu thủ gần nhất trong phạm vi max_player_ball_distance có bóng.
+    Để bóng không nhảy qua lại giữa hai cầu thủ đứng gần nhau (hysteresis), cầu thủ đang giữ bóng chỉ mất bóng khi:
+    - không còn trong phạm vi (hoặc không còn trong khung hình), hoặc
+    - một cầu thủ khác gần bóng hơn ít nhất switch_margin pixel trong min_switch_frames khung hình liên tiếp
+    switch_margin=0 và min_switch_frames=1 cho kết quả giống hệt cách gán theo cầu thủ gần nhất ở từng khung hình.
+    '''
+    def __init__(self, switch_margin=5, min_switch_frames=3):
         self.max_player_ball_distance = 70 # khoảng cách tối đa để gán bóng cho cầu thủ, 70 là
-    
-    def assign_ball_to_player(self,players,ball_bbox): # hàm để gán bóng cho cầu thủ gần nhất
-        ball_position = get_center_of_bbox(ball_bbox) 
+        self.switch_margin = switch_margin # cầu thủ khác phải gần bóng hơn cầu thủ đang giữ bóng bao nhiêu pixel mới được tính
+        self.min_switch_frames = min_switch_frames # số khung hình liên tiếp cầu thủ khác phải gần hơn thì mới đổi người giữ bóng
+        self.reset()
 
-        miniumum_distance = 99999 # khởi tạo khoảng cách tối thiểu lớn
-        assigned_player=-1 # khởi tạo id cầu thủ được gán bóng là -1 (không có)
+    def get_params(self): # tham số ảnh hưởng đến kết quả, dùng cho khóa của StageCache
+        return dict(max_player_ball_distance=self.max_player_ball_distance, switch_margin=self.switch_margin, min_switch_frames=self.min_switch_frames)
 
-        for player_id, player in players.items(): 
-            player_bbox = player['bbox'] # lấy bounding box của cầu thủ
+    def reset(self):
+        # trạng thái hysteresis, gọi khi bắt đầu video mới
+        self.holder = -1 # cầu thủ đang giữ bóng
+        self.candidate = -1 # cầu thủ đang gần bóng hơn người giữ bóng
+        self.candidate_frames = 0 # số khung hình liên tiếp của candidate
 
-            distance_left = measure_distance((player_bbox[0],player_bbox[-1]),ball_position) # tính khoảng cách từ cạnh trái của bounding box cầu thủ đến vị trí bóng
-            distance_right = measure_distance((player_bbox[2],player_bbox[-1]),ball_position) # tính khoảng cách từ cạnh phải của bounding box cầu thủ đến vị trí bóng
-            distance = min(distance_left,distance_right) # lấy khoảng cách nhỏ hơn trong 2 khoảng cách trên 
+    def get_ball_distances(self, player_bboxes, ball_position):
+        # khoảng cách từ bóng tới chân gần hơn (góc dưới trái/phải của bbox) của tất cả cầu thủ cùng lúc
+        player_bboxes = np.asarray(player_bboxes, dtype=np.float64).reshape(-1, 4)
+        ball_position = np.asarray(ball_position, dtype=np.float64)
+        dy = player_bboxes[..., 3] - ball_position[..., 1]
+        distance_left = np.sqrt((player_bboxes[..., 0] - ball_position[..., 0])**2 + dy**2)
+        distance_right = np.sqrt((player_bboxes[..., 2] - ball_position[..., 0])**2 + dy**2)
+        return np.minimum(distance_left, distance_right)
 
-            if distance < self.max_player_ball_distance: # nếu khoảng cách nhỏ hơn khoảng cách tối đa để gán bóng
-                if distance < miniumum_distance:
-                    miniumum_distance = distance
-                    assigned_player = player_id
+    def assign_ball_to_player(self,players,ball_bbox): # hàm để gán bóng cho cầu thủ gần nhất (một khung hình, không có hysteresis)
+        if len(players) == 0:
+            return -1
+        distances = self.get_ball_distances([player['bbox'] for player in players.values()], get_center_of_bbox(ball_bbox))
+        nearest = int(distances.argmin()) # cầu thủ đầu tiên nếu có nhiều cầu thủ cùng khoảng cách, giống vòng lặp cũ
+        if distances[nearest] >= self.max_player_ball_distance:
+            return -1
+        return list(players)[nearest]
 
-        return assigned_player
\ No newline at end of file
+    def update_possession(self, nearest, nearest_distance, holder_distance):
+        '''
+        logic hàm này là (một bước của hysteresis, dùng chung cho cả video và streaming):
+        1. Không có cầu thủ nào trong phạm vi: không ai có bóng ở khung hình này (vẫn nhớ người giữ bóng)
+        2. Người giữ bóng không còn trong phạm vi: cầu thủ gần nhất có bóng ngay
+        3. Cầu thủ khác gần hơn ít nhất switch_margin: đếm số khung hình liên tiếp, đủ min_switch_frames thì đổi người giữ bóng
+        holder_distance là khoảng cách của người giữ bóng ở khung hình này (None nếu không có trong khung hình)
+        Trả về id cầu thủ có bóng ở khung hình này, -1 nếu không có.
+        '''
+        if nearest == -1:
+            self.candidate, self.candidate_frames = -1, 0
+            return -1
+        if nearest == self.holder or holder_distance is None or holder_distance >= self.max_player_ball_distance:
+            self.holder = nearest
+            self.candidate, self.candidate_frames = -1, 0
+            return nearest
+        if nearest_distance <= holder_distance - self.switch_margin:
+            self.candidate_frames = self.candidate_frames + 1 if nearest == self.candidate else 1
+            self.candidate = nearest
+            if self.candidate_frames >= self.min_switch_frames:
+                self.holder = nearest
+                self.candidate, self.candidate_frames = -1, 0
+                return nearest
+        else:
+            self.candidate, self.candidate_frames = -1, 0
+        return self.holder
+
+    def assign_possession_to_frame(self, players, ball_bbox):
+        # gán bóng cho một khung hình có hysteresis (streaming), trả về id cầu thủ có bóng hoặc -1
+        if ball_bbox is None or len(players) == 0:
+            return self.update_possession(-1, None, None)
+        player_ids = list(players)
+        distances = self.get_ball_distances([player['bbox'] for player in players.values()], get_center_of_bbox(ball_bbox))
+        nearest = int(distances.argmin())
+        holder_distance = float(distances[player_ids.index(self.holder)]) if self.holder in players else None
+        if distances[nearest] >= self.max_player_ball_distance:
+            return self.update_possession(-1, None, holder_distance)
+        return self.update_possession(player_ids[nearest], float(distances[nearest]), holder_distance)
+
+    def assign_ball_possession(self, tracks):
+        '''
+        logic hàm này là (cả video trong một lượt):
+        1. Gom bbox, đội của tất cả các dòng players và tâm bóng của từng khung hình thành mảng
+        2. Tính khoảng cách tới bóng của tất cả các dòng cùng lúc, tìm cầu thủ gần nhất trong phạm vi của từng khung hình
+        3. Duyệt các khung hình chỉ với các số đã tính để chạy hysteresis (update_possession)
+        4. Gán has_ball cho các dòng có bóng, team_ball_control là đội của người có bóng hoặc giữ đội cuối cùng có bóng (0 nếu chưa có)
+        Trả về mảng team_ball_control.
+        '''
+        self.reset()
+        players = tracks['players']
+        num_frames = len(players)
+        ball_centers = np.full((num_frames, 2), np.nan)
+        for frame_num, ball_track in enumerate(tracks['ball']):
+            if frame_num < num_frames and 1 in ball_track:
+                ball_centers[frame_num] = get_center_of_bbox(ball_track[1]['bbox'])
+
+        if isinstance(players, ObjectTracks):
+            bboxes, _ = players.column('bbox')
+            teams, has_team = players.column('team')
+            frame = players.frame_index()
+            track_ids = players.track_ids
+        else:
+            player_tracks = [track for frame_tracks in players for track in frame_tracks.values()]
+            bboxes = np.array([track['bbox'] for track in player_tracks], dtype=np.float64).reshape(-1, 4)
+            has_team = np.array(['team' in track for track in player_tracks], dtype=bool)
+            teams = np.array([track.get('team', 0) for track in player_tracks], dtype=np.int64)
+            frame = np.repeat(np.arange(num_frames), [len(frame_tracks) for frame_tracks in players])
+            track_ids = np.array([track_id for frame_tracks in players for track_id in frame_tracks], dtype=np.int64)
+
+        if len(bboxes) == 0: # không có dòng players nào (chỉ có bóng hoặc tracks rỗng): không ai có bóng
+            return np.zeros(num_frames, dtype=np.int64)
+        distances = self.get_ball_distances(bboxes, ball_centers[frame]) # NaN khi khung hình không có bóng
+        in_range = distances < self.max_player_ball_distance
+        # dòng gần bóng nhất trong phạm vi của từng khung hình: sắp xếp theo (khung hình, khoảng cách), stable nên hòa thì lấy dòng trước
+        order = np.lexsort((np.where(in_range, distances, np.inf), frame))
+        first = np.r_[True, frame[order][1:] != frame[order][:-1]]
+        nearest_row = np.full(num_frames, -1)
+        candidates = order[first]
+        candidates = candidates[in_range[candidates]]
+        nearest_row[frame[candidates]] = candidates
+
+        starts = np.searchsorted(frame, np.arange(num_frames + 1))
+        distance_list, track_id_list = distances.tolist(), track_ids.tolist()
+        assigned_rows = np.full(num_frames, -1)
+        for frame_num, row in enumerate(nearest_row.tolist()):
+            holder_distance = None
+            if self.holder != -1: # khoảng cách của người giữ bóng trong khung hình này (nếu có)
+                frame_ids = track_id_list[starts[frame_num]:starts[frame_num + 1]]
+                if self.holder in frame_ids:
+                    holder_distance = distance_list[starts[frame_num] + frame_ids.index(self.holder)]
+                    holder_distance = None if holder_distance != holder_distance else holder_distance # NaN: không có bóng
+            if row == -1:
+                self.update_possession(-1, None, holder_distance)
+                continue
+            assigned = self.update_possession(track_id_list[row], distance_list[row], holder_distance)
+            frame_ids = track_id_list[starts[frame_num]:starts[frame_num + 1]]
+            assigned_rows[frame_num] = starts[frame_num] + frame_ids.index(assigned)
+
+        has_ball_rows = assigned_rows[assigned_rows >= 0]
+        if isinstance(players, ObjectTracks):
+            players.set_column('has_ball', True, has_ball_rows)
+        else:
+            for row in has_ball_rows.tolist():
+                player_tracks[row]['has_ball'] = True
+
+        # đội của người có bóng, khung hình không ai có bóng thì giữ đội cuối cùng có bóng (0 nếu chưa có)
+        frame_team = np.zeros(num_frames, dtype=np.int64)
+        with_ball = assigned_rows >= 0
+        frame_team[with_ball] = np.where(has_team[assigned_rows[with_ball]], teams[assigned_rows[with_ball]], 0)
+        last_index = np.maximum.accumulate(np.where(with_ball, np.arange(num_frames), -1)) if num_frames else np.zeros(0, dtype=np.int64)
+        return np.where(last_index >= 0, frame_team[np.maximum(last_index, 0)], 0)
@@ -0,0 +1,81 @@
+import numpy as np
+
+class PossessionTimeline(): # tỉ lệ kiểm soát bóng của các đội tới từng khung hình, tính từ tổng tiền tố (prefix sum)
+    '''
+    team_ball_control là đội kiểm soát bóng ở từng khung hình (0 nếu chưa có đội nào), thay vì đếm lại team_ball_control[:frame_num+1]
+    ở mỗi khung hình (O(n^2) trên cả trận), mỗi đội có một mảng tổng tiền tố số khung hình kiểm soát bóng:
+    - prefix[f, i] là số khung hình trong [0, f) mà đội teams[i] kiểm soát bóng, số khung hình của đoạn [start, stop) là prefix[stop] - prefix[start]
+    - get_possession(frame_num, window) trả về tỉ lệ kiểm soát bóng (%) của các đội tới frame_num hoặc trong window khung hình gần nhất, O(1)
+    - get_rolling_possession() cho các cửa sổ 1/5/15 phút, get_possession_series() cho mọi khung hình cùng lúc
+    - append() thêm từng khung hình (streaming), extend() thêm nhiều khung hình cùng lúc
+    Tỉ lệ tính trên các khung hình có đội kiểm soát bóng, chưa đội nào có bóng thì tỉ lệ là 0 (không chia cho 0).
+    '''
+    def __init__(self, team_ball_control=None, frame_rate=24, teams=(1, 2), capacity=1024):
+        self.frame_rate = frame_rate # fps của video, dùng để đổi phút sang số khung hình
+        self.teams = tuple(teams)
+        self.team_index = {team: index for index, team in enumerate(self.teams)}
+        self.prefix = np.zeros((max(capacity, 1) + 1, len(self.teams)), dtype=np.int64)
+        self.num_frames = 0
+        if team_ball_control is not None:
+            self.extend(team_ball_control)
+
+    def __len__(self):
+        return self.num_frames
+
+    def _reserve(self, size):
+        # tăng gấp đôi dung lượng khi cần, giống ObjectTracks
+        if size + 1 > len(self.prefix):
+            prefix = np.zeros((max(size + 1, 2 * len(self.prefix)), len(self.teams)), dtype=np.int64)
+            prefix[:self.num_frames + 1] = self.prefix[:self.num_frames + 1]
+            self.prefix = prefix
+
+    def append(self, team):
+        # thêm khung hình tiếp theo với đội kiểm soát bóng team
+        self._reserve(self.num_frames + 1)
+        self.prefix[self.num_frames + 1] = self.prefix[self.num_frames]
+        index = self.team_index.get(int(team))
+        if index is not None:
+            self.prefix[self.num_frames + 1, index] += 1
+        self.num_frames += 1
+
+    def extend(self, team_ball_control):
+        # thêm nhiều khung hình cùng lúc: tổng tích lũy của ma trận one-hot (khung hình, đội)
+        team_ball_control = np.asarray(team_ball_control).reshape(-1)
+        if len(team_ball_control) == 0:
+            return
+        self._reserve(self.num_frames + len(team_ball_control))
+        one_hot = team_ball_control[:, None] == np.array(self.teams)[None, :]
+        start = self.num_frames
+        self.prefix[start + 1:start + 1 + len(team_ball_control)] = self.prefix[start] + np.cumsum(one_hot, axis=0)
+        self.num_frames += len(team_ball_control)
+
+    def get_window(self, frame_num=None, window=None):
+        # đoạn [start, stop) kết thúc ở frame_num (mặc định khung hình cuối), dài tối đa window khung hình (mặc định từ đầu trận)
+        stop = self.num_frames if frame_num is None else min(frame_num + 1, self.num_frames)
+        stop = max(stop, 0)
+        start = 0 if window is None else max(stop - int(window), 0)
+        return start, stop
+
+    def get_counts(self, frame_num=None, window=None):
+        # số khung hình kiểm soát bóng của từng đội trong đoạn kết thúc ở frame_num, dạng {team: số khung hình}
+        start, stop = self.get_window(frame_num, window)
+        counts = self.prefix[stop] - self.prefix[start]
+        return {team: int(count) for team, count in zip(self.teams, counts)}
+
+    def get_possession(self, frame_num=None, window=None):
+        # tỉ lệ kiểm soát bóng (%) của từng đội tới frame_num (hoặc trong window khung hình gần nhất), 0 nếu chưa đội nào có bóng
+        counts = self.get_counts(frame_num, window)
+        total = sum(counts.values())
+        return {team: (100.0 * count / total if total > 0 else 0.0) for team, count in counts.items()}
+
+    def get_rolling_possession(self, frame_num=None, minutes=(1, 5, 15)):
+        # tỉ lệ kiểm soát bóng trong 1/5/15 phút gần nhất, dạng {phút: {team: %}}
+        return {window_minutes: self.get_possession(frame_num, window=round(window_minutes * 60 * self.frame_rate)) for window_minutes in minutes}
+
+    def get_possession_series(self, window=None):
+        # tỉ lệ kiểm soát bóng (%) tới mọi khung hình cùng lúc, mảng (số khung hình, số đội) theo thứ tự teams
+        stop = np.arange(1, self.num_frames + 1)
+        start = np.zeros_like(stop) if window is None else np.maximum(stop - int(window), 0)
+        counts = (self.prefix[stop] - self.prefix[start]).astype(np.float64)
+        total = counts.sum(axis=1, keepdims=True)
+        return np.divide(100.0 * counts, total, out=np.zeros_like(counts), where=total > 0)
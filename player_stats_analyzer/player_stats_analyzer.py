@@ -2,6 +2,7 @@ import sys
 import cv2
 import numpy as np
 sys.path.append('../')
+from utils import OverlayCompositor
 
 class PlayerStatsAnalyzer():
     """
@@ -15,6 +16,7 @@ class PlayerStatsAnalyzer():
     
     def __init__(self):
         self.player_stats = {}  # Dictionary lưu thống kê của từng cầu thủ
+        self.overlay_compositor = OverlayCompositor()  # bảng thống kê vẽ sẵn, vẽ lại khi thống kê thay đổi
         
     def calculate_player_stats(self, tracks, team_ball_control, selected_player_ids=None):
         """
@@ -27,6 +29,7 @@ class PlayerStatsAnalyzer():
         """
         # Khởi tạo dictionary lưu stats
         self.player_stats = {}
+        self.overlay_compositor.clear()
         
         # Lấy tổng số frame
         total_frames = len(tracks['players'])
@@ -231,33 +234,57 @@ class PlayerStatsAnalyzer():
         
         return table_img
     
-    def draw_stats_on_frame(self, frame, position=(10, 500), max_players=5):
+    def draw_stats_on_frame(self, frame, position=(10, 500), max_players=5, render_profile=None):
         """
         Vẽ bảng thống kê chuyên nghiệp lên góc frame
         
+        Thống kê không đổi trong cả video nên cả bảng là một lớp tĩnh của OverlayCompositor:
+        vẽ một lần rồi mỗi frame chỉ trộn vùng ROI của bảng (không copy/addWeighted cả frame).
+        
         Args:
             frame: Frame video cần vẽ
             position: Vị trí bắt đầu vẽ (x, y)
             max_players: Số lượng player tối đa hiển thị
+            render_profile: Nếu có, position là tọa độ trên khung hình tham chiếu 1920x1080 gắn với góc dưới bên trái,
+                            bảng được thu nhỏ theo kích thước frame (xem utils/render_profile.py)
         
         Returns:
-            Frame đã được vẽ thống kê
+            Frame đã được vẽ thống kê (vẽ trực tiếp lên frame)
         """
         if not self.player_stats:
             return frame
         
         x, y = position
-        
-        # Kích thước bảng
+        table_width, table_height = self.get_table_size(max_players)
+        margin = 8  # chứa shadow và viền dày 3px
+        roi = (x - margin, y - margin, x + table_width + margin, y + table_height + margin)
+        draw = lambda canvas, dx, dy: self.draw_stats_table(canvas, (x + dx, y + dy), max_players)
+        if render_profile is None:
+            return self.overlay_compositor.compose(frame, ('player_stats', position, max_players), roi, draw)
+        return self.overlay_compositor.compose(frame, ('player_stats', position, max_players), roi, draw,
+                                               scale=render_profile.get_hud_scale(frame.shape),
+                                               position=render_profile.get_hud_point(frame.shape, 'bottom_left', roi[:2]))
+    
+    def get_table_size(self, max_players=5):
+        # (chiều rộng, chiều cao) của bảng thống kê
         table_width = 400
         row_height = 36
         header_height = 50
         title_height = 45
         padding = 15
-        
-        # Tính toán chiều cao tổng
         num_players = min(len(self.player_stats), max_players)
-        table_height = title_height + header_height + (num_players * row_height) + padding * 4
+        return table_width, title_height + header_height + (num_players * row_height) + padding * 4
+    
+    def draw_stats_table(self, frame, position, max_players=5):
+        """
+        Vẽ bảng thống kê (nền, viền, tiêu đề, header, các dòng) lên frame tại position, trả về frame đã vẽ
+        """
+        x, y = position
+        
+        # Kích thước bảng
+        table_width, table_height = self.get_table_size(max_players)
+        row_height = 36
+        padding = 15
         
         # Tạo overlay với gradient background
         overlay = frame.copy()
@@ -0,0 +1,2 @@
+from .speed_and_distance_estimator import SpeedAndDistance_Estimator
+from .online_speed_and_distance_estimator import OnlineSpeedAndDistance_Estimator
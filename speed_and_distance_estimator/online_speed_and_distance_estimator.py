@@ -0,0 +1,163 @@
+from collections import deque
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import get_foot_position
+from .speed_and_distance_estimator import SpeedAndDistance_Estimator
+
+class OnlineSpeedAndDistance_Estimator(): # ước lượng tốc độ và quãng đường khi nhận từng khung hình (video trực tiếp)
+    '''
+    Cùng cách tính theo cửa sổ frame_window khung hình như SpeedAndDistance_Estimator nhưng không cần toàn bộ tracks:
+    - push() nhận tracks của một loại đối tượng ở khung hình tiếp theo ({track_id: track_info}), trả về các khung hình đã tính xong
+    - Mỗi cầu thủ có một bộ đệm vòng frame_window+1 ô (khung hình f nằm ở ô f % (frame_window+1)) lưu
+      position_transformed (đã làm mượt) hoặc vị trí chân của bbox, đủ cho cửa sổ [s, s+frame_window] hiện tại
+    - Khi nhận khung hình e = s+frame_window thì tính cửa sổ cho tất cả cầu thủ cùng lúc, gán speed/distance cho các
+      khung hình trong [s, e] và trả về các khung hình s..e-1 (khung hình e còn là khung hình đầu của cửa sổ tiếp theo),
+      nên mỗi khung hình trễ tối đa frame_window khung hình
+    - flush() khi hết video tính nốt cửa sổ cuối cùng, khung hình không tính được tốc độ thì mặc định là 0
+    Không làm mượt hoặc 'ema' cho kết quả giống hệt SpeedAndDistance_Estimator.add_speed_and_distance_to_tracks.
+    'savgol' cần nhìn trước nửa cửa sổ làm mượt ở mọi khung hình (khung hình cuối cửa sổ là khung hình mới nhận) nên dùng 'ema' thay thế.
+    '''
+    def __init__(self, speed_and_distance_estimator=None):
+        estimator = speed_and_distance_estimator if speed_and_distance_estimator is not None else SpeedAndDistance_Estimator()
+        self.frame_window = estimator.frame_window
+        self.frame_rate = estimator.frame_rate
+        self.smoothing = estimator.smoothing
+        if self.smoothing == 'savgol':
+            print("⚠️ Làm mượt Savitzky-Golay cần nhìn trước, ước lượng trực tiếp dùng EMA thay thế")
+            self.smoothing = 'ema'
+        self.smoothing_window = estimator.smoothing_window
+        self.ema_alpha = estimator.ema_alpha
+        self.reset()
+
+    def reset(self):
+        # bắt đầu video mới: khung hình tiếp theo là khung hình 0, tổng quãng đường về 0
+        self.frame_num = 0 # số thứ tự của khung hình tiếp theo
+        self.window_start = 0 # khung hình đầu s của cửa sổ hiện tại
+        self.pending = deque() # (frame_num, object_track) đã nhận nhưng chưa tính xong
+        self.track_rows = {} # track_id -> dòng trong các bộ đệm vòng
+        size = self.frame_window + 1
+        self.present = np.zeros((0, size), dtype=bool)
+        self.position = np.zeros((0, size, 2))
+        self.has_position = np.zeros((0, size), dtype=bool)
+        self.foot = np.zeros((0, size, 2))
+        self.has_foot = np.zeros((0, size), dtype=bool)
+        self.total_distance = np.zeros(0) # tổng quãng đường của từng dòng
+        self.smoothing_state = {} # track_id -> trạng thái làm mượt của đoạn vị trí hiện tại
+
+    def push(self, object_track):
+        '''
+        logic hàm này là:
+        1. Xóa ô của khung hình mới trong bộ đệm vòng (ô này đang giữ khung hình s-1 của cửa sổ trước, không còn dùng)
+        2. Ghi vị trí (hoặc vị trí chân) của từng cầu thủ vào ô đó
+        3. Nếu khung hình là khung hình cuối e = s+frame_window của cửa sổ thì tính cửa sổ và trả về khung hình s..e-1
+        Trả về list (frame_num, object_track) các khung hình đã có speed/distance, theo thứ tự khung hình.
+        '''
+        frame_num = self.frame_num
+        self.frame_num += 1
+        slot = frame_num % (self.frame_window + 1)
+        for column in (self.present, self.has_position, self.has_foot):
+            column[:, slot] = False
+
+        for track_id, track_info in object_track.items():
+            row = self.get_track_row(track_id)
+            self.present[row, slot] = True
+            position = track_info.get('position_transformed')
+            if position is not None:
+                self.position[row, slot] = self.smooth_position(track_id, frame_num, position)
+                self.has_position[row, slot] = True
+            elif 'bbox' in track_info: # vị trí chân chỉ dùng khi không có position_transformed
+                self.foot[row, slot] = get_foot_position(track_info['bbox'])
+                self.has_foot[row, slot] = True
+        self.pending.append((frame_num, object_track))
+
+        if frame_num - self.window_start < self.frame_window:
+            return []
+        self.finish_window(frame_num)
+        self.window_start = frame_num
+        return self.pop_ready(self.frame_window)
+
+    def flush(self):
+        # hết video: cửa sổ cuối cùng kết thúc ở khung hình cuối, trả về tất cả các khung hình còn lại
+        if self.frame_num - 1 > self.window_start:
+            self.finish_window(self.frame_num - 1)
+        self.window_start = self.frame_num
+        return self.pop_ready(len(self.pending))
+
+    def pop_ready(self, count):
+        ready = [self.pending.popleft() for _ in range(count)]
+        for _, object_track in ready: # cầu thủ không tính được tốc độ thì mặc định là 0
+            for track_info in object_track.values():
+                track_info.setdefault('speed', 0.0)
+                track_info.setdefault('distance', 0.0)
+        return ready
+
+    def get_track_row(self, track_id):
+        row = self.track_rows.get(track_id)
+        if row is not None:
+            return row
+        row = self.track_rows[track_id] = len(self.track_rows)
+        if row == len(self.present): # hết chỗ thì tăng gấp đôi số dòng của các bộ đệm
+            grow = max(len(self.present), 32)
+            for name in ('present', 'position', 'has_position', 'foot', 'has_foot', 'total_distance'):
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.zeros((grow,) + array.shape[1:], dtype=array.dtype)]))
+        return row
+
+    def finish_window(self, end_frame):
+        '''
+        logic hàm này là (tính cho tất cả cầu thủ cùng lúc, giống SpeedAndDistance_Estimator):
+        1. Vị trí đầu: position_transformed đầu tiên trong [s, s+frame_window), không có thì vị trí chân ở khung hình s
+        2. Vị trí cuối: position_transformed cuối cùng trong (s, e], không có thì vị trí chân cuối cùng trong (s, e]
+        3. Chỉ tính cho cầu thủ có mặt ở khung hình s, quãng đường pixel nhân 0.05, cộng dồn tổng quãng đường
+        4. Gán speed/distance cho các khung hình [s, e] đang chờ (khung hình s ghi đè kết quả của cửa sổ trước)
+        '''
+        length = end_frame - self.window_start
+        slots = (self.window_start + np.arange(length + 1)) % (self.frame_window + 1)
+        has_position, has_foot = self.has_position[:, slots], self.has_foot[:, slots]
+
+        start_range = has_position[:, :min(length, self.frame_window - 1) + 1]
+        start = start_range.argmax(axis=1) # không có position_transformed thì argmax = 0, đúng là khung hình s
+        use_bbox_for_start = ~start_range.any(axis=1)
+        has_start = ~use_bbox_for_start | has_foot[:, 0]
+        end = length - has_position[:, :0:-1].argmax(axis=1)
+        use_bbox_for_end = ~has_position[:, 1:].any(axis=1)
+        end = np.where(use_bbox_for_end, length - has_foot[:, :0:-1].argmax(axis=1), end)
+        has_end = ~use_bbox_for_end | has_foot[:, 1:].any(axis=1)
+        valid = self.present[:, slots[0]] & has_start & has_end & (start < end)
+        rows = np.flatnonzero(valid)
+        if len(rows) == 0:
+            return
+
+        start, end = start[rows], end[rows]
+        use_bbox_for_start, use_bbox_for_end = use_bbox_for_start[rows], use_bbox_for_end[rows]
+        start_position = np.where(use_bbox_for_start[:, None], self.foot[rows, slots[start]], self.position[rows, slots[start]])
+        end_position = np.where(use_bbox_for_end[:, None], self.foot[rows, slots[end]], self.position[rows, slots[end]])
+        difference = start_position - end_position
+        distance_covered = np.sqrt(difference[:, 0]**2 + difference[:, 1]**2) # giống measure_distance
+        distance_covered = np.where(use_bbox_for_start | use_bbox_for_end, distance_covered * 0.05, distance_covered) # vị trí pixel thì scale xuống
+        time_elapsed = (end - start) / self.frame_rate
+        self.total_distance[rows] += distance_covered
+
+        speed = dict(zip(rows.tolist(), (distance_covered / time_elapsed * 3.6).tolist())) # m/s -> km/h
+        total_distance = dict(zip(rows.tolist(), self.total_distance[rows].tolist()))
+        for _, object_track in self.pending:
+            for track_id, track_info in object_track.items():
+                row = self.track_rows[track_id]
+                if row in speed:
+                    track_info['speed'] = speed[row]
+                    track_info['distance'] = total_distance[row]
+
+    def smooth_position(self, track_id, frame_num, position):
+        # EMA chỉ dùng các vị trí đã nhận, mất dấu quá smoothing_window khung hình thì bắt đầu đoạn mới (giống smooth_positions)
+        # s[0] = x[0], s[i] = alpha*x[i] + (1-alpha)*s[i-1], cùng thứ tự phép tính với lfilter
+        if self.smoothing is None:
+            return position
+        position = np.asarray(position, dtype=np.float64)
+        last_frame, previous = self.smoothing_state.get(track_id, (None, None))
+        if last_frame is None or frame_num - last_frame > self.smoothing_window:
+            previous = position
+        smoothed = self.ema_alpha * position + (1 - self.ema_alpha) * previous
+        self.smoothing_state[track_id] = (frame_num, smoothed)
+        return smoothed
+
@@ -1,136 +1,217 @@
 import cv2
+from itertools import chain
+import numpy as np
+from scipy.signal import savgol_filter, lfilter
 import sys  # thêm đường dẫn thư mục cha để import module utils
 sys.path.append('../')
-from utils import measure_distance ,get_foot_position
+from utils import get_foot_position, RenderProfile
+from track_store import ObjectTracks
 
 class SpeedAndDistance_Estimator(): # lớp để ước lượng tốc độ và khoảng cách di chuyển của cầu thủ
-    def __init__(self): 
+    '''
+    Tốc độ và quãng đường được tính theo từng cửa sổ frame_window khung hình:
+    - Cửa sổ bắt đầu ở khung hình s = k*frame_window và kết thúc ở e = min(s+frame_window, số khung hình-1)
+    - Vị trí đầu là position_transformed đầu tiên của cầu thủ trong [s, s+frame_window), không có thì dùng vị trí chân của bbox ở s
+    - Vị trí cuối là position_transformed cuối cùng trong (s, e], không có thì dùng vị trí chân của bbox cuối cùng trong (s, e]
+    - Nếu dùng vị trí chân (pixel) thì quãng đường nhân 0.05 để đổi gần đúng sang mét
+    - Tốc độ (km/h) và tổng quãng đường được gán cho tất cả các khung hình của cầu thủ trong [s, e]
+    smoothing làm mượt position_transformed của từng cầu thủ trước khi tính để bớt các đỉnh tốc độ do vị trí bị rung:
+    None (không làm mượt), 'savgol' (Savitzky-Golay, smoothing_window khung hình, bậc 2) hoặc 'ema' (trung bình trượt hàm mũ, hệ số ema_alpha)
+    '''
+    def __init__(self, smoothing=None, smoothing_window=7, ema_alpha=0.3): 
         self.frame_window=5 # số khung hình để tính toán tốc độ và khoảng cách di chuyển
         self.frame_rate=24 # fps của video
+        if smoothing not in (None, 'savgol', 'ema'):
+            raise ValueError(f"❌ Không hỗ trợ kiểu làm mượt: {smoothing} (chọn None, 'savgol' hoặc 'ema')")
+        self.smoothing = smoothing
+        self.smoothing_window = smoothing_window # độ dài cửa sổ Savitzky-Golay (số lẻ)
+        self.ema_alpha = ema_alpha # hệ số của EMA, càng nhỏ càng mượt nhưng càng trễ
+
+    def get_params(self): # tham số ảnh hưởng đến kết quả, dùng cho khóa của StageCache
+        return dict(frame_window=self.frame_window, frame_rate=self.frame_rate, smoothing=self.smoothing,
+                    smoothing_window=self.smoothing_window, ema_alpha=self.ema_alpha)
     
     def add_speed_and_distance_to_tracks(self,tracks):
-        total_distance= {}# dictionary để lưu tổng khoảng cách di chuyển cho từng đối tượng và track_id
-
+        '''
+        logic hàm này là (tính trên mảng cho toàn bộ video thay vì duyệt từng cửa sổ và từng cầu thủ):
+        1. Gom vị trí của tất cả các dòng (khung hình, track_id) của players thành các mảng (get_track_positions)
+        2. Tính tốc độ và tổng quãng đường cho tất cả các cửa sổ cùng lúc (get_speed_and_distance)
+        3. Gán lại vào tracks, cầu thủ không tính được tốc độ thì mặc định là 0
+        '''
         for object, object_tracks in tracks.items(): # duyệt qua từng loại đối tượng trong tracks
             if object == "ball" or object == "referees":
                 continue  
-            number_of_frames = len(object_tracks) # số khung hình có trong tracks của đối tượng hiện tại
-            
-            for frame_num in range(0,number_of_frames, self.frame_window): # duyệt qua các khung hình với bước nhảy là frame_window
-                last_frame = min(frame_num+self.frame_window,number_of_frames-1 ) # khung hình cuối cùng trong cửa sổ hiện tại
-                # min() để đảm bảo không vượt quá số khung hình có trong tracks
-                # frame_num+self.frame_window là khung hình tiếp theo sau cửa sổ hiện tại
-                # number_of_frames-1 là khung hình cuối cùng trong tracks (vì index bắt đầu từ 0)
-
-                for track_id,_ in object_tracks[frame_num].items(): # duyệt qua từng track_id trong khung hình hiện tại
-                    # Tìm vị trí bắt đầu (start_position) - ưu tiên position_transformed
-                    start_position = None
-                    start_frame_actual = frame_num
-                    use_bbox_for_start = False
-                    
-                    for f in range(frame_num, min(frame_num + self.frame_window, number_of_frames)):
-                        if track_id in object_tracks[f]:
-                            pos = object_tracks[f][track_id].get('position_transformed')
-                            if pos is not None:
-                                start_position = pos
-                                start_frame_actual = f
-                                break
-                    
-                    # Nếu không có position_transformed, dùng foot position từ bbox
-                    if start_position is None and track_id in object_tracks[frame_num]:
-                        if 'bbox' in object_tracks[frame_num][track_id]:
-                            bbox = object_tracks[frame_num][track_id]['bbox']
-                            start_position = get_foot_position(bbox)
-                            start_frame_actual = frame_num
-                            use_bbox_for_start = True
-                    
-                    # Tìm vị trí kết thúc (end_position)
-                    end_position = None
-                    end_frame_actual = last_frame
-                    use_bbox_for_end = False
-                    
-                    for f in range(last_frame, frame_num, -1):
-                        if track_id in object_tracks[f]:
-                            pos = object_tracks[f][track_id].get('position_transformed')
-                            if pos is not None:
-                                end_position = pos
-                                end_frame_actual = f
-                                break
-                    
-                    # Nếu không có position_transformed, dùng foot position từ bbox
-                    if end_position is None:
-                        for f in range(last_frame, frame_num, -1):
-                            if track_id in object_tracks[f] and 'bbox' in object_tracks[f][track_id]:
-                                bbox = object_tracks[f][track_id]['bbox']
-                                end_position = get_foot_position(bbox)
-                                end_frame_actual = f
-                                use_bbox_for_end = True
-                                break
-                    
-                    # Nếu không tìm thấy cả 2 position hoặc 2 position trùng nhau
-                    if start_position is None or end_position is None or start_frame_actual >= end_frame_actual:
-                        continue
-                    
-                    # Nếu dùng bbox position, khoảng cách tính bằng pixel cần scale xuống
-                    # Giả sử 1 pixel ~ 0.1m (có thể điều chỉnh)
-                    distance_covered = measure_distance(start_position, end_position)
-                    if use_bbox_for_start or use_bbox_for_end:
-                        distance_covered = distance_covered * 0.05  # Scale down vì là pixel position
-                    
-                    '''
-                    logic đoạn này là:
-                    1. Lấy vị trí bắt đầu và kết thúc của đối tượng trong cửa sổ khung hình hiện tại
-                    2. Tính khoảng cách di chuyển giữa hai vị trí này   
-                    3. Tính thời gian đã trôi qua giữa hai khung hình dựa trên frame_rate và số khung hình trong cửa sổ
-                    4. Tính tốc độ di chuyển (m/s) và chuyển đổi sang km/h
-                    5. Cập nhật tổng khoảng cách di chuyển cho đối tượng và track_id trong dictionary total_distance
-                    6. Gán tốc độ và khoảng cách di chuyển cho từng khung hình trong cửa sổ hiện tại   
-                    track_id là id của đối tượng được theo dõi (cầu thủ)
-                    7. Cập nhật thông tin tốc độ và khoảng cách di chuyển vào tracks để sử dụng sau này
-                    '''
-                    # Nếu dùng bbox position, khoảng cách tính bằng pixel cần scale xuống
-                    # Giả sử 1 pixel ~ 0.1m (có thể điều chỉnh)
-                    distance_covered = measure_distance(start_position, end_position)
-                    if use_bbox_for_start or use_bbox_for_end:
-                        distance_covered = distance_covered * 0.05  # Scale down vì là pixel position
-                    
-                    time_elapsed = (end_frame_actual - start_frame_actual)/self.frame_rate # tính thời gian đã trôi qua giữa hai khung hình
-                    
-                    if time_elapsed == 0:  # Tránh chia cho 0
-                        continue
-                        
-                    speed_meteres_per_second = distance_covered/time_elapsed # tính tốc độ di chuyển (m/s)
-                    speed_km_per_hour = speed_meteres_per_second*3.6 # chuyển đổi tốc độ sang km/h
-
-                    if object not in total_distance: # khởi tạo dictionary để lưu tổng khoảng cách di chuyển cho đối tượng nếu chưa tồn tại
-                        total_distance[object]= {} # khởi tạo dictionary rỗng cho đối tượng 
-                    
-                    if track_id not in total_distance[object]: # khởi tạo tổng khoảng cách di chuyển cho track_id nếu chưa tồn tại
-                        total_distance[object][track_id] = 0 # khởi tạo tổng khoảng cách di chuyển là 0
-                    
-                    total_distance[object][track_id] += distance_covered # cộng dồn khoảng cách di chuyển vào tổng khoảng cách
-
-
-                    '''
-                    vòng for bên dưới để gán tốc độ và khoảng cách di chuyển cho từng khung hình trong cửa sổ hiện tại
-                    '''
-                    for frame_num_batch in range(frame_num, last_frame + 1):  # +1 để bao gồm last_frame
-                        if track_id not in tracks[object][frame_num_batch]:
-                            continue
-                        tracks[object][frame_num_batch][track_id]['speed'] = speed_km_per_hour
-                        tracks[object][frame_num_batch][track_id]['distance'] = total_distance[object][track_id]
-        
-        # Sau khi tính toán xong, khởi tạo 0 cho các cầu thủ không có speed/distance
-        for object, object_tracks in tracks.items():
-            if object == "ball" or object == "referees":
+            rows = self.get_track_positions(object_tracks)
+            speed, distance, assigned = self.get_speed_and_distance(rows, len(object_tracks))
+
+            if isinstance(object_tracks, ObjectTracks): # tracks dạng cột: gán cả cột
+                assigned_rows = np.flatnonzero(assigned)
+                object_tracks.set_column('speed', speed[assigned_rows], assigned_rows)
+                object_tracks.set_column('distance', distance[assigned_rows], assigned_rows)
+                for name in ('speed', 'distance'): # khởi tạo 0 cho các cầu thủ không có speed/distance
+                    object_tracks.set_column(name, 0.0, np.flatnonzero(~object_tracks.column(name)[1]))
                 continue
-            for frame_num in range(len(object_tracks)):
-                for track_id in object_tracks[frame_num].keys():
-                    if 'speed' not in object_tracks[frame_num][track_id]:
-                        object_tracks[frame_num][track_id]['speed'] = 0.0
-                    if 'distance' not in object_tracks[frame_num][track_id]:
-                        object_tracks[frame_num][track_id]['distance'] = 0.0
-    
+            for track_info, row_assigned, row_speed, row_distance in zip(rows['track_infos'], assigned.tolist(), speed.tolist(), distance.tolist()):
+                if row_assigned:
+                    track_info['speed'] = row_speed
+                    track_info['distance'] = row_distance
+                else: # khởi tạo 0 cho các cầu thủ không có speed/distance
+                    track_info.setdefault('speed', 0.0)
+                    track_info.setdefault('distance', 0.0)
+
+    def get_track_positions(self, object_tracks):
+        # các mảng theo dòng (khung hình, track_id), các dòng xếp theo thứ tự khung hình:
+        # frame, track_id, position (position_transformed), has_position, foot (vị trí chân của bbox), has_foot
+        # vị trí chân chỉ được dùng khi cả cửa sổ không có position_transformed nên chỉ cần tính cho các dòng không có position_transformed
+        if isinstance(object_tracks, ObjectTracks):
+            positions, has_position = object_tracks.column('position_transformed')
+            has_position = has_position & ~np.isnan(positions).any(axis=1)
+            bboxes, has_bbox = object_tracks.column('bbox')
+            rows = dict(frame=object_tracks.frame_index(), track_id=object_tracks.track_ids.copy(), position=positions.copy(), has_position=has_position)
+            missing = np.flatnonzero(has_bbox & ~has_position)
+            bboxes = bboxes[missing]
+        else:
+            track_infos = [track_info for track in object_tracks for track_info in track.values()]
+            positions = [track_info.get('position_transformed') for track_info in track_infos]
+            has_position = np.array([position is not None for position in positions], dtype=bool)
+            # np.fromiter trên dãy số phẳng nhanh hơn nhiều so với np.array trên list các list
+            positions = np.fromiter(chain.from_iterable([position if position is not None else (np.nan, np.nan) for position in positions]),
+                                    np.float64, 2 * len(track_infos)).reshape(-1, 2)
+            rows = dict(frame=np.repeat(np.arange(len(object_tracks)), [len(track) for track in object_tracks]),
+                        track_id=np.fromiter((track_id for track in object_tracks for track_id in track), np.int64, len(track_infos)),
+                        position=positions, has_position=has_position, track_infos=track_infos)
+            missing = np.array([row for row in np.flatnonzero(~has_position).tolist() if 'bbox' in track_infos[row]], dtype=np.int64)
+            bboxes = np.array([track_infos[row]['bbox'] for row in missing.tolist()], dtype=np.float64).reshape(-1, 4)
+        rows['has_foot'] = np.zeros(len(rows['frame']), dtype=bool)
+        rows['has_foot'][missing] = True
+        rows['foot'] = np.zeros((len(rows['frame']), 2))
+        rows['foot'][missing] = np.stack([np.trunc((bboxes[:, 0] + bboxes[:, 2]) / 2), np.trunc(bboxes[:, 3])], axis=1) # giống get_foot_position
+        return rows
+
+    def get_speed_and_distance(self, rows, number_of_frames):
+        '''
+        logic hàm này là:
+        1. Sắp xếp các dòng theo cầu thủ (stable nên vẫn giữ thứ tự khung hình), mỗi đoạn liên tiếp cùng cầu thủ và cùng cửa sổ
+           k = frame // frame_window là một nhóm, các nhóm xếp theo (cầu thủ, cửa sổ)
+        2. Khung hình đầu cửa sổ s = k*frame_window cũng là khung hình cuối của cửa sổ k-1 nên khi tìm vị trí cuối,
+           dòng ở khung hình s thuộc nhóm ngay trước nó (nếu là nhóm (cầu thủ, k-1))
+        3. Mỗi nhóm lấy dòng đầu tiên/cuối cùng có position_transformed (hoặc có vị trí chân), một nhóm chỉ được tính
+           nếu cầu thủ có mặt ở khung hình s (giống việc duyệt các cầu thủ của khung hình s)
+        4. Quãng đường, tốc độ tính trên mảng, tổng quãng đường cộng dồn theo từng cầu thủ
+        5. Mỗi dòng lấy kết quả của nhóm chứa nó, khung hình s dùng chung thì cửa sổ k ghi đè cửa sổ k-1 (nếu cửa sổ k tính được)
+        Trả về (speed, distance, assigned) theo dòng, assigned[i] là dòng i có tốc độ.
+        '''
+        num_rows = len(rows['frame'])
+        speed, distance, assigned = np.zeros(num_rows), np.zeros(num_rows), np.zeros(num_rows, dtype=bool)
+        if num_rows == 0:
+            return speed, distance, assigned
+
+        track_index = self._dense_index(rows['track_id'])
+        position = self.smooth_positions(rows['frame'], track_index, rows['position'], rows['has_position'])
+
+        # các mảng theo thứ tự đã sắp xếp (chỉ lấy các cột cần cho mọi dòng, vị trí chỉ lấy ở các dòng đầu/cuối cửa sổ)
+        # track_index kiểu số nguyên nhỏ thì argsort stable dùng radix sort (O(n))
+        order = np.argsort(track_index.astype(np.int16 if track_index.max() < 2**15 else np.int64), kind='stable')
+        frame, track = rows['frame'][order], track_index[order]
+        has_position, has_foot = rows['has_position'][order], rows['has_foot'][order]
+        window = frame // self.frame_window
+        same_track = track[1:] == track[:-1]
+        new_group = np.r_[True, ~same_track | (window[1:] != window[:-1])]
+        group = np.cumsum(new_group) - 1
+        num_groups = group[-1] + 1
+
+        is_start = frame % self.frame_window == 0
+        end_group = group.copy()
+        previous_window = np.r_[False, same_track & (window[:-1] == window[1:] - 1)] # dòng trước là cửa sổ k-1 của cùng cầu thủ
+        end_group[is_start] = np.where(previous_window[is_start], group[is_start] - 1, -1)
+
+        group_start = np.full(num_groups, -1)
+        group_start[group[is_start]] = np.flatnonzero(is_start) # dòng ở khung hình s của từng nhóm
+        start = self._group_rows(group, has_position, num_groups)
+        use_bbox_for_start = start < 0 # không có position_transformed thì dùng vị trí chân ở khung hình s
+        start = np.where(use_bbox_for_start, np.where((group_start >= 0) & has_foot[group_start], group_start, -1), start)
+        end = self._group_rows(end_group, has_position, num_groups, last=True)
+        use_bbox_for_end = end < 0
+        end = np.where(use_bbox_for_end, self._group_rows(end_group, has_foot, num_groups, last=True), end)
+        valid = (group_start >= 0) & (start >= 0) & (end >= 0)
+        valid[valid] = frame[start[valid]] < frame[end[valid]]
+        valid_groups = np.flatnonzero(valid)
+
+        start, end = start[valid_groups], end[valid_groups]
+        use_bbox_for_start, use_bbox_for_end = use_bbox_for_start[valid_groups], use_bbox_for_end[valid_groups]
+        start_position, end_position = position[order[start]], position[order[end]]
+        for side, side_position, use_bbox in ((start, start_position, use_bbox_for_start), (end, end_position, use_bbox_for_end)):
+            side_position[use_bbox] = rows['foot'][order[side[use_bbox]]] # các dòng dùng vị trí chân của bbox
+        difference = start_position - end_position
+        distance_covered = np.sqrt(difference[:, 0]**2 + difference[:, 1]**2) # giống measure_distance
+        distance_covered = np.where(use_bbox_for_start | use_bbox_for_end, distance_covered * 0.05, distance_covered) # vị trí pixel thì scale xuống
+        time_elapsed = (frame[end] - frame[start]) / self.frame_rate
+        window_speed = distance_covered / time_elapsed * 3.6 # m/s -> km/h
+
+        # tổng quãng đường cộng dồn theo thứ tự cửa sổ của từng cầu thủ (các nhóm đã xếp theo cầu thủ rồi cửa sổ),
+        # np.cumsum cộng tuần tự như vòng lặp cũ
+        total_distance = np.empty_like(distance_covered)
+        track_of_group = track[start]
+        for segment in np.split(np.arange(len(valid_groups)), np.flatnonzero(np.diff(track_of_group)) + 1):
+            total_distance[segment] = np.cumsum(distance_covered[segment])
+
+        # gán kết quả cho các dòng: nhóm của cửa sổ trước (chỉ dòng ở khung hình s) rồi nhóm chứa dòng để ghi đè
+        group_speed, group_distance = np.zeros(num_groups), np.zeros(num_groups)
+        group_speed[valid_groups], group_distance[valid_groups] = window_speed, total_distance
+        previous = np.flatnonzero(end_group != group)
+        previous = previous[(end_group[previous] >= 0) & valid[end_group[previous]]]
+        own = np.flatnonzero(valid[group])
+        sorted_speed, sorted_distance, sorted_assigned = np.zeros(num_rows), np.zeros(num_rows), np.zeros(num_rows, dtype=bool)
+        for rows_to_assign, groups in ((previous, end_group[previous]), (own, group[own])):
+            sorted_speed[rows_to_assign], sorted_distance[rows_to_assign] = group_speed[groups], group_distance[groups]
+            sorted_assigned[rows_to_assign] = True
+        speed[order], distance[order], assigned[order] = sorted_speed, sorted_distance, sorted_assigned
+        return speed, distance, assigned
+
+    @staticmethod
+    def _dense_index(track_ids):
+        # đánh số lại track_id thành 0..số cầu thủ-1 (giữ thứ tự), id nhỏ thì dùng bảng tra thay vì np.unique (sắp xếp)
+        if len(track_ids) and track_ids.min() >= 0 and track_ids.max() < 4 * len(track_ids) + 1024:
+            present = np.zeros(track_ids.max() + 1, dtype=bool)
+            present[track_ids] = True
+            return (np.cumsum(present) - 1)[track_ids]
+        return np.unique(track_ids, return_inverse=True)[1].reshape(-1)
+
+    @staticmethod
+    def _group_rows(group, mask, num_groups, last=False):
+        # group không giảm theo dòng, trả về dòng đầu tiên (last=True: cuối cùng) có mask của từng nhóm, -1 nếu không có (group < 0 bị bỏ qua)
+        rows = np.flatnonzero(mask & (group >= 0))
+        result = np.full(num_groups, -1)
+        if len(rows) == 0:
+            return result
+        groups = group[rows]
+        boundary = groups[1:] != groups[:-1]
+        keep = np.r_[boundary, True] if last else np.r_[True, boundary]
+        result[groups[keep]] = rows[keep]
+        return result
+
+    def smooth_positions(self, frame, track_index, position, has_position):
+        # làm mượt position_transformed theo từng đoạn của từng cầu thủ, mất dấu ngắn (không quá smoothing_window khung hình) vẫn coi là cùng một đoạn
+        if self.smoothing is None:
+            return position
+        rows = np.flatnonzero(has_position)
+        if len(rows) == 0: # không cầu thủ nào có position_transformed
+            return position
+        rows = rows[np.lexsort((frame[rows], track_index[rows]))]
+        breaks = np.flatnonzero((np.diff(track_index[rows]) != 0) | (np.diff(frame[rows]) > self.smoothing_window)) + 1
+        smoothed = position.copy()
+        for segment in np.split(rows, breaks):
+            smoothed[segment] = self.smooth_segment(position[segment])
+        return smoothed
+
+    def smooth_segment(self, positions):
+        if self.smoothing == 'ema': # s[0] = x[0], s[i] = alpha*x[i] + (1-alpha)*s[i-1]
+            return lfilter([self.ema_alpha], [1, self.ema_alpha - 1], positions, axis=0, zi=(1 - self.ema_alpha) * positions[:1])[0]
+        window_length = min(self.smoothing_window, len(positions) - (len(positions) + 1) % 2) # số lẻ không vượt độ dài đoạn
+        if window_length <= 2: # đoạn quá ngắn để khớp đa thức bậc 2
+            return positions
+        return savgol_filter(positions, window_length, 2, axis=0)
+
     def draw_speed_and_distance(self,frames,tracks):
         ''''
         Hàm để vẽ tốc độ và khoảng cách di chuyển lên khung hình
@@ -145,30 +226,38 @@ class SpeedAndDistance_Estimator(): # lớp để ước lượng tốc độ v
         '''
         output_frames = []
         for frame_num, frame in enumerate(frames):
-            for object, object_tracks in tracks.items():
-                if object == "ball" or object == "referees":
-                    continue 
-                for _, track_info in object_tracks[frame_num].items():
-                    # _ là track_id, không sử dụng nên đặt là _
-                    # Luôn vẽ speed và distance, ngay cả khi là 0
-                    speed = track_info.get('speed', 0.0) # lấy tốc độ từ track_info, mặc định là 0
-                    distance = track_info.get('distance', 0.0) # lấy khoảng cách từ track_info, mặc định là 0
-                    
-                    if 'bbox' not in track_info:
-                        continue
-                    
-                    bbox = track_info['bbox'] 
-                    position = get_foot_position(bbox)
-                    position = list(position)
-                    position[1]+=40 # dịch vị trí y xuống dưới 40 pixel để vẽ thông tin dưới chân cầu thủ
-
-                    position = tuple(map(int,position)) # chuyển vị trí sang kiểu int để vẽ
-                    cv2.putText(frame, f"{speed:.2f} km/h",position,cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
-                    # FONT_HERSHEY_SIMPLEX là font chữ
-                    # 0.5 là kích thước chữ
-                    # (0,0,0) là màu chữ (đen)
-                    # 2 là độ dày chữ
-                    cv2.putText(frame, f"{distance:.2f} m",(position[0],position[1]+20),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
-            output_frames.append(frame)
+            frame_tracks = {object: object_tracks[frame_num] for object, object_tracks in tracks.items()}
+            output_frames.append(self.draw_frame_speed_and_distance(frame, frame_tracks))
         
-        return output_frames
\ No newline at end of file
+        return output_frames
+
+    def draw_frame_speed_and_distance(self, frame, frame_tracks, render_profile=None):
+        # vẽ tốc độ và quãng đường dưới chân từng cầu thủ lên một khung hình (vẽ trực tiếp lên frame),
+        # frame_tracks có dạng {"players":{...}, "referees":{...}, "ball":{...}}, render_profile đổi bbox và cỡ chữ theo khung hình đầu ra
+        render_profile = render_profile or RenderProfile()
+        font_scale, thickness = 0.5 * render_profile.scale, render_profile.thickness(2)
+        for object, object_track in frame_tracks.items():
+            if object == "ball" or object == "referees":
+                continue 
+            for _, track_info in object_track.items():
+                # _ là track_id, không sử dụng nên đặt là _
+                # Luôn vẽ speed và distance, ngay cả khi là 0
+                speed = track_info.get('speed', 0.0) # lấy tốc độ từ track_info, mặc định là 0
+                distance = track_info.get('distance', 0.0) # lấy khoảng cách từ track_info, mặc định là 0
+                
+                if 'bbox' not in track_info:
+                    continue
+                
+                bbox = render_profile.scale_bbox(track_info['bbox'])
+                position = get_foot_position(bbox)
+                position = list(position)
+                position[1]+=render_profile.length(40) # dịch vị trí y xuống dưới 40 pixel (ở độ phân giải gốc) để vẽ thông tin dưới chân cầu thủ
+
+                position = tuple(map(int,position)) # chuyển vị trí sang kiểu int để vẽ
+                cv2.putText(frame, f"{speed:.2f} km/h",position,cv2.FONT_HERSHEY_SIMPLEX,font_scale,(0,0,0),thickness)
+                # FONT_HERSHEY_SIMPLEX là font chữ
+                # 0.5 là kích thước chữ
+                # (0,0,0) là màu chữ (đen)
+                # 2 là độ dày chữ
+                cv2.putText(frame, f"{distance:.2f} m",(position[0],position[1]+render_profile.length(20)),cv2.FONT_HERSHEY_SIMPLEX,font_scale,(0,0,0),thickness)
+        return frame
\ No newline at end of file
@@ -1 +1 @@
-from .team_assigner import TeamAssigner # Lớp để gán đội cho các cầu thủ dựa trên màu sắc áo đấu
\ No newline at end of file
+from .team_assigner import TeamAssigner
@@ -1,84 +1,282 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from sklearn.cluster import KMeans
+import sys
+sys.path.append('../')
+from utils import iter_prefetched
 
 class TeamAssigner: # Lớp để gán đội cho các cầu thủ dựa trên màu sắc áo đấu
-    def __init__(self):
+    '''
+    Mô hình đội được học từ màu áo ở nhiều khung hình thay vì chỉ khung hình đầu tiên:
+    - fit_team_model lấy mẫu num_sample_frames khung hình trải đều video, lấy màu áo của các cầu thủ (song song trên num_workers luồng),
+      lấy mẫu con tối đa max_colors màu rồi phân 2 cụm, bỏ các màu quá xa cả hai tâm (thủ môn, trọng tài bị nhận nhầm là cầu thủ) và phân cụm lại
+    - Đội của mỗi cầu thủ được bầu chọn lại theo thời gian: mỗi vote_interval khung hình lấy màu áo một lần, mỗi đoạn vote_window
+      khung hình của một track có nhãn riêng là đội được bầu nhiều nhất (đổi id giữa hai cầu thủ khác đội chỉ ảnh hưởng một đoạn)
+    - Màu ngoại lai (xa cả hai tâm hơn outlier_threshold) không được bầu, chỉ dùng khi track không có phiếu nào khác
+    - Streaming (update_team_model): màu áo được gom dần từ các khung hình có cầu thủ, mô hình được học khi có ít nhất 2 màu áo khác nhau
+      (trước đó cầu thủ có đội 0) và có thể được học lại mỗi refit_interval khung hình
+    Thời gian học mô hình chỉ phụ thuộc vào num_sample_frames và max_colors, không phụ thuộc vào độ dài video.
+    '''
+    def __init__(self, max_iter=20, num_sample_frames=30, max_colors=2000, outlier_scale=3.0, min_outlier_distance=30.0,
+                 vote_interval=12, vote_window=120, num_workers=None, refit_interval=None):
         self.team_colors = {}   # dictionary để lưu màu sắc của các đội
-        self.player_team_dict = {} # dictionary để lưu đội của từng cầu thủ
-    
-    def get_clustering_model(self,image): # hàm để lấy mô hình phân cụm K-means từ hình ảnh
-        # Reshape the image to 2D array
-        image_2d = image.reshape(-1,3) # chuyển đổi hình ảnh thành mảng 2D với mỗi hàng là một pixel và 3 cột là giá trị màu RGB
+        self.player_team_dict = {} # dictionary để lưu đội gần nhất của từng cầu thủ
+        self.max_iter = max_iter # số vòng lặp tối đa của K-means 2 cụm trên pixel của từng cầu thủ
+        self.num_sample_frames = num_sample_frames # số khung hình lấy mẫu để học mô hình đội
+        self.max_colors = max_colors # số màu áo tối đa dùng để phân cụm
+        self.outlier_scale = outlier_scale # ngưỡng ngoại lai = trung vị + outlier_scale * độ lệch chuẩn ước lượng từ MAD
+        self.min_outlier_distance = min_outlier_distance # ngưỡng ngoại lai nhỏ nhất (khoảng cách màu BGR)
+        self.vote_interval = vote_interval # số khung hình giữa hai lần lấy màu áo của một cầu thủ
+        self.vote_window = vote_window # độ dài mỗi đoạn bầu chọn (khung hình)
+        self.num_workers = num_workers or min(8, os.cpu_count() or 1) # số luồng lấy màu áo khi học mô hình
+        self.outlier_threshold = np.inf
+        self.player_votes = {} # (player_id, đoạn) -> số phiếu [đội 1, đội 2, đội 1 ngoại lai, đội 2 ngoại lai]
+        self.last_vote_frame = {} # player_id -> khung hình lấy màu gần nhất
+        self.refit_interval = refit_interval # streaming: số khung hình giữa hai lần học lại mô hình đội, None là chỉ học một lần
+        self.kmeans = None # mô hình đội (K-means 2 cụm), None khi chưa học
+        self.sample_colors = deque(maxlen=num_sample_frames) # streaming: màu áo của num_sample_frames khung hình lấy mẫu gần nhất
+        self.last_fit_frame = None # streaming: khung hình học mô hình gần nhất
 
-        # Preform K-means with 2 clusters
-        kmeans = KMeans(n_clusters=2, init="k-means++",n_init=1) # khởi tạo mô hình K-means với 2 cụm
-        kmeans.fit(image_2d) # huấn luyện mô hình K-means trên dữ liệu hình ảnh 2D
-        
+    def get_params(self): # tham số ảnh hưởng đến kết quả, dùng cho khóa của StageCache
+        return dict(max_iter=self.max_iter, num_sample_frames=self.num_sample_frames, max_colors=self.max_colors,
+                    outlier_scale=self.outlier_scale, min_outlier_distance=self.min_outlier_distance,
+                    vote_interval=self.vote_interval, vote_window=self.vote_window)
 
-        return kmeans
+    def get_top_half_crops(self, frame, bboxes): # cắt nửa trên hình ảnh của từng cầu thủ
+        crops = []
+        for bbox in bboxes:
+            image = frame[int(bbox[1]):int(bbox[3]),int(bbox[0]):int(bbox[2])] # cắt hình ảnh của cầu thủ từ khung hình dựa trên bounding box
+            # bbox = [x_min, y_min, x_max, y_max]
+            crops.append(image[0:int(image.shape[0]/2),:]) # lấy nửa trên của hình ảnh cầu thủ
+            # lấy nửa trên vì nửa trên thường chứa nhiều thông tin về màu sắc áo đấu hơn nửa dưới
+        return crops
+
+    def get_player_colors(self, frame, bboxes): # hàm để lấy màu sắc của nhiều cầu thủ trong một khung hình cùng lúc
+        '''
+        logic hàm này là (K-means 2 cụm cho tất cả các cầu thủ cùng lúc bằng NumPy thay vì mỗi cầu thủ một mô hình sklearn):
+        1. Cắt nửa trên hình ảnh của từng cầu thủ, xếp chồng thành mảng (số cầu thủ, số pixel lớn nhất, 3) kèm mask pixel hợp lệ
+        2. Khởi tạo tâm cụm: cụm 0 là pixel góc trên bên trái (thường là nền), cụm 1 là pixel xa nó nhất
+        3. Lặp Lloyd: gán mỗi pixel cho tâm gần nhất, tính lại tâm là trung bình các pixel của cụm, dừng khi nhãn không đổi
+        4. Giống cách cũ: cụm xuất hiện nhiều nhất ở 4 góc là nền, màu cầu thủ là tâm của cụm còn lại
+        Trả về mảng (số cầu thủ, 3).
+        '''
+        return self.get_crop_colors(self.get_top_half_crops(frame, bboxes))
+
+    def get_crop_colors(self, crops): # màu áo của các ảnh nửa trên đã cắt sẵn, xem get_player_colors
+        player_colors = np.zeros((len(crops), 3))
+        sizes = np.array([crop.shape[0] * crop.shape[1] for crop in crops], dtype=np.int64)
+        if len(crops) == 0 or sizes.max() == 0:
+            return player_colors
+
+        pixels = np.zeros((len(crops), sizes.max(), 3))
+        for i, crop in enumerate(crops):
+            pixels[i, :sizes[i]] = crop.reshape(-1, 3)
+        valid = np.arange(sizes.max()) < sizes[:, None]
+
+        centers = np.empty((len(crops), 2, 3))
+        centers[:, 0] = pixels[:, 0]
+        distances = ((pixels - centers[:, :1]) ** 2).sum(axis=2)
+        centers[:, 1] = pixels[np.arange(len(crops)), np.where(valid, distances, -1).argmax(axis=1)]
+        counts = sizes.astype(np.float64)
+        totals = pixels.sum(axis=1) # các pixel thêm vào cho đủ kích thước bằng 0 nên không ảnh hưởng tổng
+        labels = None
+        for _ in range(self.max_iter):
+            # pixel gần tâm 1 hơn tâm 0 khi p.(c1-c0) > (|c1|^2-|c0|^2)/2, chỉ cần một phép nhân ma trận cho mỗi cầu thủ
+            direction = centers[:, 1] - centers[:, 0]
+            threshold = ((centers[:, 1] ** 2).sum(axis=1) - (centers[:, 0] ** 2).sum(axis=1)) / 2
+            new_labels = (np.einsum('npk,nk->np', pixels, direction) > threshold[:, None]) & valid
+            if labels is not None and np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            counts_1 = labels.sum(axis=1).astype(np.float64)
+            sums_1 = np.einsum('np,npk->nk', labels.astype(np.float64), pixels)
+            for cluster, cluster_counts, cluster_sums in ((0, counts - counts_1, totals - sums_1), (1, counts_1, sums_1)):
+                has_members = cluster_counts > 0 # cụm rỗng thì giữ nguyên tâm
+                centers[has_members, cluster] = cluster_sums[has_members] / cluster_counts[has_members, None]
+
+        for i, crop in enumerate(crops):
+            if sizes[i] == 0: # không cắt được pixel nào
+                continue
+            clustered_image = labels[i, :sizes[i]].reshape(crop.shape[0], crop.shape[1]).astype(int)
+            corner_clusters = [clustered_image[0,0],clustered_image[0,-1],clustered_image[-1,0],clustered_image[-1,-1]] # nhãn cụm của 4 góc
+            non_player_cluster = max(set(corner_clusters),key=corner_clusters.count)
+            # xác định cụm không phải cầu thủ dựa trên nhãn xuất hiện nhiều nhất trong 4 góc
+            player_colors[i] = centers[i, 1 - non_player_cluster] # cụm cầu thủ là cụm còn lại
+        return player_colors
 
     def get_player_color(self,frame,bbox): # hàm để lấy màu sắc của cầu thủ từ khung hình và bounding box
-        image = frame[int(bbox[1]):int(bbox[3]),int(bbox[0]):int(bbox[2])] # cắt hình ảnh của cầu thủ từ khung hình dựa trên bounding box
-        # bbox = [x_min, y_min, x_max, y_max]
-        top_half_image = image[0:int(image.shape[0]/2),:] # lấy nửa trên của hình ảnh cầu thủ
-        #dấu : để lấy tất cả các cột, 0 :int(image.shape[0]/2) để lấy từ hàng 0 đến hàng giữa (nửa trên), [0:int(image.shape[0]/2),:], : ở cuối để lấy tất cả các kênh màu
-        # image[height, width, channels] 
-        
-        # Get Clustering model
-        kmeans = self.get_clustering_model(top_half_image) # lấy mô hình phân cụm K-means từ nửa trên của hình ảnh cầu thủ
-        # lấy mô hình phân cụm từ nửa trên của hình ảnh cầu thủ vì nửa trên thường chứa nhiều thông tin về màu sắc áo đấu hơn nửa dưới
-        
-        # Get the cluster labels forr each pixel
-        labels = kmeans.labels_ # lấy nhãn cụm cho mỗi pixel trong hình ảnh,pixel là một điểm dữ liệu trong không gian màu RGB
-
-        # Reshape the labels to the image shape
-        # tại sao phải reshape lại? Vì labels là một mảng 1 chiều chứa nhãn cụm cho mỗi pixel, cần reshape lại để có hình dạng giống với hình ảnh ban đầu để dễ dàng xử lý, hình dạng ban đầu của nửa trên hình ảnh là (height, width)
-        clustered_image = labels.reshape(top_half_image.shape[0],top_half_image.shape[1]) # chuyển đổi nhãn cụm trở lại hình dạng ban đầu của nửa trên hình ảnh
-
-        # Get the player cluster
-        corner_clusters = [clustered_image[0,0],clustered_image[0,-1],clustered_image[-1,0],clustered_image[-1,-1]] # lấy nhãn cụm của 4 góc của nửa trên hình ảnh
-        # clustered_image[-1,-1] là góc dưới bên phải
-        non_player_cluster = max(set(corner_clusters),key=corner_clusters.count)
-        # xác định cụm không phải cầu thủ dựa trên nhãn xuất hiện nhiều nhất trong 4 góc
-        player_cluster = 1 - non_player_cluster # cụm cầu thủ là cụm còn lại
-        # 1 là vì chỉ có 2 cụm (0 và 1)
-        player_color = kmeans.cluster_centers_[player_cluster] # lấy màu sắc trung tâm của cụm cầu thủ
-
-        return player_color
-
-
-    def assign_team_color(self,frame, player_detections): # hàm để gán màu sắc đội cho các cầu thủ dựa trên phát hiện cầu thủ
-        
-        player_colors = []
-        for _, player_detection in player_detections.items():
-            bbox = player_detection["bbox"] 
-            player_color =  self.get_player_color(frame,bbox) 
-            player_colors.append(player_color) # lưu màu sắc của cầu thủ vào danh sách
-        
-        kmeans = KMeans(n_clusters=2, init="k-means++",n_init=10) # khởi tạo mô hình K-means với 2 cụm
-        # n_init=10 để chạy K-means 10 lần với các khởi tạo khác nhau và chọn kết quả tốt nhất
-        # kmeans++ là phương pháp khởi tạo cụm để cải thiện hiệu suất của K-means
-        kmeans.fit(player_colors)
+        return self.get_player_colors(frame, [bbox])[0]
+
+
+    def assign_team_color(self,frame, player_detections): # hàm để gán màu sắc đội cho các cầu thủ dựa trên phát hiện cầu thủ (một khung hình)
+        player_colors = self.get_player_colors(frame, [player_detection["bbox"] for player_detection in player_detections.values()])
+        self.fit_colors(player_colors)
+
+    def get_sample_frames(self, player_tracks): # tối đa num_sample_frames khung hình có cầu thủ, trải đều video
+        candidates = np.array([frame_num for frame_num, player_track in enumerate(player_tracks) if len(player_track) > 0])
+        if len(candidates) <= self.num_sample_frames:
+            return candidates.tolist()
+        return candidates[np.unique(np.linspace(0, len(candidates) - 1, self.num_sample_frames).round().astype(int))].tolist()
+
+    def fit_team_model(self, video_frames, player_tracks):
+        '''
+        logic hàm này là:
+        1. Chọn các khung hình mẫu trải đều video, đọc trên luồng nền và cắt nửa trên của tất cả cầu thủ
+        2. Lấy màu áo của các ảnh đã cắt song song trên num_workers luồng (NumPy nhả GIL khi tính)
+        3. Lấy mẫu con tối đa max_colors màu rồi phân 2 cụm có loại bỏ ngoại lai (fit_colors)
+        '''
+        sample_frames = self.get_sample_frames(player_tracks)
+        crops = []
+        for frame_num, frame in iter_prefetched(((frame_num, video_frames[frame_num]) for frame_num in sample_frames)):
+            bboxes = [track['bbox'] for track in player_tracks[frame_num].values()]
+            crops += [crop.copy() for crop in self.get_top_half_crops(frame, bboxes)] # copy để không giữ cả khung hình trong bộ nhớ
+        if not crops:
+            raise ValueError("❌ Không có cầu thủ nào để học màu áo của hai đội")
+
+        chunks = [chunk for chunk in np.array_split(np.arange(len(crops)), self.num_workers) if len(chunk)]
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            player_colors = np.concatenate(list(executor.map(lambda chunk: self.get_crop_colors([crops[i] for i in chunk]), chunks)))
+        if len(player_colors) > self.max_colors:
+            player_colors = player_colors[np.random.default_rng(0).choice(len(player_colors), self.max_colors, replace=False)]
+        self.fit_colors(player_colors)
+        print(f"✅ Đã học màu áo hai đội từ {len(sample_frames)} khung hình ({len(player_colors)} màu)")
+
+    def fit_colors(self, player_colors):
+        '''
+        logic hàm này là:
+        1. Phân 2 cụm bằng K-means (random_state cố định để nhãn đội giống nhau giữa các lần chạy)
+        2. Ngưỡng ngoại lai từ khoảng cách tới tâm gần nhất: trung vị + outlier_scale * 1.4826 * MAD (không nhỏ hơn min_outlier_distance)
+        3. Phân cụm lại chỉ trên các màu không ngoại lai (thủ môn, trọng tài mặc màu khác không kéo lệch tâm của hai đội)
+        '''
+        player_colors = np.asarray(player_colors, dtype=np.float64)
+        inliers = np.ones(len(player_colors), dtype=bool)
+        for _ in range(2):
+            kmeans = KMeans(n_clusters=2, init="k-means++",n_init=10, random_state=0) # khởi tạo mô hình K-means với 2 cụm
+            # n_init=10 để chạy K-means 10 lần với các khởi tạo khác nhau và chọn kết quả tốt nhất
+            # kmeans++ là phương pháp khởi tạo cụm để cải thiện hiệu suất của K-means
+            kmeans.fit(player_colors[inliers])
+            distances = np.sqrt(((player_colors[:, None, :] - kmeans.cluster_centers_[None, :, :]) ** 2).sum(axis=2)).min(axis=1)
+            median = np.median(distances[inliers])
+            mad = np.median(np.abs(distances[inliers] - median))
+            self.outlier_threshold = max(median + self.outlier_scale * 1.4826 * mad, self.min_outlier_distance)
+            new_inliers = distances <= self.outlier_threshold
+            if new_inliers.sum() < 2 or np.array_equal(new_inliers, inliers):
+                break
+            inliers = new_inliers
 
         self.kmeans = kmeans
 
         self.team_colors[1] = kmeans.cluster_centers_[0] # lưu màu sắc trung tâm của cụm 0 là màu sắc của đội 1
         self.team_colors[2] = kmeans.cluster_centers_[1] # lưu màu sắc trung tâm của cụm 1 là màu sắc của đội 2
 
+    def reset(self): # xóa mô hình đội và các phiếu bầu trước khi chạy streaming trên video mới
+        self.kmeans, self.team_colors, self.outlier_threshold = None, {}, np.inf
+        self.player_team_dict, self.player_votes, self.last_vote_frame = {}, {}, {}
+        self.sample_colors.clear()
+        self.last_fit_frame = None
 
-    def get_player_team(self,frame,player_bbox,player_id): # hàm để lấy đội của cầu thủ dựa trên bounding box và id cầu thủ
-        if player_id in self.player_team_dict: # nếu id cầu thủ đã có trong dictionary thì trả về đội đã gán
-            return self.player_team_dict[player_id]
+    def update_team_model(self, frame, player_track, frame_num):
+        '''
+        logic hàm này là (streaming, gọi trước get_player_teams ở mỗi khung hình):
+        1. Lấy màu áo của các cầu thủ vào bộ đệm: trước lần học đầu tiên ở mọi khung hình có cầu thủ, sau đó (nếu có refit_interval)
+           mỗi refit_interval // num_sample_frames khung hình; bộ đệm chỉ giữ num_sample_frames khung hình lấy mẫu gần nhất
+        2. Chưa có mô hình: học ngay khi bộ đệm có ít nhất 2 màu áo khác nhau (K-means 2 cụm không chạy được với ít hơn,
+           màu của một cầu thủ hoặc một đội ở nhiều khung hình chỉ khác nhau do nhiễu)
+        3. Đã có mô hình và đã qua refit_interval khung hình: học lại từ bộ đệm, giữ nhãn đội theo tâm cũ gần nhất
+           và bỏ các phiếu cũ để các cầu thủ được bầu lại bằng mô hình mới
+        '''
+        if self.kmeans is not None and self.refit_interval is None:
+            return
+        sample_step = 1 if self.kmeans is None else max(1, self.refit_interval // self.num_sample_frames)
+        if len(player_track) > 0 and frame_num % sample_step == 0:
+            self.sample_colors.append(self.get_player_colors(frame, [track['bbox'] for track in player_track.values()]))
+
+        if self.kmeans is not None and frame_num - self.last_fit_frame < self.refit_interval:
+            return
+        player_colors = np.concatenate(self.sample_colors) if self.sample_colors else np.zeros((0, 3))
+        # cần ít nhất 2 màu áo khác nhau: các màu cách nhau không quá min_outlier_distance (một cầu thủ, một đội) chỉ là nhiễu
+        if len(player_colors) < 2 or np.ptp(player_colors, axis=0).max() <= self.min_outlier_distance:
+            return
+        if len(player_colors) > self.max_colors:
+            player_colors = player_colors[np.random.default_rng(0).choice(len(player_colors), self.max_colors, replace=False)]
 
-        player_color = self.get_player_color(frame,player_bbox) # lấy màu sắc của cầu thủ từ khung hình và bounding box
+        previous_colors = None if self.kmeans is None else self.kmeans.cluster_centers_.copy()
+        self.fit_colors(player_colors)
+        self.last_fit_frame = frame_num
+        if previous_colors is None:
+            return
+        # cụm mới gần tâm cũ của đội kia hơn thì đổi chỗ hai cụm để đội của các cầu thủ không bị đảo nhãn
+        centers = self.kmeans.cluster_centers_
+        if np.linalg.norm(centers - previous_colors[::-1], axis=1).sum() < np.linalg.norm(centers - previous_colors, axis=1).sum():
+            self.kmeans.cluster_centers_ = centers[::-1].copy()
+            self.team_colors[1], self.team_colors[2] = self.kmeans.cluster_centers_
+        self.player_votes, self.last_vote_frame = {}, {}
 
-        team_id = self.kmeans.predict(player_color.reshape(1,-1))[0] # dự đoán đội của cầu thủ dựa trên màu sắc sử dụng mô hình K-means
-        # reshape(1,-1) để chuyển đổi player_color thành mảng 2D với 1 hàng và số cột tương ứng với số đặc trưng (3 đặc trưng cho màu RGB)
-        # (1,-1) trong reshape có nghĩa là 1 hàng và số cột tự động xác định dựa trên kích thước ban đầu của mảng
-        team_id+=1 # đội 1 và đội 2 tương ứng với cụm 0 và cụm 1 trong K-means, tăng thêm 1 để có đội 1 và đội 2
+    def predict_teams(self, player_colors): # đội gần nhất (giống kmeans.predict) và màu có phải ngoại lai không
+        distances = np.sqrt(((player_colors[:, None, :] - self.kmeans.cluster_centers_[None, :, :]) ** 2).sum(axis=2))
+        return distances.argmin(axis=1) + 1, distances.min(axis=1) > self.outlier_threshold
 
-        if player_id ==91: # nếu id cầu thủ là 91 thì gán đội là 1
-            team_id=1
+    def vote(self, frame, player_track, frame_num=None):
+        # lấy màu áo (cùng lúc) của các cầu thủ đến lượt bầu: id mới, đã qua vote_interval khung hình hoặc sang đoạn mới
+        # frame_num=None: chỉ bầu một lần cho mỗi id (như get_player_team cũ)
+        due = [player_id for player_id in player_track
+               if player_id not in self.last_vote_frame
+               or (frame_num is not None and (frame_num - self.last_vote_frame[player_id] >= self.vote_interval
+                                              or frame_num // self.vote_window != self.last_vote_frame[player_id] // self.vote_window))]
+        if not due:
+            return
+        teams, outliers = self.predict_teams(self.get_player_colors(frame, [player_track[player_id]['bbox'] for player_id in due]))
+        segment = 0 if frame_num is None else frame_num // self.vote_window
+        for player_id, team, outlier in zip(due, teams.tolist(), outliers.tolist()):
+            votes = self.player_votes.setdefault((player_id, segment), np.zeros(4))
+            votes[team - 1 + 2 * outlier] += 1
+            self.last_vote_frame[player_id] = 0 if frame_num is None else frame_num
+
+    def get_voted_team(self, player_id, segment):
+        # đội được bầu nhiều nhất trong đoạn, hòa thì giữ đội của đoạn trước; chỉ có phiếu ngoại lai thì giữ đội trước hoặc lấy đội gần nhất
+        votes = self.player_votes.get((player_id, segment), np.zeros(4))
+        previous = self.player_team_dict.get(player_id)
+        if votes[:2].sum() > 0:
+            scores = votes[:2].copy()
+            if previous is not None:
+                scores[previous - 1] += 0.5
+            team = int(scores.argmax()) + 1
+        elif previous is not None:
+            team = previous
+        else:
+            team = int(votes[2:].argmax()) + 1
+        self.player_team_dict[player_id] = team # lưu đội của cầu thủ vào dictionary
+        return team
+
+    def get_player_teams(self, frame, player_track, frame_num=None): # hàm để lấy đội của tất cả cầu thủ trong một khung hình, {player_id: team}
+        # bầu chọn theo các phiếu đã có tới khung hình này (dùng được cho streaming), màu áo của các cầu thủ đến lượt được lấy cùng lúc
+        if self.kmeans is None: # streaming: chưa đủ màu áo để học mô hình đội
+            return {player_id: 0 for player_id in player_track}
+        self.vote(frame, player_track, frame_num)
+        segment = 0 if frame_num is None else frame_num // self.vote_window
+        return {player_id: self.get_voted_team(player_id, segment) for player_id in player_track}
+
+    def get_player_team(self,frame,player_bbox,player_id): # hàm để lấy đội của cầu thủ dựa trên bounding box và id cầu thủ
+        return self.get_player_teams(frame, {player_id: {'bbox': player_bbox}})[player_id]
 
-        self.player_team_dict[player_id] = team_id # lưu đội của cầu thủ vào dictionary
+    def assign_teams(self, video_frames, player_tracks):
+        '''
+        logic hàm này là (chạy trên toàn bộ video):
+        1. Học mô hình đội từ các khung hình mẫu (fit_team_model)
+        2. Duyệt video một lượt, chỉ lấy màu áo ở các khung hình có cầu thủ đến lượt bầu
+        3. Mỗi đoạn vote_window khung hình của mỗi track lấy đội được bầu nhiều nhất trong cả đoạn (kể cả các phiếu sau khung hình đó),
+           các đoạn xét theo thứ tự thời gian để hòa thì giữ đội của đoạn trước
+        Trả về list {player_id: team} cho từng khung hình.
+        '''
+        self.fit_team_model(video_frames, player_tracks)
+        self.player_team_dict, self.player_votes, self.last_vote_frame = {}, {}, {}
+        for frame_num, frame in enumerate(video_frames):
+            if frame_num >= len(player_tracks):
+                break
+            self.vote(frame, player_tracks[frame_num], frame_num)
 
-        return team_id
+        segment_teams = {key: self.get_voted_team(*key) for key in sorted(self.player_votes, key=lambda key: key[1])}
+        return [{player_id: segment_teams[(player_id, frame_num // self.vote_window)] for player_id in player_track}
+                for frame_num, player_track in enumerate(player_tracks)]
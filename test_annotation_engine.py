@@ -0,0 +1,108 @@
+"""
+Test script để kiểm tra AnnotationEngine vẽ tất cả các lớp chú thích trong một lần duyệt giống các lượt vẽ cũ trên toàn bộ video
+"""
+
+import numpy as np
+import pytest
+from pipeline import AnnotationEngine
+from trackers.tracker import Tracker
+from camera_movement_estimator import CameraMovementEstimator
+from speed_and_distance_estimator import SpeedAndDistance_Estimator
+from player_stats_analyzer import PlayerStatsAnalyzer
+from utils import OverlayCompositor
+from player_ball_assigner import PossessionTimeline
+
+def _make_video(num_frames=4, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = [rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8) for _ in range(num_frames)]
+    tracks = {"players": [], "referees": [], "ball": []}
+    for frame_num in range(num_frames):
+        players = {}
+        for player_id in range(1, 7):
+            x, y = 150 * player_id + 5 * frame_num, 300 + 40 * player_id
+            players[player_id] = {'bbox': [x, y, x + 40, y + 90], 'team': 1 + player_id % 2, 'team_color': (255, 0, 0) if player_id % 2 else (0, 0, 255),
+                                  'speed': 10.0 + player_id, 'distance': 2.0 * frame_num, 'has_ball': player_id == 3}
+        tracks["players"].append(players)
+        tracks["referees"].append({20: {'bbox': [1200, 400, 1240, 490]}})
+        tracks["ball"].append({1: {'bbox': [600 + 10 * frame_num, 500, 612 + 10 * frame_num, 512]}})
+    team_ball_control = np.array([1, 1, 2, 2][:num_frames])
+    camera_movement = [[0.5 * frame_num, -1.0] for frame_num in range(num_frames)]
+    return frames, tracks, team_ball_control, camera_movement
+
+def _make_tracker():
+    # chỉ cần các hàm vẽ của Tracker, không nạp mô hình
+    tracker = Tracker.__new__(Tracker)
+    tracker.overlay_compositor = OverlayCompositor()
+    return tracker
+
+class _ListWriter:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+def test_annotation_engine_matches_multi_pass():
+    """Test vẽ một lượt cho kết quả giống hệt các lượt vẽ cũ, không sửa khung hình gốc, thứ tự lớp đúng"""
+
+    print("Testing AnnotationEngine...")
+    print("=" * 60)
+
+    frames, tracks, team_ball_control, camera_movement = _make_video()
+    originals = [frame.copy() for frame in frames]
+    tracker = _make_tracker()
+    camera_movement_estimator = CameraMovementEstimator(frames[0])
+    speed_and_distance_estimator = SpeedAndDistance_Estimator()
+    stats_analyzer = PlayerStatsAnalyzer()
+    stats_analyzer.calculate_player_stats(tracks, team_ball_control)
+
+    # cách cũ: nhiều lượt trên toàn bộ video
+    expected = tracker.draw_annotations(frames, tracks, team_ball_control)
+    expected = camera_movement_estimator.draw_camera_movement(expected, camera_movement)
+    speed_and_distance_estimator.draw_speed_and_distance(expected, tracks)
+    expected = [stats_analyzer.draw_stats_on_frame(frame, position=(10, frame.shape[0] - 270), max_players=5) for frame in expected]
+
+    engine = AnnotationEngine.from_components(tracker, camera_movement_estimator, speed_and_distance_estimator, stats_analyzer)
+    assert engine.layer_names == ['players', 'referees', 'ball', 'team_ball_control', 'camera_movement', 'speed_and_distance', 'player_stats']
+    writer = _ListWriter()
+    assert engine.render(frames, tracks, team_ball_control, camera_movement, writer) == len(frames)
+    for frame_num, (result, old) in enumerate(zip(writer.frames, expected)):
+        assert np.array_equal(result, old), f"❌ Khung hình {frame_num} khác cách vẽ cũ"
+    assert all(np.array_equal(frame, original) for frame, original in zip(frames, originals)), "❌ Không được sửa khung hình gốc"
+    stats = engine.stats()
+    print(f"\nStats: {stats}")
+    assert stats['frames'] == len(frames) and set(stats['layer_ms']) == set(engine.layer_names)
+
+    print("\n" + "=" * 60)
+    print("✓ AnnotationEngine test passed!")
+
+def test_annotation_engine_registry():
+    """Test thêm lớp trước một lớp khác, thay lớp cùng tên, bỏ lớp"""
+
+    print("Testing AnnotationEngine registry...")
+    print("=" * 60)
+
+    frames, tracks, team_ball_control, camera_movement = _make_video(num_frames=1)
+    engine = AnnotationEngine.from_components(_make_tracker())
+    assert engine.layer_names == ['players', 'referees', 'ball', 'team_ball_control']
+
+    calls = []
+    engine.register('marker', lambda frame, context: calls.append(context['frame_num']) or frame, before='ball')
+    assert engine.layer_names == ['players', 'referees', 'marker', 'ball', 'team_ball_control']
+    engine.register('marker', lambda frame, context: calls.append(-1) or frame)
+    assert engine.layer_names[-1] == 'marker' and engine.layer_names.count('marker') == 1
+    engine.annotate_frame(frames[0], {'frame_num': 0, 'tracks': {name: track[0] for name, track in tracks.items()},
+                                      'possession': PossessionTimeline(team_ball_control), 'camera_movement': camera_movement[0]})
+    assert calls == [-1]
+
+    engine.unregister('marker')
+    assert 'marker' not in engine.layer_names
+    with pytest.raises(ValueError):
+        engine.register('marker', lambda frame, context: frame, before='radar')
+
+    print("\n" + "=" * 60)
+    print("✓ AnnotationEngine registry test passed!")
+
+if __name__ == "__main__":
+    test_annotation_engine_matches_multi_pass()
+    test_annotation_engine_registry()
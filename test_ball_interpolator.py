@@ -0,0 +1,113 @@
+"""
+Test script để kiểm tra BallInterpolator nội suy vị trí bóng trên mảng NumPy và OnlineBallInterpolator cho streaming
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from trackers import BallInterpolator, OnlineBallInterpolator
+from track_store import TrackStore
+
+def _make_ball_positions(num_frames=400, seed=0):
+    # bóng bay theo các đường parabol (chuyền dài), có khoảng trống ngắn, khoảng trống dài, khoảng trống ở đầu và cuối video
+    rng = np.random.default_rng(seed)
+    frames = np.arange(num_frames)
+    phase = frames % 80
+    x = 200 + 4.0 * frames
+    y = 700 - 12.0 * phase + 0.15 * phase**2
+    truth = np.stack([x - 6, y - 6, x + 6, y + 6], axis=1)
+    detected = rng.random(num_frames) > 0.3
+    detected[:4] = False
+    detected[150:190] = False
+    detected[-3:] = False
+    ball_positions = [{1: {"bbox": truth[frame_num].tolist()}} if detected[frame_num] else {} for frame_num in range(num_frames)]
+    return ball_positions, truth, detected
+
+def _pandas_interpolation(ball_positions):
+    # cách cũ: DataFrame.interpolate() rồi bfill()
+    df_ball_positions = pd.DataFrame([x.get(1, {}).get('bbox', []) for x in ball_positions], columns=['x1', 'y1', 'x2', 'y2'])
+    return df_ball_positions.interpolate().bfill().to_numpy()
+
+def _bboxes(ball_positions):
+    return np.array([frame[1]['bbox'] if 1 in frame else [np.nan] * 4 for frame in ball_positions])
+
+def test_ball_interpolation():
+    """Test nội suy tuyến tính giống pandas, giới hạn độ dài khoảng trống, cờ interpolated và spline/Kalman bám đường bay cong"""
+
+    print("Testing BallInterpolator...")
+    print("=" * 60)
+
+    ball_positions, truth, detected = _make_ball_positions()
+    result = BallInterpolator().interpolate_ball_positions(ball_positions)
+    assert np.allclose(_bboxes(result), _pandas_interpolation(ball_positions), rtol=0, atol=1e-9), "❌ Nội suy tuyến tính khác pandas"
+    flags = np.array([frame[1]['interpolated'] for frame in result])
+    assert np.array_equal(flags, ~detected), "❌ Cờ interpolated sai"
+    assert np.array_equal(_bboxes(result)[detected], truth[detected]), "❌ Khung hình có bóng phải giữ nguyên bbox"
+
+    # tracks dạng cột cho kết quả giống tracks dạng dictionary
+    store = TrackStore({"players": [{}] * len(ball_positions), "referees": [{}] * len(ball_positions), "ball": ball_positions})
+    assert np.array_equal(_bboxes(BallInterpolator().interpolate_ball_positions(store['ball'])), _bboxes(result))
+
+    # khoảng trống dài hơn max_gap không được nội suy
+    limited = BallInterpolator(max_gap=10).interpolate_ball_positions(ball_positions)
+    assert all(limited[frame_num] == {} for frame_num in range(150, 190)), "❌ Khoảng trống dài hơn max_gap phải để trống"
+    assert limited[2][1]['interpolated'] and limited[-1][1]['interpolated'], "❌ Khoảng trống ngắn ở hai đầu vẫn được điền"
+
+    errors = {}
+    for method in BallInterpolator.METHODS:
+        bboxes, interpolated = BallInterpolator(method=method, max_gap=10).interpolate_bboxes(_bboxes(ball_positions))
+        inside = interpolated.copy()
+        inside[:4] = inside[-3:] = False
+        errors[method] = np.abs(bboxes[inside] - truth[inside]).mean()
+    print(f"\nMean error (pixel): {errors}")
+    assert errors['spline'] < errors['linear'] * 0.5, "❌ Spline phải bám đường bay cong tốt hơn nội suy tuyến tính"
+    assert errors['kalman'] < errors['linear'], "❌ Kalman phải bám đường bay cong tốt hơn nội suy tuyến tính"
+
+    empty = BallInterpolator().interpolate_ball_positions([{}, {}])
+    assert empty == [{}, {}], "❌ Video không có bóng thì không nội suy"
+    with pytest.raises(ValueError):
+        BallInterpolator(method='cubic')
+
+    print("\n" + "=" * 60)
+    print("✓ BallInterpolator test passed!")
+
+def _run_online(online, ball_positions):
+    results, max_latency = [], 0
+    for frame_num, frame in enumerate(ball_positions):
+        for ready_frame, bbox, interpolated in online.push(frame[1]['bbox'] if 1 in frame else None):
+            max_latency = max(max_latency, frame_num - ready_frame)
+            results.append((ready_frame, bbox, interpolated))
+    results += online.flush()
+    return results, max_latency
+
+def test_online_ball_interpolation():
+    """Test nhận từng khung hình: kết quả giống hệt nội suy trên cả video, mỗi khung hình trễ tối đa lookahead khung hình"""
+
+    print("Testing OnlineBallInterpolator...")
+    print("=" * 60)
+
+    ball_positions, _, _ = _make_ball_positions(seed=1)
+    for method in BallInterpolator.METHODS:
+        for max_gap in (None, 10):
+            interpolator = BallInterpolator(method=method, max_gap=max_gap)
+            bboxes, interpolated = interpolator.interpolate_bboxes(_bboxes(ball_positions))
+
+            online = OnlineBallInterpolator(interpolator, lookahead=len(ball_positions))
+            results, _ = _run_online(online, ball_positions)
+            assert [frame_num for frame_num, _, _ in results] == list(range(len(ball_positions))), "❌ Phải trả về mọi khung hình đúng thứ tự"
+            online_bboxes = np.array([[np.nan] * 4 if bbox is None else bbox for _, bbox, _ in results])
+            assert np.array_equal(online_bboxes, bboxes, equal_nan=True), f"❌ Streaming khác cả video ({method}, max_gap={max_gap})"
+            assert [flag for _, _, flag in results] == interpolated.tolist()
+
+            # lookahead nhỏ: khoảng trống dài hơn lookahead không được nội suy, không khung hình nào trễ quá lookahead
+            online = OnlineBallInterpolator(interpolator, lookahead=12)
+            results, max_latency = _run_online(online, ball_positions)
+            assert max_latency <= 12, f"❌ Trễ {max_latency} khung hình ({method})"
+            assert len(results) == len(ball_positions) and all(results[frame_num][1] is None for frame_num in range(150, 190))
+
+    print("\n" + "=" * 60)
+    print("✓ OnlineBallInterpolator test passed!")
+
+if __name__ == "__main__":
+    test_ball_interpolation()
+    test_online_ball_interpolation()
@@ -0,0 +1,118 @@
+"""
+Test script để kiểm tra BatchInferenceEngine (inference theo lô, tự giảm kích thước lô khi hết bộ nhớ)
+"""
+
+from unittest import mock
+import numpy as np
+from trackers.batch_inference import BatchInferenceEngine, letterbox_batch, get_available_ram
+from trackers.inference_backends import get_exported_path, get_missing_requirements, load_detection_model
+from trackers.tracker import Tracker
+
+class _FakeModel:
+    # mô hình giả: báo hết bộ nhớ khi lô lớn hơn max_batch, kết quả là chỉ số khung hình để kiểm tra thứ tự
+    def __init__(self, max_batch):
+        self.max_batch = max_batch
+        self.batch_sizes = []
+        self.kwargs = None
+
+    def predict(self, frames, **kwargs):
+        self.kwargs = kwargs
+        if len(frames) > self.max_batch:
+            raise RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB")
+        self.batch_sizes.append(len(frames))
+        return [int(frame[0, 0]) for frame in frames]
+
+def test_batch_inference_engine():
+    """Test thứ tự kết quả, trả về từng khung hình và giảm kích thước lô khi hết bộ nhớ"""
+
+    print("Testing BatchInferenceEngine...")
+    print("=" * 60)
+
+    frames = [np.full((4, 4), i, dtype=np.uint8) for i in range(50)]
+    model = _FakeModel(max_batch=6)
+    engine = BatchInferenceEngine(model, batch_size=16, imgsz=320, half=True, adaptive=True, prepare_inputs=False) # mô hình giả nhận khung hình gốc
+    engine.batch_size = 16 # bỏ qua giới hạn theo bộ nhớ của máy chạy test
+
+    predictions = engine.iter_predictions(frames)
+    first_frame, first_detection = next(predictions) # kết quả được trả về ngay sau lô đầu tiên
+    assert first_detection == 0, "❌ Kết quả đầu tiên không đúng"
+    detections = [first_detection] + [detection for _, detection in predictions]
+
+    print(f"\nBatch sizes: {model.batch_sizes}")
+    print(f"Stats: {engine.stats()}")
+    assert detections == list(range(50)), "❌ Thứ tự kết quả không đúng"
+    assert engine.batch_size == 4, "❌ Kích thước lô phải giảm 16 -> 8 -> 4"
+    assert max(model.batch_sizes) <= 6, "❌ Không được chạy lô vượt bộ nhớ"
+    assert model.kwargs['imgsz'] == 320 and model.kwargs['half'] is True, "❌ imgsz/half không được truyền cho mô hình"
+
+    # lỗi khác không phải hết bộ nhớ thì phải được ném ra
+    engine = BatchInferenceEngine(_FakeModel(max_batch=0), batch_size=1, prepare_inputs=False)
+    try:
+        list(engine.iter_predictions(frames))
+        assert False, "❌ Lỗi inference bị nuốt mất"
+    except RuntimeError:
+        pass
+
+    print("\n" + "=" * 60)
+    print("✓ BatchInferenceEngine test passed!")
+
+class _FakeBoxes:
+    def __init__(self, data, orig_shape):
+        self.data = data
+        self.orig_shape = orig_shape
+
+class _FakeDetection:
+    def __init__(self, data, orig_shape):
+        self.boxes = _FakeBoxes(data, orig_shape)
+
+def test_letterbox_and_memory_limit():
+    """Test letterbox giống ultralytics, đổi bbox về khung hình gốc, giới hạn lô theo MemAvailable và bộ nhớ mỗi khung hình cấu hình được"""
+
+    print("Testing letterbox and memory limit...")
+    print("=" * 60)
+
+    frames = [np.full((1080, 1920, 3), value, dtype=np.uint8) for value in (10, 200)]
+    inputs, ratio, pad = letterbox_batch(frames, imgsz=640)
+    assert inputs.shape == (2, 384, 640, 3) and ratio == 1 / 3 and pad == (0, 12), "❌ Letterbox (auto) phải thêm viền tới bội số của 32"
+    assert (inputs[:, :12] == 114).all() and (inputs[0, 12:372] == 10).all() and (inputs[1, 12:372] == 200).all()
+    assert letterbox_batch(frames, imgsz=640, auto=False)[0].shape == (2, 640, 640, 3), "❌ Mô hình export nhận ảnh imgsz x imgsz"
+
+    # bbox trên ảnh đã letterbox -> khung hình gốc, bbox tràn ra ngoài bị cắt
+    detection = _FakeDetection(np.array([[100.0, 42.0, 200.0, 112.0, 0.9, 2.0], [600.0, 300.0, 660.0, 400.0, 0.5, 0.0]]), (384, 640))
+    BatchInferenceEngine.restore_boxes(detection, frames[0], ratio, pad)
+    assert np.allclose(detection.boxes.data[:, :4], [[300, 90, 600, 300], [1800, 864, 1920, 1080]])
+    assert np.allclose(detection.boxes.data[:, 4:], [[0.9, 2.0], [0.5, 0.0]]) and detection.orig_shape == (1080, 1920)
+
+    available = get_available_ram()
+    print(f"\nAvailable RAM: {available and available / 1e9:.2f} GB")
+    engine = BatchInferenceEngine(_FakeModel(max_batch=64), batch_size=64, frame_memory=available / 8, prepare_inputs=False)
+    assert engine.batch_size == 4, "❌ Kích thước lô phải theo một nửa bộ nhớ còn trống chia bộ nhớ mỗi khung hình"
+    assert not engine.measure_frame_memory, "❌ Bộ nhớ mỗi khung hình đã cấu hình thì không đo lại"
+
+    print("\n" + "=" * 60)
+    print("✓ Letterbox and memory limit test passed!")
+
+def test_inference_backend_paths():
+    """Test tên file export của các inference backend"""
+    assert get_exported_path('models/best.pt', 'onnx') == 'models/best.onnx', "❌ Sai đường dẫn ONNX"
+    assert get_exported_path('models/best.pt', 'onnx', int8=True) == 'models/best_int8.onnx', "❌ Sai đường dẫn ONNX INT8"
+    assert get_exported_path('models/best.pt', 'openvino', int8=True) == 'models/best_int8_openvino_model', "❌ Sai đường dẫn OpenVINO INT8"
+    assert get_missing_requirements('torch') == [], "❌ Backend torch không cần thêm thư viện"
+
+    # thiếu thư viện thì chạy bằng torch: backend trả về và khóa cache là torch, không phải onnx/int8 được yêu cầu
+    with mock.patch('trackers.inference_backends.get_missing_requirements', return_value=['onnxruntime']), \
+         mock.patch('trackers.inference_backends.YOLO', side_effect=lambda path, **kwargs: path):
+        assert load_detection_model('models/best.pt', backend='onnx', int8=True) == ('models/best.pt', 'torch')
+    with mock.patch('trackers.tracker.load_detection_model', return_value=(_FakeModel(max_batch=1), 'torch')):
+        tracker = Tracker('models/best.pt', inference_backend='onnx', int8=True)
+    assert tracker.cache_params['inference_backend'] == 'torch' and tracker.cache_params['int8'] is False, "❌ Khóa cache phải theo backend thực sự được dùng"
+    with mock.patch('trackers.tracker.load_detection_model', return_value=(_FakeModel(max_batch=1), 'onnx')):
+        tracker = Tracker('models/best.pt', inference_backend='onnx', int8=True)
+    assert tracker.cache_params['inference_backend'] == 'onnx' and tracker.cache_params['int8'] is True
+    assert tracker.inference_engine.letterbox_auto is False, "❌ Mô hình export nhận ảnh imgsz x imgsz"
+    print("✓ Inference backend paths test passed!")
+
+if __name__ == "__main__":
+    test_batch_inference_engine()
+    test_letterbox_and_memory_limit()
+    test_inference_backend_paths()
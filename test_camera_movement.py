@@ -0,0 +1,112 @@
+"""
+Test script để kiểm tra CameraMovementEstimator ước lượng chuyển động camera bằng RANSAC trên tất cả các điểm đặc trưng
+"""
+
+import cv2
+import numpy as np
+import pytest
+from camera_movement_estimator import CameraMovementEstimator
+from utils import measure_distance, measure_xy_distance
+
+FRAME_SIZE = (360, 640)
+
+def _make_video(num_frames=40, pan=(3.0, 1.0)):
+    # camera lia đều pan pixel/khung hình trên một nền có nhiều góc (khán đài, biển quảng cáo),
+    # 4 "cầu thủ" có họa tiết ô cờ chạy nhanh theo chiều ngược lại, ở vị trí cố định trên ảnh
+    rng = np.random.default_rng(0)
+    background = np.full((900, 1400, 3), 60, dtype=np.uint8)
+    for _ in range(400):
+        x, y = rng.integers(0, 1380), rng.integers(0, 880)
+        cv2.rectangle(background, (int(x), int(y)), (int(x + rng.integers(6, 20)), int(y + rng.integers(6, 20))), rng.integers(90, 255, 3).tolist(), -1)
+    checker = (np.indices((40, 24)).sum(axis=0) // 4 % 2 * 255).astype(np.uint8)
+    frames, bboxes = [], []
+    for frame_num in range(num_frames):
+        x0, y0 = 100 + pan[0] * frame_num, 100 + pan[1] * frame_num
+        matrix = np.float32([[1, 0, -x0], [0, 1, -y0]])
+        frame = cv2.warpAffine(background, matrix, (FRAME_SIZE[1], FRAME_SIZE[0]), flags=cv2.INTER_LINEAR)
+        frame_bboxes = []
+        for player in range(4):
+            x, y = 60 + 140 * player + (frame_num * 9) % 60, 150 + 30 * player
+            frame[y:y + 40, x:x + 24] = checker[:, :, None]
+            frame_bboxes.append([x, y, x + 24, y + 40])
+        frames.append(frame)
+        bboxes.append(frame_bboxes)
+    return frames, bboxes
+
+def _max_displacement_movement(frames, features_params, lk_params):
+    # cách cũ: chuyển động camera là độ dịch chuyển của điểm đặc trưng di chuyển nhiều nhất
+    movements = [[0, 0]]
+    old_gray = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
+    old_features = cv2.goodFeaturesToTrack(old_gray, **features_params)
+    for frame in frames[1:]:
+        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        new_features, _, _ = cv2.calcOpticalFlowPyrLK(old_gray, frame_gray, old_features, None, **lk_params)
+        max_distance, movement = 0, [0, 0]
+        for new, old in zip(new_features, old_features):
+            distance = measure_distance(new.ravel(), old.ravel())
+            if distance > max_distance:
+                max_distance, movement = distance, list(measure_xy_distance(old.ravel(), new.ravel()))
+        if max_distance > 5:
+            old_features = cv2.goodFeaturesToTrack(frame_gray, **features_params)
+        else:
+            movement = [0, 0]
+        movements.append(movement)
+        old_gray = frame_gray
+    return np.array(movements, dtype=np.float64)
+
+def test_ransac_camera_movement():
+    """Test chuyển động camera theo số đông các điểm (RANSAC) thay vì điểm di chuyển nhiều nhất, có tỉ lệ inlier và ít lần xác định lại điểm"""
+
+    print("Testing CameraMovementEstimator RANSAC...")
+    print("=" * 60)
+
+    frames, bboxes = _make_video()
+    expected = np.array([[0.0, 0.0]] + [[3.0, 1.0]] * (len(frames) - 1))
+
+    for motion_model in CameraMovementEstimator.MOTION_MODELS:
+        estimator = CameraMovementEstimator(frames[0], motion_model=motion_model)
+        tracks = {'players': [{player: {'bbox': bbox} for player, bbox in enumerate(frame_bboxes)} for frame_bboxes in bboxes]}
+        movement = np.array(estimator.get_camera_movement(frames, tracks=tracks))
+        stats = estimator.stats()
+        print(f"\n{motion_model}: max error {np.abs(movement - expected).max():.3f} px, stats {stats}")
+        assert np.abs(movement - expected).max() < 0.3, f"❌ Chuyển động camera sai ({motion_model})"
+        assert stats['frames'] == len(frames) and stats['mean_inlier_ratio'] > 0.8
+        assert stats['redetections'] < len(frames) // 4, "❌ Chỉ xác định lại điểm đặc trưng khi cần"
+
+    old = _max_displacement_movement(frames, dict(estimator.features, mask=estimator.mask_features), estimator.lk_params)
+    print(f"Max error of largest displacement: {np.abs(old - expected).max():.3f} px")
+    assert np.abs(old - expected).max() > 3, "❌ Điểm trên cầu thủ phải làm hỏng cách cũ"
+
+    # chuyển động cộng dồn: điểm đứng yên trên sân có cùng position_adjusted ở mọi khung hình
+    static = [{1: {'position': (300 - 3 * frame_num, 200 - frame_num)}} for frame_num in range(len(frames))]
+    estimator.add_adjust_positions_to_tracks({'ball': static}, movement, accumulate=True)
+    adjusted = np.array([frame[1]['position_adjusted'] for frame in static])
+    assert np.abs(adjusted - [300, 200]).max() < 2, "❌ Vị trí điều chỉnh theo chuyển động cộng dồn phải đứng yên"
+
+    print("\n" + "=" * 60)
+    print("✓ CameraMovementEstimator RANSAC test passed!")
+
+def test_feature_mask():
+    """Test mặt nạ điểm đặc trưng tạo theo kích thước khung hình và bỏ bbox các đối tượng"""
+
+    print("Testing CameraMovementEstimator feature mask...")
+    print("=" * 60)
+
+    frames, bboxes = _make_video(num_frames=1)
+    estimator = CameraMovementEstimator(frames[0])
+    assert estimator.mask_features.shape == FRAME_SIZE and estimator.border == 7
+    features = estimator.detect_features(cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY), bboxes[0]).reshape(-1, 2)
+    for x1, y1, x2, y2 in bboxes[0]:
+        inside = (features[:, 0] >= x1) & (features[:, 0] <= x2) & (features[:, 1] >= y1) & (features[:, 1] <= y2)
+        assert not inside.any(), "❌ Không được lấy điểm đặc trưng trên cầu thủ"
+    assert len(features) > 50
+
+    with pytest.raises(ValueError):
+        CameraMovementEstimator(frames[0], motion_model='translation')
+
+    print("\n" + "=" * 60)
+    print("✓ CameraMovementEstimator feature mask test passed!")
+
+if __name__ == "__main__":
+    test_ransac_camera_movement()
+    test_feature_mask()
@@ -0,0 +1,124 @@
+"""
+Test script để kiểm tra chế độ keyframe: chỉ chạy YOLO ở khung hình chính, bbox ở các khung hình giữa được dịch chuyển bằng optical flow
+"""
+
+from unittest import mock
+import numpy as np
+import cv2
+from trackers import Tracker
+from trackers.keyframe_propagator import KeyframePropagator
+from trackers.batch_inference import BatchInferenceEngine
+
+NAMES = {0: 'ball', 1: 'goalkeeper', 2: 'player', 3: 'referee'}
+
+def _make_video(num_frames, camera_shift_at=None):
+    # nền có vân để optical flow bám được, 3 cầu thủ (mảng vân riêng) chạy với vận tốc khác nhau
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (360, 800, 3), dtype=np.uint8), (5, 5), 0)
+    patches = [cv2.GaussianBlur(rng.integers(0, 255, (90, 40, 3), dtype=np.uint8), (3, 3), 0) for _ in range(3)]
+    velocities = [(3, 0), (-2, 1), (1, -2)]
+    frames, boxes = [], []
+    for frame_num in range(num_frames):
+        offset = 60 if camera_shift_at is not None and frame_num >= camera_shift_at else 0 # camera lia đột ngột
+        frame = np.roll(background, offset, axis=1).copy()
+        frame_boxes = []
+        for index, (patch, (vx, vy)) in enumerate(zip(patches, velocities)):
+            x, y = 150 + index * 200 + vx * frame_num + offset, 120 + vy * frame_num
+            frame[y:y + 90, x:x + 40] = patch
+            frame_boxes.append([x, y, x + 40, y + 90])
+        frames.append(frame)
+        boxes.append(np.array(frame_boxes, dtype=float))
+    return frames, boxes
+
+class _Array:
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float32)
+    def cpu(self):
+        return self
+    def numpy(self):
+        return self.values
+
+class _Detection:
+    # kết quả giống ultralytics: names, boxes.xyxy, boxes.conf, boxes.cls
+    def __init__(self, boxes):
+        self.names = NAMES
+        self.boxes = mock.Mock(xyxy=_Array(boxes), conf=_Array(np.full(len(boxes), 0.9)), cls=_Array(np.full(len(boxes), 2)))
+
+class _FakeModel:
+    # mô hình giả: trả về bbox thật của khung hình, ghi lại các khung hình đã chạy YOLO
+    def __init__(self, frames, boxes):
+        self.lookup = {frame.tobytes(): frame_boxes for frame, frame_boxes in zip(frames, boxes)}
+        self.calls = 0
+    def predict(self, frames, **kwargs):
+        self.calls += len(frames)
+        return [_Detection(self.lookup[frame.tobytes()]) for frame in frames]
+
+def _make_tracker(frames, boxes, **keyframe_options):
+    model = _FakeModel(frames, boxes)
+    with mock.patch('trackers.tracker.load_detection_model', return_value=(model, 'torch')):
+        tracker = Tracker('models/best.pt', **keyframe_options)
+    tracker.inference_engine = BatchInferenceEngine(model, batch_size=8, adaptive=False, prepare_inputs=False) # mô hình giả nhận khung hình gốc
+    return tracker, model
+
+def test_flow_propagation():
+    """Test optical flow dịch chuyển bbox đúng vị trí thật sau nhiều khung hình liên tiếp không chạy YOLO"""
+
+    print("Testing KeyframePropagator...")
+    print("=" * 60)
+
+    frames, boxes = _make_video(10)
+    for propagation in ('flow', 'motion'):
+        propagator = KeyframePropagator(keyframe_interval=10, propagation=propagation)
+        assert propagator.update(frames[0]), "❌ Khung hình đầu tiên phải chạy YOLO"
+        propagator.observe([1, 2, 3], boxes[0], [2, 2, 2])
+        propagator.update(frames[1])
+        propagator.observe([1, 2, 3], boxes[1], [2, 2, 2]) # khung hình chính thứ hai để chế độ motion có vận tốc
+        for frame_num in range(2, 10):
+            assert not propagator.update(frames[frame_num]), "❌ Không có ngưỡng thì không được chạy YOLO ngoài lịch"
+            propagator.observe(propagator.track_ids, propagator.propagated, propagator.class_ids, keyframe=False)
+        error = np.abs(propagator.boxes - boxes[9]).max()
+        print(f"{propagation}: max error after 8 propagated frames = {error:.2f} px")
+        assert error < 3, f"❌ Bbox dịch chuyển bằng {propagation} lệch quá xa"
+
+    # camera lia đột ngột thì phải chạy YOLO ngay
+    frames, boxes = _make_video(6, camera_shift_at=4)
+    propagator = KeyframePropagator(keyframe_interval=100, max_camera_motion=20)
+    triggered = []
+    for frame_num, frame in enumerate(frames):
+        if propagator.update(frame):
+            triggered.append(frame_num)
+        propagator.observe([1, 2, 3], boxes[frame_num], [2, 2, 2])
+    print(f"Adaptive keyframes (camera): {triggered}")
+    assert triggered == [0, 4], "❌ Chuyển động camera lớn phải tạo khung hình chính"
+
+    print("\n" + "=" * 60)
+    print("✓ KeyframePropagator test passed!")
+
+def test_tracker_keyframes():
+    """Test Tracker.iter_frame_tracks chỉ chạy YOLO ở khung hình chính mà id và bbox vẫn giống khi chạy mọi khung hình"""
+
+    print("Testing Tracker keyframe mode...")
+    print("=" * 60)
+
+    frames, boxes = _make_video(30)
+    tracker, model = _make_tracker(frames, boxes)
+    reference = [frame_tracks['players'] for _, _, frame_tracks in tracker.iter_frame_tracks(frames)]
+    assert model.calls == 30, "❌ keyframe_interval=1 phải chạy YOLO mọi khung hình"
+
+    tracker, model = _make_tracker(frames, boxes, keyframe_interval=5)
+    results = [frame_tracks['players'] for _, _, frame_tracks in tracker.iter_frame_tracks(frames)]
+    print(f"Detection calls: {model.calls}/30, stats: {tracker.keyframe_propagator.stats()}")
+    assert model.calls == 6, "❌ keyframe_interval=5 phải chạy YOLO ở 6/30 khung hình"
+
+    for frame_num, (expected, players) in enumerate(zip(reference, results)):
+        assert set(players) == set(expected), f"❌ Id ở khung hình {frame_num} bị thay đổi"
+        for track_id in players:
+            error = np.abs(np.array(players[track_id]['bbox']) - expected[track_id]['bbox']).max()
+            assert error < 3, f"❌ Bbox của id {track_id} ở khung hình {frame_num} lệch {error:.1f} px"
+
+    print("\n" + "=" * 60)
+    print("✓ Tracker keyframe test passed!")
+
+if __name__ == "__main__":
+    test_flow_propagation()
+    test_tracker_keyframes()
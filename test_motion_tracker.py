@@ -0,0 +1,89 @@
+"""
+Test script để kiểm tra MotionTracker (gán id bằng IoU + Hungarian + Kalman) và các tracker backend khác
+"""
+
+import numpy as np
+import cv2
+from trackers.motion_tracker import MotionTracker
+from trackers.tracker_backends import TRACKER_BACKENDS, create_tracker_backend
+
+PLAYER, REFEREE = 2, 3
+
+def _box(x, y, w=40, h=90):
+    return [x, y, x + w, y + h]
+
+def test_motion_tracker():
+    """Test id ổn định khi cầu thủ di chuyển, bị mất dấu vài khung hình và đi sát nhau"""
+
+    print("Testing MotionTracker...")
+    print("=" * 60)
+
+    tracker = MotionTracker(max_lost=5)
+    history = {0: [], 1: [], 2: []}
+
+    for frame_num in range(40):
+        boxes, class_ids, owners = [], [], []
+        # cầu thủ 0 chạy sang phải nhanh (8 px/khung hình), cầu thủ 1 chạy sang trái, hai người đi ngang qua nhau
+        boxes.append(_box(100 + frame_num * 8, 300)); class_ids.append(PLAYER); owners.append(0)
+        boxes.append(_box(500 - frame_num * 4, 330)); class_ids.append(PLAYER); owners.append(1)
+        # trọng tài đứng gần cầu thủ 1 nhưng khác lớp nên không được ghép nhầm
+        if not 10 <= frame_num < 13: # mất dấu 3 khung hình, vẫn phải giữ id
+            boxes.append(_box(505 - frame_num * 4, 332)); class_ids.append(REFEREE); owners.append(2)
+
+        # đảo thứ tự phát hiện để kiểm tra id không phụ thuộc vào thứ tự
+        order = np.random.default_rng(frame_num).permutation(len(boxes))
+        track_ids = tracker.update(np.array(boxes)[order], np.array(class_ids)[order])
+        assert len(set(track_ids)) == len(track_ids), "❌ Hai phát hiện bị gán cùng một id"
+        for detection_index, track_id in zip(order, track_ids):
+            history[owners[detection_index]].append(track_id)
+
+    for owner, ids in history.items():
+        print(f"Object {owner}: ids {sorted(set(ids))}")
+        assert len(set(ids)) == 1, f"❌ Đối tượng {owner} bị đổi id"
+
+    # mất dấu lâu hơn max_lost thì track bị xóa, xuất hiện lại sẽ có id mới
+    for _ in range(7):
+        tracker.update(np.zeros((0, 4)), np.zeros(0))
+    assert len(tracker.track_ids) == 0, "❌ Track mất dấu quá max_lost phải bị xóa"
+    new_id = tracker.update(np.array([_box(100, 300)]), np.array([PLAYER]))[0]
+    assert new_id == tracker.next_id - 1 and new_id not in history[0], "❌ Track mới phải có id mới"
+
+    print("\n" + "=" * 60)
+    print("✓ MotionTracker test passed!")
+
+def test_tracker_backends():
+    """Test mọi backend giữ id ổn định, không trùng id giữa các lớp và bỏ qua phát hiện có độ tin cậy thấp"""
+
+    print("Testing tracker backends...")
+    print("=" * 60)
+
+    background = np.random.default_rng(0).integers(0, 255, (240, 480, 3), dtype=np.uint8)
+    for name in TRACKER_BACKENDS:
+        backend = create_tracker_backend(name)
+        player_ids, referee_ids = set(), set()
+        for frame_num in range(15):
+            player_box = _box(50 + frame_num * 3, 60)
+            referee_box = _box(300, 80)
+            # csrt cần khung hình thật, vẽ các đối tượng lên nền ngẫu nhiên
+            frame = background.copy()
+            cv2.rectangle(frame, (int(player_box[0]), 60), (int(player_box[2]), 150), (0, 0, 255), -1)
+            cv2.rectangle(frame, (300, 80), (340, 170), (0, 255, 255), -1)
+
+            confidences = [0.9, 0.9, 0.3] if frame_num % 5 == 0 else [0.9, 0.9]
+            boxes = [player_box, referee_box, _box(400, 100)][:len(confidences)]
+            track_ids = backend.track(frame, np.array(boxes, dtype=float), np.array(confidences), np.array([PLAYER, REFEREE, PLAYER][:len(confidences)]))
+            player_ids.add(track_ids[0])
+            referee_ids.add(track_ids[1])
+            if len(track_ids) == 3:
+                assert track_ids[2] == -1, f"❌ {name}: phát hiện độ tin cậy thấp không được tạo track mới"
+
+        print(f"{name}: player ids {player_ids}, referee ids {referee_ids}")
+        assert len(player_ids) == 1 and len(referee_ids) == 1, f"❌ {name}: id bị đổi"
+        assert player_ids != referee_ids, f"❌ {name}: trùng id giữa các lớp"
+
+    print("\n" + "=" * 60)
+    print("✓ Tracker backends test passed!")
+
+if __name__ == "__main__":
+    test_motion_tracker()
+    test_tracker_backends()
@@ -0,0 +1,96 @@
+"""
+Test script để kiểm tra OverlayCompositor: lớp HUD vẽ sẵn một lần, trộn chỉ trên vùng ROI cho kết quả như vẽ lại cả khung hình
+"""
+
+import cv2
+import numpy as np
+from utils import OverlayCompositor
+from player_stats_analyzer import PlayerStatsAnalyzer
+from camera_movement_estimator import CameraMovementEstimator
+from trackers.tracker import Tracker
+
+def _make_frames(num_frames=3, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8) for _ in range(num_frames)]
+
+def _old_team_ball_control_background(frame):
+    # cách cũ: copy cả khung hình rồi addWeighted trên cả khung hình
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (1350, 850), (1900, 970), (255, 255, 255), -1)
+    cv2.addWeighted(overlay, 0.4, frame, 0.6, 0, frame)
+    return frame
+
+def test_overlay_matches_full_frame_drawing():
+    """Test lớp trộn trên ROI giống vẽ trên cả khung hình (sai khác làm tròn), chỉ vẽ lớp một lần, ngoài ROI giữ nguyên"""
+
+    print("Testing OverlayCompositor...")
+    print("=" * 60)
+
+    frames = _make_frames()
+    compositor = OverlayCompositor()
+    calls = []
+    def draw(canvas, dx, dy):
+        calls.append((dx, dy))
+        return Tracker.draw_team_ball_control_background(canvas, dx, dy)
+
+    for frame in frames:
+        expected = _old_team_ball_control_background(frame.copy())
+        result = compositor.compose(frame.copy(), 'team_ball_control', (1350, 850, 1901, 971), draw)
+        difference = np.abs(result.astype(int) - expected.astype(int))
+        assert difference.max() <= 1, f"❌ Sai khác {difference.max()} mức so với cách cũ"
+        outside = np.ones(frame.shape[:2], dtype=bool)
+        outside[850:971, 1350:1901] = False
+        assert np.array_equal(result[outside], frame[outside]), "❌ Không được thay đổi pixel ngoài ROI"
+    assert calls == [(-1350, -850)] * 2, "❌ Lớp tĩnh chỉ được vẽ một lần (lên nền đen và nền trắng)"
+
+    # bảng thống kê (nhiều lần addWeighted, chữ, hình tròn) vẽ sẵn giống vẽ trực tiếp
+    analyzer = PlayerStatsAnalyzer()
+    analyzer.player_stats = {player_id: {'team_color': (200, 30 * player_id, 10), 'ball_touches': player_id, 'possession_percentage': 10.0 * player_id,
+                                         'total_distance': 50.0 + player_id, 'average_speed': 5.0 + player_id} for player_id in range(1, 8)}
+    position = (10, frames[0].shape[0] - 270)
+    for frame in frames:
+        expected = analyzer.draw_stats_table(frame.copy(), position, max_players=5)
+        result = analyzer.draw_stats_on_frame(frame.copy(), position=position, max_players=5)
+        difference = np.abs(result.astype(int) - expected.astype(int))
+        print(f"Player stats max difference: {difference.max()}")
+        assert difference.max() <= 2, f"❌ Bảng thống kê sai khác {difference.max()} mức"
+    assert len(analyzer.overlay_compositor.layers) == 1
+
+    # nền thông tin chuyển động camera vẫn trả về bản sao như trước
+    estimator = CameraMovementEstimator(frames[0])
+    outputs = estimator.draw_camera_movement(frames, [[1.5, -2.0]] * len(frames))
+    assert all(output is not frame for output, frame in zip(outputs, frames)), "❌ draw_camera_movement phải trả về bản sao"
+    assert np.abs(outputs[0][150:].astype(int) - frames[0][150:].astype(int)).max() == 0
+
+    print("\n" + "=" * 60)
+    print("✓ OverlayCompositor test passed!")
+
+def test_overlay_clipped_at_frame_edge():
+    """Test ROI vượt ra ngoài khung hình chỉ trộn phần nằm trong khung hình"""
+
+    print("Testing OverlayCompositor clipping...")
+    print("=" * 60)
+
+    frame = _make_frames(num_frames=1)[0][:200, :300].copy()
+    compositor = OverlayCompositor()
+    def draw(canvas, dx, dy):
+        overlay = canvas.copy()
+        cv2.rectangle(overlay, (250 + dx, -20 + dy), (349 + dx, 49 + dy), (0, 0, 255), -1)
+        return cv2.addWeighted(overlay, 0.5, canvas, 0.5, 0)
+
+    expected = frame.copy()
+    overlay = expected.copy()
+    cv2.rectangle(overlay, (250, -20), (349, 49), (0, 0, 255), -1)
+    expected = cv2.addWeighted(overlay, 0.5, expected, 0.5, 0)
+    result = compositor.compose(frame.copy(), 'edge', (250, -20, 350, 50), draw)
+    assert np.abs(result.astype(int) - expected.astype(int)).max() <= 1, "❌ Phần ROI trong khung hình phải giống vẽ trực tiếp"
+
+    untouched = compositor.compose(frame.copy(), 'outside', (400, 300, 450, 350), draw)
+    assert np.array_equal(untouched, frame), "❌ ROI nằm ngoài khung hình thì giữ nguyên khung hình"
+
+    print("\n" + "=" * 60)
+    print("✓ OverlayCompositor clipping test passed!")
+
+if __name__ == "__main__":
+    test_overlay_matches_full_frame_drawing()
+    test_overlay_clipped_at_frame_edge()
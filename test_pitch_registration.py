@@ -0,0 +1,178 @@
+"""
+Test script để kiểm tra PitchRegistration (homography cho từng khung hình từ đường kẻ sân khi camera lia và zoom)
+"""
+
+import os
+import tempfile
+import numpy as np
+import cv2
+import pytest
+from utils import StageCache
+from view_transformer import ViewTransformer, PitchRegistration, PITCH_KEYPOINTS
+from view_transformer.pitch_registration import PITCH_LINES, sample_pitch_lines_of, project_points
+
+PIXELS_PER_METER = 20
+TEST_POINTS = np.array([[300, 400], [640, 360], [1000, 600], [500, 650]], dtype=np.float64) # các điểm trên mặt sân trong ảnh 1280x720
+
+def _pitch_to_image():
+    # camera nhìn nửa trái của sân từ khán đài (sân -> ảnh)
+    pitch = np.float32([[20, 0], [85, 0], [95, 68], [10, 68]])
+    image = np.float32([[150, 150], [1130, 150], [1500, 700], [-220, 700]])
+    return cv2.getPerspectiveTransform(pitch, image)
+
+def _make_video(num_frames, pan=8, zoom=0.004):
+    # vẽ sân nhìn từ trên xuống (cỏ kẻ sọc, nhiễu, đường kẻ trắng) rồi chiếu lên ảnh, camera lia sang phải và zoom dần
+    rng = np.random.default_rng(1)
+    margin = 10
+    top_down = np.zeros((88 * PIXELS_PER_METER, 125 * PIXELS_PER_METER, 3), dtype=np.uint8)
+    top_down[:] = (40, 120, 50)
+    for x in range(0, top_down.shape[1], 10 * PIXELS_PER_METER):
+        top_down[:, x:x + 5 * PIXELS_PER_METER] = (45, 135, 55)
+    top_down = np.clip(top_down.astype(int) + rng.integers(-25, 25, top_down.shape[:2] + (1,)), 0, 255).astype(np.uint8)
+    for line in PITCH_LINES:
+        points = (sample_pitch_lines_of(line) + margin) * PIXELS_PER_METER
+        cv2.polylines(top_down, [np.round(points).astype(np.int32)], False, (235, 235, 235), 3)
+    top_down_to_pitch = np.array([[1 / PIXELS_PER_METER, 0, -margin], [0, 1 / PIXELS_PER_METER, -margin], [0, 0, 1]])
+
+    frames, pitch_to_images = [], []
+    for frame_num in range(num_frames):
+        scale = 1 + zoom * frame_num
+        camera = np.array([[scale, 0, (1 - scale) * 640 - pan * frame_num], [0, scale, (1 - scale) * 360], [0, 0, 1]])
+        pitch_to_image = camera @ _pitch_to_image()
+        frames.append(cv2.warpPerspective(top_down, pitch_to_image @ top_down_to_pitch, (1280, 720), borderValue=(60, 60, 60)))
+        pitch_to_images.append(pitch_to_image)
+    return frames, pitch_to_images
+
+def _max_error(homography, pitch_to_image):
+    # sai số lớn nhất (mét) của TEST_POINTS so với homography thật
+    predicted, _ = project_points(homography, TEST_POINTS)
+    expected, _ = project_points(np.linalg.inv(pitch_to_image), TEST_POINTS)
+    return np.abs(predicted - expected).max()
+
+def test_line_registration():
+    """Test homography bám theo camera lia/zoom và được hiệu chỉnh lại từ đường kẻ sân khi ma trận ban đầu bị lệch"""
+
+    print("Testing PitchRegistration...")
+    print("=" * 60)
+
+    frames, pitch_to_images = _make_video(20)
+    # homography ban đầu lệch khoảng 10 pixel ở mỗi góc (giống 4 góc sân nhập tay không chính xác)
+    pitch = np.float32([[20, 0], [85, 0], [95, 68], [10, 68]])
+    image = np.float32([[150, 150], [1130, 150], [1500, 700], [-220, 700]]) + np.float32([[12, -8], [-10, 6], [9, 10], [-14, -6]])
+    initial_homography = np.linalg.inv(cv2.getPerspectiveTransform(pitch, image))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, 'video.avi')
+        with open(video_path, 'wb') as f:
+            f.write(b'fake video') # chỉ dùng để tính khóa cache
+        cache = StageCache(os.path.join(tmp_dir, 'cache'))
+
+        pitch_registration = PitchRegistration(initial_homography=initial_homography, keyframe_interval=5)
+        homographies = pitch_registration.get_homographies(frames, cache=cache, video_path=video_path)
+        stats = pitch_registration.stats()
+        print(f"\nStats: {stats}")
+
+        errors = [_max_error(homography, pitch_to_image) for homography, pitch_to_image in zip(homographies, pitch_to_images)]
+        fixed_errors = [_max_error(initial_homography, pitch_to_image) for pitch_to_image in pitch_to_images]
+        print(f"Max error: registered {max(errors):.3f} m, fixed homography {max(fixed_errors):.3f} m")
+        assert homographies.shape == (20, 3, 3)
+        assert max(errors) < 0.5, "❌ Homography ước lượng lệch quá 0.5m"
+        assert max(fixed_errors) > 5, "❌ Video thử phải có camera di chuyển"
+        assert stats['keyframes'] == 4 and stats['refined'] >= 1, "❌ Phải hiệu chỉnh ở các khung hình chính"
+        assert stats['max_reprojection_error'] < 2, "❌ Sai số chiếu lại sau khi hiệu chỉnh phải nhỏ"
+
+        # lần chạy sau dùng lại kết quả từ cache, stats vẫn giữ nguyên
+        cached = PitchRegistration(initial_homography=initial_homography, keyframe_interval=5)
+        assert np.array_equal(cached.get_homographies(frames, cache=cache, video_path=video_path), homographies)
+        assert cached.stats() == stats, "❌ Stats phải được lưu cùng homography trong cache"
+
+    # ViewTransformer dùng homography của từng khung hình với vị trí trên ảnh
+    view_transformer = ViewTransformer()
+    view_transformer.set_homographies(homographies, position_key='position')
+    tracks = {'players': [{7: {'position': (640, 360), 'position_adjusted': (0.0, 0.0)}} for _ in range(20)]}
+    view_transformer.add_transformed_position_to_tracks(tracks)
+    expected, _ = project_points(np.linalg.inv(pitch_to_images[19]), np.array([[640.0, 360.0]]))
+    assert np.abs(np.subtract(tracks['players'][19][7]['position_transformed'], expected[0])).max() < 0.5, "❌ Phải biến đổi 'position' bằng homography của khung hình"
+
+    print("\n" + "=" * 60)
+    print("✓ PitchRegistration test passed!")
+
+def test_keypoints_and_smoothing():
+    """Test homography từ các điểm đặc trưng của sân (kèm sai số chiếu lại) và làm mượt theo thời gian"""
+
+    print("Testing PitchRegistration keypoints and smoothing...")
+    print("=" * 60)
+
+    pitch_to_image = _pitch_to_image()
+    names = ['corner_top_left', 'halfway_top', 'center_spot', 'left_penalty_top_inner', 'left_penalty_bottom_inner', 'halfway_bottom']
+    pitch_points = np.array([PITCH_KEYPOINTS[name] for name in names], dtype=np.float64)
+    image_points, _ = project_points(pitch_to_image, pitch_points)
+    rng = np.random.default_rng(0)
+    homography, error = PitchRegistration.estimate_from_keypoints(image_points + rng.normal(0, 0.5, image_points.shape), pitch_points)
+    print(f"\nKeypoint reprojection error: {error:.3f} px")
+    assert error < 2 and _max_error(homography, pitch_to_image) < 0.3, "❌ Homography từ điểm đặc trưng không đúng"
+    assert PitchRegistration.estimate_from_keypoints(image_points[:3], pitch_points[:3]) == (None, None), "❌ Cần ít nhất 4 điểm"
+
+    # homography rung quanh giá trị thật, sau khi làm mượt thì rung ít hơn
+    pitch_registration = PitchRegistration(initial_homography=np.eye(3), smoothing_window=9)
+    true_homography = np.linalg.inv(pitch_to_image)
+    noisy = []
+    for _ in range(60):
+        jitter = np.eye(3)
+        jitter[:2, 2] = rng.normal(0, 3, 2) # ảnh rung 3 pixel
+        noisy.append(true_homography @ jitter)
+    smoothed = pitch_registration.smooth_homographies(np.array(noisy), (1280, 720))
+    noisy_error = np.mean([_max_error(homography, pitch_to_image) for homography in noisy])
+    smoothed_error = np.mean([_max_error(homography, pitch_to_image) for homography in smoothed])
+    print(f"Mean error: noisy {noisy_error:.3f} m, smoothed {smoothed_error:.3f} m")
+    assert smoothed_error < noisy_error / 2, "❌ Làm mượt phải giảm rung"
+
+    print("\n" + "=" * 60)
+    print("✓ PitchRegistration keypoint and smoothing test passed!")
+
+def test_global_initialisation_and_fallback():
+    """Test ma trận ban đầu sai xa (ECC không căn cục bộ được) được tìm lại từ các ứng viên, không căn được thì dùng ma trận ban đầu cố định"""
+
+    print("Testing PitchRegistration seed search and fallback...")
+    print("=" * 60)
+
+    # ma trận ban đầu lệch cả zoom và lia ngang (4 góc sân của một góc quay khác), sai hơn 10m
+    frames, pitch_to_images = _make_video(15)
+    camera = np.array([[1.3, 0, (1 - 1.3) * 640 + 250], [0, 1.3, (1 - 1.3) * 360], [0, 0, 1]])
+    seed = np.linalg.inv(camera @ _pitch_to_image())
+    pitch_registration = PitchRegistration(initial_homography=seed, keyframe_interval=5)
+    homographies = pitch_registration.get_homographies(frames)
+    stats = pitch_registration.stats()
+    errors = [_max_error(homography, pitch_to_image) for homography, pitch_to_image in zip(homographies, pitch_to_images)]
+    print(f"\nStats: {stats}")
+    print(f"Max error: seed {_max_error(seed, pitch_to_images[0]):.3f} m, registered {max(errors):.3f} m")
+    assert _max_error(seed, pitch_to_images[0]) > 10
+    assert stats['refined'] >= 1 and stats['fallback_frames'] == 0, "❌ Phải tìm lại được homography từ các ứng viên"
+    assert max(errors) < 0.5, "❌ Homography tìm lại lệch quá 0.5m"
+
+    # không có đường kẻ sân (cận cảnh mặt cỏ, camera lia): không nhân dồn optical flow từ ma trận chưa căn được mà dùng ma trận ban đầu cố định
+    rng = np.random.default_rng(2)
+    grass = np.clip(np.full((720, 1280, 3), (40, 120, 50)) + rng.integers(-25, 25, (720, 1280, 1)), 0, 255).astype(np.uint8)
+    grass_frames = [np.roll(grass, 8 * frame_num, axis=1) for frame_num in range(10)]
+    fallback = PitchRegistration(initial_homography=seed, keyframe_interval=5)
+    homographies = fallback.get_homographies(grass_frames)
+    assert fallback.stats()['refined'] == 0 and fallback.stats()['fallback_frames'] == 10
+    assert np.allclose(homographies, seed / seed[2, 2]), "❌ Không căn được thì phải dùng ma trận ban đầu"
+
+    # khởi tạo toàn cục từ các điểm đặc trưng nhập tay
+    names = ['corner_top_left', 'halfway_top', 'center_spot', 'left_penalty_bottom_inner']
+    image_points, _ = project_points(_pitch_to_image(), np.array([PITCH_KEYPOINTS[name] for name in names], dtype=np.float64))
+    from_keypoints = PitchRegistration.from_keypoints(dict(zip(names, image_points.tolist())), keyframe_interval=5)
+    assert _max_error(from_keypoints.initial_homography, pitch_to_images[0]) < 0.01 and from_keypoints.keyframe_interval == 5
+    with pytest.raises(ValueError):
+        PitchRegistration.from_keypoints({'corner_top_left': (0, 0), 'goal_post': (1, 1)})
+    with pytest.raises(ValueError):
+        PitchRegistration.from_keypoints(dict(zip(names[:3], image_points[:3].tolist())))
+
+    print("\n" + "=" * 60)
+    print("✓ PitchRegistration seed search and fallback test passed!")
+
+if __name__ == "__main__":
+    test_line_registration()
+    test_keypoints_and_smoothing()
+    test_global_initialisation_and_fallback()
@@ -0,0 +1,129 @@
+"""
+Test script để kiểm tra PlayerBallAssigner gán bóng cho cả video cùng lúc và hysteresis giữa hai cầu thủ đứng gần nhau
+"""
+
+import copy
+import numpy as np
+from player_ball_assigner import PlayerBallAssigner
+from track_store import TrackStore
+from utils import get_center_of_bbox, measure_distance
+
+def _make_tracks(num_frames=300):
+    # cầu thủ đứng ngẫu nhiên quanh bóng, có khung hình mất bóng, mất cầu thủ và khung hình không có cầu thủ nào
+    rng = np.random.default_rng(0)
+    tracks = {"players": [], "referees": [], "ball": []}
+    for frame_num in range(num_frames):
+        ball_x, ball_y = 400 + frame_num, 500 + 50 * np.sin(frame_num / 20)
+        players = {}
+        if frame_num % 97 != 50:
+            for track_id in range(1, 11):
+                if (frame_num * track_id) % 13 == 5:
+                    continue
+                x, y = ball_x + rng.uniform(-120, 120), ball_y + rng.uniform(-80, 40)
+                players[track_id] = {"bbox": [x, y, x + 30, y + 80], "team": 1 if track_id <= 5 else 2}
+        tracks["players"].append(players)
+        tracks["referees"].append({})
+        tracks["ball"].append({} if frame_num % 17 == 3 else {1: {"bbox": [ball_x - 6, ball_y - 6, ball_x + 6, ball_y + 6]}})
+    return tracks
+
+def _assign_frame_by_frame(tracks):
+    # cách cũ: vòng lặp qua từng cầu thủ trong từng khung hình, không có hysteresis
+    team_ball_control = []
+    for frame_num, players in enumerate(tracks['players']):
+        assigned_player, minimum_distance = -1, 99999
+        if 1 in tracks['ball'][frame_num]:
+            ball_position = get_center_of_bbox(tracks['ball'][frame_num][1]['bbox'])
+            for player_id, player in players.items():
+                bbox = player['bbox']
+                distance = min(measure_distance((bbox[0], bbox[-1]), ball_position), measure_distance((bbox[2], bbox[-1]), ball_position))
+                if distance < 70 and distance < minimum_distance:
+                    minimum_distance, assigned_player = distance, player_id
+        if assigned_player != -1:
+            players[assigned_player]['has_ball'] = True
+            team_ball_control.append(players[assigned_player]['team'])
+        else:
+            team_ball_control.append(team_ball_control[-1] if len(team_ball_control) > 0 else 0)
+    return np.array(team_ball_control)
+
+def _has_ball(players):
+    return [sorted(player_id for player_id, player in frame.items() if player.get('has_ball')) for frame in players]
+
+def test_vectorized_ball_possession():
+    """Test không có hysteresis thì giống hệt vòng lặp cũ, với tracks dạng dictionary và dạng cột, streaming giống cả video"""
+
+    print("Testing PlayerBallAssigner vectorized...")
+    print("=" * 60)
+
+    tracks = _make_tracks()
+    expected = copy.deepcopy(tracks)
+    expected_control = _assign_frame_by_frame(expected)
+
+    result = copy.deepcopy(tracks)
+    team_ball_control = PlayerBallAssigner(switch_margin=0, min_switch_frames=1).assign_ball_possession(result)
+    assert np.array_equal(team_ball_control, expected_control), "❌ team_ball_control khác cách cũ"
+    assert _has_ball(result['players']) == _has_ball(expected['players']), "❌ has_ball khác cách cũ"
+    assert len(set(team_ball_control.tolist())) == 2
+
+    store = TrackStore.from_dict(tracks)
+    assert np.array_equal(PlayerBallAssigner(switch_margin=0, min_switch_frames=1).assign_ball_possession(store), expected_control)
+    assert _has_ball(store['players']) == _has_ball(expected['players']), "❌ has_ball trên tracks dạng cột khác tracks dạng dictionary"
+
+    # streaming (từng khung hình) giống cả video, kể cả khi có hysteresis
+    for switch_margin, min_switch_frames in ((0, 1), (5, 3)):
+        batch = copy.deepcopy(tracks)
+        PlayerBallAssigner(switch_margin, min_switch_frames).assign_ball_possession(batch)
+        assigner = PlayerBallAssigner(switch_margin, min_switch_frames)
+        streaming = copy.deepcopy(tracks)
+        for frame_num, players in enumerate(streaming['players']):
+            ball = streaming['ball'][frame_num].get(1)
+            assigned_player = assigner.assign_possession_to_frame(players, None if ball is None else ball['bbox'])
+            if assigned_player != -1:
+                players[assigned_player]['has_ball'] = True
+        assert _has_ball(streaming['players']) == _has_ball(batch['players']), "❌ Streaming khác cả video"
+
+    # không có dòng players nào (chỉ có bóng hoặc tracks rỗng): không ai có bóng, giống cách gán từng khung hình
+    for players in ([{}, {}], []):
+        only_ball = {'players': players, 'ball': [{1: {'bbox': [0, 0, 4, 4]}}, {}][:len(players)]}
+        assert np.array_equal(PlayerBallAssigner().assign_ball_possession(only_ball), np.zeros(len(players), dtype=np.int64))
+        assert np.array_equal(PlayerBallAssigner().assign_ball_possession(TrackStore.from_dict(copy.deepcopy(only_ball))), np.zeros(len(players), dtype=np.int64))
+    assert PlayerBallAssigner().assign_possession_to_frame({}, [0, 0, 4, 4]) == -1
+
+    print("\n" + "=" * 60)
+    print("✓ PlayerBallAssigner vectorized test passed!")
+
+def test_possession_hysteresis():
+    """Test bóng không nhảy qua lại giữa hai cầu thủ đứng gần nhau, cầu thủ ra khỏi phạm vi thì mất bóng ngay"""
+
+    print("Testing PlayerBallAssigner hysteresis...")
+    print("=" * 60)
+
+    # cầu thủ 1 (đội 1) và 2 (đội 2) đứng hai bên bóng, khoảng cách chênh nhau vài pixel ngẫu nhiên,
+    # từ khung hình 60 cầu thủ 2 dẫn bóng đi rõ ràng, từ khung hình 90 cầu thủ 2 chạy ra xa
+    rng = np.random.default_rng(1)
+    tracks = {"players": [], "ball": []}
+    for frame_num in range(120):
+        offset = 3 + rng.uniform(-2.5, 2.5, 2)
+        if frame_num >= 60:
+            offset = np.array([40.0, 2.0])
+        player_2_x = 500 + offset[1] if frame_num < 90 else 900
+        tracks["players"].append({1: {"bbox": [470 - offset[0], 420, 500 - offset[0], 500], "team": 1},
+                                  2: {"bbox": [player_2_x, 420, player_2_x + 30, 500], "team": 2}})
+        tracks["ball"].append({1: {"bbox": [494, 494, 506, 506]}})
+
+    old = copy.deepcopy(tracks)
+    old_control = _assign_frame_by_frame(old)
+    team_ball_control = PlayerBallAssigner().assign_ball_possession(tracks)
+    switches = lambda control: int((np.diff(control) != 0).sum())
+    print(f"\nPossession switches: frame by frame {switches(old_control)}, hysteresis {switches(team_ball_control)}")
+    assert switches(old_control[:60]) > 10
+    assert switches(team_ball_control[:60]) <= 1, "❌ Bóng vẫn nhảy qua lại giữa hai cầu thủ"
+    assert (team_ball_control[63:90] == 2).all(), "❌ Cầu thủ gần hơn rõ ràng phải có bóng"
+    assert (team_ball_control[90:] == 1).all(), "❌ Cầu thủ ra khỏi phạm vi phải mất bóng ngay"
+    assert all(sum(player.get('has_ball', False) for player in frame.values()) == 1 for frame in tracks['players'])
+
+    print("\n" + "=" * 60)
+    print("✓ PlayerBallAssigner hysteresis test passed!")
+
+if __name__ == "__main__":
+    test_vectorized_ball_possession()
+    test_possession_hysteresis()
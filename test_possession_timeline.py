@@ -0,0 +1,98 @@
+"""
+Test script để kiểm tra PossessionTimeline: tỉ lệ kiểm soát bóng từ tổng tiền tố, cửa sổ 1/5/15 phút và không chia cho 0
+"""
+
+import numpy as np
+from player_ball_assigner import PossessionTimeline
+from case_studies import TeamComparisonAnalyzer
+from analytics import ReportGenerator
+from trackers.tracker import Tracker
+from utils import OverlayCompositor
+
+def _make_team_ball_control(num_frames=3000, seed=0):
+    # chưa đội nào có bóng ở đầu video, sau đó các đoạn kiểm soát bóng dài ngắn khác nhau
+    rng = np.random.default_rng(seed)
+    team_ball_control = np.repeat(rng.integers(1, 3, num_frames // 20), 20)[:num_frames]
+    team_ball_control[:37] = 0
+    return team_ball_control
+
+def _naive_possession(team_ball_control, frame_num, window=None):
+    # cách cũ: cắt mảng tới frame_num rồi đếm
+    start = 0 if window is None else max(frame_num + 1 - window, 0)
+    till_frame = team_ball_control[start:frame_num + 1]
+    team_1, team_2 = (till_frame == 1).sum(), (till_frame == 2).sum()
+    total = team_1 + team_2
+    return {1: 100.0 * team_1 / total if total else 0.0, 2: 100.0 * team_2 / total if total else 0.0}
+
+def test_possession_timeline():
+    """Test tỉ lệ kiểm soát bóng giống cách đếm cũ ở mọi khung hình, append giống extend, cửa sổ theo phút"""
+
+    print("Testing PossessionTimeline...")
+    print("=" * 60)
+
+    team_ball_control = _make_team_ball_control()
+    timeline = PossessionTimeline(team_ball_control, frame_rate=24, capacity=16)
+    streaming = PossessionTimeline(capacity=4)
+    for team in team_ball_control:
+        streaming.append(team)
+    assert len(timeline) == len(streaming) == len(team_ball_control)
+    assert np.array_equal(timeline.prefix[:len(timeline) + 1], streaming.prefix[:len(streaming) + 1]), "❌ append và extend phải giống nhau"
+
+    for frame_num in range(0, len(team_ball_control), 97):
+        for window in (None, 24, 1440):
+            possession = timeline.get_possession(frame_num, window)
+            expected = _naive_possession(team_ball_control, frame_num, window)
+            assert all(abs(possession[team] - expected[team]) < 1e-9 for team in (1, 2)), f"❌ Sai ở khung hình {frame_num}, window {window}"
+
+    # chưa đội nào có bóng: 0% thay vì chia cho 0
+    assert timeline.get_possession(10) == {1: 0.0, 2: 0.0}
+    assert PossessionTimeline().get_possession() == {1: 0.0, 2: 0.0}
+
+    series = timeline.get_possession_series(window=1440)
+    assert series.shape == (len(team_ball_control), 2)
+    assert np.allclose(series[-1], list(timeline.get_possession(window=1440).values()))
+    assert np.allclose(series[36], 0.0)
+
+    rolling = timeline.get_rolling_possession()
+    assert set(rolling) == {1, 5, 15}
+    assert rolling[1] == timeline.get_possession(window=1440), "❌ 1 phút = 60 * frame_rate khung hình"
+    assert rolling[15] == timeline.get_possession(), "❌ Cửa sổ dài hơn trận đấu là cả trận"
+
+    print("\n" + "=" * 60)
+    print("✓ PossessionTimeline test passed!")
+
+def test_possession_timeline_consumers():
+    """Test TeamComparisonAnalyzer, report và bảng kiểm soát bóng trên video dùng PossessionTimeline"""
+
+    print("Testing PossessionTimeline consumers...")
+    print("=" * 60)
+
+    team_ball_control = _make_team_ball_control(num_frames=200)
+    tracks = {'players': [{1: {'team': 1}, 2: {'team': 2}} for _ in range(180)]}
+    analyzer = TeamComparisonAnalyzer()
+    team_stats = analyzer.analyze_teams(tracks, team_ball_control)
+    for team in (1, 2):
+        expected = int((team_ball_control[:180] == team).sum())
+        assert team_stats[team]['ball_control_frames'] == expected, "❌ Số khung hình kiểm soát bóng sai"
+        assert abs(team_stats[team]['possession_percentage'] - 100.0 * expected / 180) < 1e-9
+    assert analyzer.rolling_possession[1] == analyzer.possession_timeline.get_possession(179, window=1440)
+
+    html = ReportGenerator.__new__(ReportGenerator)._generate_team_comparison_section(analyzer)
+    assert 'Possession Timeline' in html and 'Last 5 min' in html
+
+    # khung hình đầu tiên chưa đội nào có bóng: không lỗi chia cho 0
+    tracker = Tracker.__new__(Tracker) # chỉ cần hàm vẽ, không nạp mô hình
+    tracker.overlay_compositor = OverlayCompositor()
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    with_array = tracker.draw_team_ball_control(frame.copy(), 0, team_ball_control)
+    with_timeline = tracker.draw_team_ball_control(frame.copy(), 0, PossessionTimeline(team_ball_control))
+    assert np.array_equal(with_array, with_timeline)
+    later = [tracker.draw_team_ball_control(frame.copy(), 150, value) for value in (team_ball_control, PossessionTimeline(team_ball_control))]
+    assert np.array_equal(*later), "❌ Mảng và PossessionTimeline phải vẽ giống nhau"
+
+    print("\n" + "=" * 60)
+    print("✓ PossessionTimeline consumers test passed!")
+
+if __name__ == "__main__":
+    test_possession_timeline()
+    test_possession_timeline_consumers()
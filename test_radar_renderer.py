@@ -0,0 +1,108 @@
+"""
+Test script để kiểm tra RadarRenderer: sân mini vẽ sẵn một lần, marker cầu thủ và vệt di chuyển giống cách vẽ cũ của render_position_radar_video
+"""
+
+import cv2
+import numpy as np
+from analytics import RadarRenderer
+
+def _old_draw_mini_pitch(frame, team1_positions, team2_positions, width=200, height=130):
+    # cách cũ: vẽ lại cả sân và copy cả khung hình ở mỗi khung hình
+    mini_pitch = np.zeros((height, width, 3), dtype=np.uint8)
+    mini_pitch[:] = (34, 139, 34)
+    cv2.rectangle(mini_pitch, (10, 10), (width-10, height-10), (255, 255, 255), 2)
+    cv2.line(mini_pitch, (width//2, 10), (width//2, height-10), (255, 255, 255), 1)
+    cv2.circle(mini_pitch, (width//2, height//2), 15, (255, 255, 255), 1)
+    cv2.rectangle(mini_pitch, (10, 40), (40, 90), (255, 255, 255), 1)
+    cv2.rectangle(mini_pitch, (width-40, 40), (width-10, 90), (255, 255, 255), 1)
+    for positions, color in ((team1_positions, (0, 0, 255)), (team2_positions, (255, 0, 0))):
+        for x, y in positions:
+            if 0 <= x <= 105 and 0 <= y <= 68:
+                px = int((x / 105) * (width - 20) + 10)
+                py = int((y / 68) * (height - 20) + 10)
+                cv2.circle(mini_pitch, (px, py), 3, color, -1)
+                cv2.circle(mini_pitch, (px, py), 4, (255, 255, 255), 1)
+    y_offset, x_offset = 20, frame.shape[1] - width - 20
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (x_offset-5, y_offset-5), (x_offset+width+5, y_offset+height+5), (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
+    frame[y_offset:y_offset+height, x_offset:x_offset+width] = mini_pitch
+    cv2.rectangle(frame, (x_offset-2, y_offset-2), (x_offset+width+2, y_offset+height+2), (255, 255, 255), 2)
+    cv2.putText(frame, "Tactical View", (x_offset, y_offset-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+    return frame
+
+def _old_draw_position_trails(frame, position_history):
+    for positions in position_history.values():
+        for i in range(len(positions) - 1):
+            thickness = max(1, int(2 * (i + 1) / len(positions)))
+            cv2.line(frame, tuple(map(int, positions[i])), tuple(map(int, positions[i + 1])), (255, 255, 0), thickness)
+    return frame
+
+def test_radar_renderer_matches_old_drawing():
+    """Test radar giống cách vẽ cũ (sai khác làm tròn ở nền trong suốt), cầu thủ chồng nhau và ngoài sân, chỉ vẽ trong ROI"""
+
+    print("Testing RadarRenderer...")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    renderer = RadarRenderer()
+    for frame_num in range(5):
+        frame = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+        team1 = [list(position) for position in rng.uniform(-5, 110, (11, 2)) * [1, 0.65]]
+        team2 = [list(position) for position in rng.uniform(-5, 110, (11, 2)) * [1, 0.65]]
+        team2.append(list(team1[0])) # hai cầu thủ cùng vị trí: đội 2 vẽ đè đội 1
+        team1.append([105, 68]) # góc sân
+
+        expected = _old_draw_mini_pitch(frame.copy(), team1, team2)
+        result = renderer.draw(frame.copy(), {1: team1, 2: team2})
+        difference = np.abs(result.astype(int) - expected.astype(int))
+        assert difference.max() <= 1, f"❌ Khung hình {frame_num}: sai khác {difference.max()} mức so với cách cũ"
+        x1, y1, x2, y2 = renderer.get_roi(frame.shape)
+        outside = np.ones(frame.shape[:2], dtype=bool)
+        outside[y1:y2, x1:x2] = False
+        assert np.array_equal(result[outside], frame[outside]), "❌ Không được thay đổi pixel ngoài ROI của radar"
+        # marker (không qua trộn nền) phải giống hệt
+        pitch = (slice(20, 150), slice(1920 - 220, 1920 - 20))
+        assert np.array_equal(result[pitch], expected[pitch]), "❌ Sân mini và marker phải giống hệt cách cũ"
+    assert len(renderer.overlay_compositor.layers) == 1, "❌ Sân tĩnh chỉ được vẽ một lần"
+
+    # sân mini thu nhỏ (proxy/draft) và khung hình nhỏ không lỗi
+    small = RadarRenderer(pitch_size=(50, 33))
+    assert small.draw(np.zeros((270, 480, 3), dtype=np.uint8), {1: [[0, 0], [52.5, 34]], 2: []}).shape == (270, 480, 3)
+    assert len(RadarRenderer().project([[-1, 10], [200, 10], [52.5, 34]])) == 1
+
+    print("\n" + "=" * 60)
+    print("✓ RadarRenderer test passed!")
+
+def test_radar_renderer_trails():
+    """Test ring buffer giữ trail_length điểm gần nhất theo đúng thứ tự, vẽ giống list + pop(0)"""
+
+    print("Testing RadarRenderer trails...")
+    print("=" * 60)
+
+    rng = np.random.default_rng(1)
+    renderer = RadarRenderer(trail_length=30, capacity=2)
+    position_history = {}
+    for frame_num in range(75):
+        track_ids = [track_id for track_id in range(1, 9) if track_id > 6 or frame_num % (track_id + 1)]
+        points = [tuple(int(value) for value in rng.integers(0, 1000, 2)) for _ in track_ids]
+        renderer.update_trails(track_ids, points)
+        for track_id, point in zip(track_ids, points):
+            position_history.setdefault(track_id, []).append(point)
+            if len(position_history[track_id]) > 30:
+                position_history[track_id].pop(0)
+
+    for track_id, positions in position_history.items():
+        assert np.array_equal(renderer.get_trail(track_id), np.array(positions)), f"❌ Vệt di chuyển của track {track_id} sai"
+    assert len(renderer.get_trail(99)) == 0
+
+    frame = np.zeros((1000, 1000, 3), dtype=np.uint8)
+    expected = _old_draw_position_trails(frame.copy(), position_history)
+    assert np.array_equal(renderer.draw_trails(frame.copy()), expected), "❌ Vẽ vệt di chuyển phải giống cách cũ"
+
+    print("\n" + "=" * 60)
+    print("✓ RadarRenderer trails test passed!")
+
+if __name__ == "__main__":
+    test_radar_renderer_matches_old_drawing()
+    test_radar_renderer_trails()
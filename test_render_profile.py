@@ -0,0 +1,81 @@
+"""
+Test script để kiểm tra RenderProfile: video proxy/draft thu nhỏ, bố cục HUD theo góc neo và profile full giữ nguyên kết quả vẽ cũ
+"""
+
+import cv2
+import numpy as np
+import pytest
+from utils import RenderProfile
+from test_annotation_engine import _make_video, _make_tracker, _ListWriter
+from pipeline import AnnotationEngine
+from camera_movement_estimator import CameraMovementEstimator
+from speed_and_distance_estimator import SpeedAndDistance_Estimator
+from player_stats_analyzer import PlayerStatsAnalyzer
+
+def test_render_profile():
+    """Test kích thước đầu ra, tên file, điểm HUD theo góc neo và lỗi với profile/góc neo không hợp lệ"""
+
+    print("Testing RenderProfile...")
+    print("=" * 60)
+
+    full, proxy, draft = RenderProfile(), RenderProfile('proxy'), RenderProfile('draft')
+    assert full.get_output_size(1920, 1080) == (1920, 1080)
+    assert proxy.get_output_size(1920, 1080) == (960, 540)
+    assert draft.get_output_size(1920, 1080) == (480, 270)
+    assert full.get_output_path('output_videos/output_video.avi') == 'output_videos/output_video.avi'
+    assert proxy.get_output_path('output_videos/output_video.avi') == 'output_videos/output_video_proxy.avi'
+
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    assert proxy.resize_frame(frame).shape == (540, 960, 3)
+    resized = full.resize_frame(frame)
+    assert resized.shape == frame.shape and resized is not frame, "❌ Profile full phải copy khung hình"
+
+    # khung hình tham chiếu: điểm không đổi; 720p: khoảng cách tới góc neo nhân với 2/3
+    assert full.get_hud_point((1080, 1920, 3), 'bottom_right', (1350, 850)) == (1350, 850)
+    assert full.get_hud_point((720, 1280, 3), 'bottom_right', (1900, 970)) == (1280 - round(20 * 2 / 3), 720 - round(110 * 2 / 3))
+    assert full.get_hud_point((720, 1280, 3), 'top_left', (10, 30)) == (round(10 * 2 / 3), 20)
+    assert full.get_hud_scale((540, 960, 3)) == 0.5
+    assert proxy.thickness(1) == 1 and proxy.length(10) == 5
+
+    with pytest.raises(ValueError):
+        RenderProfile('preview')
+    with pytest.raises(ValueError):
+        full.get_hud_point(frame.shape, 'center', (0, 0))
+
+    print("\n" + "=" * 60)
+    print("✓ RenderProfile test passed!")
+
+def test_render_profile_proxy_render():
+    """Test video proxy gần giống video full thu nhỏ, profile full giống hệt cách vẽ không có profile"""
+
+    print("Testing proxy render...")
+    print("=" * 60)
+
+    frames, tracks, team_ball_control, camera_movement = _make_video(num_frames=2)
+    frames = [cv2.GaussianBlur(frame, (31, 31), 0) for frame in frames] # nền mịn để so sánh sau khi thu nhỏ
+    stats_analyzer = PlayerStatsAnalyzer()
+    stats_analyzer.calculate_player_stats(tracks, team_ball_control)
+
+    renders = {}
+    for name in ('default', 'full', 'proxy'):
+        profile = None if name == 'default' else RenderProfile(name)
+        engine = AnnotationEngine.from_components(_make_tracker(), CameraMovementEstimator(frames[0]), SpeedAndDistance_Estimator(),
+                                                  stats_analyzer, render_profile=profile)
+        writer = _ListWriter()
+        engine.render(frames, tracks, team_ball_control, camera_movement, writer)
+        renders[name] = writer.frames
+
+    for default, full, proxy in zip(renders['default'], renders['full'], renders['proxy']):
+        assert np.array_equal(default, full), "❌ Profile full phải giống hệt cách vẽ cũ"
+        assert proxy.shape == (540, 960, 3)
+        downscaled = cv2.resize(full, (960, 540), interpolation=cv2.INTER_AREA)
+        diff = np.abs(proxy.astype(np.int16) - downscaled.astype(np.int16)).mean()
+        print(f"Mean abs diff proxy vs downscaled full: {diff:.2f}")
+        assert diff < 8, "❌ Video proxy phải gần giống video full thu nhỏ"
+
+    print("\n" + "=" * 60)
+    print("✓ Proxy render test passed!")
+
+if __name__ == "__main__":
+    test_render_profile()
+    test_render_profile_proxy_render()
@@ -0,0 +1,61 @@
+"""
+Test script để kiểm tra bước ghép kết quả của SegmentParallelPipeline
+"""
+
+from pipeline import SegmentParallelPipeline
+
+def _player_bbox(player_index, frame_num):
+    # mỗi cầu thủ chạy ngang với tốc độ khác nhau, các cầu thủ cách nhau đủ xa để không chồng bbox
+    x = 100 + player_index * 200 + frame_num * (player_index + 1)
+    y = 300 + player_index * 50
+    return [x, y, x + 40, y + 90]
+
+def _run_segment(start, stop, local_ids, camera_offset):
+    # giả lập kết quả process_segment: id cục bộ khác với id chung, khung hình đầu tiên của đoạn có chuyển động (0,0)
+    tracks = {"players":[], "referees":[], "ball":[]}
+    for frame_num in range(start, stop):
+        tracks["players"].append({local_ids[i]: {"bbox": _player_bbox(i, frame_num)} for i in range(3)})
+        tracks["referees"].append({local_ids[3]: {"bbox": [600, 100, 630, 180]}})
+        tracks["ball"].append({1: {"bbox": [frame_num, 385, frame_num + 12, 397]}})
+    camera_movement = [[0, 0]] + [[camera_offset, 0]] * (stop - start - 1)
+    return {'start': start, 'stop': stop, 'tracks': tracks, 'camera_movement': camera_movement}
+
+def test_segment_merge():
+    """Test chia đoạn, so khớp id trên phần chồng lấn và ghép chuyển động camera"""
+
+    print("Testing SegmentParallelPipeline merge...")
+    print("=" * 60)
+
+    pipeline = SegmentParallelPipeline('models/best.pt', num_workers=3, overlap=5)
+    segments = pipeline.split_segments(30)
+    print(f"\nSegments: {segments}")
+    assert segments == [(0, 0, 10), (5, 10, 20), (15, 20, 30)], "❌ Chia đoạn không đúng"
+
+    # mỗi tiến trình đánh id riêng, thứ tự id khác nhau giữa các đoạn
+    local_ids = [[1, 2, 3, 4], [3, 1, 2, 4], [2, 4, 1, 3]]
+    results = [_run_segment(start, stop, ids, segment_index + 1)
+               for segment_index, ((start, _, stop), ids) in enumerate(zip(segments, local_ids))]
+    tracks, camera_movement = pipeline.merge_segments(results, [owned_start for _, owned_start, _ in segments])
+
+    assert len(tracks["players"]) == 30, "❌ Số frame sau khi ghép không đúng"
+    assert len(camera_movement) == 30, "❌ Số frame chuyển động camera không đúng"
+
+    # id của mỗi cầu thủ phải giữ nguyên trong cả video
+    for player_index in range(3):
+        ids = {track_id for frame_num, frame_track in enumerate(tracks["players"])
+               for track_id, track in frame_track.items() if track["bbox"] == _player_bbox(player_index, frame_num)}
+        print(f"Player {player_index}: ids {ids}")
+        assert ids == {player_index + 1}, "❌ Id cầu thủ bị đổi khi qua ranh giới đoạn"
+    referee_ids = {track_id for frame_track in tracks["referees"] for track_id in frame_track}
+    assert referee_ids == {4}, "❌ Id trọng tài bị đổi khi qua ranh giới đoạn"
+
+    # khung hình chồng lấn chỉ dùng để khởi động, chuyển động ở ranh giới lấy từ đoạn sau
+    assert camera_movement[0] == [0, 0], "❌ Khung hình đầu tiên phải có chuyển động (0,0)"
+    assert camera_movement[10] == [2, 0] and camera_movement[20] == [3, 0], "❌ Chuyển động camera ở ranh giới không đúng"
+    assert tracks["ball"][25][1]["bbox"][0] == 25, "❌ Vị trí bóng bị lệch khung hình"
+
+    print("\n" + "=" * 60)
+    print("✓ SegmentParallelPipeline merge test passed!")
+
+if __name__ == "__main__":
+    test_segment_merge()
@@ -0,0 +1,166 @@
+"""
+Test script để kiểm tra SpeedAndDistance_Estimator tính tốc độ/quãng đường trên mảng vị trí của từng cầu thủ
+"""
+
+import copy
+import numpy as np
+import pytest
+from speed_and_distance_estimator import SpeedAndDistance_Estimator, OnlineSpeedAndDistance_Estimator
+from utils import measure_distance, get_foot_position
+from track_store import TrackStore
+
+def _make_tracks(num_frames=123):
+    # cầu thủ chạy theo đường ngẫu nhiên, có khung hình bị mất track và khung hình nằm ngoài sân (chỉ có bbox)
+    rng = np.random.default_rng(0)
+    tracks = {"players": [], "referees": [], "ball": []}
+    positions = rng.uniform([0, 0], [105, 68], (15, 2))
+    for frame_num in range(num_frames):
+        positions += rng.normal(0, 0.3, positions.shape)
+        players = {}
+        for track_id in range(1, 16):
+            if (frame_num * track_id) % 11 == 3: # mất track
+                continue
+            x, y = rng.uniform([100, 250], [1700, 1000])
+            player = {"bbox": [x, y, x + 30, y + 80]}
+            if track_id > 12 or (frame_num + track_id) % 9 == 0: # ngoài vùng sân đã biến đổi
+                player["position_transformed"] = None
+            else:
+                player["position_transformed"] = positions[track_id - 1].tolist()
+            players[track_id] = player
+        tracks["players"].append(players)
+        tracks["referees"].append({30: {"bbox": [900.0, 500.0, 930.0, 580.0], "position_transformed": [50.0, 30.0]}})
+        tracks["ball"].append({1: {"bbox": [frame_num, 385.0, frame_num + 12.0, 397.0]}})
+    return tracks
+
+def _add_speed_window_by_window(estimator, tracks):
+    # cách cũ: duyệt từng cửa sổ frame_window khung hình của từng cầu thủ
+    players = tracks['players']
+    number_of_frames = len(players)
+    total_distance = {}
+    for frame_num in range(0, number_of_frames, estimator.frame_window):
+        last_frame = min(frame_num + estimator.frame_window, number_of_frames - 1)
+        for track_id in players[frame_num]:
+            start = next(((f, players[f][track_id]['position_transformed']) for f in range(frame_num, min(frame_num + estimator.frame_window, number_of_frames))
+                          if players[f].get(track_id, {}).get('position_transformed') is not None), None)
+            use_bbox = start is None
+            if use_bbox:
+                start = (frame_num, get_foot_position(players[frame_num][track_id]['bbox']))
+            end = next(((f, players[f][track_id]['position_transformed']) for f in range(last_frame, frame_num, -1)
+                        if players[f].get(track_id, {}).get('position_transformed') is not None), None)
+            if end is None:
+                end = next(((f, get_foot_position(players[f][track_id]['bbox'])) for f in range(last_frame, frame_num, -1) if track_id in players[f]), None)
+                use_bbox = True
+            if end is None or start[0] >= end[0]:
+                continue
+            distance = measure_distance(start[1], end[1]) * (0.05 if use_bbox else 1)
+            total_distance[track_id] = total_distance.get(track_id, 0) + distance
+            for f in range(frame_num, last_frame + 1):
+                if track_id in players[f]:
+                    players[f][track_id]['speed'] = distance / ((end[0] - start[0]) / estimator.frame_rate) * 3.6
+                    players[f][track_id]['distance'] = total_distance[track_id]
+    for frame in players:
+        for track in frame.values():
+            track.setdefault('speed', 0.0)
+            track.setdefault('distance', 0.0)
+    return tracks
+
+def _speeds(tracks, key):
+    return np.array([track[key] for frame in tracks['players'] for track in frame.values()])
+
+def test_vectorized_speed_and_distance():
+    """Test kết quả giống cách tính cũ theo từng cửa sổ, với tracks dạng dictionary và dạng cột"""
+
+    print("Testing SpeedAndDistance_Estimator vectorized...")
+    print("=" * 60)
+
+    estimator = SpeedAndDistance_Estimator()
+    tracks = _make_tracks()
+    expected = _add_speed_window_by_window(estimator, copy.deepcopy(tracks))
+
+    result = copy.deepcopy(tracks)
+    estimator.add_speed_and_distance_to_tracks(result)
+    for key in ('speed', 'distance'):
+        error = np.abs(_speeds(result, key) - _speeds(expected, key)).max()
+        print(f"\nMax {key} difference: {error:.2e}")
+        assert np.allclose(_speeds(result, key), _speeds(expected, key), rtol=1e-12, atol=0), f"❌ {key} khác cách tính cũ"
+    assert (_speeds(result, 'speed') > 0).any() and (_speeds(result, 'speed') == 0).any()
+    assert 'speed' not in result['referees'][0][30] and 'speed' not in result['ball'][0][1], "❌ Không tính tốc độ cho trọng tài và bóng"
+
+    store = TrackStore.from_dict(tracks)
+    estimator.add_speed_and_distance_to_tracks(store)
+    for key in ('speed', 'distance'):
+        assert np.array_equal(_speeds(store, key), _speeds(result, key)), f"❌ {key} trên tracks dạng cột khác tracks dạng dictionary"
+
+    print("\n" + "=" * 60)
+    print("✓ SpeedAndDistance_Estimator vectorized test passed!")
+
+def test_speed_smoothing():
+    """Test làm mượt vị trí (Savitzky-Golay, EMA) làm giảm tốc độ ảo do vị trí bị rung"""
+
+    print("Testing SpeedAndDistance_Estimator smoothing...")
+    print("=" * 60)
+
+    # cầu thủ chạy đều 18 km/h (5 m/s), vị trí bị rung 0.3m
+    rng = np.random.default_rng(1)
+    tracks = {"players": [{7: {"position_transformed": [10 + 5 * frame_num / 24 + rng.normal(0, 0.3), 30 + rng.normal(0, 0.3)]}}
+                          for frame_num in range(240)]}
+    errors = {}
+    for smoothing in (None, 'savgol', 'ema'):
+        result = copy.deepcopy(tracks)
+        SpeedAndDistance_Estimator(smoothing=smoothing).add_speed_and_distance_to_tracks(result)
+        errors[smoothing] = np.abs(_speeds(result, 'speed')[5:-5] - 18).mean()
+    print(f"\nMean speed error (km/h): {errors}")
+    assert errors['savgol'] < errors[None] * 0.7 and errors['ema'] < errors[None] * 0.7, "❌ Làm mượt phải giảm tốc độ ảo"
+
+    # chỉ có bbox, không cầu thủ nào có position_transformed: không lỗi, làm mượt không thay đổi kết quả
+    no_position = {'players': [{1: {'bbox': [0, 0, 10, 20]}}, {1: {'bbox': [0, 0, 10, 20]}}], 'referees': [{}, {}], 'ball': [{}, {}]}
+    results = {}
+    for smoothing in (None, 'savgol', 'ema'):
+        results[smoothing] = copy.deepcopy(no_position)
+        SpeedAndDistance_Estimator(smoothing=smoothing).add_speed_and_distance_to_tracks(results[smoothing])
+    assert results['ema'] == results['savgol'] == results[None]
+
+    assert SpeedAndDistance_Estimator(smoothing='savgol').get_params() != SpeedAndDistance_Estimator().get_params(), "❌ Kiểu làm mượt phải nằm trong khóa cache"
+    with pytest.raises(ValueError):
+        SpeedAndDistance_Estimator(smoothing='median')
+
+    print("\n" + "=" * 60)
+    print("✓ SpeedAndDistance_Estimator smoothing test passed!")
+
+def test_online_speed_and_distance():
+    """Test nhận từng khung hình: kết quả giống hệt cách tính trên toàn bộ tracks và mỗi khung hình trễ tối đa frame_window khung hình"""
+
+    print("Testing OnlineSpeedAndDistance_Estimator...")
+    print("=" * 60)
+
+    for num_frames in (120, 121, 123): # khung hình cuối là đầu cửa sổ, ngay sau đầu cửa sổ, giữa cửa sổ
+        for smoothing in (None, 'ema'):
+            estimator = SpeedAndDistance_Estimator(smoothing=smoothing)
+            tracks = _make_tracks(num_frames)
+            expected = copy.deepcopy(tracks)
+            estimator.add_speed_and_distance_to_tracks(expected)
+
+            online = OnlineSpeedAndDistance_Estimator(estimator)
+            players = copy.deepcopy(tracks['players'])
+            ready_frames, max_latency = [], 0
+            for frame_num, object_track in enumerate(players):
+                for ready_frame, ready_track in online.push(object_track):
+                    assert ready_track is players[ready_frame] and 'speed' in next(iter(ready_track.values()))
+                    max_latency = max(max_latency, frame_num - ready_frame)
+                    ready_frames.append(ready_frame)
+            ready_frames += [ready_frame for ready_frame, _ in online.flush()]
+            assert ready_frames == list(range(num_frames)), "❌ Phải trả về mọi khung hình đúng thứ tự"
+            assert max_latency <= estimator.frame_window, f"❌ Trễ {max_latency} khung hình"
+            for key in ('speed', 'distance'):
+                assert np.array_equal(_speeds({'players': players}, key), _speeds(expected, key)), f"❌ {key} khác cách tính trên toàn bộ tracks ({num_frames} khung hình, {smoothing})"
+
+    # savgol cần nhìn trước nên ước lượng trực tiếp dùng EMA
+    assert OnlineSpeedAndDistance_Estimator(SpeedAndDistance_Estimator(smoothing='savgol')).smoothing == 'ema'
+
+    print("\n" + "=" * 60)
+    print("✓ OnlineSpeedAndDistance_Estimator test passed!")
+
+if __name__ == "__main__":
+    test_vectorized_speed_and_distance()
+    test_speed_smoothing()
+    test_online_speed_and_distance()
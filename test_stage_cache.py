@@ -0,0 +1,89 @@
+"""
+Test script để kiểm tra StageCache (cache kết quả các bước theo nội dung video, trọng số mô hình và tham số)
+"""
+
+import os
+import tempfile
+import time
+from utils import StageCache
+
+def _write(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+
+def test_stage_cache_keys():
+    """Test khóa thay đổi theo nội dung file, tham số và bước phía trước, kết quả được dùng lại giữa các lần chạy"""
+
+    print("Testing StageCache keys...")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_a, video_b, model = (os.path.join(tmp_dir, name) for name in ('a.mp4', 'b.mp4', 'best.pt'))
+        _write(video_a, b'video a' * 1000)
+        _write(video_b, b'video b' * 1000)
+        _write(model, b'weights')
+
+        cache = StageCache(os.path.join(tmp_dir, 'cache'))
+        key_a = cache.make_key('tracks', files=[video_a, model], params={'imgsz': 640})
+        key_b = cache.make_key('tracks', files=[video_b, model], params={'imgsz': 640})
+        print(f"\nKeys: {key_a}, {key_b}")
+        assert key_a != key_b, "❌ Video khác nhau phải có khóa khác nhau"
+        assert key_a != cache.make_key('tracks', files=[video_a, model], params={'imgsz': 1280}), "❌ Tham số khác nhau phải có khóa khác nhau"
+        assert key_a == cache.make_key('tracks', files=[video_a, model], params={'imgsz': 640}), "❌ Khóa phải ổn định"
+        child_a = cache.make_key('annotated_tracks', parents=[key_a])
+        assert child_a != cache.make_key('annotated_tracks', parents=[key_b]), "❌ Khóa phải phụ thuộc vào bước phía trước"
+
+        calls = []
+        compute = lambda: calls.append(1) or {'players': [{1: {'bbox': [0, 0, 1, 1]}}]}
+        first = cache.get_or_compute(key_a, compute)
+        assert cache.get_or_compute(key_b, compute) is not None and len(calls) == 2, "❌ Video khác không được dùng lại kết quả"
+
+        # lần chạy sau (đối tượng cache mới) dùng lại kết quả đã lưu
+        cache = StageCache(os.path.join(tmp_dir, 'cache'))
+        assert cache.get_or_compute(key_a, compute) == first and len(calls) == 2, "❌ Kết quả đã lưu phải được dùng lại"
+
+        # sửa nội dung video thì khóa đổi
+        time.sleep(0.01)
+        _write(video_a, b'video a edited' * 1000)
+        assert cache.make_key('tracks', files=[video_a, model], params={'imgsz': 640}) != key_a, "❌ Sửa video phải đổi khóa"
+
+        # cache bị tắt thì luôn tính lại
+        disabled = StageCache(os.path.join(tmp_dir, 'cache'), enabled=False)
+        assert disabled.make_key('tracks', files=[video_a]) is None
+        disabled.get_or_compute(None, compute)
+        assert len(calls) == 3, "❌ Cache bị tắt phải tính lại"
+
+    print("\n" + "=" * 60)
+    print("✓ StageCache key test passed!")
+
+def test_stage_cache_eviction():
+    """Test giới hạn dung lượng và xóa kết quả lâu không dùng nhất (LRU)"""
+
+    print("Testing StageCache eviction...")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        value = b'x' * 4000
+        cache = StageCache(tmp_dir, max_size=10000)
+        for key in ('a', 'b'):
+            cache.put(key, value)
+            time.sleep(0.01)
+        cache.get('a') # a được dùng gần đây hơn b
+        time.sleep(0.01)
+        cache.put('c', value) # vượt 10000 byte, b bị xóa
+
+        stats = cache.stats()
+        print(f"\nStats: {stats}")
+        assert set(cache.index['entries']) == {'a', 'c'}, "❌ Phải xóa kết quả lâu không dùng nhất"
+        assert not os.path.exists(cache.entry_path('b')), "❌ File của kết quả bị xóa vẫn còn"
+        assert stats['size'] <= 10000, "❌ Vượt giới hạn dung lượng"
+
+        cache.put('big', b'x' * 20000) # lớn hơn cả giới hạn thì không lưu
+        assert 'big' not in cache.index['entries'], "❌ Kết quả lớn hơn giới hạn không được lưu"
+
+    print("\n" + "=" * 60)
+    print("✓ StageCache eviction test passed!")
+
+if __name__ == "__main__":
+    test_stage_cache_keys()
+    test_stage_cache_eviction()
@@ -0,0 +1,171 @@
+"""
+Test script để kiểm tra StreamingPipeline: thứ tự khung hình, cờ nội suy bóng, tốc độ và team_ball_control giống các bước chạy trên toàn bộ video
+"""
+
+import copy
+import os
+import tempfile
+import numpy as np
+import pytest
+import cv2
+from pipeline import StreamingPipeline
+from trackers.tracker import Tracker
+from team_assigner import TeamAssigner
+from player_ball_assigner import PlayerBallAssigner
+from camera_movement_estimator import CameraMovementEstimator
+from view_transformer import ViewTransformer
+from speed_and_distance_estimator import SpeedAndDistance_Estimator
+from utils import OverlayCompositor, VideoFrameReader
+
+NUM_FRAMES = 30
+MISSING_BALL = range(8, 13) # các khung hình không phát hiện được bóng
+
+def _player_bbox(player_id, frame_num):
+    x, y = 400 + 150 * player_id + 3 * frame_num, 450 + 60 * player_id
+    return [x, y, x + 40, y + 90]
+
+def _make_frame_tracks(frame_num):
+    # 6 cầu thủ chạy ngang sân (đội xen kẽ), bóng ở chân cầu thủ 3 rồi chuyển sang cầu thủ 4, mất bóng ở MISSING_BALL
+    players = {player_id: {'bbox': _player_bbox(player_id, frame_num)} for player_id in range(1, 7)}
+    holder = 3 if frame_num < 15 else 4
+    x1, _, x2, y2 = players[holder]['bbox']
+    ball = {} if frame_num in MISSING_BALL else {1: {'bbox': [(x1 + x2) / 2 - 5, y2 - 10, (x1 + x2) / 2 + 5, y2]}}
+    return {'players': players, 'referees': {}, 'ball': ball}
+
+def _make_frames():
+    # nền cỏ có vân (để ước lượng chuyển động camera), áo đội 1 đỏ, đội 2 trắng ở giữa bbox
+    background = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    background[:] = (40, 140, 40)
+    background += np.random.default_rng(0).integers(0, 20, background.shape, dtype=np.uint8)
+    frames = []
+    for frame_num in range(NUM_FRAMES):
+        frame = background.copy()
+        for player_id, player in _make_frame_tracks(frame_num)['players'].items():
+            x1, y1, x2, y2 = player['bbox']
+            cv2.rectangle(frame, (x1 + 10, y1 + 5), (x2 - 10, y1 + 40), (0, 0, 220) if player_id % 2 else (240, 240, 240), -1)
+        frames.append(frame)
+    return frames
+
+def _make_tracker(fail_at=None, visible_players=None):
+    # chỉ cần các hàm xử lý tracks và vẽ của Tracker, detection + tracking được thay bằng tracks dựng sẵn
+    # visible_players: {frame_num: các id cầu thủ nhìn thấy}, mặc định thấy cả 6 cầu thủ
+    tracker = Tracker.__new__(Tracker)
+    tracker.overlay_compositor = OverlayCompositor()
+    def iter_frame_tracks(frames):
+        for frame_num, frame in enumerate(frames):
+            if frame_num == fail_at:
+                raise RuntimeError("detector failed")
+            frame_tracks = _make_frame_tracks(frame_num)
+            if visible_players is not None and frame_num in visible_players:
+                frame_tracks['players'] = {player_id: frame_tracks['players'][player_id] for player_id in visible_players[frame_num]}
+            yield frame_num, frame, frame_tracks
+    tracker.iter_frame_tracks = iter_frame_tracks
+    return tracker
+
+def _make_pipeline(tracker):
+    return StreamingPipeline(tracker, TeamAssigner(), PlayerBallAssigner(), ViewTransformer(), SpeedAndDistance_Estimator())
+
+def _run_batch(frames):
+    # các bước của main.py trên toàn bộ video, gán đội giống streaming (học màu áo ở khung hình đầu tiên, bầu chọn theo từng khung hình)
+    tracker = _make_tracker()
+    frame_tracks = [_make_frame_tracks(frame_num) for frame_num in range(NUM_FRAMES)]
+    tracks = {object_name: [copy.deepcopy(frame_track[object_name]) for frame_track in frame_tracks] for object_name in frame_tracks[0]}
+    tracker.add_position_to_tracks(tracks)
+    camera_movement_estimator = CameraMovementEstimator(frames[0])
+    camera_movement_estimator.add_adjust_positions_to_tracks(tracks, camera_movement_estimator.get_camera_movement(frames, tracks=tracks))
+    ViewTransformer().add_transformed_position_to_tracks(tracks)
+    tracks['ball'] = tracker.interpolate_ball_positions(tracks['ball'])
+    SpeedAndDistance_Estimator().add_speed_and_distance_to_tracks(tracks)
+    team_assigner = TeamAssigner()
+    team_assigner.assign_team_color(frames[0], tracks['players'][0])
+    for frame_num, (frame, player_track) in enumerate(zip(frames, tracks['players'])):
+        for player_id, team in team_assigner.get_player_teams(frame, player_track, frame_num).items():
+            player_track[player_id]['team'] = team
+    return tracks, PlayerBallAssigner().assign_ball_possession(tracks)
+
+def test_streaming_pipeline_matches_batch():
+    """Test streaming trả về đủ khung hình theo đúng thứ tự, nội suy bóng, tốc độ và team_ball_control giống chạy trên toàn bộ video"""
+
+    print("Testing StreamingPipeline...")
+    print("=" * 60)
+
+    frames = _make_frames()
+    expected_tracks, expected_control = _run_batch(frames)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_video_path = os.path.join(tmp_dir, 'streaming.avi')
+        # nguồn không biết trước độ dài (generator): team_ball_control được tạo theo từng khung hình
+        tracks, team_ball_control = _make_pipeline(_make_tracker()).run((frame for frame in frames), output_video_path)
+        with VideoFrameReader(output_video_path) as reader:
+            assert len(reader) == NUM_FRAMES, "❌ Video đầu ra phải có đủ khung hình"
+
+    assert len(tracks['players']) == NUM_FRAMES and len(team_ball_control) == NUM_FRAMES
+    for frame_num in range(NUM_FRAMES):
+        players = tracks['players'][frame_num]
+        assert sorted(players) == list(range(1, 7))
+        assert all(players[player_id]['bbox'] == _player_bbox(player_id, frame_num) for player_id in players), f"❌ Khung hình {frame_num} sai thứ tự"
+
+        ball = tracks['ball'][frame_num][1]
+        assert ball['interpolated'] == (frame_num in MISSING_BALL), f"❌ Cờ nội suy bóng sai ở khung hình {frame_num}"
+        assert np.allclose(ball['bbox'], expected_tracks['ball'][frame_num][1]['bbox']), f"❌ Bbox bóng khác cách nội suy trên toàn bộ video ở khung hình {frame_num}"
+
+        for player_id, player in players.items():
+            expected = expected_tracks['players'][frame_num][player_id]
+            assert player['team'] == expected['team']
+            for key in ('speed', 'distance'):
+                assert (key in player) == (key in expected), f"❌ Thiếu {key} ở khung hình {frame_num}"
+                if key in player:
+                    assert abs(player[key] - expected[key]) < 1e-6, f"❌ {key} khác cách tính trên toàn bộ video ở khung hình {frame_num}"
+    assert any('speed' in player for player in tracks['players'][NUM_FRAMES - 1].values()), "❌ Cầu thủ trong sân phải có tốc độ"
+    assert np.array_equal(team_ball_control, expected_control), "❌ team_ball_control khác cách tính trên toàn bộ video"
+    assert set(team_ball_control.tolist()) == {1, 2}
+
+    print("\n" + "=" * 60)
+    print("✓ StreamingPipeline test passed!")
+
+def test_streaming_pipeline_closes_writer_on_error():
+    """Test lỗi giữa video: luồng ghi vẫn được đóng và các khung hình đã ghi vẫn đọc được"""
+
+    print("Testing StreamingPipeline error handling...")
+    print("=" * 60)
+
+    frames = _make_frames()[:20]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_video_path = os.path.join(tmp_dir, 'streaming.avi')
+        pipeline = _make_pipeline(_make_tracker(fail_at=15))
+        with pytest.raises(RuntimeError):
+            pipeline.run(frames, output_video_path)
+        assert not pipeline.writer._thread.is_alive(), "❌ Luồng ghi video phải được đóng khi có lỗi"
+        with VideoFrameReader(output_video_path) as reader:
+            assert len(list(reader)) > 0, "❌ Các khung hình đã ghi phải đọc được"
+
+    print("\n" + "=" * 60)
+    print("✓ StreamingPipeline error handling test passed!")
+
+def test_streaming_pipeline_few_players_at_start():
+    """Test khung hình đầu không có hoặc chỉ có một cầu thủ: không lỗi K-means, đội 0 cho tới khi học được màu áo hai đội"""
+
+    print("Testing StreamingPipeline with few players at start...")
+    print("=" * 60)
+
+    frames = _make_frames()[:10]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tracker = _make_tracker(visible_players={0: [], 1: [3], 2: [3]})
+        tracks, team_ball_control = _make_pipeline(tracker).run(frames, os.path.join(tmp_dir, 'streaming.avi'))
+
+    assert tracks['players'][0] == {} and len(team_ball_control) == len(frames)
+    assert all(tracks['players'][frame_num][3]['team'] == 0 and 'team_color' not in tracks['players'][frame_num][3] for frame_num in (1, 2)), "❌ Chưa học màu áo thì cầu thủ có đội 0"
+    for frame_num in range(3, len(frames)):
+        teams = {player_id: player['team'] for player_id, player in tracks['players'][frame_num].items()}
+        # áo đỏ ở id lẻ, áo trắng ở id chẵn
+        assert len(set(teams.values())) == 2 and all(teams[player_id] == teams[1 + (player_id + 1) % 2] for player_id in teams), f"❌ Gán đội sai ở khung hình {frame_num}"
+        assert all('team_color' in player for player in tracks['players'][frame_num].values())
+    assert team_ball_control[-1] in (1, 2)
+
+    print("\n" + "=" * 60)
+    print("✓ StreamingPipeline few players test passed!")
+
+if __name__ == "__main__":
+    test_streaming_pipeline_matches_batch()
+    test_streaming_pipeline_closes_writer_on_error()
+    test_streaming_pipeline_few_players_at_start()
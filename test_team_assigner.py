@@ -0,0 +1,186 @@
+"""
+Test script để kiểm tra TeamAssigner lấy màu áo của tất cả cầu thủ trong một khung hình cùng lúc
+"""
+
+import time
+import numpy as np
+from sklearn.cluster import KMeans
+from team_assigner import TeamAssigner
+
+TEAM_COLORS = {1: (200, 30, 30), 2: (240, 240, 240)}
+
+def _make_frame(num_players=22):
+    # sân cỏ có nhiễu, cầu thủ là hình chữ nhật màu áo (có nhiễu) ở giữa bbox, các bbox không chồng lên nhau
+    rng = np.random.default_rng(0)
+    frame = np.clip(np.full((1080, 1920, 3), (40, 130, 50)) + rng.integers(-20, 20, (1080, 1920, 3)), 0, 255).astype(np.uint8)
+    player_track, teams = {}, {}
+    for i in range(num_players):
+        x, y = 80 + (i % 11) * 165, 150 + (i // 11) * 450
+        width = 20 + 4 * i
+        height = width * 2.2
+        shirt = frame[int(y + height * 0.1):int(y + height * 0.5), int(x + width * 0.25):int(x + width * 0.75)]
+        shirt[:] = np.clip(np.array(TEAM_COLORS[i % 2 + 1]) + rng.integers(-15, 15, shirt.shape), 0, 255)
+        player_track[i + 1] = {'bbox': [x, y, x + width, y + height]}
+        teams[i + 1] = i % 2 + 1
+    return frame, player_track, teams
+
+def _sklearn_player_color(frame, bbox):
+    # cách cũ: một mô hình sklearn KMeans cho mỗi cầu thủ
+    image = frame[int(bbox[1]):int(bbox[3]), int(bbox[0]):int(bbox[2])]
+    top_half_image = image[0:int(image.shape[0] / 2), :]
+    kmeans = KMeans(n_clusters=2, init="k-means++", n_init=10).fit(top_half_image.reshape(-1, 3))
+    clustered_image = kmeans.labels_.reshape(top_half_image.shape[0], top_half_image.shape[1])
+    corner_clusters = [clustered_image[0, 0], clustered_image[0, -1], clustered_image[-1, 0], clustered_image[-1, -1]]
+    return kmeans.cluster_centers_[1 - max(set(corner_clusters), key=corner_clusters.count)]
+
+def test_batched_player_colors():
+    """Test màu áo tính cùng lúc giống K-means của sklearn cho từng cầu thủ và gán đúng đội"""
+
+    print("Testing TeamAssigner batched colors...")
+    print("=" * 60)
+
+    frame, player_track, teams = _make_frame()
+    bboxes = [track['bbox'] for track in player_track.values()]
+    team_assigner = TeamAssigner()
+
+    start = time.perf_counter()
+    expected = np.array([_sklearn_player_color(frame, bbox) for bbox in bboxes])
+    sklearn_time = time.perf_counter() - start
+    start = time.perf_counter()
+    player_colors = team_assigner.get_player_colors(frame, bboxes)
+    batched_time = time.perf_counter() - start
+    error = np.abs(player_colors - expected).max()
+    print(f"\nMax color difference: {error:.2e}, sklearn {sklearn_time*1000:.1f} ms, batched {batched_time*1000:.1f} ms")
+    assert player_colors.shape == (len(bboxes), 3)
+    assert error < 1e-6, "❌ Màu áo khác K-means của sklearn"
+    assert np.array_equal(team_assigner.get_player_color(frame, bboxes[3]), player_colors[3])
+
+    team_assigner.assign_team_color(frame, player_track)
+    player_teams = team_assigner.get_player_teams(frame, player_track)
+    # nhãn đội của K-means có thể đổi chỗ cho nhau
+    assert player_teams == teams or player_teams == {player_id: 3 - team for player_id, team in teams.items()}, "❌ Gán đội sai"
+    for player_id in (1, 2):
+        team = player_teams[player_id]
+        assert np.abs(team_assigner.team_colors[team] - TEAM_COLORS[teams[player_id]]).max() < 5, "❌ Màu đội không đúng"
+
+    # cầu thủ đã có đội thì không tính lại, bbox rỗng không làm lỗi
+    assert team_assigner.get_player_team(frame, [0, 0, 0, 0], 1) == player_teams[1]
+    assert np.array_equal(team_assigner.get_player_colors(frame, [[10, 10, 10, 10]]), np.zeros((1, 3)))
+
+    print("\n" + "=" * 60)
+    print("✓ TeamAssigner batched color test passed!")
+
+def _make_video(num_frames=240):
+    # video nhỏ: 10 cầu thủ mỗi đội, thủ môn áo vàng (đội 1), ở 20 khung hình đầu chỉ thấy các cầu thủ đội 1 (camera đang ở một góc sân),
+    # từ khung hình 130 id 5 (đội 1) bị tracker gán nhầm cho một cầu thủ đội 2
+    rng = np.random.default_rng(0)
+    shirts = {1: (200, 30, 30), 2: (240, 240, 240), 'goalkeeper': (20, 220, 230)}
+    frames, player_tracks, expected = [], [], []
+    for frame_num in range(num_frames):
+        frame = np.clip(np.full((180, 640, 3), (40, 130, 50)) + rng.integers(-20, 20, (180, 640, 3)), 0, 255).astype(np.uint8)
+        player_track, frame_expected = {}, {}
+        for player_id in range(1, 22):
+            if player_id == 21:
+                shirt, team = 'goalkeeper', 1
+            else:
+                team = 1 if player_id <= 10 else 2
+                if player_id == 5 and frame_num >= 130:
+                    team = 2
+                shirt = team
+            if frame_num < 20 and (team == 2 or player_id == 21):
+                continue
+            x, y = 10 + (player_id - 1) * 29, 20 + (player_id % 3) * 50
+            frame[y + 4:y + 18, x + 4:x + 14] = np.clip(np.array(shirts[shirt]) + rng.integers(-15, 15, (14, 10, 3)), 0, 255)
+            player_track[player_id] = {'bbox': [x, y, x + 18, y + 40]}
+            frame_expected[player_id] = team
+        frames.append(frame)
+        player_tracks.append(player_track)
+        expected.append(frame_expected)
+    return frames, player_tracks, expected
+
+def _accuracy(player_teams, expected):
+    # tỉ lệ gán đúng của các cầu thủ (không tính thủ môn), cho phép hai nhãn đội đổi chỗ cho nhau
+    pairs = [(player_teams[frame_num][player_id], team) for frame_num, teams in enumerate(expected) for player_id, team in teams.items() if player_id != 21]
+    correct = sum(predicted == team for predicted, team in pairs)
+    return max(correct, len(pairs) - correct) / len(pairs)
+
+def test_team_model_from_many_frames():
+    """Test học màu áo từ nhiều khung hình (kể cả khi khung hình đầu chỉ có một đội), loại thủ môn khỏi mô hình và bầu chọn lại theo thời gian"""
+
+    print("Testing TeamAssigner team model...")
+    print("=" * 60)
+
+    frames, player_tracks, expected = _make_video()
+
+    # cách cũ: chỉ học từ khung hình đầu tiên (chỉ có một đội) rồi giữ đội đầu tiên của mỗi id mãi mãi
+    first_frame = TeamAssigner()
+    first_frame.assign_team_color(frames[0], player_tracks[0])
+    old_teams = [first_frame.get_player_teams(frame, player_track) for frame, player_track in zip(frames, player_tracks)]
+
+    team_assigner = TeamAssigner(num_sample_frames=12, num_workers=2)
+    start = time.perf_counter()
+    player_teams = team_assigner.assign_teams(frames, player_tracks)
+    elapsed = time.perf_counter() - start
+    print(f"\nAccuracy: first frame {_accuracy(old_teams, expected):.3f}, many frames {_accuracy(player_teams, expected):.3f} ({elapsed:.2f}s)")
+    # chỉ sai ở 10 khung hình đầu đoạn có id 5 bị đổi sang cầu thủ khác
+    assert _accuracy(player_teams, expected) > 0.99, "❌ Gán đội sai"
+    assert _accuracy(old_teams, expected) < 0.9
+    assert player_teams[200][5] != player_teams[100][5] and player_teams[200][5] == player_teams[200][11], "❌ Id bị đổi sang cầu thủ đội khác phải được bầu lại"
+    assert len({teams[21] for teams in player_teams if 21 in teams}) == 1, "❌ Thủ môn (màu ngoại lai) không được đổi đội"
+    for team in (1, 2):
+        distances = [np.abs(team_assigner.team_colors[team] - np.array(color)).max() for color in TEAM_COLORS.values()]
+        assert min(distances) < 10, "❌ Màu đội bị thủ môn kéo lệch"
+    print(f"Outlier threshold: {team_assigner.outlier_threshold:.1f}")
+
+    # kết quả giống nhau giữa các lần chạy (nhãn đội không đổi chỗ ngẫu nhiên)
+    assert TeamAssigner(num_sample_frames=12, num_workers=1).assign_teams(frames, player_tracks) == player_teams
+
+    # streaming: chỉ dùng các phiếu đã có tới khung hình hiện tại, id bị đổi được bầu lại sau vài lần lấy màu
+    team_assigner.player_team_dict, team_assigner.player_votes, team_assigner.last_vote_frame = {}, {}, {}
+    online_teams = [team_assigner.get_player_teams(frame, player_track, frame_num) for frame_num, (frame, player_track) in enumerate(zip(frames, player_tracks))]
+    assert online_teams[100] == player_teams[100] and online_teams[130][5] == online_teams[100][5]
+    assert online_teams[130 + 2 * team_assigner.vote_interval][5] == player_teams[200][5], "❌ Streaming phải bầu lại đội của id bị đổi"
+
+    print("\n" + "=" * 60)
+    print("✓ TeamAssigner team model test passed!")
+
+def test_streaming_team_model():
+    """Test streaming: khung hình đầu không đủ cầu thủ thì chưa học (đội 0), học khi có đủ màu áo và học lại định kỳ không đảo nhãn đội"""
+
+    print("Testing TeamAssigner streaming team model...")
+    print("=" * 60)
+
+    frames, player_tracks, expected = _make_video()
+    # 2 khung hình đầu: không có cầu thủ, rồi chỉ có một cầu thủ (một màu áo)
+    player_tracks[0] = {}
+    player_tracks[1] = {1: player_tracks[1][1]}
+    expected[0], expected[1] = {}, {1: 1}
+
+    team_assigner = TeamAssigner(num_sample_frames=12, refit_interval=60)
+    online_teams = []
+    for frame_num, (frame, player_track) in enumerate(zip(frames, player_tracks)):
+        team_assigner.update_team_model(frame, player_track, frame_num)
+        online_teams.append(team_assigner.get_player_teams(frame, player_track, frame_num))
+        if frame_num < 20: # chỉ có màu áo của đội 1
+            assert team_assigner.kmeans is None and set(online_teams[-1].values()) <= {0}, "❌ Chưa đủ màu áo thì cầu thủ có đội 0"
+    assert team_assigner.kmeans is not None and len(set(online_teams[20].values())) == 2, "❌ Phải học màu áo ngay khi thấy cả hai đội"
+    assert len(team_assigner.sample_colors) == 12, "❌ Bộ đệm màu áo chỉ giữ num_sample_frames khung hình"
+
+    late = online_teams[20:], expected[20:]
+    print(f"\nAccuracy from frame 20: {_accuracy(*late):.3f}")
+    assert _accuracy(*late) > 0.95, "❌ Gán đội sai"
+    assert online_teams[239][11] == online_teams[80][11] and online_teams[239][1] == online_teams[80][1] != online_teams[80][11], "❌ Học lại không được đảo nhãn đội"
+    for team in (1, 2):
+        assert min(np.abs(team_assigner.team_colors[team] - np.array(color)).max() for color in TEAM_COLORS.values()) < 10
+
+    # reset để chạy lại trên video mới
+    team_assigner.reset()
+    assert team_assigner.kmeans is None and not team_assigner.sample_colors and team_assigner.get_player_teams(frames[0], {3: {'bbox': [0, 0, 18, 40]}}, 0) == {3: 0}
+
+    print("\n" + "=" * 60)
+    print("✓ TeamAssigner streaming team model test passed!")
+
+if __name__ == "__main__":
+    test_batched_player_colors()
+    test_team_model_from_many_frames()
+    test_streaming_team_model()
@@ -0,0 +1,98 @@
+"""
+Test script để kiểm tra TrackStore (tracks dạng cột bằng mảng NumPy, vẫn truy cập được như dictionary)
+"""
+
+import pickle
+import numpy as np
+from track_store import TrackStore, ObjectTracks
+
+def _make_tracks(num_frames=50):
+    # tracks kiểu cũ: list các dictionary {track_id: {...}} cho từng khung hình
+    tracks = {"players": [], "referees": [], "ball": []}
+    for frame_num in range(num_frames):
+        tracks["players"].append({track_id: {"bbox": [10.0 * track_id + frame_num, 20.0, 10.0 * track_id + frame_num + 40, 110.5]}
+                                  for track_id in range(1, 6) if (frame_num + track_id) % 7 != 0})
+        tracks["referees"].append({9: {"bbox": [600.0, 100.0, 630.0, 180.0]}})
+        tracks["ball"].append({1: {"bbox": [frame_num, 385.0, frame_num + 12.0, 397.0]}} if frame_num % 4 else {})
+    return tracks
+
+def test_track_store_compatibility():
+    """Test truy cập kiểu dictionary, thêm/sửa/xóa, kiểu giá trị trả về và pickle"""
+
+    print("Testing TrackStore compatibility...")
+    print("=" * 60)
+
+    tracks = _make_tracks()
+    store = TrackStore.from_dict(tracks)
+    assert store.to_dict() == tracks, "❌ Chuyển đổi qua lại không giữ nguyên tracks"
+    assert len(store['players']) == 50 and list(store) == ['players', 'referees', 'ball']
+    assert store['players'] == tracks['players'], "❌ So sánh với list kiểu cũ không đúng"
+
+    player = store['players'][3][2]
+    player['position'] = (42, 110)
+    player['position_adjusted'] = (40.5, 111.25)
+    player['position_transformed'] = None # nằm ngoài sân
+    player['speed'] = 12.5
+    player['team'] = 1
+    player['team_color'] = np.array([10.0, 20.0, 30.0])
+    player['has_ball'] = True
+    player['note'] = 'extra' # trường không có trong FIELDS
+    assert player['position'] == (42, 110) and type(player['position'][0]) is int, "❌ position phải là tuple số nguyên"
+    assert player['position_transformed'] is None and 'position_transformed' in player, "❌ None phải được giữ nguyên"
+    assert player['has_ball'] is True and player['team'] == 1 and player['note'] == 'extra'
+    assert 'speed' not in store['players'][3][1] and store['players'][3][1].get('speed', 0) == 0, "❌ Trường chưa gán không được xuất hiện"
+    assert np.array_equal(player['team_color'], [10, 20, 30])
+
+    player['position'] = (42.5, 110) # số thực không được làm tròn ngầm vào cột số nguyên
+    assert player['position'] == (42.5, 110), "❌ Giá trị không đúng kiểu phải được giữ nguyên"
+
+    # thêm đối tượng vào một khung hình cũ (chèn dòng vào giữa) và xóa đối tượng
+    store['players'][0][99] = {"bbox": [1.0, 2.0, 3.0, 4.0]}
+    assert player['speed'] == 12.5, "❌ View cũ phải tìm lại đúng dòng sau khi chèn"
+    assert list(store['players'][0])[-1] == 99 and 99 in store['players'][0]
+    del store['players'][0][99]
+    assert 99 not in store['players'][0] and store['players'][3][2]['speed'] == 12.5
+
+    # gán lại cả loại đối tượng bằng list (như interpolate_ball_positions)
+    store['ball'] = [{1: {"bbox": [0.0, 0.0, 1.0, 1.0]}}] * 50
+    assert isinstance(store['ball'], ObjectTracks) and store['ball'][49][1]['bbox'] == [0.0, 0.0, 1.0, 1.0]
+
+    restored = pickle.loads(pickle.dumps(store))
+    assert restored['referees'] == store['referees'] and restored['players'][3][2]['note'] == 'extra', "❌ Pickle làm mất dữ liệu"
+    restored['players'].append({7: {"bbox": [0.0, 0.0, 1.0, 1.0]}}) # vẫn thêm được khung hình sau khi pickle
+    assert len(restored['players']) == 51
+
+    print("\n" + "=" * 60)
+    print("✓ TrackStore compatibility test passed!")
+
+def test_track_store_columns():
+    """Test truy cập theo cột để tính toán trên toàn bộ video và dung lượng bộ nhớ"""
+
+    print("Testing TrackStore columns...")
+    print("=" * 60)
+
+    tracks = _make_tracks(200)
+    store = TrackStore.from_dict(tracks)
+    players = store['players']
+
+    bboxes, has_bbox = players.column('bbox')
+    frame_index = players.frame_index()
+    assert has_bbox.all() and len(bboxes) == sum(len(frame) for frame in tracks['players'])
+    assert np.array_equal(frame_index, [frame_num for frame_num, frame in enumerate(tracks['players']) for _ in frame])
+    assert np.array_equal(players.track_ids, [track_id for frame in tracks['players'] for track_id in frame])
+
+    players.set_column('speed', bboxes[:, 0] * 0.5) # gán cả cột trong một lần
+    for frame_num, frame in enumerate(tracks['players']):
+        for track_id, track in frame.items():
+            assert players[frame_num][track_id]['speed'] == track['bbox'][0] * 0.5, "❌ set_column gán sai dòng"
+
+    dict_size = len(pickle.dumps(tracks))
+    print(f"\nColumn bytes: {store.nbytes()}, rows: {len(bboxes)}, pickled dict: {dict_size}")
+    assert store.nbytes() < 200 * (len(bboxes) + 400), "❌ Mỗi dòng phải dùng ít bộ nhớ"
+
+    print("\n" + "=" * 60)
+    print("✓ TrackStore column test passed!")
+
+if __name__ == "__main__":
+    test_track_store_compatibility()
+    test_track_store_columns()
@@ -0,0 +1,91 @@
+"""
+Test script để kiểm tra VideoFrameReader (đọc video dạng streaming)
+"""
+
+import os
+import tempfile
+import numpy as np
+import cv2
+from utils import VideoFrameReader, AsyncVideoWriter, iter_batches
+
+def _create_test_video(path, num_frames=40, size=(64, 48)):
+    # Tạo video giả, mỗi frame có độ sáng khác nhau để phân biệt
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, size)
+    for i in range(num_frames):
+        writer.write(np.full((size[1], size[0], 3), i * 6, dtype=np.uint8))
+    writer.release()
+
+def test_video_frame_reader():
+    """Test duyệt tuần tự, truy cập ngẫu nhiên và chia lô"""
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, 'test.avi')
+        _create_test_video(video_path)
+
+        print("Testing VideoFrameReader...")
+        print("=" * 60)
+
+        with VideoFrameReader(video_path, prefetch_size=4, cache_size=2) as reader:
+            print(f"\nFrames: {len(reader)}, FPS: {reader.fps}, Size: {reader.width}x{reader.height}")
+            assert len(reader) == 40, "❌ Số frame không đúng"
+            assert reader.fps == 25, "❌ FPS phải lấy từ container"
+
+            # Duyệt tuần tự qua bộ đệm đọc trước
+            brightness = [int(frame.mean()) for frame in reader]
+            assert len(brightness) == 40, "❌ Duyệt tuần tự phải trả về đủ frame"
+            assert brightness == sorted(brightness), "❌ Thứ tự frame không đúng"
+
+            # Truy cập ngẫu nhiên (seek) phải khớp với duyệt tuần tự
+            assert abs(int(reader[25].mean()) - brightness[25]) <= 1, "❌ reader[25] không khớp"
+            assert abs(int(reader[-1].mean()) - brightness[-1]) <= 1, "❌ reader[-1] không khớp"
+            assert len(reader[5:10]) == 5, "❌ Slice phải trả về 5 frame"
+            assert len(reader._cache) <= 2, "❌ Cache vượt quá cache_size"
+
+            # Dừng sớm không được làm treo luồng đọc trước
+            for i, _ in enumerate(reader):
+                if i == 2:
+                    break
+
+            batch_sizes = [len(batch) for batch in iter_batches(reader, 16)]
+            print(f"Batch sizes: {batch_sizes}")
+            assert batch_sizes == [16, 16, 8], "❌ Chia lô không đúng"
+
+        with VideoFrameReader(video_path, max_frames=10) as reader:
+            assert len(list(reader)) == 10, "❌ max_frames không giới hạn số frame"
+
+    print("\n" + "=" * 60)
+    print("✓ VideoFrameReader test passed!")
+
+def test_async_video_writer():
+    """Test ghi video trên luồng nền với fps và codec lấy từ video nguồn"""
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, 'test.avi')
+        output_path = os.path.join(tmp_dir, 'output.avi')
+        _create_test_video(video_path)
+
+        print("Testing AsyncVideoWriter...")
+        print("=" * 60)
+
+        with VideoFrameReader(video_path) as reader:
+            assert reader.codec == 'MJPG', "❌ Codec phải lấy từ container"
+            # hàng đợi nhỏ để kiểm tra backpressure
+            with AsyncVideoWriter(output_path, fps=reader.fps, codec=reader.codec, queue_size=2) as writer:
+                for frame in reader:
+                    writer.write(frame)
+            stats = writer.stats()
+
+        print(f"\nStats: {stats}")
+        assert stats['frames_written'] == 40, "❌ Phải ghi đủ 40 frame"
+        assert stats['max_queue_depth'] <= 3, "❌ Hàng đợi vượt quá giới hạn"
+
+        with VideoFrameReader(output_path) as output:
+            assert len(output) == 40, "❌ Video đầu ra thiếu frame"
+            assert output.fps == 25, "❌ FPS đầu ra phải giống video nguồn"
+
+    print("\n" + "=" * 60)
+    print("✓ AsyncVideoWriter test passed!")
+
+if __name__ == "__main__":
+    test_video_frame_reader()
+    test_async_video_writer()
@@ -0,0 +1,94 @@
+"""
+Test script để kiểm tra ViewTransformer biến đổi tất cả các vị trí trong một lần (kể cả ma trận riêng cho từng khung hình)
+"""
+
+import copy
+import numpy as np
+import cv2
+from view_transformer import ViewTransformer
+from track_store import TrackStore
+
+def _make_tracks(num_frames=40):
+    rng = np.random.default_rng(0)
+    tracks = {"players": [], "referees": [], "ball": []}
+    for frame_num in range(num_frames):
+        tracks["players"].append({track_id: {"position_adjusted": tuple(rng.uniform([100, 250], [1700, 1050]))}
+                                  for track_id in range(1, 12) if (frame_num + track_id) % 5})
+        tracks["referees"].append({30: {"position_adjusted": (900.5, 600.25)}})
+        tracks["ball"].append({1: {"position_adjusted": (frame_num * 10.0, 500.0)}} if frame_num % 3 else {})
+    return tracks
+
+def _transform_one_by_one(view_transformer, tracks):
+    # cách cũ: gọi cv2.perspectiveTransform cho từng điểm
+    for object_tracks in tracks.values():
+        for frame_num, track in enumerate(object_tracks):
+            for track_info in track.values():
+                point = np.array(track_info['position_adjusted']).reshape(-1, 1, 2).astype(np.float32)
+                homography = view_transformer.get_homography(frame_num)
+                track_info['position_transformed'] = cv2.perspectiveTransform(point, homography).reshape(-1, 2).squeeze().tolist()
+    return tracks
+
+def test_batch_transform():
+    """Test biến đổi một lần cho kết quả giống hệt biến đổi từng điểm, với tracks dạng dictionary và dạng cột"""
+
+    print("Testing ViewTransformer batch transform...")
+    print("=" * 60)
+
+    view_transformer = ViewTransformer()
+    tracks = _make_tracks()
+    expected = _transform_one_by_one(view_transformer, copy.deepcopy(tracks))
+
+    batch = copy.deepcopy(tracks)
+    view_transformer.add_transformed_position_to_tracks(batch)
+    assert batch == expected, "❌ Kết quả biến đổi một lần khác biến đổi từng điểm"
+
+    store = TrackStore.from_dict(tracks)
+    view_transformer.add_transformed_position_to_tracks(store)
+    assert store.to_dict() == expected, "❌ Kết quả trên tracks dạng cột khác biến đổi từng điểm"
+
+    point = view_transformer.transform_point(np.array([910, 260]))
+    print(f"\nTop-right corner -> {point.tolist()}")
+    assert np.allclose(point, [[105, 0]], atol=1e-3), "❌ Góc sân phải biến đổi về góc sân chuẩn"
+
+    print("\n" + "=" * 60)
+    print("✓ ViewTransformer batch transform test passed!")
+
+def test_per_frame_homographies():
+    """Test mỗi khung hình dùng ma trận riêng, kể cả khi tracks chỉ là một đoạn của video (start_frame)"""
+
+    print("Testing ViewTransformer per-frame homographies...")
+    print("=" * 60)
+
+    view_transformer = ViewTransformer()
+    tracks = _make_tracks()
+    num_frames = len(tracks['players'])
+    # camera lia ngang: 4 góc sân dịch sang phải 5 pixel mỗi khung hình, khung hình cuối không có ma trận riêng
+    homographies = [cv2.getPerspectiveTransform((view_transformer.pixel_vertices + [5.0 * frame_num, 0]).astype(np.float32),
+                                                 view_transformer.target_vertices)
+                    for frame_num in range(num_frames - 1)] + [None]
+    view_transformer.set_homographies(homographies)
+    assert np.allclose(view_transformer.get_homography(num_frames - 1), view_transformer.perspective_transformer)
+
+    expected = _transform_one_by_one(view_transformer, copy.deepcopy(tracks))
+    store = TrackStore.from_dict(tracks)
+    view_transformer.add_transformed_position_to_tracks(store)
+    for name in ('players', 'referees', 'ball'):
+        for frame_num in range(num_frames):
+            for track_id, track in expected[name][frame_num].items():
+                error = np.abs(np.subtract(store[name][frame_num][track_id]['position_transformed'], track['position_transformed'])).max()
+                assert error < 1e-4, f"❌ {name} {track_id} ở khung hình {frame_num} lệch {error}"
+
+    # streaming: tracks một khung hình, start_frame cho biết đó là khung hình nào
+    frame_num = 20
+    window = {name: [copy.deepcopy(object_tracks[frame_num])] for name, object_tracks in tracks.items()}
+    view_transformer.add_transformed_position_to_tracks(window, start_frame=frame_num)
+    error = np.abs(np.subtract(window['referees'][0][30]['position_transformed'], expected['referees'][frame_num][30]['position_transformed'])).max()
+    print(f"\nStreaming window error at frame {frame_num}: {error:.2e}")
+    assert error < 1e-4, "❌ start_frame phải chọn đúng ma trận của khung hình"
+
+    print("\n" + "=" * 60)
+    print("✓ ViewTransformer per-frame homography test passed!")
+
+if __name__ == "__main__":
+    test_batch_transform()
+    test_per_frame_homographies()
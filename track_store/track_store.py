@@ -0,0 +1,376 @@
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import numpy as np
+
+'''
+Lưu tracks dạng cột (columnar) bằng mảng NumPy thay cho list các dictionary lồng nhau:
+- Mỗi loại đối tượng (players, referees, ball) là một ObjectTracks, mỗi dòng là một cặp (khung hình, track_id)
+- Các dòng của cùng một khung hình nằm liền nhau, frame_starts[f]:frame_starts[f+1] là các dòng của khung hình f (giống CSR)
+- Mỗi trường quen thuộc (bbox, position, ..., has_ball) là một mảng NumPy (số dòng, kích thước trường),
+  mảng present cho biết dòng nào đã có trường đó (giống việc key có trong dictionary hay không)
+- Trường không nằm trong FIELDS hoặc giá trị không đúng kiểu của trường được lưu trong một dictionary phụ (extras)
+Truy cập kiểu cũ tracks['players'][frame_num][track_id]['bbox'] vẫn dùng được qua các view (FrameView, TrackView),
+còn các bước cần tính toán trên toàn bộ video thì lấy thẳng cả cột bằng column()/set_column().
+'''
+
+# tên trường: (kiểu dữ liệu, kích thước mỗi dòng, hàm chuyển giá trị về kiểu python giống dictionary cũ)
+FIELDS = {
+    'bbox': (np.float64, (4,), lambda value: value.tolist()),
+    'position': (np.int64, (2,), lambda value: tuple(value.tolist())), # get_foot_position/get_center_of_bbox trả về pixel nguyên
+    'position_adjusted': (np.float64, (2,), lambda value: tuple(value.tolist())),
+    'position_transformed': (np.float64, (2,), lambda value: None if np.isnan(value).all() else value.tolist()), # None khi nằm ngoài sân
+    'speed': (np.float64, (), float),
+    'distance': (np.float64, (), float),
+    'team': (np.int64, (), int),
+    'team_color': (np.float64, (3,), lambda value: value.copy()),
+    'has_ball': (np.bool_, (), bool),
+}
+FIELD_NAMES = list(FIELDS)
+FIELD_INDEX = {name: index for index, name in enumerate(FIELD_NAMES)}
+SCALAR_TYPES = {np.float64: (float, int), np.int64: (int,), np.bool_: (bool,)} # kiểu python gán thẳng được vào cột một giá trị
+FRAME_ROWS_CACHE = 256 # số khung hình giữ bảng track_id -> dòng để tra cứu nhanh
+
+def encode_value(name, value):
+    # chuyển giá trị sang mảng của trường name, trả về None nếu giá trị không lưu được trong cột (sẽ được lưu vào extras)
+    dtype, shape, _ = FIELDS[name]
+    if shape == () and type(value) in SCALAR_TYPES[dtype]: # số python thông thường, không cần tạo mảng
+        return value
+    if name == 'position_transformed' and value is None:
+        return np.full(shape, np.nan)
+    try:
+        array = np.asarray(value)
+    except (ValueError, TypeError):
+        return None
+    if array.shape != shape:
+        return None
+    if dtype is np.bool_:
+        return array if array.dtype.kind == 'b' else None
+    if array.dtype.kind not in 'iuf':
+        return None
+    if dtype is np.int64 and array.dtype.kind == 'f' and not np.array_equal(array, np.round(array)):
+        return None # số thực không được làm tròn ngầm
+    return array
+
+class ObjectTracks():
+    '''
+    Tracks của một loại đối tượng cho toàn bộ video, dùng được như list các dictionary {track_id: {...}} cũ:
+    len(), object_tracks[frame_num], duyệt tuần tự, append(frame_dict)
+    '''
+    def __init__(self, frames=None, capacity=1024):
+        self._size = 0 # số dòng đang dùng
+        self._num_frames = 0
+        self._starts = np.zeros(1, dtype=np.int64) # dòng bắt đầu của từng khung hình, phần tử cuối là _size
+        self._track_ids = np.zeros(capacity, dtype=np.int64)
+        self._present = np.zeros((capacity, len(FIELDS)), dtype=bool)
+        self._values = {name: np.zeros((capacity,) + shape, dtype=dtype) for name, (dtype, shape, _) in FIELDS.items()}
+        self._extras = {} # (frame_num, track_id) -> {key: value} cho các trường ngoài FIELDS
+        self._version = 0 # tăng mỗi khi vị trí các dòng thay đổi, để TrackView biết phải tìm lại dòng
+        self._frame_rows = OrderedDict() # frame_num -> {track_id: vị trí trong khung hình}, chỉ giữ FRAME_ROWS_CACHE khung hình gần nhất
+        for frame in frames or []:
+            self.append(frame)
+
+    # ---------------- truy cập kiểu list ----------------
+    def __len__(self):
+        return self._num_frames
+
+    def __getitem__(self, frame_num):
+        if isinstance(frame_num, slice):
+            return [FrameView(self, index) for index in range(*frame_num.indices(self._num_frames))]
+        return FrameView(self, self._frame_number(frame_num))
+
+    def __setitem__(self, frame_num, frame):
+        # thay toàn bộ các đối tượng của một khung hình
+        frame_num = self._frame_number(frame_num)
+        frame = dict(frame.items()) if isinstance(frame, FrameView) and frame.object_tracks is self else frame
+        for track_id in list(FrameView(self, frame_num)):
+            self.delete_row(frame_num, track_id)
+        view = FrameView(self, frame_num)
+        for track_id, track in frame.items():
+            view[track_id] = track
+
+    def __iter__(self):
+        for frame_num in range(self._num_frames):
+            yield FrameView(self, frame_num)
+
+    def __eq__(self, other):
+        # so sánh như list các dictionary, dùng được với cả list kiểu cũ
+        if not isinstance(other, (ObjectTracks, list)):
+            return NotImplemented
+        return len(self) == len(other) and all(frame == other_frame for frame, other_frame in zip(self, other))
+
+    def __repr__(self):
+        return f"ObjectTracks({self._num_frames} frames, {self._size} rows)"
+
+    def _frame_number(self, frame_num):
+        if frame_num < 0:
+            frame_num += self._num_frames
+        if not 0 <= frame_num < self._num_frames:
+            raise IndexError(f"frame {frame_num} nằm ngoài {self._num_frames} khung hình")
+        return frame_num
+
+    def append(self, frame):
+        # thêm một khung hình ở cuối, frame là dictionary {track_id: {...}} (hoặc FrameView)
+        if len(self._starts) <= self._num_frames + 1:
+            self._starts = self._grow(self._starts, 2 * len(self._starts))
+        self._num_frames += 1
+        self._starts[self._num_frames] = self._size
+        view = FrameView(self, self._num_frames - 1)
+        for track_id, track in frame.items():
+            view[track_id] = track
+
+    def extend(self, frames):
+        for frame in frames:
+            self.append(frame)
+
+    # ---------------- quản lý dòng ----------------
+    def frame_slice(self, frame_num):
+        return int(self._starts[frame_num]), int(self._starts[frame_num + 1])
+
+    def frame_track_ids(self, frame_num):
+        start, stop = self.frame_slice(frame_num)
+        return self._track_ids[start:stop]
+
+    def frame_rows(self, frame_num):
+        # {track_id: vị trí trong khung hình} của khung hình frame_num
+        rows = self._frame_rows.get(frame_num)
+        if rows is None:
+            rows = {track_id: offset for offset, track_id in enumerate(self.frame_track_ids(frame_num).tolist())}
+            self._frame_rows[frame_num] = rows
+            if len(self._frame_rows) > FRAME_ROWS_CACHE:
+                self._frame_rows.popitem(last=False)
+        return rows
+
+    def find_row(self, frame_num, track_id):
+        # dòng của (frame_num, track_id), -1 nếu không có
+        offset = self.frame_rows(frame_num).get(track_id)
+        return -1 if offset is None else int(self._starts[frame_num]) + offset
+
+    def _reserve(self, size):
+        capacity = len(self._track_ids)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        self._track_ids = self._grow(self._track_ids, capacity)
+        self._present = self._grow(self._present, capacity)
+        self._values = {name: self._grow(values, capacity) for name, values in self._values.items()}
+
+    @staticmethod
+    def _grow(array, capacity):
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def insert_row(self, frame_num, track_id):
+        # thêm một dòng rỗng cho (frame_num, track_id) ở cuối các dòng của khung hình, trả về chỉ số dòng
+        row = int(self._starts[frame_num + 1])
+        self._reserve(self._size + 1)
+        if row < self._size: # chèn vào giữa (ít gặp, ví dụ sửa một khung hình cũ): dời các dòng phía sau
+            self._track_ids[row + 1:self._size + 1] = self._track_ids[row:self._size]
+            self._present[row + 1:self._size + 1] = self._present[row:self._size]
+            for values in self._values.values():
+                values[row + 1:self._size + 1] = values[row:self._size]
+            self._version += 1
+        self._track_ids[row] = track_id
+        self._present[row] = False
+        rows = self._frame_rows.get(frame_num)
+        if rows is not None:
+            rows[track_id] = row - int(self._starts[frame_num])
+        self._starts[frame_num + 1:self._num_frames + 1] += 1
+        self._size += 1
+        return row
+
+    def delete_row(self, frame_num, track_id):
+        row = self.find_row(frame_num, track_id)
+        if row == -1:
+            raise KeyError(track_id)
+        self._track_ids[row:self._size - 1] = self._track_ids[row + 1:self._size]
+        self._present[row:self._size - 1] = self._present[row + 1:self._size]
+        for values in self._values.values():
+            values[row:self._size - 1] = values[row + 1:self._size]
+        self._starts[frame_num + 1:self._num_frames + 1] -= 1
+        self._size -= 1
+        self._extras.pop((frame_num, track_id), None)
+        self._frame_rows.pop(frame_num, None)
+        self._version += 1
+
+    # ---------------- truy cập theo cột (dùng cho các bước tính trên toàn bộ video) ----------------
+    @property
+    def track_ids(self):
+        return self._track_ids[:self._size]
+
+    def frame_index(self):
+        # số thứ tự khung hình của từng dòng
+        return np.repeat(np.arange(self._num_frames), np.diff(self._starts[:self._num_frames + 1]))
+
+    def column(self, name):
+        # trả về (giá trị, mask) của trường name cho tất cả các dòng, mask[i] là dòng i đã có trường này
+        return self._values[name][:self._size], self._present[:self._size, FIELD_INDEX[name]]
+
+    def set_column(self, name, values, rows=None):
+        # gán trường name cho các dòng rows (mặc định tất cả các dòng) trong một lần
+        rows = slice(0, self._size) if rows is None else rows
+        self._values[name][rows] = values
+        self._present[rows, FIELD_INDEX[name]] = True
+
+    def nbytes(self):
+        arrays = [self._track_ids[:self._size], self._present[:self._size], self._starts]
+        arrays += [values[:self._size] for values in self._values.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def to_list(self):
+        # chuyển về list các dictionary như cũ
+        return [{track_id: dict(track.items()) for track_id, track in frame.items()} for frame in self]
+
+    def __getstate__(self):
+        # chỉ lưu phần đang dùng của các mảng khi pickle (StageCache, tiến trình con của SegmentParallelPipeline)
+        state = self.__dict__.copy()
+        state['_track_ids'] = self._track_ids[:self._size].copy()
+        state['_present'] = self._present[:self._size].copy()
+        state['_values'] = {name: values[:self._size].copy() for name, values in self._values.items()}
+        state['_starts'] = self._starts[:self._num_frames + 1].copy()
+        state['_frame_rows'] = OrderedDict()
+        return state
+
+class FrameView(MutableMapping):
+    # các đối tượng của một khung hình, dùng như dictionary {track_id: {...}}
+    def __init__(self, object_tracks, frame_num):
+        self.object_tracks = object_tracks
+        self.frame_num = frame_num
+
+    def __getitem__(self, track_id):
+        row = self.object_tracks.find_row(self.frame_num, track_id)
+        if row == -1:
+            raise KeyError(track_id)
+        return TrackView(self.object_tracks, self.frame_num, track_id, row=row)
+
+    def __setitem__(self, track_id, track):
+        track = dict(track.items()) # sao chép trước khi xóa, track có thể là view của chính dòng này
+        object_tracks = self.object_tracks
+        row = object_tracks.find_row(self.frame_num, track_id)
+        if row == -1:
+            row = object_tracks.insert_row(self.frame_num, track_id)
+        else:
+            object_tracks._present[row] = False
+            object_tracks._extras.pop((self.frame_num, track_id), None)
+        view = TrackView(object_tracks, self.frame_num, track_id, row=row)
+        for key, value in track.items():
+            view[key] = value
+
+    def __delitem__(self, track_id):
+        self.object_tracks.delete_row(self.frame_num, track_id)
+
+    def __contains__(self, track_id):
+        return track_id in self.object_tracks.frame_rows(self.frame_num)
+
+    def __iter__(self):
+        return iter(self.object_tracks.frame_track_ids(self.frame_num).tolist())
+
+    def __len__(self):
+        start, stop = self.object_tracks.frame_slice(self.frame_num)
+        return stop - start
+
+    def __repr__(self):
+        return repr({track_id: dict(track.items()) for track_id, track in self.items()})
+
+class TrackView(MutableMapping):
+    # thông tin của một đối tượng trong một khung hình, dùng như dictionary {'bbox': ..., 'team': ..., ...}
+    def __init__(self, object_tracks, frame_num, track_id, row=None):
+        self.object_tracks = object_tracks
+        self.frame_num = frame_num
+        self.track_id = track_id
+        self._row = row
+        self._version = object_tracks._version if row is not None else None
+
+    @property
+    def row(self):
+        if self._version != self.object_tracks._version:
+            self._row = self.object_tracks.find_row(self.frame_num, self.track_id)
+            self._version = self.object_tracks._version
+            if self._row == -1:
+                raise KeyError(self.track_id)
+        return self._row
+
+    def __getitem__(self, key):
+        object_tracks = self.object_tracks
+        if key in FIELD_INDEX and object_tracks._present[self.row, FIELD_INDEX[key]]:
+            return FIELDS[key][2](object_tracks._values[key][self.row])
+        extras = object_tracks._extras.get((self.frame_num, self.track_id))
+        if extras is not None and key in extras:
+            return extras[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        object_tracks = self.object_tracks
+        row = self.row
+        encoded = encode_value(key, value) if key in FIELD_INDEX else None
+        extras = object_tracks._extras.get((self.frame_num, self.track_id))
+        if encoded is not None:
+            object_tracks._values[key][row] = encoded
+            object_tracks._present[row, FIELD_INDEX[key]] = True
+            if extras is not None:
+                extras.pop(key, None)
+            return
+        if key in FIELD_INDEX:
+            object_tracks._present[row, FIELD_INDEX[key]] = False
+        object_tracks._extras.setdefault((self.frame_num, self.track_id), {})[key] = value
+
+    def __delitem__(self, key):
+        object_tracks = self.object_tracks
+        if key in FIELD_INDEX and object_tracks._present[self.row, FIELD_INDEX[key]]:
+            object_tracks._present[self.row, FIELD_INDEX[key]] = False
+            return
+        extras = object_tracks._extras.get((self.frame_num, self.track_id))
+        if extras is None or key not in extras:
+            raise KeyError(key)
+        del extras[key]
+
+    def __iter__(self):
+        present = self.object_tracks._present[self.row]
+        keys = [name for name, is_present in zip(FIELD_NAMES, present) if is_present]
+        keys += list(self.object_tracks._extras.get((self.frame_num, self.track_id), {}))
+        return iter(keys)
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+class TrackStore(MutableMapping):
+    '''
+    Thay cho dictionary tracks = {"players": [...], "referees": [...], "ball": [...]}:
+    tracks['players'] là một ObjectTracks, gán tracks['ball'] = list các dictionary sẽ được chuyển thành ObjectTracks.
+    '''
+    def __init__(self, tracks=None, object_names=("players", "referees", "ball")):
+        self.objects = {object_name: ObjectTracks() for object_name in object_names}
+        for object_name, object_tracks in (tracks or {}).items():
+            self[object_name] = object_tracks
+
+    @classmethod
+    def from_dict(cls, tracks):
+        # chuyển tracks kiểu cũ (ví dụ đọc từ file stub) sang TrackStore, TrackStore thì giữ nguyên
+        return tracks if isinstance(tracks, TrackStore) else cls(tracks)
+
+    def __getitem__(self, object_name):
+        return self.objects[object_name]
+
+    def __setitem__(self, object_name, object_tracks):
+        self.objects[object_name] = object_tracks if isinstance(object_tracks, ObjectTracks) else ObjectTracks(object_tracks)
+
+    def __delitem__(self, object_name):
+        del self.objects[object_name]
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __repr__(self):
+        return f"TrackStore({', '.join(f'{name}: {tracks!r}' for name, tracks in self.objects.items())})"
+
+    def nbytes(self):
+        return sum(object_tracks.nbytes() for object_tracks in self.objects.values())
+
+    def to_dict(self):
+        return {object_name: object_tracks.to_list() for object_name, object_tracks in self.objects.items()}
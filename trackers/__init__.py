@@ -0,0 +1,3 @@
+from .tracker import Tracker
+from .ball_interpolator import BallInterpolator
+from .online_ball_interpolator import OnlineBallInterpolator
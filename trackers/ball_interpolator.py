@@ -0,0 +1,160 @@
+import numpy as np
+from scipy.interpolate import CubicSpline
+import sys
+sys.path.append('../')
+from track_store import ObjectTracks
+
+class BallInterpolator(): # nội suy vị trí bóng ở các khung hình không phát hiện được bóng
+    '''
+    Thay cho DataFrame.interpolate() + bfill() của pandas, bbox bóng của cả video là một mảng (số khung hình, 4), NaN ở khung hình không có bóng:
+    - method='linear': nội suy tuyến tính giữa hai khung hình có bóng ở hai đầu khoảng trống
+    - method='spline': spline bậc 3 qua spline_context khung hình có bóng ở mỗi bên khoảng trống (bóng bay theo đường cong)
+    - method='kalman': bộ lọc Kalman vận tốc không đổi cho tâm bóng, làm mượt RTS (Rauch-Tung-Striebel) trên từng khoảng trống,
+      kích thước bbox vẫn nội suy tuyến tính
+    - max_gap: khoảng trống dài hơn max_gap khung hình (bóng bị che lâu, ra ngoài khung hình...) thì không nội suy, None là không giới hạn
+    - khoảng trống ở đầu video lấy bbox bóng đầu tiên, ở cuối video giữ bbox bóng cuối cùng (giống interpolate + bfill cũ)
+    Mỗi khung hình có cờ interpolated (True nếu bbox bóng là nội suy), dùng OnlineBallInterpolator cho streaming.
+    '''
+    METHODS = ('linear', 'spline', 'kalman')
+
+    def __init__(self, method='linear', max_gap=None, spline_context=2, process_noise=1.0, measurement_noise=2.0):
+        if method not in self.METHODS:
+            raise ValueError(f"❌ Kiểu nội suy bóng không hợp lệ: {method}, chọn một trong {self.METHODS}")
+        self.method = method
+        self.max_gap = max_gap # số khung hình tối đa của một khoảng trống được nội suy
+        self.spline_context = spline_context # số khung hình có bóng mỗi bên khoảng trống dùng cho spline
+        self.process_noise = process_noise # độ lệch chuẩn gia tốc của bóng (pixel/khung hình^2) trong mô hình Kalman
+        self.measurement_noise = measurement_noise # độ lệch chuẩn sai số detection của tâm bóng (pixel)
+        self.transition = np.array([[1.0, 1.0], [0.0, 1.0]]) # trạng thái (vị trí, vận tốc) sau một khung hình
+        self.process_covariance = process_noise**2 * np.array([[0.25, 0.5], [0.5, 1.0]])
+
+    def get_params(self): # tham số ảnh hưởng đến kết quả, dùng cho khóa của StageCache
+        return dict(ball_interpolation=self.method, ball_max_gap=self.max_gap, spline_context=self.spline_context,
+                    process_noise=self.process_noise, measurement_noise=self.measurement_noise)
+
+    def interpolate_ball_positions(self, ball_positions):
+        # ball_positions là list {track_id: {'bbox': ...}} của từng khung hình (hoặc ObjectTracks),
+        # trả về list {1: {'bbox': ..., 'interpolated': ...}}, {} ở khung hình không có bóng sau khi nội suy
+        bboxes, interpolated = self.interpolate_bboxes(self.get_ball_bboxes(ball_positions))
+        has_bbox = ~np.isnan(bboxes).any(axis=1)
+        return [{1: {"bbox": bbox, "interpolated": flag}} if has else {}
+                for bbox, flag, has in zip(bboxes.tolist(), interpolated.tolist(), has_bbox.tolist())]
+
+    @staticmethod
+    def get_ball_bboxes(ball_positions):
+        # bbox của bóng (track_id 1) ở từng khung hình, NaN nếu không có
+        bboxes = np.full((len(ball_positions), 4), np.nan)
+        if isinstance(ball_positions, ObjectTracks): # tracks dạng cột: lấy thẳng cả cột bbox
+            values, has_bbox = ball_positions.column('bbox')
+            rows = np.flatnonzero(has_bbox & (ball_positions.track_ids == 1))
+            bboxes[ball_positions.frame_index()[rows]] = values[rows]
+            return bboxes
+        for frame_num, ball_track in enumerate(ball_positions):
+            bbox = ball_track.get(1, {}).get('bbox')
+            if bbox is not None and len(bbox) == 4:
+                bboxes[frame_num] = bbox
+        return bboxes
+
+    def interpolate_bboxes(self, bboxes):
+        '''
+        logic hàm này là:
+        1. Tìm các khung hình không có bóng và độ dài khoảng trống chứa chúng, bỏ các khoảng trống dài hơn max_gap
+        2. Khoảng trống ở hai đầu video lấy bbox bóng đầu tiên/cuối cùng
+        3. Khoảng trống giữa video: linear dùng np.interp cho tất cả khung hình cùng lúc,
+           spline nội suy từng khoảng trống, kalman chạy bộ lọc Kalman cho cả video rồi làm mượt từng khoảng trống
+        Trả về (bboxes đã nội suy với NaN ở khung hình không nội suy được, mảng bool interpolated).
+        '''
+        bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 4)
+        detected = ~np.isnan(bboxes).any(axis=1)
+        bboxes[~detected] = np.nan
+        known_frames = np.flatnonzero(detected)
+        missing = np.flatnonzero(~detected)
+        interpolated = np.zeros(len(bboxes), dtype=bool)
+        if len(known_frames) == 0 or len(missing) == 0:
+            return bboxes, interpolated
+
+        gap_id = np.cumsum(np.r_[True, np.diff(missing) > 1]) - 1 # khoảng trống chứa từng khung hình thiếu
+        gap_length = np.bincount(gap_id)[gap_id]
+        fill = missing if self.max_gap is None else missing[gap_length <= self.max_gap]
+        interpolated[fill] = True
+
+        position = np.searchsorted(known_frames, fill)
+        outside = (position == 0) | (position == len(known_frames)) # trước bóng đầu tiên hoặc sau bóng cuối cùng
+        bboxes[fill[outside]] = bboxes[known_frames[np.minimum(position[outside], len(known_frames) - 1)]]
+
+        inside = fill[~outside]
+        if len(inside) == 0:
+            return bboxes, interpolated
+        if self.method == 'linear':
+            for column in range(4):
+                bboxes[inside, column] = np.interp(inside, known_frames, bboxes[known_frames, column])
+            return bboxes, interpolated
+
+        states = self.run_kalman_filter(bboxes, detected, known_frames[0]) if self.method == 'kalman' else None
+        for gap_frames in np.split(inside, np.flatnonzero(np.diff(inside) > 1) + 1):
+            position = np.searchsorted(known_frames, gap_frames[0])
+            if self.method == 'spline':
+                context = known_frames[max(position - self.spline_context, 0):position + self.spline_context]
+                bboxes[gap_frames] = self.fill_gap(gap_frames, context, bboxes[context])
+            else:
+                context = known_frames[position - 1:position + 1]
+                gap_states = [states[frame_num] for frame_num in gap_frames] + [states[context[1]]]
+                bboxes[gap_frames] = self.fill_gap_kalman(gap_frames, context, bboxes[context], gap_states)
+        return bboxes, interpolated
+
+    def fill_gap(self, gap_frames, known_frames, known_bboxes, method=None):
+        # bbox ở các khung hình gap_frames từ các khung hình có bóng known_frames quanh khoảng trống (tuyến tính hoặc spline)
+        known_frames, known_bboxes = np.asarray(known_frames), np.asarray(known_bboxes, dtype=np.float64)
+        if (method or self.method) == 'spline' and len(known_frames) > 2:
+            return CubicSpline(known_frames, known_bboxes, axis=0)(gap_frames)
+        # tuyến tính giữa khung hình có bóng ngay trước và ngay sau khoảng trống, cùng phép tính với np.interp trên cả video
+        before = np.searchsorted(known_frames, gap_frames[0]) - 1
+        return np.stack([np.interp(gap_frames, known_frames[before:before + 2], known_bboxes[before:before + 2, column])
+                         for column in range(4)], axis=1)
+
+    @staticmethod
+    def get_centers(bboxes):
+        bboxes = np.asarray(bboxes, dtype=np.float64)
+        return np.stack([(bboxes[..., 0] + bboxes[..., 2]) / 2, (bboxes[..., 1] + bboxes[..., 3]) / 2], axis=-1)
+
+    def kalman_step(self, state, center):
+        '''
+        Một khung hình của bộ lọc Kalman vận tốc không đổi, hai trục x, y độc lập nhưng cùng ma trận hiệp phương sai:
+        mean có dạng (2 trạng thái: vị trí, vận tốc) x (2 trục), state là (mean, covariance) đã lọc và (mean, covariance) dự đoán.
+        state=None là khung hình có bóng đầu tiên, center=None là khung hình không có bóng (chỉ dự đoán).
+        '''
+        if state is None:
+            mean = np.array([center, [0.0, 0.0]])
+            covariance = np.diag([self.measurement_noise**2, 100.0]) # chưa biết vận tốc: độ lệch chuẩn 10 pixel/khung hình
+            return mean, covariance, mean, covariance
+        predicted_mean = self.transition @ state[0]
+        predicted_covariance = self.transition @ state[1] @ self.transition.T + self.process_covariance
+        if center is None:
+            return predicted_mean, predicted_covariance, predicted_mean, predicted_covariance
+        gain = predicted_covariance[:, 0] / (predicted_covariance[0, 0] + self.measurement_noise**2)
+        mean = predicted_mean + np.outer(gain, center - predicted_mean[0])
+        covariance = predicted_covariance - np.outer(gain, predicted_covariance[0])
+        return mean, covariance, predicted_mean, predicted_covariance
+
+    def run_kalman_filter(self, bboxes, detected, first_frame):
+        # trạng thái Kalman của từng khung hình từ khung hình có bóng đầu tiên
+        centers = self.get_centers(bboxes)
+        states = [None] * len(bboxes)
+        state = None
+        for frame_num in range(first_frame, len(bboxes)):
+            state = states[frame_num] = self.kalman_step(state, centers[frame_num] if detected[frame_num] else None)
+        return states
+
+    def fill_gap_kalman(self, gap_frames, known_frames, known_bboxes, gap_states):
+        # làm mượt RTS ngược từ khung hình có bóng ngay sau khoảng trống (gap_states[-1]), tâm bóng lấy từ trạng thái đã làm mượt,
+        # kích thước bbox nội suy tuyến tính giữa known_frames (khung hình có bóng ngay trước và ngay sau khoảng trống)
+        linear = self.fill_gap(gap_frames, known_frames, known_bboxes, method='linear')
+        centers = np.empty((len(gap_frames), 2))
+        smoothed = gap_states[-1][0]
+        for index in range(len(gap_frames) - 1, -1, -1):
+            filtered_mean, filtered_covariance = gap_states[index][:2]
+            predicted_mean, predicted_covariance = gap_states[index + 1][2:]
+            gain = filtered_covariance @ self.transition.T @ np.linalg.inv(predicted_covariance)
+            smoothed = filtered_mean + gain @ (smoothed - predicted_mean)
+            centers[index] = smoothed[0]
+        return linear + np.tile(centers - self.get_centers(linear), 2)
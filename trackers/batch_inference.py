@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+import cv2
+import numpy as np
+sys.path.append('../')
+from utils import iter_batches, iter_prefetched
+
+def letterbox_batch(frames, imgsz=640, stride=32, auto=True, color=114):
+    '''
+    Letterbox giống ultralytics (LetterBox): thu nhỏ giữ tỉ lệ để cạnh dài bằng imgsz rồi thêm viền màu color cho đủ kích thước,
+    auto=True chỉ thêm viền tới bội số gần nhất của stride (mô hình .pt), auto=False thêm viền thành imgsz x imgsz (ONNX, OpenVINO).
+    Các khung hình phải cùng kích thước. Trả về (mảng uint8 (N, cao, rộng, 3) BGR, tỉ lệ thu nhỏ, (lề trái, lề trên)).
+    '''
+    height, width = frames[0].shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    pad_width, pad_height = imgsz - new_width, imgsz - new_height
+    if auto:
+        pad_width, pad_height = pad_width % stride, pad_height % stride
+    left, top = int(round(pad_width / 2 - 0.1)), int(round(pad_height / 2 - 0.1))
+    inputs = np.full((len(frames), new_height + pad_height, new_width + pad_width, 3), color, dtype=np.uint8)
+    for index, frame in enumerate(frames):
+        resized = frame if (new_width, new_height) == (width, height) else cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        inputs[index, top:top + new_height, left:left + new_width] = resized
+    return inputs, ratio, (left, top)
+
+class BatchInferenceEngine(): # chạy YOLO theo lô với kích thước lô, độ phân giải và độ chính xác (half/fp32) cấu hình được
+    '''
+    Lớp này thay cho vòng lặp chia lô cố định 20 khung hình trong Tracker.detect_frames:
+    1. Kích thước lô ban đầu là batch_size, bị giới hạn theo bộ nhớ còn trống (GPU nếu có, nếu không thì MemAvailable của RAM)
+       chia cho bộ nhớ mỗi khung hình (frame_memory, mặc định ước lượng từ imgsz rồi đo lại sau lô đầu tiên)
+    2. Nếu inference bị hết bộ nhớ thì giảm một nửa kích thước lô và chạy lại lô đó (adaptive)
+    3. Một luồng nền chuẩn bị lô tiếp theo (letterbox về imgsz, BGR -> RGB, chuẩn hóa về [0, 1], tensor NCHW) trong khi lô hiện tại
+       đang chạy inference (overlap), mô hình nhận tensor đã sẵn sàng nên predict chỉ còn inference và NMS,
+       bbox được đổi lại về tọa độ của khung hình gốc
+    4. Kết quả được trả về lần lượt từng khung hình (generator) thay vì gom vào một list lớn
+    Khi torch chưa được nạp (mô hình không phải ultralytics) hoặc các khung hình khác kích thước, khung hình được đưa thẳng vào predict.
+    '''
+    ACTIVATION_FACTOR = 64 # bộ nhớ ước lượng mỗi khung hình = kích thước tensor đầu vào x hệ số này (activation của mạng), chỉ dùng trước khi đo được
+
+    def __init__(self, model, batch_size=20, imgsz=640, half=False, device=None, conf=0.1, overlap=True, adaptive=True,
+                 frame_memory=None, letterbox_auto=True, prepare_inputs=True):
+        self.model = model
+        self.batch_size = batch_size # kích thước lô hiện tại, có thể giảm khi hết bộ nhớ
+        self.imgsz = imgsz # độ phân giải đầu vào của mô hình
+        self.half = half # dùng fp16 (chỉ có tác dụng trên GPU)
+        self.device = device # None để ultralytics tự chọn, ví dụ 'cpu', 'cuda:0'
+        self.conf = conf # ngưỡng độ tin cậy khi dự đoán
+        self.overlap = overlap # chuẩn bị lô tiếp theo trên luồng nền
+        self.adaptive = adaptive # tự điều chỉnh kích thước lô theo bộ nhớ
+        self.max_batch_size = batch_size # kích thước lô yêu cầu, giới hạn trên khi tăng lại kích thước lô sau khi đo bộ nhớ
+        # bộ nhớ (byte) mỗi khung hình khi inference, None thì ước lượng từ imgsz và đo lại sau lô đầu tiên
+        self.frame_memory = frame_memory
+        self.measure_frame_memory = frame_memory is None
+        self.letterbox_auto = letterbox_auto # True: viền tới bội số của stride (.pt), False: imgsz x imgsz (ONNX, OpenVINO export cố định kích thước)
+        self.prepare_inputs = prepare_inputs # chuẩn bị tensor đầu vào trên luồng nền (cần torch)
+
+        self.frames_processed = 0
+        self.inference_time = 0.0
+
+        if self.adaptive:
+            self.batch_size = max(1, min(self.batch_size, self.memory_batch_limit()))
+
+    def iter_predictions(self, frames):
+        '''
+        logic hàm này là:
+        1. Chia frames (list hoặc VideoFrameReader) thành các lô, chuẩn bị tensor đầu vào của từng lô (prepare_batch),
+           nếu overlap thì việc chia lô và chuẩn bị tensor chạy trên luồng nền, chồng lên inference của lô trước
+        2. Chạy inference cho từng lô, lô lớn hơn kích thước lô hiện tại (sau khi bị giảm) sẽ được chia nhỏ
+        3. Trả về lần lượt (frame, detection) theo đúng thứ tự khung hình
+        '''
+        batches = (self.prepare_batch(batch) for batch in iter_batches(frames, self.batch_size))
+        if self.overlap:
+            batches = iter_prefetched(batches, prefetch_size=2)
+        for batch, prepared in batches:
+            for frame, detection in zip(batch, self.predict_batch(batch, prepared)):
+                yield frame, detection
+
+    def prepare_batch(self, frames):
+        # letterbox + tensor NCHW float [0, 1] RGB của một lô (chạy trên luồng nền khi overlap), trả về (frames, (tensor, tỉ lệ, lề)) hoặc (frames, None)
+        torch = sys.modules.get('torch') # ultralytics đã import torch, không import thêm nếu chưa có
+        if not self.prepare_inputs or torch is None or len(frames) == 0 or any(frame.shape != frames[0].shape for frame in frames):
+            return frames, None
+        inputs, ratio, pad = letterbox_batch(frames, self.imgsz, auto=self.letterbox_auto)
+        tensor = torch.from_numpy(np.ascontiguousarray(inputs[..., ::-1].transpose(0, 3, 1, 2))).float().div_(255.0)
+        if self.device is not None and str(self.device) != 'cpu':
+            tensor = tensor.pin_memory().to(self.device, non_blocking=True)
+        return frames, (tensor, ratio, pad)
+
+    @staticmethod
+    def restore_boxes(detection, frame, ratio, pad):
+        # bbox của ảnh đã letterbox -> tọa độ của khung hình gốc (bỏ lề, chia tỉ lệ, cắt trong khung hình), giống ultralytics scale_boxes
+        height, width = frame.shape[:2]
+        boxes = detection.boxes.data
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / ratio).clip(0, width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / ratio).clip(0, height)
+        detection.orig_img = frame
+        detection.orig_shape = detection.boxes.orig_shape = (height, width)
+        return detection
+
+    def predict_batch(self, frames, prepared=None):
+        # chạy inference cho một lô (tensor đã chuẩn bị nếu có), nếu hết bộ nhớ thì giảm kích thước lô và chạy lại phần chưa xong
+        inputs = frames if prepared is None else prepared[0]
+        detections = []
+        start = 0
+        while start < len(frames):
+            chunk = inputs[start:start + self.batch_size]
+            try:
+                memory_before = self.start_memory_measurement()
+                inference_start = time.perf_counter()
+                chunk_detections = self.model.predict(chunk, conf=self.conf, imgsz=self.imgsz, half=self.half, device=self.device, verbose=False)
+                self.inference_time += time.perf_counter() - inference_start
+                self.finish_memory_measurement(memory_before, len(chunk))
+            except Exception as e:
+                if not (self.adaptive and self.is_out_of_memory(e) and self.batch_size > 1):
+                    raise
+                self.batch_size = max(1, self.batch_size // 2)
+                self.max_batch_size = self.batch_size # không tăng lại quá kích thước đã bị hết bộ nhớ
+                self.release_memory()
+                print(f"⚠️ Hết bộ nhớ khi inference, giảm kích thước lô xuống {self.batch_size}")
+                continue
+            if prepared is not None:
+                chunk_detections = [self.restore_boxes(detection, frame, prepared[1], prepared[2])
+                                    for detection, frame in zip(chunk_detections, frames[start:start + len(chunk)])]
+            detections += chunk_detections
+            start += len(chunk)
+        self.frames_processed += len(frames)
+        return detections
+
+    def memory_batch_limit(self):
+        # số khung hình tối đa mỗi lô theo bộ nhớ còn trống, chỉ dùng một nửa bộ nhớ còn trống để dự phòng
+        free_memory = self.available_memory()
+        if free_memory is None:
+            return self.max_batch_size
+        return max(1, int(free_memory * 0.5 // self.get_frame_memory()))
+
+    def get_frame_memory(self):
+        # bộ nhớ mỗi khung hình: đã cấu hình/đo được, nếu chưa thì ước lượng từ tensor đầu vào imgsz x imgsz x 3
+        if self.frame_memory is not None:
+            return self.frame_memory
+        return self.imgsz * self.imgsz * 3 * (2 if self.half else 4) * self.ACTIVATION_FACTOR
+
+    def use_gpu(self):
+        torch = sys.modules.get('torch')
+        return torch is not None and torch.cuda.is_available() and str(self.device or 'cuda') != 'cpu'
+
+    def start_memory_measurement(self):
+        # bộ nhớ trước lô đầu tiên: GPU là bộ nhớ đang cấp phát (đặt lại đỉnh), CPU là đỉnh RSS của tiến trình; None nếu không cần/không đo được
+        if not (self.adaptive and self.measure_frame_memory):
+            return None
+        if self.use_gpu():
+            torch = sys.modules['torch']
+            torch.cuda.reset_peak_memory_stats()
+            return torch.cuda.memory_allocated()
+        return self.peak_rss()
+
+    def finish_memory_measurement(self, memory_before, num_frames):
+        # đo bộ nhớ thật mỗi khung hình sau lô đầu tiên rồi tính lại kích thước lô (không vượt batch_size yêu cầu)
+        if memory_before is None:
+            return
+        self.measure_frame_memory = False
+        memory_after = sys.modules['torch'].cuda.max_memory_allocated() if self.use_gpu() else self.peak_rss()
+        if memory_after is None or memory_after <= memory_before: # đỉnh RSS đã cao hơn từ trước (đọc video, nạp mô hình): giữ ước lượng
+            return
+        self.frame_memory = (memory_after - memory_before) / num_frames
+        self.batch_size = max(1, min(self.max_batch_size, self.memory_batch_limit()))
+
+    @staticmethod
+    def peak_rss():
+        # đỉnh bộ nhớ RSS của tiến trình (byte), None trên Windows
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024 # Linux trả về KB, macOS trả về byte
+
+    def available_memory(self):
+        # bộ nhớ còn trống (byte) của thiết bị chạy inference, None nếu không xác định được
+        if self.use_gpu():
+            try:
+                free_memory, _ = sys.modules['torch'].cuda.mem_get_info()
+                return free_memory
+            except Exception:
+                return None
+        return get_available_ram()
+
+    @staticmethod
+    def is_out_of_memory(error):
+        return isinstance(error, MemoryError) or 'out of memory' in str(error).lower()
+
+    @staticmethod
+    def release_memory():
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def stats(self):
+        return {
+            'frames_processed': self.frames_processed,
+            'inference_time': self.inference_time,
+            'inference_fps': self.frames_processed / self.inference_time if self.inference_time > 0 else 0.0,
+            'batch_size': self.batch_size,
+        }
+
+def get_available_ram():
+    '''
+    RAM có thể cấp phát (byte): MemAvailable trong /proc/meminfo (tính cả page cache thu hồi được, khác MemFree/SC_AVPHYS_PAGES),
+    không có thì dùng psutil nếu đã cài, cuối cùng là số trang trống. None nếu không xác định được.
+    '''
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024 # kB
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError): # không hỗ trợ trên Windows
+        return None
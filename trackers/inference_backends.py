@@ -0,0 +1,85 @@
+import os
+import importlib.util
+from ultralytics import YOLO
+
+'''
+Các inference backend cho Tracker, chọn bằng tham số inference_backend của Tracker (tùy chọn --inference-backend của main.py):
+- torch: chạy trực tiếp file .pt bằng ultralytics/PyTorch (mặc định)
+- onnx: export một lần sang ONNX rồi chạy bằng ONNX Runtime, int8=True thì lượng tử hóa trọng số sang INT8 (dynamic quantization)
+- openvino: export một lần sang OpenVINO IR rồi chạy bằng OpenVINO, int8=True thì lượng tử hóa INT8 với dữ liệu hiệu chỉnh calibration_data
+File export được lưu cạnh file .pt và chỉ export lại khi file .pt mới hơn.
+Mô hình trả về vẫn là ultralytics.YOLO nên kết quả predict (boxes.xyxy, boxes.conf, boxes.cls, names) giống hệt backend torch.
+'''
+
+INFERENCE_BACKENDS = ['torch', 'onnx', 'openvino']
+BACKEND_REQUIREMENTS = {'onnx': ['onnx', 'onnxruntime'], 'openvino': ['openvino']} # thư viện cần có cho từng backend
+CALIBRATION_DATA = 'FutVAR-Football-Players-Detection-Dataset-10/data.yaml' # dữ liệu hiệu chỉnh cho INT8 của OpenVINO
+
+def load_detection_model(model_path, backend='torch', int8=False, imgsz=640, calibration_data=CALIBRATION_DATA):
+    '''
+    logic hàm này là:
+    1. Backend torch thì nạp file .pt như trước
+    2. Kiểm tra thư viện của backend, nếu thiếu thì báo và dùng backend torch
+    3. Export file .pt sang định dạng của backend nếu chưa có hoặc đã cũ
+    4. Nạp file đã export bằng ultralytics.YOLO
+    Trả về (mô hình, backend thực sự được dùng): khi thiếu thư viện thì backend là 'torch' để khóa cache theo đúng backend đã chạy.
+    '''
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"❌ Không có inference backend '{backend}', chọn một trong: {', '.join(INFERENCE_BACKENDS)}")
+    if backend == 'torch':
+        return YOLO(model_path), 'torch'
+
+    missing = get_missing_requirements(backend)
+    if missing:
+        print(f"⚠️ Thiếu thư viện {', '.join(missing)} cho inference backend '{backend}', dùng backend torch.")
+        print(f"  Install with: pip install {' '.join(missing)}")
+        return YOLO(model_path), 'torch'
+
+    exported_path = export_model(model_path, backend, int8=int8, imgsz=imgsz, calibration_data=calibration_data)
+    return YOLO(exported_path, task='detect'), backend
+
+def export_model(model_path, backend, int8=False, imgsz=640, calibration_data=CALIBRATION_DATA):
+    # export file .pt sang ONNX hoặc OpenVINO một lần, trả về đường dẫn file/thư mục đã export
+    exported_path = get_exported_path(model_path, backend, int8=int8)
+    if os.path.exists(exported_path) and os.path.getmtime(exported_path) >= os.path.getmtime(model_path):
+        return exported_path
+
+    print(f"⚙️ Đang export {model_path} sang {backend}{' INT8' if int8 else ''}: {exported_path}")
+    model = YOLO(model_path)
+    if backend == 'onnx':
+        # dynamic=True để chạy được với mọi kích thước lô của BatchInferenceEngine
+        onnx_path = model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+        if int8:
+            quantize_onnx_model(onnx_path, exported_path)
+    else:
+        export_kwargs = dict(format='openvino', imgsz=imgsz, dynamic=True)
+        if int8:
+            export_kwargs.update(int8=True, data=calibration_data)
+        openvino_path = model.export(**export_kwargs)
+        if os.path.abspath(openvino_path) != os.path.abspath(exported_path): # ultralytics tự đặt tên thư mục, đổi về tên của exported_path
+            os.replace(openvino_path, exported_path)
+    return exported_path
+
+def quantize_onnx_model(onnx_path, int8_path):
+    # lượng tử hóa trọng số sang INT8 (dynamic quantization của ONNX Runtime, không cần dữ liệu hiệu chỉnh)
+    import onnx
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    # giữ lại metadata (names, stride, imgsz) mà ultralytics cần khi nạp file ONNX
+    source_model = onnx.load(onnx_path)
+    int8_model = onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(source_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+
+def get_exported_path(model_path, backend, int8=False):
+    # models/best.pt -> models/best.onnx, models/best_int8.onnx, models/best_openvino_model/, models/best_int8_openvino_model/
+    stem = os.path.splitext(model_path)[0] + ('_int8' if int8 else '')
+    if backend == 'onnx':
+        return stem + '.onnx'
+    return stem + '_openvino_model'
+
+def get_missing_requirements(backend):
+    # danh sách thư viện còn thiếu để chạy backend
+    return [module for module in BACKEND_REQUIREMENTS.get(backend, []) if importlib.util.find_spec(module) is None]
@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+import sys
+sys.path.append('../')
+from camera_movement_estimator import CameraMovementEstimator
+
+class KeyframePropagator(): # chỉ chạy YOLO ở khung hình chính (keyframe), các khung hình ở giữa được suy ra từ khung hình trước
+    '''
+    Lớp này dùng cho chế độ keyframe của Tracker:
+    1. Khung hình chính là khung hình có frame_num chia hết cho keyframe_interval
+    2. Ở các khung hình khác, bbox của các đối tượng đang được theo dõi được dịch chuyển theo:
+       - flow: optical flow Lucas-Kanade của một lưới điểm bên trong mỗi bbox (trung vị độ dịch chuyển)
+       - motion: vận tốc không đổi tính từ hai khung hình chính gần nhất của mỗi track
+    3. Khung hình được chuyển thành khung hình chính (chạy YOLO ngay) khi:
+       - chuyển động camera (CameraMovementEstimator) lớn hơn max_camera_motion pixel
+       - độ bất định lớn hơn max_uncertainty: tỉ lệ bbox mà optical flow theo dõi thất bại (chỉ có ở chế độ flow)
+    '''
+    def __init__(self, keyframe_interval=1, propagation='flow', max_camera_motion=None, max_uncertainty=None):
+        if propagation not in ('flow', 'motion'):
+            raise ValueError(f"❌ Không có cách suy ra bbox '{propagation}', chọn flow hoặc motion")
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.propagation = propagation
+        self.max_camera_motion = max_camera_motion
+        self.max_uncertainty = max_uncertainty
+
+        self.lk_params = dict(
+            winSize = (15,15),
+            maxLevel = 2,
+            criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT,10,0.03)
+        ) # tham số cho thuật toán Lucas-Kanade, giống CameraMovementEstimator
+        self.grid = np.linspace(0.25, 0.75, 3) # vị trí tương đối của lưới 3x3 điểm bên trong bbox
+
+        self.reset()
+
+    def reset(self):
+        self.old_gray = None
+        self.track_ids = np.zeros(0, dtype=int)
+        self.boxes = np.zeros((0, 4))
+        self.class_ids = np.zeros(0, dtype=int)
+        self.velocities = np.zeros((0, 4)) # độ dịch chuyển bbox mỗi khung hình, dùng cho chế độ motion
+        self.anchors = {} # track_id -> (số thứ tự khung hình, bbox) ở khung hình chính gần nhất của track
+        self.camera_movement_estimator = None
+        self.propagated = None
+        self.uncertainty = 0.0
+        self.camera_motion = 0.0
+
+        self.num_frames = 0
+        self.num_keyframes = 0
+
+    def is_enabled(self):
+        # keyframe_interval=1 và không có ngưỡng nào thì mọi khung hình đều chạy YOLO, không cần dịch chuyển bbox
+        return self.keyframe_interval > 1 or self.max_camera_motion is not None or self.max_uncertainty is not None
+
+    def is_scheduled_keyframe(self, frame_num):
+        return frame_num % self.keyframe_interval == 0
+
+    def update(self, frame):
+        '''
+        Gọi cho mọi khung hình theo thứ tự, trước khi quyết định có chạy YOLO hay không:
+        1. Cập nhật chuyển động camera (nếu dùng ngưỡng camera)
+        2. Dịch chuyển bbox của khung hình trước sang khung hình hiện tại, lưu vào self.propagated
+        3. Trả về True nếu khung hình này cần chạy YOLO (không có bbox để dịch chuyển hoặc vượt ngưỡng)
+        '''
+        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.num_frames += 1
+
+        needs_detection = False
+        if self.max_camera_motion is not None:
+            if self.camera_movement_estimator is None:
+                self.camera_movement_estimator = CameraMovementEstimator(frame)
+            self.camera_motion = float(np.linalg.norm(self.camera_movement_estimator.get_frame_movement(frame)))
+            needs_detection = self.camera_motion > self.max_camera_motion
+
+        if self.old_gray is None:
+            self.propagated = None
+            needs_detection = True
+        elif self.propagation == 'flow':
+            self.propagated, self.uncertainty = self.propagate_with_flow(self.old_gray, frame_gray)
+        else:
+            self.propagated, self.uncertainty = self.boxes + self.velocities, 0.0
+
+        if self.max_uncertainty is not None and self.uncertainty > self.max_uncertainty:
+            needs_detection = True
+
+        self.old_gray = frame_gray
+        return needs_detection
+
+    def propagate_with_flow(self, old_gray, frame_gray):
+        # dịch chuyển tất cả bbox bằng một lần gọi calcOpticalFlowPyrLK, trả về (bbox mới, tỉ lệ bbox theo dõi thất bại)
+        if len(self.boxes) == 0:
+            return self.boxes.copy(), 0.0
+
+        grid_x, grid_y = np.meshgrid(self.grid, self.grid)
+        widths = (self.boxes[:, 2] - self.boxes[:, 0])[:, None]
+        heights = (self.boxes[:, 3] - self.boxes[:, 1])[:, None]
+        points_x = self.boxes[:, 0, None] + widths * grid_x.ravel()[None, :]
+        points_y = self.boxes[:, 1, None] + heights * grid_y.ravel()[None, :]
+        points = np.stack([points_x, points_y], axis=2).reshape(-1, 1, 2).astype(np.float32)
+
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(old_gray, frame_gray, points, None, **self.lk_params)
+        displacement = (new_points - points).reshape(len(self.boxes), -1, 2)
+        good = status.reshape(len(self.boxes), -1).astype(bool)
+
+        # trung vị độ dịch chuyển của các điểm theo dõi được, bbox có ít hơn một nửa số điểm theo dõi được thì giữ nguyên
+        masked = np.where(good[:, :, None], displacement, np.nan)
+        tracked = good.sum(axis=1) >= good.shape[1] / 2
+        shift = np.zeros((len(self.boxes), 2))
+        if tracked.any():
+            shift[tracked] = np.nanmedian(masked[tracked], axis=1)
+
+        propagated = self.boxes + np.concatenate([shift, shift], axis=1)
+        return propagated, float(1 - tracked.mean())
+
+    def observe(self, track_ids, boxes, class_ids, keyframe=True):
+        # lưu các bbox đã được gán id của khung hình hiện tại (keyframe: từ YOLO, nếu không: từ self.propagated) để dùng cho khung hình sau
+        track_ids = np.asarray(track_ids, dtype=int)
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        velocities = {track_id: velocity for track_id, velocity in zip(self.track_ids, self.velocities)}
+        if keyframe:
+            # vận tốc của chế độ motion tính giữa hai khung hình chính liên tiếp của mỗi track (bbox từ YOLO)
+            # không tính từ bbox đã dịch chuyển vì sai số dịch chuyển tích lũy sẽ bị cộng vào vận tốc
+            for track_id, box in zip(track_ids, boxes):
+                if track_id in self.anchors:
+                    anchor_frame, anchor_box = self.anchors[track_id]
+                    velocities[track_id] = (box - anchor_box) / max(1, self.num_frames - anchor_frame)
+            self.anchors = {track_id: (self.num_frames, box) for track_id, box in zip(track_ids, boxes)} # bỏ các track đã mất dấu
+        self.velocities = np.array([velocities.get(track_id, np.zeros(4)) for track_id in track_ids]).reshape(-1, 4)
+        self.track_ids = track_ids
+        self.boxes = boxes
+        self.class_ids = np.asarray(class_ids, dtype=int)
+
+    def stats(self):
+        return {
+            'frames': self.num_frames,
+            'keyframes': self.num_keyframes,
+            'keyframe_ratio': self.num_keyframes / self.num_frames if self.num_frames > 0 else 0.0,
+        }
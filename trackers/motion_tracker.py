@@ -0,0 +1,139 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+import sys
+sys.path.append('../')
+from utils import get_bbox_iou_matrix
+
+class MotionTracker(): # gán id cho các phát hiện bằng ma trận chi phí IoU + khoảng cách tâm, thuật toán Hungarian và bộ lọc Kalman vận tốc không đổi
+    '''
+    Lớp này thay cho vòng lặp cập nhật tracker CSRT cho từng phát hiện:
+    1. Mỗi track có trạng thái [cx, cy, w, h, vx, vy, vw, vh] (tâm, kích thước và vận tốc của chúng), tất cả track được lưu trong mảng numpy
+    2. Mỗi khung hình dự đoán vị trí mới của tất cả track một lần (mô hình vận tốc không đổi)
+    3. Tính ma trận chi phí giữa bbox dự đoán và bbox phát hiện: (1 - IoU) + khoảng cách tâm / max_distance, chỉ ghép cùng lớp
+    4. Giải bài toán ghép cặp bằng thuật toán Hungarian, cặp nào không đạt ngưỡng (IoU < min_iou và khoảng cách >= max_distance) thì bỏ
+    5. Cập nhật bộ lọc Kalman cho các track được ghép, track không được ghép tăng bộ đếm mất dấu và bị xóa khi vượt max_lost
+    6. Phát hiện không được ghép tạo track mới với id tiếp theo
+    '''
+    def __init__(self, max_lost=30, max_distance=50, min_iou=0.1, min_confidence=0.5):
+        self.max_lost = max_lost # số khung hình tối đa giữ track bị mất dấu
+        self.min_confidence = min_confidence # phát hiện có độ tin cậy thấp hơn ngưỡng này bị bỏ qua
+        self.max_distance = max_distance # khoảng cách tâm (pixel) tối đa để ghép, giống ngưỡng 50 của cách ghép cũ
+        self.min_iou = min_iou # IoU tối thiểu để ghép khi khoảng cách tâm lớn hơn max_distance
+        self.next_id = 1 # id cho track mới
+
+        # trạng thái của tất cả track
+        self.track_ids = np.zeros(0, dtype=int)
+        self.class_ids = np.zeros(0, dtype=int)
+        self.lost_counts = np.zeros(0, dtype=int)
+        self.states = np.zeros((0, 8))
+        self.covariances = np.zeros((0, 8, 8))
+
+        # mô hình vận tốc không đổi: vị trí mới = vị trí cũ + vận tốc
+        self.transition = np.eye(8)
+        self.transition[:4, 4:] = np.eye(4)
+        self.observation = np.eye(4, 8) # chỉ đo được [cx, cy, w, h]
+        self.process_noise = np.diag([1.0, 1.0, 1.0, 1.0, 0.5, 0.5, 0.1, 0.1])
+        self.measurement_noise = np.diag([4.0, 4.0, 10.0, 10.0])
+        self.initial_covariance = np.diag([10.0, 10.0, 10.0, 10.0, 100.0, 100.0, 10.0, 10.0])
+
+    def track(self, frame, boxes, confidences, class_ids):
+        # giao diện chung của các tracker backend (xem tracker_backends.py): trả về id cho từng phát hiện, -1 nếu phát hiện bị bỏ qua
+        track_ids = np.full(len(boxes), -1, dtype=int)
+        keep = np.asarray(confidences) >= self.min_confidence
+        track_ids[keep] = self.update(np.asarray(boxes)[keep], np.asarray(class_ids)[keep])
+        return track_ids.tolist()
+
+    def update(self, boxes, class_ids):
+        '''
+        logic hàm này là:
+        1. Dự đoán vị trí của tất cả track cho khung hình hiện tại
+        2. Ghép các phát hiện với track bằng ma trận chi phí và thuật toán Hungarian
+        3. Cập nhật track được ghép, tăng bộ đếm mất dấu và xóa track bị mất quá lâu
+        4. Tạo track mới cho các phát hiện không được ghép
+        Trả về danh sách id tương ứng với từng phát hiện (theo thứ tự của boxes)
+        '''
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        class_ids = np.asarray(class_ids, dtype=int).reshape(-1)
+        detection_ids = np.full(len(boxes), -1, dtype=int)
+
+        self.predict()
+
+        matched = np.zeros(len(self.track_ids), dtype=bool)
+        if len(boxes) > 0 and len(self.track_ids) > 0:
+            cost, valid = self.cost_matrix(boxes, class_ids)
+            rows, cols = linear_sum_assignment(np.where(valid, cost, 1e6))
+            keep = valid[rows, cols]
+            rows, cols = rows[keep], cols[keep]
+
+            self.correct(rows, self.to_measurements(boxes[cols]))
+            self.lost_counts[rows] = 0
+            matched[rows] = True
+            detection_ids[cols] = self.track_ids[rows]
+
+        # track không được ghép bị tăng bộ đếm mất dấu, vượt quá max_lost thì xóa
+        self.lost_counts[~matched] += 1
+        self.keep_tracks(self.lost_counts <= self.max_lost)
+
+        # phát hiện không được ghép tạo track mới, id được cấp theo thứ tự phát hiện
+        new_detections = np.flatnonzero(detection_ids == -1)
+        if len(new_detections) > 0:
+            new_ids = np.arange(self.next_id, self.next_id + len(new_detections))
+            self.next_id += len(new_detections)
+            detection_ids[new_detections] = new_ids
+            self.add_tracks(new_ids, boxes[new_detections], class_ids[new_detections])
+
+        return detection_ids.tolist()
+
+    def predict(self):
+        # dự đoán trạng thái của tất cả track bằng phép nhân ma trận theo lô
+        self.states = self.states @ self.transition.T
+        self.covariances = self.transition @ self.covariances @ self.transition.T + self.process_noise
+
+    def correct(self, rows, measurements):
+        # bước cập nhật của bộ lọc Kalman cho các track ở vị trí rows, tính theo lô
+        if len(rows) == 0:
+            return
+        states = self.states[rows]
+        covariances = self.covariances[rows]
+        innovation = measurements - states @ self.observation.T
+        innovation_covariance = self.observation @ covariances @ self.observation.T + self.measurement_noise
+        kalman_gain = covariances @ self.observation.T @ np.linalg.inv(innovation_covariance)
+        self.states[rows] = states + (kalman_gain @ innovation[:, :, None])[:, :, 0]
+        self.covariances[rows] = (np.eye(8) - kalman_gain @ self.observation) @ covariances
+
+    def cost_matrix(self, boxes, class_ids):
+        # ma trận chi phí (số track x số phát hiện) và mặt nạ các cặp được phép ghép
+        predicted_boxes = self.to_boxes(self.states)
+        iou = get_bbox_iou_matrix(predicted_boxes, boxes)
+        distance = np.linalg.norm(self.states[:, None, :2] - self.to_measurements(boxes)[None, :, :2], axis=2)
+        cost = (1 - iou) + distance / self.max_distance
+        valid = (self.class_ids[:, None] == class_ids[None, :]) & ((iou >= self.min_iou) | (distance < self.max_distance))
+        return cost, valid
+
+    def add_tracks(self, track_ids, boxes, class_ids):
+        states = np.zeros((len(boxes), 8))
+        states[:, :4] = self.to_measurements(boxes) # vận tốc ban đầu bằng 0
+        self.track_ids = np.concatenate([self.track_ids, track_ids])
+        self.class_ids = np.concatenate([self.class_ids, class_ids])
+        self.lost_counts = np.concatenate([self.lost_counts, np.zeros(len(boxes), dtype=int)])
+        self.states = np.concatenate([self.states, states])
+        self.covariances = np.concatenate([self.covariances, np.repeat(self.initial_covariance[None], len(boxes), axis=0)])
+
+    def keep_tracks(self, mask):
+        self.track_ids = self.track_ids[mask]
+        self.class_ids = self.class_ids[mask]
+        self.lost_counts = self.lost_counts[mask]
+        self.states = self.states[mask]
+        self.covariances = self.covariances[mask]
+
+    @staticmethod
+    def to_measurements(boxes):
+        # (x1, y1, x2, y2) -> (cx, cy, w, h)
+        return np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+                                boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]])
+
+    @staticmethod
+    def to_boxes(states):
+        # (cx, cy, w, h, ...) -> (x1, y1, x2, y2)
+        half_w, half_h = states[:, 2] / 2, states[:, 3] / 2
+        return np.column_stack([states[:, 0] - half_w, states[:, 1] - half_h, states[:, 0] + half_w, states[:, 1] + half_h])
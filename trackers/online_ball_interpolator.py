@@ -0,0 +1,124 @@
+from collections import deque
+import numpy as np
+from .ball_interpolator import BallInterpolator
+
+class OnlineBallInterpolator(): # nội suy vị trí bóng khi nhận từng khung hình (video trực tiếp)
+    '''
+    Cùng cách nội suy với BallInterpolator nhưng chỉ nhìn trước tối đa lookahead khung hình:
+    - push() nhận bbox bóng của khung hình tiếp theo (None nếu không có bóng), trả về các khung hình đã có bbox bóng cuối cùng
+      dạng list (frame_num, bbox hoặc None, interpolated), theo thứ tự khung hình
+    - Khoảng trống dài hơn max_gap (hoặc lookahead nếu nhỏ hơn) không được nội suy nên mỗi khung hình trễ tối đa lookahead khung hình
+    - 'spline' chờ thêm spline_context khung hình có bóng sau khoảng trống, chờ quá lookahead thì nội suy với các khung hình đã có
+    - 'kalman' chạy bộ lọc Kalman tiến ở mỗi khung hình, khi khoảng trống kết thúc thì làm mượt ngược trên khoảng trống đó
+    - flush() khi hết video: khoảng trống ở cuối giữ bbox bóng cuối cùng
+    Kết quả giống hệt BallInterpolator.interpolate_bboxes khi lookahead đủ lớn (không nhỏ hơn max_gap và đủ chờ spline_context).
+    '''
+    def __init__(self, ball_interpolator=None, lookahead=24):
+        self.interpolator = ball_interpolator if ball_interpolator is not None else BallInterpolator()
+        self.lookahead = lookahead
+        max_gap = self.interpolator.max_gap
+        self.max_gap = lookahead if max_gap is None else min(max_gap, lookahead)
+        self.reset()
+
+    def reset(self):
+        # bắt đầu video mới
+        self.frame_num = 0 # số thứ tự của khung hình tiếp theo
+        self.pending = deque() # [frame_num, bbox, interpolated, xong chưa, trạng thái Kalman] của các khung hình chưa trả về
+        self.known = deque(maxlen=max(self.interpolator.spline_context, 1)) # (frame_num, bbox) của các khung hình có bóng gần nhất
+        self.gap_start = None # khung hình đầu của khoảng trống đang mở
+        self.waiting = [] # các khoảng trống đã kết thúc đang chờ thêm khung hình có bóng phía sau (spline)
+        self.kalman_state = None
+
+    def push(self, ball_bbox):
+        '''
+        logic hàm này là:
+        1. Thêm khung hình vào hàng đợi, cập nhật bộ lọc Kalman (nếu dùng)
+        2. Không có bóng: mở/kéo dài khoảng trống, dài quá max_gap thì các khung hình của khoảng trống giữ nguyên không có bóng
+        3. Có bóng: thêm vào các khoảng trống đang chờ, kết thúc khoảng trống đang mở (nội suy ngay hoặc chờ thêm cho spline)
+        4. Khoảng trống chờ đủ điểm hoặc quá lookahead thì nội suy, trả về các khung hình đầu hàng đợi đã xong
+        '''
+        frame_num = self.frame_num
+        self.frame_num += 1
+        bbox = None if ball_bbox is None else np.asarray(ball_bbox, dtype=np.float64)
+        if bbox is not None and (bbox.shape != (4,) or np.isnan(bbox).any()):
+            bbox = None
+        if self.interpolator.method == 'kalman' and (self.kalman_state is not None or bbox is not None):
+            center = None if bbox is None else self.interpolator.get_centers(bbox)
+            self.kalman_state = self.interpolator.kalman_step(self.kalman_state, center)
+        self.pending.append([frame_num, bbox, False, bbox is not None, self.kalman_state])
+
+        if bbox is None:
+            if self.gap_start is None:
+                self.gap_start = frame_num
+            if frame_num - self.gap_start + 1 > self.max_gap: # khoảng trống quá dài: không nội suy
+                for entry in self.get_entries(self.gap_start, frame_num + 1):
+                    entry[3] = True
+        else:
+            for gap in self.waiting:
+                if len(gap['after']) < self.interpolator.spline_context:
+                    gap['after'].append((frame_num, bbox))
+            if self.gap_start is not None:
+                self.close_gap(frame_num, bbox)
+            self.known.append((frame_num, bbox))
+
+        self.resolve_waiting(frame_num - self.lookahead)
+        return self.pop_ready()
+
+    def flush(self):
+        # hết video: khoảng trống ở cuối giữ bbox bóng cuối cùng, các khoảng trống đang chờ nội suy với các khung hình đã có
+        if self.gap_start is not None and self.frame_num - self.gap_start <= self.max_gap and len(self.known) > 0:
+            for entry in self.get_entries(self.gap_start, self.frame_num):
+                entry[1], entry[2] = self.known[-1][1], True
+        self.gap_start = None
+        self.resolve_waiting(self.frame_num)
+        for entry in self.pending:
+            entry[3] = True
+        return self.pop_ready()
+
+    def get_entries(self, start, stop):
+        # các phần tử của hàng đợi của khung hình start..stop-1 (bỏ qua các khung hình đã trả về)
+        first = self.pending[0][0]
+        return [self.pending[frame_num - first] for frame_num in range(max(start, first), stop)]
+
+    def close_gap(self, frame_num, bbox):
+        # khoảng trống gap_start..frame_num-1 kết thúc ở khung hình có bóng frame_num
+        gap_start, self.gap_start = self.gap_start, None
+        if frame_num - gap_start > self.max_gap:
+            return
+        entries = self.get_entries(gap_start, frame_num)
+        gap_frames = np.arange(gap_start, frame_num)
+        if len(self.known) == 0: # đầu video: lấy bbox bóng đầu tiên
+            self.set_gap(entries, [bbox] * len(entries))
+        elif self.interpolator.method == 'spline':
+            self.waiting.append({'entries': entries, 'frames': gap_frames, 'before': list(self.known), 'after': [(frame_num, bbox)]})
+        else:
+            known_frames = [self.known[-1][0], frame_num]
+            known_bboxes = [self.known[-1][1], bbox]
+            if self.interpolator.method == 'linear':
+                self.set_gap(entries, self.interpolator.fill_gap(gap_frames, known_frames, known_bboxes))
+            else:
+                gap_states = [entry[4] for entry in entries] + [self.kalman_state]
+                self.set_gap(entries, self.interpolator.fill_gap_kalman(gap_frames, known_frames, known_bboxes, gap_states))
+
+    def resolve_waiting(self, oldest_frame):
+        # nội suy spline cho các khoảng trống đã đủ spline_context khung hình có bóng phía sau hoặc có khung hình cũ hơn oldest_frame
+        waiting = []
+        for gap in self.waiting:
+            if len(gap['after']) < self.interpolator.spline_context and gap['frames'][0] > oldest_frame:
+                waiting.append(gap)
+                continue
+            context = gap['before'] + gap['after']
+            self.set_gap(gap['entries'], self.interpolator.fill_gap(gap['frames'], [frame for frame, _ in context], [bbox for _, bbox in context]))
+        self.waiting = waiting
+
+    @staticmethod
+    def set_gap(entries, bboxes):
+        for entry, bbox in zip(entries, bboxes):
+            entry[1], entry[2], entry[3] = np.asarray(bbox), True, True
+
+    def pop_ready(self):
+        ready = []
+        while self.pending and self.pending[0][3]:
+            frame_num, bbox, interpolated = self.pending.popleft()[:3]
+            ready.append((frame_num, None if bbox is None else bbox.tolist(), interpolated))
+        return ready
@@ -1,26 +1,53 @@
-from ultralytics import YOLO # đây là thư viện YOLO để thực hiện phát hiện đối tượng
 import pickle # thư viện pickle để lưu trữ và tải dữ liệu dạng nhị phân
 import os
 import numpy as np  
-import pandas as pd 
 import cv2 # thư viện OpenCV để xử lý ảnh và video
 import sys  # thêm thư mục cha vào sys.path để có thể import module từ thư mục cha
 sys.path.append('../')
-from utils import get_center_of_bbox, get_bbox_width, get_foot_position
-from collections import defaultdict
+from utils import get_center_of_bbox, get_bbox_width, get_foot_position, iter_batches, iter_prefetched, OverlayCompositor, RenderProfile
+from track_store import TrackStore, ObjectTracks
+from player_ball_assigner import PossessionTimeline
+from .tracker_backends import create_tracker_backend
+from .batch_inference import BatchInferenceEngine
+from .keyframe_propagator import KeyframePropagator
+from .ball_interpolator import BallInterpolator
+from .inference_backends import load_detection_model # nạp mô hình YOLO (thư viện ultralytics) theo inference backend
 
 class Tracker: # lớp Tracker để theo dõi các đối tượng trong video
     
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
-        self.trackers = {}  # Dictionary to store active trackers
-        self.next_id = 1    # For assigning unique IDs
+    def __init__(self, model_path, tracker_backend='kalman', batch_size=20, imgsz=640, half=False, device=None, inference_backend='torch', int8=False,
+                 keyframe_interval=1, propagation='flow', max_camera_motion=None, max_uncertainty=None, frame_memory=None):
+        # inference_backend là torch (file .pt), onnx (ONNX Runtime) hoặc openvino, int8 là lượng tử hóa INT8 khi export (xem trackers/inference_backends.py)
+        self.model_path = model_path
+        # backend thực sự được dùng (thiếu thư viện onnx/openvino thì là torch), INT8 chỉ có tác dụng với mô hình export
+        self.model, inference_backend = load_detection_model(model_path, backend=inference_backend, int8=int8, imgsz=imgsz)
+        int8 = int8 and inference_backend != 'torch'
+        self.inference_backend = inference_backend
+        # batch_size là kích thước lô để xử lý khung hình, lô ở đây là số ảnh được đưa vào mô hình để dự đoán trong một lần
+        # imgsz là độ phân giải đầu vào của mô hình, half là dùng fp16 trên GPU, frame_memory là bộ nhớ mỗi khung hình (byte, None thì đo sau lô đầu tiên)
+        # mô hình export (ONNX, OpenVINO) nhận ảnh imgsz x imgsz nên letterbox thêm viền đủ kích thước như ultralytics
+        self.inference_engine = BatchInferenceEngine(self.model, batch_size=batch_size, imgsz=imgsz, half=half, device=device,
+                                                     frame_memory=frame_memory, letterbox_auto=inference_backend == 'torch')
         self.max_lost = 30  # Maximum number of frames to keep lost tracks
+        self.tracker_backend = create_tracker_backend(tracker_backend, max_lost=self.max_lost) # gán id cho các phát hiện qua từng khung hình: kalman, iou, bytetrack hoặc csrt
+        # chỉ chạy YOLO mỗi keyframe_interval khung hình (hoặc khi camera/tracks thay đổi nhiều), xem trackers/keyframe_propagator.py
+        self.keyframe_propagator = KeyframePropagator(keyframe_interval=keyframe_interval, propagation=propagation,
+                                                      max_camera_motion=max_camera_motion, max_uncertainty=max_uncertainty)
+        self.overlay_compositor = OverlayCompositor() # nền bán trong suốt của bảng kiểm soát bóng vẽ sẵn một lần
+        self.cls_names_inv = None # tên lớp -> id lớp của mô hình, có sau lần detection đầu tiên
+        # các tham số làm thay đổi kết quả tracking, dùng cho khóa của StageCache (batch_size và device không làm thay đổi kết quả)
+        # inference_backend và int8 là của mô hình thực sự được nạp, không phải giá trị được yêu cầu
+        self.cache_params = dict(tracker_backend=tracker_backend, imgsz=imgsz, half=half, inference_backend=inference_backend, int8=int8,
+                                 conf=self.inference_engine.conf, keyframe_interval=keyframe_interval, propagation=propagation,
+                                 max_camera_motion=max_camera_motion, max_uncertainty=max_uncertainty)
 
     def add_position_to_tracks(self,tracks): # hàm này thêm vị trí (position) vào từng track trong tracks
         #tracks là dictionary lưu trữ thông tin về các đối tượng được theo dõi trong từng khung hình
         for object, object_tracks in tracks.items(): # nó sẽ lặp qua từng loại đối tượng: players, referees, ball
             #.items() trả về cả key và value trong dictionary
+            if isinstance(object_tracks, ObjectTracks): # tracks dạng cột: tính vị trí cho tất cả các dòng cùng lúc
+                self.add_position_to_object_tracks(object, object_tracks)
+                continue
             for frame_num, track in enumerate(object_tracks): # lặp qua từng khung hình cho từng loại object
                 for track_id, track_info in track.items():
                     #track_id là id của đối tượng, track_info là thông tin về bbox
@@ -32,48 +59,94 @@ class Tracker: # lớp Tracker để theo dõi các đối tượng trong video
                         position = get_foot_position(bbox) # Lấy vị trí chân của người chơi và trọng tài
                     tracks[object][frame_num][track_id]['position'] = position # Thêm vị trí vào track
 
-    def interpolate_ball_positions(self,ball_positions): # hàm này nội suy (interpolate) vị trí bóng trong trường hợp bóng không được phát hiện trong một số khung hình
+    @staticmethod
+    def add_position_to_object_tracks(object, object_tracks):
+        # giống get_center_of_bbox (bóng) và get_foot_position (cầu thủ, trọng tài) nhưng trên cả cột bbox, int() cắt phần thập phân như np.trunc
+        bboxes, has_bbox = object_tracks.column('bbox')
+        rows = np.flatnonzero(has_bbox)
+        bboxes = bboxes[rows]
+        x = np.trunc((bboxes[:, 0] + bboxes[:, 2]) / 2)
+        y = np.trunc((bboxes[:, 1] + bboxes[:, 3]) / 2) if object == 'ball' else np.trunc(bboxes[:, 3])
+        object_tracks.set_column('position', np.stack([x, y], axis=1).astype(np.int64), rows)
+
+    def interpolate_ball_positions(self,ball_positions,ball_interpolator=None): # hàm này nội suy (interpolate) vị trí bóng trong trường hợp bóng không được phát hiện trong một số khung hình
         # nội suy là cách ước tính giá trị nằm giữa 2 giá trị đã biết, trong trường hợp này là vị trí bóng trong các khung hình mà bóng không được phát hiện
-        ball_positions = [x.get(1,{}).get('bbox',[]) for x in ball_positions] # Lấy bbox của bóng từ ball_positions
-        # x.get(1,{}) lấy thông tin của bóng với track_id là 1, nếu không có thì trả về dictionary rỗng
-        # .get('bbox',[]) lấy bbox từ dictionary, nếu không có thì trả về danh sách rỗng
-        # dictionary ở đây nó lưu trữ thông tin về các track của bóng trong từng khung hình
-        # Tạo DataFrame từ danh sách bbox
-        df_ball_positions = pd.DataFrame(ball_positions,columns=['x1','y1','x2','y2'])
-
-        # Interpolate missing values
-        df_ball_positions = df_ball_positions.interpolate() # nội suy các giá trị bị thiếu
-        df_ball_positions = df_ball_positions.bfill() # điền các giá trị NaN ở đầu bằng giá trị tiếp theo
-        # bfill() là hàm trong pandas để điền các giá trị NaN bằng giá trị tiếp theo trong cột
-
-        ball_positions = [{1: {"bbox":x}} for x in df_ball_positions.to_numpy().tolist()]# chuyển DataFrame trở lại danh sách bbox
-        # 1: {"bbox":x} tạo dictionary với track_id là 1 và bbox là x
-        #tolist() chuyển DataFrame thành danh sách các danh sách
-        return ball_positions
+        # bbox bóng của cả video được nội suy trên mảng NumPy (tuyến tính, spline hoặc Kalman, có giới hạn độ dài khoảng trống), xem trackers/ball_interpolator.py
+        # trả về list {1: {"bbox": ..., "interpolated": ...}} của từng khung hình, {} nếu khung hình đó vẫn không có bóng
+        ball_interpolator = ball_interpolator if ball_interpolator is not None else BallInterpolator()
+        return ball_interpolator.interpolate_ball_positions(ball_positions)
 
     # YOLO Detection
     def detect_frames(self, frames): # hàm này thực hiện phát hiện đối tượng trên từng khung hình trong frames sử dụng mô hình YOLO
         # self là đối tượng của lớp Tracker
         # frames là danh sách các khung hình cần phát hiện đối tượng
-        batch_size=20 # kích thước lô để xử lý khung hình , lô ở đây là số lượng khung hình được xử lý cùng một lúc, là số ảnh được đưa vào mô hình để dự đoán trong một lần
-        detections = []  # danh sách lưu trữ kết quả phát hiện
-        for i in range(0,len(frames),batch_size): # lặp qua các khung hình theo kích thước lô
-            
-            # Lấy lô khung hình hiện tại
-            detections_batch = self.model.predict(frames[i:i+batch_size],conf=0.1)
-            # self.model.predict() thực hiện phát hiện đối tượng trên lô khung hình
-            # conf=0.1 là ngưỡng độ tin cậy để lọc các phát hiện có độ tin cậy thấp
-            # frames[i:i+batch_size] lấy lô khung hình từ i đến i+batch_size
-            detections += detections_batch # thêm kết quả phát hiện vào danh sách detections
-        return detections
-
-    def get_object_tracks(self, frames, read_from_stub=False, stub_path=None): # hàm này theo dõi các đối tượng trong frames và trả về tracks, tracks là thông tin về các đối tượng được theo dõi trong từng khung hình
+        # việc chia lô (kích thước lô, imgsz, half) do self.inference_engine đảm nhiệm, xem trackers/batch_inference.py
+        return [detection for _, detection in self.inference_engine.iter_predictions(frames)]
+
+    def iter_detections(self, frames):
+        # hàm này chạy YOLO theo từng lô và trả về lần lượt (frame_num, frame, detection)
+        # khác với detect_frames, kết quả không bị gom vào list nên dùng được với VideoFrameReader
+        # lô tiếp theo được đọc trên luồng nền trong khi lô hiện tại đang chạy inference
+        for frame_num, (frame, detection) in enumerate(self.inference_engine.iter_predictions(frames)):
+            yield frame_num, frame, detection
+
+    def iter_frame_tracks(self, frames):
+        '''
+        logic hàm này là:
+        1. Không dùng keyframe (keyframe_interval=1, không có ngưỡng) thì chạy YOLO mọi khung hình như iter_detections + track_frame
+        2. Chia khung hình thành lô, chạy YOLO một lần cho các khung hình chính theo lịch (mỗi keyframe_interval khung hình) của lô
+        3. Với từng khung hình theo thứ tự, KeyframePropagator dịch chuyển bbox của khung hình trước sang khung hình này;
+           nếu camera chuyển động mạnh hoặc độ bất định cao thì chạy YOLO ngay cho khung hình này (khung hình chính thêm)
+        4. Khung hình không chạy YOLO thì bbox đã dịch chuyển được đưa vào tracker backend như các phát hiện có độ tin cậy 1.0,
+           để trạng thái của backend (Kalman, số khung hình mất dấu, ...) vẫn được cập nhật mỗi khung hình và id được giữ nguyên
+        5. Trả về lần lượt (frame_num, frame, frame_tracks)
+        '''
+        propagator = self.keyframe_propagator
+        if not propagator.is_enabled():
+            for frame_num, frame, detection in self.iter_detections(frames):
+                yield frame_num, frame, self.track_frame(frame, detection)
+            return
+
+        propagator.reset()
+        batches = iter_prefetched(iter_batches(frames, self.inference_engine.batch_size), prefetch_size=2)
+        frame_num = 0
+        for batch in batches:
+            scheduled = [index for index in range(len(batch)) if propagator.is_scheduled_keyframe(frame_num + index)]
+            detections = dict(zip(scheduled, self.inference_engine.predict_batch([batch[index] for index in scheduled])))
+
+            for index, frame in enumerate(batch):
+                needs_detection = propagator.update(frame)
+                if index not in detections and needs_detection:
+                    detections[index] = self.inference_engine.predict_batch([frame])[0]
+
+                if index in detections:
+                    propagator.num_keyframes += 1
+                    frame_tracks = self.track_frame(frame, detections.pop(index))
+                else:
+                    boxes = propagator.propagated
+                    frame_tracks = self.track_boxes(frame, boxes, np.ones(len(boxes)), propagator.class_ids.copy(), keyframe=False)
+                yield frame_num, frame, frame_tracks
+                frame_num += 1
+
+    def get_cache_key(self, cache, video_path, num_frames): # khóa của bước tracking trong StageCache: nội dung video + trọng số mô hình + tham số
+        return cache.make_key('tracks', files=[video_path, self.model_path], params=dict(self.cache_params, num_frames=num_frames))
+
+    def get_object_tracks(self, frames, read_from_stub=False, stub_path=None, cache=None, video_path=None): # hàm này theo dõi các đối tượng trong frames và trả về tracks, tracks là thông tin về các đối tượng được theo dõi trong từng khung hình
         # frames là danh sách các khung hình cần theo dõi
+        # cache là StageCache (utils/stage_cache.py), kết quả được lưu theo nội dung video (video_path, mặc định lấy từ VideoFrameReader),
+        # trọng số mô hình và tham số tracking nên không bị dùng nhầm cho video khác như file stub
         # read_from_stub là cờ để đọc tracks từ file stub nếu có
         # file stub là file lưu trữ dữ liệu dạng nhị phân
         # stub_path là đường dẫn đến file stub
         # os.path.exists(stub_path) kiểm tra xem file stub có tồn tại không
 
+        if cache is not None and cache.enabled:
+            video_path = video_path or getattr(frames, 'video_path', None)
+            if video_path is not None:
+                key = self.get_cache_key(cache, video_path, len(frames))
+                return cache.get_or_compute(key, lambda: self.get_object_tracks(frames))
+            print("⚠️ Không biết đường dẫn video của frames, không dùng cache cho tracking")
+
         ## đọc dữ liệu từ file stub nếu có
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path,'rb') as f:
@@ -82,125 +155,12 @@ class Tracker: # lớp Tracker để theo dõi các đối tượng trong video
                 tracks = pickle.load(f) # tải dữ liệu từ file stub
             return tracks
 
-        # chạy YOLO để phát hiện đối tượng trên từng khung hình
-        detections = self.detect_frames(frames) # thực hiện phát hiện đối tượng trên từng khung hình
+        # frames có thể là list hoặc VideoFrameReader, detection được chạy theo từng lô trong vòng lặp bên dưới
+        tracks = TrackStore() # khởi tạo tracks rỗng (players, referees, ball) dạng cột để lưu trữ thông tin về các đối tượng được theo dõi
 
-        tracks={
-            "players":[],
-            "referees":[],
-            "ball":[]
-        } # khởi tạo tracks rỗng để lưu trữ thông tin về các đối tượng được theo dõi
-
-        for frame_num, detection in enumerate(detections):
-            cls_names = detection.names # lấy tên lớp từ kết quả phát hiện, lớp ở đây là các loại đối tượng được phát hiện như player, referee, ball
-            cls_names_inv = {v:k for k,v in cls_names.items()} # tạo từ điển đảo ngược để ánh xạ tên lớp sang id lớp
-
-            # Initialize frame dictionaries
-            tracks["players"].append({}) # thêm dictionary rỗng cho khung hình hiện tại trong players
-            tracks["referees"].append({})
-            tracks["ball"].append({})
-            
-            # Get current frame
-            frame = frames[frame_num] 
-            
-            # Process detections
-            '''
-            với từng frame thì xử lý toàn bộ detections trong frame đó
-            lấy bounding box, độ tin cậy và id lớp từ kết quả phát hiện
-            sau đó lặp qua từng phát hiện trong khung hình hiện tại
-            nếu độ tin cậy của phát hiện thấp hơn ngưỡng thì bỏ qua
-            nếu phát hiện là goalkeeper thì chuyển thành player
-            tìm tracker phù hợp hoặc tạo mới, tracker phù hợp là tracker có khoảng cách gần nhất với bounding box hiện tại
-            tracker là đối tượng theo dõi vị trí của một đối tượng trong video
-            nếu tìm thấy tracker phù hợp thì cập nhật tracker với vị trí mới
-            nếu không tìm thấy tracker phù hợp thì tạo mới tracker và thêm vào danh sách trackers
-            sau đó thêm thông tin về bounding box vào tracks
-            cuối cùng cập nhật bộ đếm mất dấu và vô hiệu hóa các tracker bị mất dấu
-            '''
-            boxes = detection.boxes.xyxy.cpu().numpy() # lấy bounding box từ kết quả phát hiện
-            # .xyxy trả về bounding box dưới dạng (x1, y1, x2, y2)
-            #.cpu() chuyển tensor về CPU
-            # .numpy() chuyển tensor thành mảng numpy
-            confidences = detection.boxes.conf.cpu().numpy() # lấy độ tin cậy từ kết quả phát hiện
-            class_ids = detection.boxes.cls.cpu().numpy() # lấy id lớp từ kết quả phát hiện
-            
-            # Update trackers and process detections
-            active_trackers = defaultdict(list)  # theo dõi các tracker hoạt động trong khung hình hiện tại
-            # defaultdict(list) tạo dictionary với giá trị mặc định là danh sách rỗng, tạo dictionary để lưu trữ các tracker hoạt động cho từng lớp đối tượng
-            
-            # xử lý từng phát hiện trong khung hình hiện tại
-            for box_idx, (bbox, conf, cls_id) in enumerate(zip(boxes, confidences, class_ids)): # lặp qua từng bounding box, độ tin cậy và id lớp
-                # Bỏ qua các phát hiện có độ tin cậy thấp
-                if conf < 0.5:  # Skip low confidence detections
-                    continue
-                    
-                # Chuyển đổi goalkeeper thành player
-                if cls_names[int(cls_id)] == "goalkeeper":
-                    cls_id = cls_names_inv["player"] # lấy id lớp của player từ tên lớp
-                
-                # Tìm tracker phù hợp hoặc tạo mới, tracker phù hợp là tracker có khoảng cách gần nhất với bounding box hiện tại
-                matched_id = None # id của tracker phù hợp
-                bbox_center = get_center_of_bbox(bbox) # lấy vị trí trung tâm của bounding box
-                
-                # Thử tìm tracker phù hợp với các tracker hiện có
-                for tracker_id, tracker_info in self.trackers.items():
-                    #.items() trả về cả key và value trong dictionary
-                    if not tracker_info['active'] or tracker_info['class_id'] != int(cls_id): # bỏ qua các tracker không hoạt động hoặc không cùng lớp
-                        continue
-                    
-                    tracker = tracker_info['tracker'] # lấy tracker từ tracker_info
-                    success, track_box = tracker.update(frame) # cập nhật tracker với khung hình hiện tại
-                    
-                    if success: # 
-                        track_center = get_center_of_bbox(track_box)# lấy vị trí trung tâm của bounding box được theo dõi bởi tracker, tracker là đối tượng theo dõi vị trí của một đối tượng trong video
-                        dist = np.linalg.norm(np.array(bbox_center) - np.array(track_center)) # tính khoảng cách Euclid giữa vị trí trung tâm của bounding box hiện tại và vị trí trung tâm của bounding box được theo dõi bởi tracker
-                        # np.linalg.norm() tính chuẩn Euclid của vector
-                        
-                        if dist < 50:  # Distance threshold for matching
-                            matched_id = tracker_id # gán id của tracker phù hợp
-                            # Cập nhật tracker với vị trí mới
-                            tracker.init(frame, tuple(bbox.astype(int))) # khởi tạo lại tracker với khung hình hiện tại và bounding box hiện tại
-                            # tuple() chuyển mảng numpy thành tuple
-                            # .astype(int) chuyển mảng numpy thành kiểu int
-                            tracker_info['lost_count'] = 0 # đặt lại bộ đếm mất dấuu tracker
-                            break # thoát khỏi vòng lặp sau khi tìm thấy tracker phù hợp
-                
-                # Create new tracker if no match found
-                if matched_id is None:
-                    tracker = cv2.TrackerCSRT_create() # tạo tracker mới sử dụng thuật toán CSRT
-                    # CSRT (Channel and Spatial Reliability Tracking) là một thuật toán theo dõi đối tượng trong video
-                    tracker.init(frame, tuple(bbox.astype(int))) # khởi tạo tracker với khung hình hiện tại và bounding box hiện tại
-                    matched_id = self.next_id # gán id mới cho tracker
-                    self.next_id += 1 
-                    
-                    
-                    # Thêm tracker mới vào danh sách trackers
-                    self.trackers[matched_id] = {
-                        'tracker': tracker,
-                        'active': True,
-                        'class_id': int(cls_id), # id lớp của đối tượng được theo dõi
-                        'lost_count': 0 # bộ đếm mất dấu tracker
-                    }
-                
-                # Add to appropriate track list
-                if int(cls_id) == cls_names_inv['player']: # nếu đối tượng là player
-                    tracks["players"][frame_num][matched_id] = {"bbox": bbox.tolist()} # thêm bounding box vào tracks, tracks là dictionary lưu trữ thông tin về các đối tượng được theo dõi trong từng khung hình
-                elif int(cls_id) == cls_names_inv['referee']:
-                    tracks["referees"][frame_num][matched_id] = {"bbox": bbox.tolist()}
-                elif int(cls_id) == cls_names_inv['ball']:
-                    tracks["ball"][frame_num][1] = {"bbox": bbox.tolist()}
-                
-                active_trackers[int(cls_id)].append(matched_id) # thêm id của tracker vào danh sách tracker hoạt động cho lớp đối tượng hiện tại
-            
-            # Update lost counts and deactivate lost trackers
-            for tracker_id, tracker_info in self.trackers.items():
-                if tracker_info['active']: # chỉ cập nhật các tracker đang hoạt động
-                    cls_id = tracker_info['class_id'] # lấy id lớp của tracker
-                    # tracker_info là thông tin về tracker hiện tại
-                    if tracker_id not in active_trackers[cls_id]: # nếu tracker không hoạt động trong khung hình hiện tại
-                        tracker_info['lost_count'] += 1 # tăng bộ đếm mất dấu tracker
-                        if tracker_info['lost_count'] > self.max_lost: # nếu bộ đếm mất dấu vượt quá ngưỡng cho phép
-                            tracker_info['active'] = False # đặt tracker không hoạt động
+        for frame_num, frame, frame_tracks in self.iter_frame_tracks(frames): # chạy YOLO theo từng lô khung hình và gán id cho các phát hiện
+            for object_name in tracks:
+                tracks[object_name].append(frame_tracks[object_name])
 
         if stub_path is not None: # nếu có đường dẫn đến file stub, file stub là file lưu trữ dữ liệu dạng nhị phân
             with open(stub_path,'wb') as f: # lưu tracks vào file stub
@@ -209,7 +169,67 @@ class Tracker: # lớp Tracker để theo dõi các đối tượng trong video
 
         return tracks
     
-    def draw_ellipse(self,frame,bbox,color,track_id=None):# hàm này vẽ hình ellipse lên khung hình frame dựa trên bounding box bbox và màu color
+    def track_frame(self, frame, detection): # hàm này gán id theo dõi cho các phát hiện của một khung hình và trả về {"players":{...}, "referees":{...}, "ball":{...}}
+        # dùng chung cho get_object_tracks (cả video) và pipeline streaming (từng khung hình)
+        cls_names = detection.names # lấy tên lớp từ kết quả phát hiện, lớp ở đây là các loại đối tượng được phát hiện như player, referee, ball
+        cls_names_inv = {v:k for k,v in cls_names.items()} # tạo từ điển đảo ngược để ánh xạ tên lớp sang id lớp
+        self.cls_names_inv = cls_names_inv # giữ lại cho các khung hình không chạy YOLO (iter_frame_tracks)
+
+        # Process detections
+        '''
+        với từng frame thì xử lý toàn bộ detections trong frame đó
+        lấy bounding box, độ tin cậy và id lớp từ kết quả phát hiện
+        chuyển goalkeeper thành player
+        gán id cho tất cả phát hiện cùng lúc bằng tracker backend (mặc định kalman: IoU + khoảng cách tâm, Hungarian, Kalman)
+        backend tự bỏ các phát hiện có độ tin cậy thấp (id -1), bytetrack dùng chúng để nối tiếp các track đang có
+        sau đó thêm thông tin về bounding box vào tracks
+        '''
+        boxes = detection.boxes.xyxy.cpu().numpy() # lấy bounding box từ kết quả phát hiện
+        # .xyxy trả về bounding box dưới dạng (x1, y1, x2, y2)
+        #.cpu() chuyển tensor về CPU
+        # .numpy() chuyển tensor thành mảng numpy
+        confidences = detection.boxes.conf.cpu().numpy() # lấy độ tin cậy từ kết quả phát hiện
+        class_ids = detection.boxes.cls.cpu().numpy().astype(int) # lấy id lớp từ kết quả phát hiện
+
+        # Chuyển đổi goalkeeper thành player
+        if "goalkeeper" in cls_names_inv:
+            class_ids[class_ids == cls_names_inv["goalkeeper"]] = cls_names_inv["player"]
+
+        return self.track_boxes(frame, boxes, confidences, class_ids)
+
+    def track_boxes(self, frame, boxes, confidences, class_ids, keyframe=True): # gán id cho các bbox (từ YOLO hoặc đã dịch chuyển từ khung hình trước) và trả về frame_tracks
+        cls_names_inv = self.cls_names_inv
+
+        # Initialize frame dictionaries
+        frame_tracks={
+            "players":{},
+            "referees":{},
+            "ball":{}
+        } # dictionary lưu các đối tượng được theo dõi trong khung hình hiện tại
+
+        track_ids = self.tracker_backend.track(frame, boxes, confidences, class_ids) # id theo dõi cho từng phát hiện
+        if self.keyframe_propagator.is_enabled(): # lưu bbox đã gán id để dịch chuyển sang khung hình sau
+            tracked = np.asarray(track_ids) != -1
+            self.keyframe_propagator.observe(np.asarray(track_ids)[tracked], np.asarray(boxes).reshape(-1, 4)[tracked],
+                                             np.asarray(class_ids)[tracked], keyframe=keyframe)
+
+        # Add to appropriate track list
+        for bbox, cls_id, track_id in zip(boxes, class_ids, track_ids):
+            if track_id == -1: # phát hiện bị backend bỏ qua
+                continue
+            if cls_id == cls_names_inv['player']: # nếu đối tượng là player
+                frame_tracks["players"][track_id] = {"bbox": bbox.tolist()} # thêm bounding box vào tracks, tracks là dictionary lưu trữ thông tin về các đối tượng được theo dõi trong từng khung hình
+            elif cls_id == cls_names_inv['referee']:
+                frame_tracks["referees"][track_id] = {"bbox": bbox.tolist()}
+            elif cls_id == cls_names_inv['ball']:
+                frame_tracks["ball"][1] = {"bbox": bbox.tolist()}
+
+        return frame_tracks
+
+    def draw_ellipse(self,frame,bbox,color,track_id=None,render_profile=None):# hàm này vẽ hình ellipse lên khung hình frame dựa trên bounding box bbox và màu color
+        # render_profile (utils/render_profile.py): bbox ở độ phân giải gốc, kích thước và nét vẽ nhân với scale của khung hình đầu ra
+        render_profile = render_profile or RenderProfile()
+        bbox = render_profile.scale_bbox(bbox)
         y2 = int(bbox[3]) # bbox[3] là tọa độ y dưới cùng của bounding box
         x_center, _ = get_center_of_bbox(bbox) # lấy tọa độ x trung tâm của bounding box
         width = get_bbox_width(bbox)
@@ -222,18 +242,18 @@ class Tracker: # lớp Tracker để theo dõi các đối tượng trong video
             startAngle=-45,
             endAngle=235,
             color = color,
-            thickness=2,
+            thickness=render_profile.thickness(2),
             lineType=cv2.LINE_4
         ) # vẽ hình ellipse lên khung hình frame
 
 
         # Đây là vẽ hình chữ nhật chứa id của đối tượng
-        rectangle_width = 40
-        rectangle_height=20
+        rectangle_width = render_profile.length(40)
+        rectangle_height=render_profile.length(20)
         x1_rect = x_center - rectangle_width//2
         x2_rect = x_center + rectangle_width//2
-        y1_rect = (y2- rectangle_height//2) +15
-        y2_rect = (y2+ rectangle_height//2) +15
+        y1_rect = (y2- rectangle_height//2) +render_profile.length(15)
+        y2_rect = (y2+ rectangle_height//2) +render_profile.length(15)
 
         if track_id is not None:
             cv2.rectangle(frame,
@@ -242,44 +262,71 @@ class Tracker: # lớp Tracker để theo dõi các đối tượng trong video
                           color,
                           cv2.FILLED) # vẽ hình chữ nhật lên khung hình frame, rectangle là hàm vẽ hình chữ nhật trong OpenCV
             
-            x1_text = x1_rect+12 # vị trí x để vẽ text, text là id của đối tượng
+            x1_text = x1_rect+render_profile.length(12) # vị trí x để vẽ text, text là id của đối tượng
             if track_id > 99: # nếu id có 3 chữ số
-                x1_text -=10 # điều chỉnh vị trí x để vẽ text
+                x1_text -=render_profile.length(10) # điều chỉnh vị trí x để vẽ text
             
             cv2.putText(
                 frame,
                 f"{track_id}",
-                (int(x1_text),int(y1_rect+15)),
+                (int(x1_text),int(y1_rect+render_profile.length(15))),
                 cv2.FONT_HERSHEY_SIMPLEX,
-                0.6,
+                0.6*render_profile.scale,
                 (0,0,0),
-                2
+                render_profile.thickness(2)
             )
             # hàm putText để vẽ text lên khung hình frame, FONT_HERSHEY_SIMPLEX là kiểu font chữ trong OpenCV
 
         return frame
 
-    def draw_traingle(self,frame,bbox,color): # hàm này vẽ hình tam giác lên khung hình frame dựa trên bounding box bbox và màu color
+    def draw_traingle(self,frame,bbox,color,render_profile=None): # hàm này vẽ hình tam giác lên khung hình frame dựa trên bounding box bbox và màu color
+        render_profile = render_profile or RenderProfile()
+        bbox = render_profile.scale_bbox(bbox)
         y= int(bbox[1])
         x,_ = get_center_of_bbox(bbox)
+        half_width, height = render_profile.length(10), render_profile.length(20)
 
         triangle_points = np.array([
             [x,y],
-            [x-10,y-20],
-            [x+10,y-20],
+            [x-half_width,y-height],
+            [x+half_width,y-height],
         ])
         cv2.drawContours(frame, [triangle_points],0,color, cv2.FILLED) # vẽ hình tam giác lên khung hình frame
         # drawContours là hàm trong OpenCV để vẽ các đường viền của hình dạng
         # cv2.FILLED là để lấp đầy hình tam giác với màu color
         
-        cv2.drawContours(frame, [triangle_points],0,(0,0,0), 2) # vẽ viền cho hình tam giác lên khung hình frame
+        cv2.drawContours(frame, [triangle_points],0,(0,0,0), render_profile.thickness(2)) # vẽ viền cho hình tam giác lên khung hình frame
 
         return frame # trả về khung hình frame đã được vẽ hình tam giác
 
-    def draw_team_ball_control(self,frame,frame_num,team_ball_control): # hàm này vẽ thông tin về kiểm soát bóng của từng đội lên khung hình frame
+    def draw_team_ball_control(self,frame,frame_num,team_ball_control,render_profile=None): # hàm này vẽ thông tin về kiểm soát bóng của từng đội lên khung hình frame
+        # team_ball_control là PossessionTimeline (tỉ lệ kiểm soát bóng O(1) mỗi khung hình) hoặc mảng đội kiểm soát bóng ở từng khung hình
+        # bảng gắn với góc dưới bên phải, tọa độ trên khung hình tham chiếu 1920x1080 được đổi theo kích thước frame (xem utils/render_profile.py)
+        render_profile = render_profile or RenderProfile()
+        hud_scale = render_profile.get_hud_scale(frame.shape)
         # Draw a semi-transparent rectaggle 
+        # nền không đổi qua các khung hình: OverlayCompositor vẽ một lần rồi chỉ trộn vùng ROI của hình chữ nhật (không copy cả khung hình)
+        self.overlay_compositor.compose(frame, 'team_ball_control', (1350, 850, 1901, 971), self.draw_team_ball_control_background,
+                                        scale=hud_scale, position=render_profile.get_hud_point(frame.shape, 'bottom_right', (1350, 850)))
+        
+        
+        if not isinstance(team_ball_control, PossessionTimeline): # mảng: chỉ đếm các khung hình từ đầu đến khung hình hiện tại
+            team_ball_control = PossessionTimeline(team_ball_control[:frame_num+1])
+        # tỷ lệ kiểm soát bóng (%) của đội 1 và đội 2 từ đầu đến khung hình hiện tại, 0 nếu chưa đội nào có bóng
+        possession = team_ball_control.get_possession(frame_num)
+        team_1, team_2 = possession[1] / 100, possession[2] / 100
+
+        thickness = render_profile.thickness(3, hud_scale)
+        cv2.putText(frame, f"Team 1 Ball Control: {team_1*100:.2f}%",render_profile.get_hud_point(frame.shape, 'bottom_right', (1400,900)), cv2.FONT_HERSHEY_SIMPLEX, hud_scale, (0,0,0), thickness) # vẽ thông tin kiểm soát bóng của đội 1 lên khung hình frame
+        cv2.putText(frame, f"Team 2 Ball Control: {team_2*100:.2f}%",render_profile.get_hud_point(frame.shape, 'bottom_right', (1400,950)), cv2.FONT_HERSHEY_SIMPLEX, hud_scale, (0,0,0), thickness) # vẽ thông tin kiểm soát bóng của đội 2 lên khung hình frame
+        #{:.2f} định dạng số thập phân với 2 chữ số sau dấu phẩy
+        # FONT_HERSHEY_SIMPLEX là kiểu font chữ trong OpenCV , hud_scale là kích thước font chữ (1 trên khung hình 1920x1080), (0,0,0) là màu đen, 3 là độ dày của chữ
+        return frame
+
+    @staticmethod
+    def draw_team_ball_control_background(frame, dx, dy): # vẽ nền bảng kiểm soát bóng, tọa độ trên khung hình + (dx, dy)
         overlay = frame.copy() # tạo bản sao của khung hình frame để vẽ hình chữ nhật bán trong suốt
-        cv2.rectangle(overlay, (1350, 850), (1900,970), (255,255,255), -1 ) # vẽ hình chữ nhật lên bản sao của khung hình frame
+        cv2.rectangle(overlay, (1350 + dx, 850 + dy), (1900 + dx, 970 + dy), (255,255,255), -1 ) # vẽ hình chữ nhật lên bản sao của khung hình frame
         #overlay là bản sao của khung hình frame
         # (1350, 850) là tọa độ góc trên bên trái của hình chữ nhật
         #(1900,970) là tọa độ góc dưới bên phải của hình chữ
@@ -288,51 +335,47 @@ class Tracker: # lớp Tracker để theo dõi các đối tượng trong video
         alpha = 0.4 # độ trong suốt của hình chữ nhật bán trong suốt
         cv2.addWeighted(overlay , alpha, frame, 1 - alpha, 0, frame) # kết hợp bản sao của khung hình frame và khung hình frame gốc để tạo hiệu ứng bán trong suốt
         # addWeighted là hàm trong OpenCV để kết hợp hai hình ảnh với trọng số nhất định
-        
-        
-        team_ball_control_till_frame = team_ball_control[:frame_num+1]  # lấy thông tin kiểm soát bóng của từng đội từ đầu đến khung hình hiện tại
-        # Get the number of time each team had ball control
-        team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==1].shape[0] # đếm số khung hình mà đội 1 kiểm soát bóng
-        team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==2].shape[0] # đếm số khung hình mà đội 2 kiểm soát bóng  
-        team_1 = team_1_num_frames/(team_1_num_frames+team_2_num_frames) # tính tỷ lệ kiểm soát bóng của đội 1
-        team_2 = team_2_num_frames/(team_1_num_frames+team_2_num_frames) # tính tỷ lệ kiểm soát bóng của đội 2
-
-        cv2.putText(frame, f"Team 1 Ball Control: {team_1*100:.2f}%",(1400,900), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,0), 3) # vẽ thông tin kiểm soát bóng của đội 1 lên khung hình frame
-        cv2.putText(frame, f"Team 2 Ball Control: {team_2*100:.2f}%",(1400,950), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,0), 3) # vẽ thông tin kiểm soát bóng của đội 2 lên khung hình frame
-        #{:.2f} định dạng số thập phân với 2 chữ số sau dấu phẩy
-        # FONT_HERSHEY_SIMPLEX là kiểu font chữ trong OpenCV , 1 là kích thước font chữ, (0,0,0) là màu đen, 3 là độ dày của chữ
         return frame
 
     def draw_annotations(self,video_frames, tracks,team_ball_control):
         # hàm này vẽ các chú thích lên từng khung hình trong video_frames dựa trên thông tin trong tracks và team_ball_control
         output_video_frames= [] # danh sách để lưu trữ các khung hình đã được vẽ chú thích
+        possession = PossessionTimeline(team_ball_control) # tổng tiền tố tính một lần cho cả video
         for frame_num, frame in enumerate(video_frames): # lặp qua từng khung hình trong video_frames
             frame = frame.copy() # tạo bản sao của khung hình hiện tại để vẽ chú thích
+            frame_tracks = {object_name: object_tracks[frame_num] for object_name, object_tracks in tracks.items()} # thông tin các đối tượng trong khung hình hiện tại
+            frame = self.draw_frame_annotations(frame, frame_num, frame_tracks, possession)
 
-            player_dict = tracks["players"][frame_num] # lấy thông tin về người chơi trong khung hình hiện tại từ tracks
-            ball_dict = tracks["ball"][frame_num] # lấy thông tin về quả bóng trong khung hình hiện tại từ tracks
-            referee_dict = tracks["referees"][frame_num] # lấy thông tin về trọng tài trong khung hình hiện tại từ tracks
+            output_video_frames.append(frame)
 
-            # Draw Players
-            for track_id, player in player_dict.items(): # lặp qua từng người chơi trong khung hình hiện tại
-                color = player.get("team_color",(0,0,255)) # lấy màu của đội từ thông tin người chơi, nếu không có thì mặc định là màu đỏ,(0,0,255) là màu đỏ trong không gian màu BGR
-                frame = self.draw_ellipse(frame, player["bbox"],color, track_id) # vẽ hình ellipse lên khung hình frame dựa trên bounding box của người chơi và màu của đội,self là đối tượng của lớp Tracker
+        return output_video_frames
 
-                if player.get('has_ball',False):# nếu người chơi có bóng
-                    frame = self.draw_traingle(frame, player["bbox"],(0,0,255)) # vẽ hình tam giác lên khung hình frame dựa trên bounding box của người chơi và màu đỏ, player["bbox"] là bounding box của người chơi
+    def draw_players(self, frame, player_dict, render_profile=None): # vẽ ellipse theo màu đội cho từng người chơi, tam giác đỏ cho người đang giữ bóng
+        for track_id, player in player_dict.items(): # lặp qua từng người chơi trong khung hình hiện tại
+            color = player.get("team_color",(0,0,255)) # lấy màu của đội từ thông tin người chơi, nếu không có thì mặc định là màu đỏ,(0,0,255) là màu đỏ trong không gian màu BGR
+            frame = self.draw_ellipse(frame, player["bbox"],color, track_id, render_profile) # vẽ hình ellipse lên khung hình frame dựa trên bounding box của người chơi và màu của đội,self là đối tượng của lớp Tracker
 
-            # Draw Referee
-            for _, referee in referee_dict.items():
-                frame = self.draw_ellipse(frame, referee["bbox"],(0,255,255))
-            
-            # Draw ball 
-            for track_id, ball in ball_dict.items():
-                frame = self.draw_traingle(frame, ball["bbox"],(0,255,0))
+            if player.get('has_ball',False):# nếu người chơi có bóng
+                frame = self.draw_traingle(frame, player["bbox"],(0,0,255), render_profile) # vẽ hình tam giác lên khung hình frame dựa trên bounding box của người chơi và màu đỏ, player["bbox"] là bounding box của người chơi
+        return frame
+
+    def draw_referees(self, frame, referee_dict, render_profile=None): # vẽ ellipse màu vàng cho trọng tài
+        for _, referee in referee_dict.items():
+            frame = self.draw_ellipse(frame, referee["bbox"],(0,255,255), render_profile=render_profile)
+        return frame
 
+    def draw_ball(self, frame, ball_dict, render_profile=None): # vẽ tam giác màu xanh lá trên quả bóng
+        for track_id, ball in ball_dict.items():
+            frame = self.draw_traingle(frame, ball["bbox"],(0,255,0), render_profile)
+        return frame
 
-            # Draw Team Ball Control
-            frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
+    def draw_frame_annotations(self, frame, frame_num, frame_tracks, team_ball_control):
+        # hàm này vẽ chú thích lên một khung hình (vẽ trực tiếp lên frame), frame_tracks có dạng {"players":{...}, "referees":{...}, "ball":{...}}
+        frame = self.draw_players(frame, frame_tracks["players"]) # người chơi trong khung hình hiện tại
+        frame = self.draw_referees(frame, frame_tracks["referees"]) # trọng tài trong khung hình hiện tại
+        frame = self.draw_ball(frame, frame_tracks["ball"]) # quả bóng trong khung hình hiện tại
 
-            output_video_frames.append(frame)
+        # Draw Team Ball Control
+        frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
 
-        return output_video_frames
\ No newline at end of file
+        return frame
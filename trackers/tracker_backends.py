@@ -0,0 +1,153 @@
+import numpy as np
+import cv2
+import sys
+sys.path.append('../')
+from utils import get_center_of_bbox, get_bbox_iou_matrix
+from .motion_tracker import MotionTracker
+
+'''
+Các tracker backend dùng cho Tracker.track_frame, chọn bằng tham số tracker_backend của Tracker (tùy chọn --tracker của main.py).
+Mọi backend có cùng giao diện track(frame, boxes, confidences, class_ids) và trả về id cho từng phát hiện (-1 nếu phát hiện bị bỏ qua).
+- kalman: MotionTracker, IoU + khoảng cách tâm, Hungarian và bộ lọc Kalman (mặc định)
+- iou: chỉ ghép theo IoU với bbox của khung hình trước, không có mô hình chuyển động, nhanh nhất
+- bytetrack: ByteTrack của thư viện supervision, ghép hai bước với phát hiện độ tin cậy cao rồi thấp
+- csrt: cách ghép cũ dùng tracker CSRT của OpenCV và ngưỡng khoảng cách tâm 50 pixel, chậm nhất
+'''
+
+class IoUTracker(MotionTracker): # chỉ ghép theo IoU giữa bbox khung hình trước và bbox hiện tại
+    def __init__(self, max_lost=30, min_iou=0.3, min_confidence=0.5):
+        super().__init__(max_lost=max_lost, min_iou=min_iou, min_confidence=min_confidence)
+
+    def predict(self):
+        pass # không có mô hình chuyển động, bbox dự đoán chính là bbox gần nhất
+
+    def correct(self, rows, measurements):
+        self.states[rows, :4] = measurements
+
+    def cost_matrix(self, boxes, class_ids):
+        iou = get_bbox_iou_matrix(self.to_boxes(self.states), boxes)
+        valid = (self.class_ids[:, None] == class_ids[None, :]) & (iou >= self.min_iou)
+        return 1 - iou, valid
+
+
+class ByteTrackTracker(): # ByteTrack của supervision, mỗi lớp đối tượng một tracker riêng
+    '''
+    ByteTrack ghép hai bước: phát hiện có độ tin cậy cao được ghép trước, phát hiện có độ tin cậy thấp (dưới min_confidence)
+    chỉ dùng để nối tiếp các track đang có chứ không tạo track mới. Vì vậy backend này nhận cả các phát hiện độ tin cậy thấp.
+    ByteTrack không phân biệt lớp nên mỗi lớp dùng một tracker riêng, id của từng tracker được đổi sang id chung để không trùng giữa các lớp.
+    '''
+    def __init__(self, max_lost=30, min_confidence=0.5, frame_rate=24):
+        import supervision as sv # chỉ cần supervision khi dùng backend này
+        self.sv = sv
+        self.max_lost = max_lost
+        self.min_confidence = min_confidence
+        self.frame_rate = frame_rate
+        self.trackers = {} # {class_id: sv.ByteTrack}
+        self.id_map = {} # {(class_id, id của ByteTrack): id chung}
+        self.next_id = 1
+
+    def track(self, frame, boxes, confidences, class_ids):
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        confidences = np.asarray(confidences, dtype=float)
+        class_ids = np.asarray(class_ids, dtype=int)
+        track_ids = np.full(len(boxes), -1, dtype=int)
+
+        for class_id in np.unique(np.concatenate([class_ids, list(self.trackers)])).astype(int):
+            if class_id not in self.trackers:
+                self.trackers[class_id] = self.sv.ByteTrack(track_activation_threshold=self.min_confidence,
+                                                            lost_track_buffer=self.max_lost,
+                                                            frame_rate=self.frame_rate)
+            # lớp không có phát hiện nào vẫn được cập nhật để tăng bộ đếm mất dấu của các track
+            indices = np.flatnonzero(class_ids == class_id)
+            detections = self.sv.Detections(xyxy=boxes[indices], confidence=confidences[indices],
+                                            class_id=class_ids[indices], data={'index': indices})
+            tracked = self.trackers[class_id].update_with_detections(detections)
+            for index, byte_track_id in zip(tracked.data.get('index', []), tracked.tracker_id):
+                key = (class_id, int(byte_track_id))
+                if key not in self.id_map:
+                    self.id_map[key] = self.next_id
+                    self.next_id += 1
+                track_ids[index] = self.id_map[key]
+
+        return track_ids.tolist()
+
+
+class CSRTTracker(): # cách ghép cũ: mỗi track một tracker CSRT của OpenCV, ghép với phát hiện gần nhất trong vòng 50 pixel
+    def __init__(self, max_lost=30, max_distance=50, min_confidence=0.5):
+        self.max_lost = max_lost
+        self.max_distance = max_distance
+        self.min_confidence = min_confidence
+        self.trackers = {}  # Dictionary to store active trackers
+        self.next_id = 1    # For assigning unique IDs
+
+    def track(self, frame, boxes, confidences, class_ids):
+        '''
+        logic hàm này là:
+        1. Cập nhật mỗi tracker CSRT đang hoạt động một lần với khung hình hiện tại để lấy vị trí dự đoán
+        2. Với từng phát hiện đủ độ tin cậy, tìm tracker cùng lớp chưa được ghép có tâm gần nhất trong vòng max_distance
+        3. Nếu tìm thấy thì khởi tạo lại tracker với bbox mới, nếu không thì tạo tracker mới
+        4. Tăng bộ đếm mất dấu cho các tracker không được ghép và vô hiệu hóa tracker bị mất quá max_lost khung hình
+        '''
+        predicted_centers = {}
+        for tracker_id, tracker_info in self.trackers.items():
+            if tracker_info['active']:
+                success, track_box = tracker_info['tracker'].update(frame) # CSRT trả về bbox dạng (x, y, w, h)
+                if success:
+                    x, y, w, h = track_box
+                    predicted_centers[tracker_id] = np.array(get_center_of_bbox((x, y, x + w, y + h)))
+
+        track_ids = []
+        matched_ids = set()
+        for bbox, conf, cls_id in zip(boxes, confidences, class_ids):
+            if conf < self.min_confidence:
+                track_ids.append(-1)
+                continue
+
+            matched_id = None
+            best_distance = self.max_distance
+            bbox_center = np.array(get_center_of_bbox(bbox))
+            for tracker_id, track_center in predicted_centers.items():
+                if tracker_id in matched_ids or self.trackers[tracker_id]['class_id'] != int(cls_id):
+                    continue
+                dist = np.linalg.norm(bbox_center - track_center)
+                if dist < best_distance:
+                    matched_id, best_distance = tracker_id, dist
+
+            if matched_id is None: # Create new tracker if no match found
+                matched_id = self.next_id
+                self.next_id += 1
+                self.trackers[matched_id] = {
+                    'tracker': cv2.TrackerCSRT_create(),
+                    'active': True,
+                    'class_id': int(cls_id),
+                    'lost_count': 0
+                }
+            self.trackers[matched_id]['lost_count'] = 0
+            x1, y1, x2, y2 = np.asarray(bbox).astype(int)
+            self.trackers[matched_id]['tracker'].init(frame, (int(x1), int(y1), int(x2 - x1), int(y2 - y1))) # khởi tạo lại tracker với bbox mới dạng (x, y, w, h)
+
+            matched_ids.add(matched_id)
+            track_ids.append(matched_id)
+
+        # Update lost counts and deactivate lost trackers
+        for tracker_id, tracker_info in self.trackers.items():
+            if tracker_info['active'] and tracker_id not in matched_ids:
+                tracker_info['lost_count'] += 1
+                if tracker_info['lost_count'] > self.max_lost:
+                    tracker_info['active'] = False
+
+        return track_ids
+
+
+TRACKER_BACKENDS = {
+    'kalman': MotionTracker,
+    'iou': IoUTracker,
+    'bytetrack': ByteTrackTracker,
+    'csrt': CSRTTracker,
+}
+
+def create_tracker_backend(name, max_lost=30):
+    # tạo tracker backend theo tên, dùng cho Tracker và tùy chọn --tracker của main.py
+    if name not in TRACKER_BACKENDS:
+        raise ValueError(f"❌ Không có tracker backend '{name}', chọn một trong: {', '.join(TRACKER_BACKENDS)}")
+    return TRACKER_BACKENDS[name](max_lost=max_lost)
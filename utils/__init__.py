@@ -0,0 +1,5 @@
+from .video_utils import read_video, save_video, create_video_writer, AsyncVideoWriter, VideoFrameReader, iter_batches, iter_prefetched
+from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance, measure_xy_distance, get_foot_position, get_bbox_iou_matrix
+from .stage_cache import StageCache
+from .overlay_compositor import OverlayCompositor
+from .render_profile import RenderProfile
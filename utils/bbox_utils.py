@@ -1,3 +1,5 @@
+import numpy as np
+
 def get_center_of_bbox(bbox):
     # hàm này nhận vào một bounding box dưới dạng (x1, y1, x2, y2)
     x1,y1,x2,y2 = bbox
@@ -18,4 +20,18 @@ def measure_xy_distance(p1,p2):
 def get_foot_position(bbox):
     # hàm này nhận vào một bounding box dưới dạng (x1, y1, x2, y2) và trả về vị trí chân (foot position)
     x1,y1,x2,y2 = bbox
-    return int((x1+x2)/2),int(y2)
\ No newline at end of file
+    return int((x1+x2)/2),int(y2)
+
+def get_bbox_iou_matrix(boxes_a, boxes_b):
+    # hàm này tính IoU (tỉ lệ giao trên hợp) giữa từng cặp bounding box của hai mảng (N,4) và (M,4) dạng (x1, y1, x2, y2), trả về ma trận (N,M)
+    boxes_a = np.asarray(boxes_a, dtype=float).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=float).reshape(-1, 4)
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
@@ -0,0 +1,69 @@
+import numpy as np
+import cv2
+
+class OverlayCompositor(): # ghép các lớp HUD tĩnh (nền bảng, viền, tiêu đề...) lên khung hình, chỉ trong vùng ROI của lớp
+    '''
+    Các bảng thông tin vẽ lên video (bảng thống kê, kiểm soát bóng, chuyển động camera) có phần nền giống nhau ở mọi khung hình,
+    trước đây mỗi khung hình phải frame.copy() + cv2.addWeighted trên cả khung hình chỉ để vẽ một bảng nhỏ:
+    - Phần tĩnh của mỗi lớp được vẽ một lần bằng chính các lệnh cv2 cũ (draw(canvas, dx, dy)) lên hai khung nền đen và trắng
+    - Các lệnh vẽ (rectangle, putText, addWeighted với bản sao) đều biến mỗi pixel f thành alpha*f + layer,
+      nên từ hai lần vẽ này tính được alpha (độ xuyên thấu) và layer (màu đã nhân alpha) cho từng pixel của ROI
+    - Mỗi khung hình chỉ cần roi * alpha + layer trên vùng ROI (một phép tính, không sao chép khung hình),
+      phần chữ thay đổi theo khung hình được vẽ thẳng lên khung hình sau đó
+    Lớp được lưu theo key, key phải chứa mọi thứ làm thay đổi phần tĩnh (vị trí, kích thước, nội dung).
+    scale khác 1 (RenderProfile proxy, video không phải 1920x1080): lớp vẽ ở tọa độ tham chiếu rồi thu nhỏ alpha và layer một lần.
+    '''
+    def __init__(self):
+        self.layers = {} # (key, scale) -> (x1, y1, alpha, layer) của lớp đã vẽ sẵn
+
+    def clear(self):
+        # nội dung tĩnh thay đổi (ví dụ thống kê được tính lại): vẽ lại các lớp ở lần dùng tiếp theo
+        self.layers = {}
+
+    def get_layer(self, key, roi, draw, scale=1.0):
+        '''
+        logic hàm này là:
+        1. Nếu lớp đã có trong cache thì trả về
+        2. Vẽ phần tĩnh lên khung nền đen (0) và trắng (255) có kích thước ROI, draw(canvas, dx, dy) vẽ tại tọa độ trên khung hình + (dx, dy)
+           và trả về canvas
+        3. alpha = (trắng - đen) / 255, layer = đen
+        4. scale khác 1 thì thu nhỏ/phóng to alpha và layer (INTER_AREA), tọa độ góc ROI nhân với scale
+        roi là (x1, y1, x2, y2) trên khung hình (tọa độ tham chiếu nếu scale khác 1).
+        '''
+        cached = self.layers.get((key, scale))
+        if cached is not None:
+            return cached
+        x1, y1, x2, y2 = roi
+        outputs = []
+        for value in (0, 255):
+            canvas = np.full((y2 - y1, x2 - x1, 3), value, dtype=np.uint8)
+            canvas = draw(canvas, -x1, -y1)
+            outputs.append(canvas.astype(np.float32))
+        alpha = (outputs[1] - outputs[0]) / 255.0
+        layer = outputs[0]
+        if scale != 1.0:
+            size = (max(1, int(round((x2 - x1) * scale))), max(1, int(round((y2 - y1) * scale))))
+            alpha = cv2.resize(alpha, size, interpolation=cv2.INTER_AREA)
+            layer = cv2.resize(layer, size, interpolation=cv2.INTER_AREA)
+            x1, y1 = int(round(x1 * scale)), int(round(y1 * scale))
+        cached = (x1, y1, alpha, layer)
+        self.layers[(key, scale)] = cached
+        return cached
+
+    def compose(self, frame, key, roi, draw, scale=1.0, position=None):
+        # trộn lớp tĩnh key vào frame (sửa trực tiếp frame) chỉ trên phần ROI nằm trong khung hình, trả về frame
+        # position là góc trên trái của lớp trên frame (mặc định là góc của ROI, nhân với scale)
+        x1, y1, alpha, layer = self.get_layer(key, roi, draw, scale)
+        if position is not None:
+            x1, y1 = position
+        height, width = alpha.shape[:2]
+        frame_x1, frame_y1 = max(x1, 0), max(y1, 0)
+        frame_x2, frame_y2 = min(x1 + width, frame.shape[1]), min(y1 + height, frame.shape[0])
+        if frame_x1 >= frame_x2 or frame_y1 >= frame_y2:
+            return frame
+        region = (slice(frame_y1 - y1, frame_y2 - y1), slice(frame_x1 - x1, frame_x2 - x1))
+        roi_pixels = frame[frame_y1:frame_y2, frame_x1:frame_x2]
+        blended = roi_pixels * alpha[region] + layer[region]
+        np.clip(blended + 0.5, 0, 255, out=blended) # làm tròn như cv2.addWeighted
+        roi_pixels[:] = blended.astype(np.uint8)
+        return frame
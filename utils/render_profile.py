@@ -0,0 +1,81 @@
+import os
+import cv2
+
+class RenderProfile(): # độ phân giải vẽ và ghi video đầu ra, bố cục HUD chuẩn hóa theo kích thước khung hình
+    '''
+    - 'full' vẽ và ghi ở độ phân giải gốc, 'proxy' (1/2) và 'draft' (1/4) thu nhỏ khung hình một lần trước khi vẽ,
+      mọi chú thích được vẽ ở độ phân giải thấp rồi ghi luôn (bản xem nhanh cho huấn luyện viên: vẽ, mã hóa và dung lượng file nhỏ hơn nhiều)
+    - Chú thích theo bbox (ellipse, tam giác, tốc độ...): tọa độ bbox, kích thước và độ dày nét nhân với scale
+    - HUD (kiểm soát bóng, chuyển động camera, bảng thống kê) được thiết kế trên khung hình tham chiếu 1920x1080,
+      mỗi bảng gắn với một góc khung hình (anchor), tọa độ được đổi theo hud_scale = min(rộng/1920, cao/1080) của khung hình đầu ra
+      nên HUD nằm đúng chỗ với mọi độ phân giải (trước đây tọa độ cố định cho 1920x1080)
+    Với 'full' trên video 1920x1080, kết quả giống hệt cách vẽ cũ.
+    '''
+    PROFILES = {'full': 1.0, 'proxy': 0.5, 'draft': 0.25}
+    REFERENCE_SIZE = (1920, 1080) # (rộng, cao) của khung hình tham chiếu của bố cục HUD
+    ANCHORS = ('top_left', 'top_right', 'bottom_left', 'bottom_right')
+
+    def __init__(self, name='full', scale=None):
+        if scale is None and name not in self.PROFILES:
+            raise ValueError(f"❌ Render profile không hợp lệ: {name}, chọn một trong {tuple(self.PROFILES)}")
+        self.name = name
+        self.scale = float(self.PROFILES[name] if scale is None else scale) # tỉ lệ độ phân giải đầu ra so với video gốc
+
+    def get_params(self):
+        return dict(render_profile=self.name, render_scale=self.scale)
+
+    def get_output_size(self, width, height):
+        # (rộng, cao) của khung hình đầu ra, làm tròn về số chẵn cho codec
+        if self.scale == 1.0:
+            return width, height
+        return max(2, int(round(width * self.scale / 2)) * 2), max(2, int(round(height * self.scale / 2)) * 2)
+
+    def get_output_path(self, output_video_path):
+        # video bản thu nhỏ có hậu tố tên profile, ví dụ output_video_proxy.avi
+        if self.scale == 1.0:
+            return output_video_path
+        root, ext = os.path.splitext(output_video_path)
+        return f"{root}_{self.name}{ext}"
+
+    def resize_frame(self, frame):
+        # bản sao duy nhất của khung hình để vẽ: copy ở độ phân giải gốc hoặc thu nhỏ (INTER_AREA) ở profile proxy/draft
+        if self.scale == 1.0:
+            return frame.copy()
+        return cv2.resize(frame, self.get_output_size(frame.shape[1], frame.shape[0]), interpolation=cv2.INTER_AREA)
+
+    def scale_bbox(self, bbox):
+        # bbox trên video gốc -> bbox trên khung hình đầu ra
+        if self.scale == 1.0:
+            return bbox
+        return [value * self.scale for value in bbox]
+
+    def length(self, value, scale=None):
+        # độ dài (pixel) trên khung hình đầu ra, scale mặc định là scale của profile
+        return int(round(value * (self.scale if scale is None else scale)))
+
+    def thickness(self, value, scale=None):
+        # độ dày nét vẽ/chữ, tối thiểu 1 pixel
+        return max(1, self.length(value, scale))
+
+    def get_hud_scale(self, frame_shape):
+        # tỉ lệ của bố cục HUD trên khung hình đầu ra so với khung hình tham chiếu
+        return min(frame_shape[1] / self.REFERENCE_SIZE[0], frame_shape[0] / self.REFERENCE_SIZE[1])
+
+    def get_hud_point(self, frame_shape, anchor, point):
+        '''
+        Đổi điểm point trên khung hình tham chiếu 1920x1080 sang khung hình đầu ra:
+        khoảng cách tới góc anchor (ví dụ 'bottom_right' là cạnh phải và cạnh dưới) được nhân với hud_scale.
+        '''
+        if anchor not in self.ANCHORS:
+            raise ValueError(f"❌ Góc neo HUD không hợp lệ: {anchor}, chọn một trong {self.ANCHORS}")
+        scale = self.get_hud_scale(frame_shape)
+        x, y = point
+        if anchor.endswith('right'):
+            x = frame_shape[1] - (self.REFERENCE_SIZE[0] - x) * scale
+        else:
+            x = x * scale
+        if anchor.startswith('bottom'):
+            y = frame_shape[0] - (self.REFERENCE_SIZE[1] - y) * scale
+        else:
+            y = y * scale
+        return int(round(x)), int(round(y))
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+
+_MISSING = object() # đánh dấu không có kết quả trong cache (kết quả của một bước có thể là None)
+
+class StageCache:
+    '''
+    Cache kết quả của các bước trong pipeline, thay cho các file stub cố định (stubs/track_stubs.pkl, stubs/camera_movement_stub.pkl)
+    vốn được dùng lại cho mọi video đầu vào.
+    - Khóa (key) được tính từ nội dung: tên bước + hash SHA-256 của các file đầu vào (video, trọng số mô hình)
+      + khóa của các bước phía trước (parents) + tham số của bước, đổi video/mô hình/tham số thì khóa đổi theo
+    - Hash của file được nhớ theo (đường dẫn, kích thước, thời gian sửa đổi) nên mỗi file chỉ bị đọc để hash một lần
+    - Mỗi kết quả là một file pickle trong cache_dir, index.json lưu kích thước và thời điểm dùng gần nhất của từng kết quả
+    - Tổng dung lượng vượt max_size (byte) thì xóa các kết quả lâu không dùng nhất (LRU)
+    - enabled=False thì không đọc/ghi gì, get_or_compute luôn chạy lại bước đó
+    '''
+    def __init__(self, cache_dir='stubs/cache', max_size=2 * 1024**3, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.enabled = enabled
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.hits = 0
+        self.misses = 0
+
+        self.index = {'entries': {}, 'file_hashes': {}}
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.load_index()
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            print(f"⚠️ Không đọc được {self.index_path}, tạo lại index của cache")
+            self.index = {'entries': {}, 'file_hashes': {}}
+        # bỏ các mục không còn file (bị xóa tay)
+        self.index['entries'] = {key: entry for key, entry in self.index['entries'].items() if os.path.exists(self.entry_path(key))}
+
+    def save_index(self):
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(temp_path, self.index_path) # ghi file tạm rồi đổi tên để index không bị hỏng khi chương trình dừng giữa chừng
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.pkl')
+
+    def hash_file(self, path):
+        # SHA-256 của nội dung file, đọc theo từng khối 1MB để không nạp cả video vào bộ nhớ
+        stat = os.stat(path)
+        abs_path = os.path.abspath(path)
+        cached = self.index['file_hashes'].get(abs_path)
+        if cached is not None and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns:
+            return cached['sha256']
+
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(block)
+        self.index['file_hashes'][abs_path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': sha256.hexdigest()}
+        return sha256.hexdigest()
+
+    def make_key(self, stage, files=(), parents=(), params=None):
+        '''
+        logic hàm này là:
+        1. Hash nội dung các file đầu vào (video, trọng số mô hình)
+        2. Ghép với khóa của các bước phía trước và tham số của bước (sắp xếp theo tên tham số)
+        3. Khóa là tên bước + 32 ký tự đầu của SHA-256 của tất cả thông tin trên
+        Trả về None nếu cache bị tắt.
+        '''
+        if not self.enabled:
+            return None
+        payload = {
+            'stage': stage,
+            'files': [self.hash_file(path) for path in files],
+            'parents': list(parents),
+            'params': params or {},
+        }
+        digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return f"{stage}-{digest[:32]}"
+
+    def get(self, key, default=None):
+        if not self.enabled or key not in self.index['entries']:
+            self.misses += 1
+            return default
+        try:
+            with open(self.entry_path(key), 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            print(f"⚠️ Kết quả {key} trong cache bị hỏng, sẽ tính lại")
+            self.remove(key)
+            self.misses += 1
+            return default
+        self.index['entries'][key]['last_access'] = time.time()
+        self.save_index()
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        path = self.entry_path(key)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(value, f)
+        size = os.path.getsize(temp_path)
+        if size > self.max_size: # một kết quả lớn hơn cả giới hạn thì không lưu
+            os.remove(temp_path)
+            print(f"⚠️ Kết quả {key} ({size / 1024**2:.1f}MB) lớn hơn giới hạn cache, không lưu")
+            return
+        os.replace(temp_path, path)
+        self.index['entries'][key] = {'size': size, 'last_access': time.time()}
+        self.evict()
+        self.save_index()
+
+    def get_or_compute(self, key, compute):
+        # trả về kết quả đã lưu của key, nếu chưa có thì chạy compute() rồi lưu lại
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            print(f"♻️ Dùng lại kết quả từ cache: {key}")
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def evict(self):
+        # xóa các kết quả lâu không dùng nhất cho đến khi tổng dung lượng không vượt max_size
+        entries = sorted(self.index['entries'].items(), key=lambda item: item[1]['last_access'])
+        total_size = sum(entry['size'] for _, entry in entries)
+        for key, entry in entries:
+            if total_size <= self.max_size:
+                break
+            self.remove(key, save=False)
+            total_size -= entry['size']
+
+    def remove(self, key, save=True):
+        self.index['entries'].pop(key, None)
+        if os.path.exists(self.entry_path(key)):
+            os.remove(self.entry_path(key))
+        if save:
+            self.save_index()
+
+    def clear(self):
+        if not self.enabled:
+            return
+        for key in list(self.index['entries']):
+            self.remove(key, save=False)
+        self.save_index()
+
+    def stats(self):
+        return {
+            'entries': len(self.index['entries']),
+            'size': sum(entry['size'] for entry in self.index['entries'].values()),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -1,5 +1,11 @@
 import cv2
 import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+_END_OF_VIDEO = object() # đánh dấu kết thúc video trong hàng đợi đọc trước
 
 def read_video(video_path):
     # Kiểm tra file có tồn tại không
@@ -29,12 +35,305 @@ def read_video(video_path):
     print(f"✅ Đã đọc thành công {len(frames)} frames từ video: {video_path}")
     return frames # trả về danh sách các khung hình
 
-def save_video(ouput_video_frames,output_video_path): # lưu video từ danh sách các khung hình
-    fourcc = cv2.VideoWriter_fourcc(*'XVID') # định dạng video
+def decode_fourcc(value): # chuyển giá trị CAP_PROP_FOURCC (số) thành chuỗi 4 ký tự
+    value = int(value)
+    codec = "".join(chr((value >> 8 * i) & 0xFF) for i in range(4))
+    if value <= 0 or not codec.isprintable():
+        return None
+    return codec
+
+def create_video_writer(output_video_path, frame_size, fps=24, codec='XVID'): # tạo VideoWriter để ghi video theo từng khung hình
+    fourcc = cv2.VideoWriter_fourcc(*codec) # định dạng video
     # fourcc là mã bốn ký tự xác định codec video
-    out = cv2.VideoWriter(output_video_path, fourcc, 24, (ouput_video_frames[0].shape[1], ouput_video_frames[0].shape[0]))
-    #tạo đối tượng VideoWriter để ghi video
-    # 24 là fps, (width,height) là kích thước khung hình
-    for frame in ouput_video_frames:
-        out.write(frame)
-    out.release() # giải phóng bộ nhớ sau khi ghi xong video
+    out = cv2.VideoWriter(output_video_path, fourcc, fps, frame_size)
+    # frame_size là (width,height) của khung hình
+    if not out.isOpened() and codec != 'XVID': # codec của video nguồn không ghi được vào container đầu ra thì dùng XVID
+        print(f"⚠️ Không ghi được codec {codec} vào {output_video_path}, chuyển sang XVID")
+        out = cv2.VideoWriter(output_video_path, cv2.VideoWriter_fourcc(*'XVID'), fps, frame_size)
+    return out
+
+def save_video(ouput_video_frames,output_video_path, fps=24, codec='XVID'): # lưu video từ danh sách (hoặc generator) các khung hình
+    # ghi qua AsyncVideoWriter để việc tạo khung hình (nếu là generator) chạy song song với việc mã hóa video
+    with AsyncVideoWriter(output_video_path, fps=fps, codec=codec) as out:
+        for frame in ouput_video_frames:
+            out.write(frame)
+
+
+class AsyncVideoWriter:
+    '''
+    Ghi video bất đồng bộ: write() chỉ đưa khung hình vào hàng đợi có giới hạn, một luồng nền mã hóa và ghi ra file.
+    - Bên tạo khung hình (vẽ chú thích) tiếp tục chạy trong khi luồng nền mã hóa
+    - Khi hàng đợi đầy, write() phải chờ (backpressure), thời gian chờ được cộng vào wait_time
+    - fps và codec nên lấy từ video nguồn (VideoFrameReader.fps, VideoFrameReader.codec)
+    - close() trả về thống kê: số khung hình, tốc độ ghi, thời gian mã hóa, thời gian chờ, độ sâu hàng đợi lớn nhất
+    '''
+    def __init__(self, output_video_path, fps=24, codec='XVID', queue_size=64):
+        self.output_video_path = output_video_path
+        self.fps = fps or 24
+        self.codec = codec or 'XVID'
+        self.queue_size = queue_size
+
+        self.frames_written = 0
+        self.encode_time = 0.0 # tổng thời gian luồng nền dành cho việc mã hóa và ghi
+        self.wait_time = 0.0 # tổng thời gian write() phải chờ vì hàng đợi đầy
+        self.max_queue_depth = 0
+
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._error = None # lỗi xảy ra trong luồng nền, được ném lại ở write()/close()
+        self._closed = False
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        if self._error is not None:
+            raise self._error
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize() + 1)
+        start = time.perf_counter()
+        self._queue.put(frame) # chờ nếu hàng đợi đầy
+        self.wait_time += time.perf_counter() - start
+
+    def _run(self):
+        out = None
+        while True:
+            frame = self._queue.get()
+            if frame is _END_OF_VIDEO:
+                break
+            if self._error is not None: # đã lỗi thì chỉ lấy hết hàng đợi để write() không bị treo
+                continue
+            try:
+                start = time.perf_counter()
+                if out is None: # mở VideoWriter theo kích thước của khung hình đầu tiên
+                    out = create_video_writer(self.output_video_path, (frame.shape[1], frame.shape[0]), self.fps, self.codec)
+                out.write(frame)
+                self.encode_time += time.perf_counter() - start
+                self.frames_written += 1
+            except Exception as e:
+                self._error = e
+        if out is not None:
+            out.release() # giải phóng bộ nhớ sau khi ghi xong video
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._start_time
+        return {
+            'frames_written': self.frames_written,
+            'elapsed_time': elapsed,
+            'throughput_fps': self.frames_written / elapsed if elapsed > 0 else 0.0,
+            'encode_fps': self.frames_written / self.encode_time if self.encode_time > 0 else 0.0,
+            'encode_time': self.encode_time,
+            'wait_time': self.wait_time,
+            'max_queue_depth': self.max_queue_depth,
+            'queue_size': self.queue_size,
+        }
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_END_OF_VIDEO)
+            self._thread.join()
+            stats = self.stats()
+            print(f"🎞️ Đã ghi {stats['frames_written']} frames vào {self.output_video_path} "
+                  f"({stats['throughput_fps']:.1f} fps, mã hóa {stats['encode_fps']:.1f} fps, "
+                  f"chờ hàng đợi {stats['wait_time']:.2f}s, hàng đợi tối đa {stats['max_queue_depth']}/{self.queue_size})")
+        if self._error is not None:
+            raise self._error
+        return self.stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class VideoFrameReader:
+    '''
+    Nguồn khung hình dạng streaming (đọc lười - lazy), thay cho việc read_video nạp toàn bộ video vào một list.
+    - Duyệt tuần tự (for frame in reader) dùng một luồng nền đọc trước tối đa prefetch_size khung hình vào hàng đợi có giới hạn
+    - Truy cập ngẫu nhiên reader[i] / reader[a:b] sẽ seek trong video, giữ lại cache_size khung hình gần nhất
+    - len(reader) trả về số khung hình theo metadata của container
+    Bộ nhớ tối đa phụ thuộc vào prefetch_size và cache_size chứ không phụ thuộc vào độ dài video.
+    '''
+    def __init__(self, video_path, prefetch_size=32, cache_size=8, max_frames=None):
+        # Kiểm tra file có tồn tại không
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"❌ Không tìm thấy video tại: {video_path}")
+
+        self.video_path = video_path
+        self.prefetch_size = prefetch_size # số khung hình tối đa được đọc trước khi duyệt tuần tự
+        self.cache_size = cache_size # số khung hình gần nhất được giữ lại cho truy cập ngẫu nhiên
+
+        self._cap = cv2.VideoCapture(video_path) # capture dùng cho truy cập ngẫu nhiên
+        if not self._cap.isOpened():
+            raise ValueError(f"❌ Không thể mở video: {video_path}. File có thể bị hỏng hoặc định dạng không được hỗ trợ.")
+
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 24 # một số container không có fps, mặc định 24 như save_video
+        self.codec = decode_fourcc(self._cap.get(cv2.CAP_PROP_FOURCC)) or 'XVID' # codec của video nguồn, ví dụ 'avc1', 'XVID'
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if max_frames is not None:
+            frame_count = min(frame_count, max_frames)
+        self.frame_count = frame_count
+
+        self._position = 0 # chỉ số khung hình tiếp theo mà self._cap sẽ đọc
+        self._cache = OrderedDict() # cache LRU {frame_num: frame}
+
+        # Kiểm tra có đọc được frame nào không
+        if self.frame_count <= 0 or self._read_at(0) is None:
+            self.close()
+            raise ValueError(f"❌ Không đọc được frame nào từ video: {video_path}")
+
+        print(f"✅ Đã mở video (streaming) {self.frame_count} frames, {self.fps:.1f} fps: {video_path}")
+
+    def __len__(self):
+        return self.frame_count
+
+    def __iter__(self):
+        return self.iter_frames()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice): # reader[a:b] trả về list các khung hình trong khoảng, kích thước bị giới hạn bởi slice
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError(f"Frame {index} nằm ngoài video ({len(self)} frames)")
+
+        frame = self._read_at(index)
+        if frame is None:
+            raise IndexError(f"Không đọc được frame {index} từ video: {self.video_path}")
+        return frame
+
+    def _read_at(self, frame_num):
+        # đọc một khung hình theo chỉ số, chỉ seek khi không đọc tuần tự
+        if frame_num in self._cache:
+            self._cache.move_to_end(frame_num)
+            return self._cache[frame_num]
+
+        if frame_num != self._position:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
+        ret, frame = self._cap.read()
+        if not ret:
+            self._position = -1 # vị trí không còn xác định, lần đọc sau sẽ seek lại
+            return None
+        self._position = frame_num + 1
+
+        self._cache[frame_num] = frame
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False) # bỏ khung hình cũ nhất
+        return frame
+
+    def iter_frames(self, start=0, stop=None):
+        '''
+        Duyệt tuần tự các khung hình trong [start, stop) với bộ đệm đọc trước có giới hạn:
+        1. Một luồng nền mở VideoCapture riêng, seek tới start và đọc lần lượt từng khung hình
+        2. Khung hình được đưa vào hàng đợi kích thước prefetch_size, luồng nền sẽ chờ khi hàng đợi đầy
+        3. Khi người dùng dừng sớm (break) thì luồng nền cũng dừng và giải phóng capture
+        '''
+        stop = len(self) if stop is None else min(stop, len(self))
+        frame_queue = queue.Queue(maxsize=max(1, self.prefetch_size))
+        stop_event = threading.Event()
+
+        def put(item): # đưa item vào hàng đợi, bỏ cuộc nếu người dùng đã dừng duyệt
+            while not stop_event.is_set():
+                try:
+                    frame_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            cap = cv2.VideoCapture(self.video_path)
+            try:
+                if start > 0:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+                for _ in range(start, stop):
+                    ret, frame = cap.read()
+                    if not ret or not put(frame):
+                        break
+            finally:
+                cap.release()
+                put(_END_OF_VIDEO)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                frame = frame_queue.get()
+                if frame is _END_OF_VIDEO:
+                    break
+                yield frame
+        finally:
+            stop_event.set()
+            producer.join()
+
+    def close(self):
+        self._cache.clear()
+        self._cap.release() # giải phóng bộ nhớ
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_prefetched(items, prefetch_size=2):
+    '''
+    Duyệt một iterable trên luồng nền, giữ trước tối đa prefetch_size phần tử trong hàng đợi có giới hạn:
+    - Dùng để chồng việc chuẩn bị dữ liệu (đọc, chia lô khung hình) lên việc xử lý phần tử hiện tại (ví dụ inference)
+    - Lỗi xảy ra trên luồng nền được ném lại ở luồng gọi
+    - Dừng sớm (break) thì luồng nền cũng dừng
+    '''
+    item_queue = queue.Queue(maxsize=max(1, prefetch_size))
+    stop_event = threading.Event()
+    errors = []
+
+    def put(item): # đưa item vào hàng đợi, bỏ cuộc nếu người dùng đã dừng duyệt
+        while not stop_event.is_set():
+            try:
+                item_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(_END_OF_VIDEO)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = item_queue.get()
+            if item is _END_OF_VIDEO:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stop_event.set()
+        producer.join()
+
+
+def iter_batches(frames, batch_size):
+    # chia một nguồn khung hình (list hoặc VideoFrameReader) thành các lô liên tiếp mà không cần nạp toàn bộ video
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,2 @@
+from .view_transformer import ViewTransformer
+from .pitch_registration import PitchRegistration, PITCH_KEYPOINTS
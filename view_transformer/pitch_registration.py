@@ -0,0 +1,412 @@
+import cv2
+import numpy as np
+
+'''
+Ước lượng ma trận biến đổi (homography) từ ảnh sang hệ tọa độ sân bóng (mét) cho từng khung hình,
+thay cho 4 góc sân pixel_vertices cố định của ViewTransformer (chỉ đúng với một góc quay của một video mẫu).
+'''
+
+PITCH_LENGTH = 105 # chiều dài sân (mét), trục x của hệ tọa độ sân
+PITCH_WIDTH = 68 # chiều rộng sân (mét), trục y của hệ tọa độ sân
+
+def _rectangle(x1, y1, x2, y2):
+    return [(x1, y1), (x2, y1), (x2, y2), (x1, y2), (x1, y1)]
+
+def _circle(center, radius, start=0, end=360):
+    angles = np.radians(np.arange(start, end + 1, 5))
+    return list(zip(center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)))
+
+# các điểm đặc trưng của sân (mét), dùng cho estimate_from_keypoints khi có mô hình phát hiện điểm đặc trưng
+PITCH_KEYPOINTS = {
+    'corner_top_left': (0, 0), 'corner_top_right': (PITCH_LENGTH, 0),
+    'corner_bottom_left': (0, PITCH_WIDTH), 'corner_bottom_right': (PITCH_LENGTH, PITCH_WIDTH),
+    'halfway_top': (PITCH_LENGTH / 2, 0), 'halfway_bottom': (PITCH_LENGTH / 2, PITCH_WIDTH),
+    'center_spot': (PITCH_LENGTH / 2, PITCH_WIDTH / 2),
+    'center_circle_top': (PITCH_LENGTH / 2, PITCH_WIDTH / 2 - 9.15), 'center_circle_bottom': (PITCH_LENGTH / 2, PITCH_WIDTH / 2 + 9.15),
+    'left_penalty_top_outer': (0, 13.84), 'left_penalty_top_inner': (16.5, 13.84),
+    'left_penalty_bottom_inner': (16.5, 54.16), 'left_penalty_bottom_outer': (0, 54.16),
+    'right_penalty_top_outer': (PITCH_LENGTH, 13.84), 'right_penalty_top_inner': (PITCH_LENGTH - 16.5, 13.84),
+    'right_penalty_bottom_inner': (PITCH_LENGTH - 16.5, 54.16), 'right_penalty_bottom_outer': (PITCH_LENGTH, 54.16),
+    'left_goal_area_top_inner': (5.5, 24.84), 'left_goal_area_bottom_inner': (5.5, 43.16),
+    'right_goal_area_top_inner': (PITCH_LENGTH - 5.5, 24.84), 'right_goal_area_bottom_inner': (PITCH_LENGTH - 5.5, 43.16),
+    'left_penalty_spot': (11, PITCH_WIDTH / 2), 'right_penalty_spot': (PITCH_LENGTH - 11, PITCH_WIDTH / 2),
+}
+
+# các đường kẻ sân (đường gấp khúc, mét) để vẽ mẫu sân và tính sai số chiếu lại
+PITCH_LINES = [
+    _rectangle(0, 0, PITCH_LENGTH, PITCH_WIDTH), # đường biên dọc và đường biên ngang
+    [(PITCH_LENGTH / 2, 0), (PITCH_LENGTH / 2, PITCH_WIDTH)], # đường giữa sân
+    _rectangle(0, 13.84, 16.5, 54.16), _rectangle(PITCH_LENGTH - 16.5, 13.84, PITCH_LENGTH, 54.16), # vòng cấm
+    _rectangle(0, 24.84, 5.5, 43.16), _rectangle(PITCH_LENGTH - 5.5, 24.84, PITCH_LENGTH, 43.16), # khu vực 5m50
+    _circle((PITCH_LENGTH / 2, PITCH_WIDTH / 2), 9.15), # vòng tròn giữa sân
+    _circle((11, PITCH_WIDTH / 2), 9.15, -53, 53), _circle((PITCH_LENGTH - 11, PITCH_WIDTH / 2), 9.15, 127, 233), # vòng cung vòng cấm
+]
+
+def sample_pitch_lines_of(line, step=0.5):
+    # các điểm cách nhau step mét trên một đường gấp khúc (kể cả điểm cuối) để vẽ bằng cv2.polylines
+    line = np.asarray(line, dtype=np.float64)
+    points = [start + (end - start) * np.linspace(0, 1, max(int(np.ceil(np.linalg.norm(end - start) / step)), 1), endpoint=False)[:, None]
+              for start, end in zip(line[:-1], line[1:])]
+    return np.concatenate(points + [line[-1:]])
+
+def sample_pitch_lines(step=0.5):
+    # tất cả các điểm trên các đường kẻ sân, mảng (N, 2)
+    return np.concatenate([sample_pitch_lines_of(line, step) for line in PITCH_LINES])
+
+def project_points(homography, points):
+    # nhân ma trận cho tất cả các điểm (N, 2), trả về (điểm đã biến đổi, mask các điểm nằm phía trước camera w > 0)
+    homogeneous = np.column_stack([points, np.ones(len(points))]) @ np.asarray(homography, dtype=np.float64).T
+    valid = homogeneous[:, 2] > 1e-9
+    projected = np.full((len(points), 2), np.nan)
+    projected[valid] = homogeneous[valid, :2] / homogeneous[valid, 2:]
+    return projected, valid
+
+def _scale_matrix(scale):
+    return np.diag([scale, scale, 1.0])
+
+def _translation_matrix(x, y):
+    return np.array([[1.0, 0, x], [0, 1.0, y], [0, 0, 1.0]])
+
+class PitchRegistration():
+    '''
+    Ước lượng homography ảnh -> sân (mét) cho từng khung hình, camera lia/zoom thì ma trận thay đổi theo:
+    1. Giữa hai khung hình liên tiếp: theo dõi các điểm đặc trưng trên mặt sân bằng Lucas-Kanade,
+       cv2.findHomography (RANSAC, loại các điểm trên cầu thủ đang chạy) cho chuyển động của ảnh, nhân dồn vào homography
+    2. Ở khung hình chính (mỗi keyframe_interval khung hình) hiệu chỉnh lại để không bị trôi:
+       - Nếu có keypoint_detector (hàm frame -> (tọa độ ảnh (N, 2), tên điểm trong PITCH_KEYPOINTS)) thì tính thẳng từ các điểm đặc trưng
+       - Nếu không thì tách các đường kẻ trắng trên nền cỏ xanh, vẽ mẫu sân theo homography hiện tại
+         và căn mẫu sân khớp với đường kẻ bằng cv2.findTransformECC (MOTION_HOMOGRAPHY), từ thô đến mịn
+       - Chỉ nhận kết quả nếu sai số chiếu lại (pixel) giảm và không vượt max_reprojection_error
+       - ECC chỉ căn được cục bộ: nếu homography hiện tại quá xa (chưa khung hình chính nào căn được hoặc sai số vượt ngưỡng)
+         thì tìm lại từ các ứng viên quanh homography hiện tại và ma trận ban đầu (zoom seed_scales, lia ngang seed_shifts)
+       - Chưa căn được khung hình chính nào hoặc bị mất dấu (sai số vượt ngưỡng mà không căn lại được): cảnh báo và trả về
+         ma trận ban đầu cố định thay cho homography nhân dồn đang bị trôi, cho tới khi căn lại được
+    3. Làm mượt theo thời gian (get_homographies): tọa độ sân của 4 điểm cố định trên ảnh được lấy trung bình trượt
+       smoothing_window khung hình rồi tính lại homography, tránh vị trí trên radar bị rung
+    initial_homography là homography ảnh -> sân của khung hình đầu tiên (mặc định là ma trận 4 góc sân của ViewTransformer),
+    from_keypoints tính nó từ các điểm đặc trưng nhập tay trên khung hình đầu tiên.
+    Các bước xử lý ảnh chạy trên ảnh thu nhỏ về chiều rộng working_width, homography trả về theo tọa độ ảnh gốc.
+    '''
+    def __init__(self, initial_homography=None, keyframe_interval=25, smoothing_window=9, max_reprojection_error=8.0,
+                 keypoint_detector=None, working_width=640, seed_scales=(0.7, 0.78, 0.87, 1.0, 1.15, 1.28, 1.43),
+                 seed_shifts=(-0.3, -0.225, -0.15, -0.075, 0.0, 0.075, 0.15, 0.225, 0.3),
+                 num_seed_candidates=3):
+        if initial_homography is None:
+            from .view_transformer import ViewTransformer
+            initial_homography = ViewTransformer().perspective_transformer
+        self.initial_homography = np.asarray(initial_homography, dtype=np.float64)
+        self.keyframe_interval = max(int(keyframe_interval), 1)
+        self.smoothing_window = max(int(smoothing_window), 1)
+        self.max_reprojection_error = max_reprojection_error
+        self.keypoint_detector = keypoint_detector
+        self.working_width = working_width
+        self.seed_scales = tuple(seed_scales) # các mức zoom (quanh tâm ảnh) của homography ứng viên khi tìm lại
+        self.seed_shifts = tuple(seed_shifts) # các mức lia ngang (tỉ lệ chiều rộng ảnh) của homography ứng viên khi tìm lại
+        self.num_seed_candidates = num_seed_candidates # số ứng viên có sai số chiếu lại nhỏ nhất được căn bằng ECC
+
+        self.features = dict(maxCorners=300, qualityLevel=0.01, minDistance=8, blockSize=7)
+        self.lk_params = dict(winSize=(21, 21), maxLevel=3, criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        self.line_points = sample_pitch_lines()
+        self.outlier_distance = 10 # pixel (ảnh thu nhỏ), khoảng cách tối đa khi tính sai số chiếu lại, đường kẻ bị che/không tách được không làm sai số tăng vô hạn
+
+        self.reset()
+
+    def reset(self):
+        # xóa trạng thái, khung hình tiếp theo đưa vào update sẽ dùng initial_homography
+        self.homography = self.initial_homography.copy()
+        self.frame_num = 0
+        self.prev_gray = None
+        self.prev_pitch_mask = None
+        self.reprojection_errors = {} # frame_num -> sai số chiếu lại (pixel ảnh gốc) ở các khung hình chính
+        self.num_keyframes = 0
+        self.num_refined = 0
+        self.lost = False # chưa căn được hoặc mất dấu: trả về initial_homography cố định
+        self.num_fallback = 0 # số khung hình trả về initial_homography
+
+    @classmethod
+    def from_keypoints(cls, keypoints, **kwargs):
+        # khởi tạo toàn cục từ các điểm đặc trưng nhập tay trên khung hình đầu tiên, keypoints là {tên điểm trong PITCH_KEYPOINTS: (x, y) pixel}
+        unknown = [name for name in keypoints if name not in PITCH_KEYPOINTS]
+        if unknown:
+            raise ValueError(f"❌ Không có điểm đặc trưng {unknown}, các tên hợp lệ: {list(PITCH_KEYPOINTS)}")
+        homography, error = cls.estimate_from_keypoints(list(keypoints.values()), [PITCH_KEYPOINTS[name] for name in keypoints])
+        if homography is None:
+            raise ValueError("❌ Cần ít nhất 4 điểm đặc trưng (không thẳng hàng) để tính homography ban đầu")
+        print(f"✅ Homography ban đầu từ {len(keypoints)} điểm đặc trưng, sai số chiếu lại {error:.2f} px")
+        return cls(initial_homography=homography, **kwargs)
+
+    def get_params(self):
+        return dict(initial_homography=self.initial_homography.round(8).tolist(), keyframe_interval=self.keyframe_interval,
+                    smoothing_window=self.smoothing_window, max_reprojection_error=self.max_reprojection_error,
+                    keypoints=self.keypoint_detector is not None, working_width=self.working_width,
+                    seed_scales=self.seed_scales, seed_shifts=self.seed_shifts, num_seed_candidates=self.num_seed_candidates)
+
+    def get_cache_key(self, cache, video_path, num_frames): # khóa của bước ước lượng homography trong StageCache
+        return cache.make_key('pitch_registration', files=[video_path], params=dict(self.get_params(), num_frames=num_frames))
+
+    def get_homographies(self, frames, cache=None, video_path=None):
+        '''
+        logic hàm này là:
+        1. Nếu có cache (StageCache) thì dùng lại kết quả đã lưu theo nội dung video và tham số
+        2. Duyệt tuần tự các khung hình bằng update để có homography thô của từng khung hình
+        3. Làm mượt theo thời gian bằng smooth_homographies
+        Trả về mảng (số khung hình, 3, 3), sai số chiếu lại ở các khung hình chính được lưu trong self.reprojection_errors
+        '''
+        if cache is not None and cache.enabled:
+            video_path = video_path or getattr(frames, 'video_path', None)
+            if video_path is not None:
+                key = self.get_cache_key(cache, video_path, len(frames))
+                homographies, state = cache.get_or_compute(key, lambda: self.compute_homographies(frames))
+                self.__dict__.update(state) # số khung hình, khung hình chính và sai số chiếu lại để stats() đúng cả khi dùng lại từ cache
+                return homographies
+            print("⚠️ Không biết đường dẫn video của frames, không dùng cache cho homography")
+        homographies, _ = self.compute_homographies(frames)
+        return homographies
+
+    def compute_homographies(self, frames):
+        self.reset()
+        frame_size = None
+        homographies = []
+        for frame in frames:
+            frame_size = frame.shape[1], frame.shape[0]
+            homographies.append(self.update(frame))
+        state = dict(frame_num=self.frame_num, num_keyframes=self.num_keyframes, num_refined=self.num_refined,
+                     num_fallback=self.num_fallback, reprojection_errors=dict(self.reprojection_errors))
+        if not homographies:
+            return np.zeros((0, 3, 3)), state
+        return self.smooth_homographies(np.array(homographies), frame_size), state
+
+    def update(self, frame):
+        '''
+        logic hàm này là (một khung hình, dùng được cho cả streaming):
+        1. Thu nhỏ khung hình, tách mặt sân (cỏ xanh)
+        2. Ước lượng chuyển động của ảnh so với khung hình trước trên mặt sân, cập nhật homography
+        3. Nếu là khung hình chính thì hiệu chỉnh lại bằng điểm đặc trưng hoặc đường kẻ sân
+        4. Chưa căn được khung hình chính nào, hoặc sai số vượt max_reprojection_error mà không căn lại được: cảnh báo (một lần)
+           và trả về initial_homography cố định cho tới khi căn lại được
+        Trả về homography thô (chưa làm mượt) ảnh -> sân của khung hình này
+        '''
+        scale = self.working_width / frame.shape[1]
+        small = cv2.resize(frame, (self.working_width, int(round(frame.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        line_mask, pitch_mask = self.detect_pitch_lines(small)
+
+        if self.prev_gray is not None:
+            motion = self.estimate_frame_motion(self.prev_gray, gray, self.prev_pitch_mask) # ảnh trước -> ảnh hiện tại (ảnh thu nhỏ)
+            motion = np.linalg.inv(_scale_matrix(scale)) @ motion @ _scale_matrix(scale)
+            self.homography = self.homography @ np.linalg.inv(motion)
+
+        if self.frame_num % self.keyframe_interval == 0:
+            self.num_keyframes += 1
+            homography, error = self.register_keyframe(frame, line_mask, pitch_mask, scale)
+            if homography is not None:
+                self.homography = homography
+                self.num_refined += 1
+                self.lost = False
+            elif self.num_refined == 0 or (error is not None and error > self.max_reprojection_error):
+                if not self.lost:
+                    reason = "chưa căn được với đường kẻ sân" if self.num_refined == 0 else f"sai số chiếu lại {error:.1f} px"
+                    print(f"⚠️ Pitch registration khung hình {self.frame_num}: {reason}, dùng ma trận ban đầu cố định cho tới khi căn lại được")
+                self.lost = True
+            if error is not None:
+                self.reprojection_errors[self.frame_num] = error
+
+        self.homography = self.homography / self.homography[2, 2]
+        self.prev_gray = gray
+        self.prev_pitch_mask = pitch_mask
+        self.frame_num += 1
+        if self.lost:
+            self.num_fallback += 1
+            return self.initial_homography / self.initial_homography[2, 2]
+        return self.homography.copy()
+
+    def detect_pitch_lines(self, image):
+        # mặt sân: màu cỏ (HSV), lấp các lỗ do cầu thủ/đường kẻ; đường kẻ: pixel sáng, ít màu, nổi hơn nền xung quanh (top-hat) và nằm trên mặt sân
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        grass = cv2.inRange(hsv, (30, 40, 40), (90, 255, 255))
+        pitch_mask = cv2.morphologyEx(grass, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (25, 25)))
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        tophat = cv2.morphologyEx(gray, cv2.MORPH_TOPHAT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (9, 9)))
+        line_mask = ((tophat > 30) & (hsv[:, :, 1] < 110) & (pitch_mask > 0)).astype(np.uint8) * 255
+        return line_mask, pitch_mask
+
+    def estimate_frame_motion(self, prev_gray, gray, pitch_mask):
+        # homography giữa hai ảnh liên tiếp từ các điểm đặc trưng trên mặt sân, không đủ điểm thì coi như camera đứng yên
+        prev_points = cv2.goodFeaturesToTrack(prev_gray, mask=pitch_mask, **self.features)
+        if prev_points is None or len(prev_points) < 8:
+            return np.eye(3)
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, prev_points, None, **self.lk_params)
+        status = status.ravel() == 1
+        if status.sum() < 8:
+            return np.eye(3)
+        motion, inliers = cv2.findHomography(prev_points[status], next_points[status], cv2.RANSAC, 2.0)
+        if motion is None or inliers.sum() < 8:
+            return np.eye(3)
+        return motion
+
+    def register_keyframe(self, frame, line_mask, pitch_mask, scale):
+        '''
+        Hiệu chỉnh homography ở khung hình chính, trả về (homography mới hoặc None nếu giữ nguyên, sai số chiếu lại pixel ảnh gốc)
+        '''
+        if self.keypoint_detector is not None:
+            image_points, names = self.keypoint_detector(frame)
+            names = [name for name in names if name in PITCH_KEYPOINTS]
+            if len(names) >= 4:
+                homography, error = self.estimate_from_keypoints(image_points, [PITCH_KEYPOINTS[name] for name in names])
+                if homography is not None and error <= self.max_reprojection_error:
+                    return homography, error
+
+        to_small = np.linalg.inv(_scale_matrix(scale)) # tọa độ ảnh thu nhỏ -> tọa độ ảnh gốc
+        guess = self.homography @ to_small
+        error_before = self.line_reprojection_error(line_mask, pitch_mask, guess)
+        if error_before is None:
+            return None, None # không thấy đủ đường kẻ sân (cận cảnh, khán đài), giữ homography từ optical flow
+
+        refined, error_after = self.refine_lines(line_mask, pitch_mask, guess, error_before)
+        if (refined is None or error_after / scale > self.max_reprojection_error) and \
+                (self.num_refined == 0 or self.lost or error_before / scale > self.max_reprojection_error):
+            # homography hiện tại quá xa để ECC căn cục bộ: tìm lại từ các ứng viên quanh homography hiện tại và ma trận ban đầu
+            refined, error_after = self.search_seeds(line_mask, pitch_mask, [guess, self.initial_homography @ to_small])
+        if refined is None or error_after / scale > self.max_reprojection_error:
+            return None, error_before / scale
+        return refined @ _scale_matrix(scale), error_after / scale
+
+    def refine_lines(self, line_mask, pitch_mask, homography, error_before, levels=((1, 2.5), (0, 2))):
+        # mặc định căn thô trên ảnh thu nhỏ một nửa (làm mờ nhiều) rồi căn mịn, trả về (homography, sai số) nếu sai số giảm, không thì (None, None)
+        refined = homography
+        for level, sigma in levels:
+            refined = self.align_lines(line_mask, refined, sigma, level)
+            if refined is None:
+                return None, None
+        error_after = self.line_reprojection_error(line_mask, pitch_mask, refined)
+        if error_after is None or error_after >= error_before:
+            return None, None
+        return refined, error_after
+
+    def search_seeds(self, line_mask, pitch_mask, bases):
+        '''
+        logic hàm này là (khởi tạo toàn cục, tọa độ ảnh thu nhỏ):
+        1. Tạo các homography ứng viên: mỗi ma trận trong bases nhân với camera zoom seed_scales quanh tâm ảnh và lia ngang seed_shifts
+        2. Xếp hạng ứng viên theo sai số chiếu lại của đường kẻ (không cần ECC), chỉ căn thô bằng ECC num_seed_candidates ứng viên tốt nhất
+        3. Căn mịn ứng viên có sai số sau khi căn thô nhỏ nhất, trả về (homography, sai số), không căn được thì (None, None)
+        '''
+        height, width = line_mask.shape
+        center = _translation_matrix(width / 2, height / 2)
+        distance = cv2.distanceTransform((line_mask == 0).astype(np.uint8), cv2.DIST_L2, 3)
+        candidates = []
+        for base in bases:
+            for zoom in self.seed_scales:
+                for shift in self.seed_shifts:
+                    camera = _translation_matrix(shift * width, 0) @ center @ _scale_matrix(zoom) @ np.linalg.inv(center) # ảnh của seed -> ảnh hiện tại
+                    candidate = base @ np.linalg.inv(camera)
+                    error = self.line_reprojection_error(line_mask, pitch_mask, candidate, distance)
+                    if error is not None:
+                        candidates.append((error, candidate))
+
+        best, best_error = None, None
+        for error, candidate in sorted(candidates, key=lambda item: item[0])[:self.num_seed_candidates]:
+            refined, refined_error = self.refine_lines(line_mask, pitch_mask, candidate, error, levels=((1, 2.5),))
+            if refined is not None and (best_error is None or refined_error < best_error):
+                best, best_error = refined, refined_error
+        if best is None:
+            return None, None
+        refined, refined_error = self.refine_lines(line_mask, pitch_mask, best, best_error, levels=((0, 2),))
+        return (best, best_error) if refined is None else (refined, refined_error)
+
+    def align_lines(self, line_mask, homography, sigma, level=0):
+        # vẽ mẫu sân theo homography rồi tìm warp (mẫu -> ảnh) bằng ECC trên ảnh thu nhỏ 2^level lần, homography mới = (warp @ homography^-1)^-1
+        pyramid = _scale_matrix(0.5 ** level)
+        observed = line_mask
+        for _ in range(level):
+            observed = cv2.pyrDown(observed)
+        template = self.render_pitch_lines(pyramid @ np.linalg.inv(homography), observed.shape)
+        template = cv2.GaussianBlur(template.astype(np.float32), (0, 0), sigma)
+        observed = cv2.GaussianBlur(observed.astype(np.float32), (0, 0), sigma)
+        warp = np.eye(3, dtype=np.float32)
+        try:
+            _, warp = cv2.findTransformECC(template, observed, warp, cv2.MOTION_HOMOGRAPHY,
+                                           (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 50, 1e-5), None, 1)
+        except cv2.error: # ECC không hội tụ
+            return None
+        warp = np.linalg.inv(pyramid) @ warp.astype(np.float64) @ pyramid
+        return np.linalg.inv(warp @ np.linalg.inv(homography))
+
+    def render_pitch_lines(self, pitch_to_image, shape, thickness=1):
+        # vẽ các đường kẻ sân lên ảnh đen kích thước shape theo homography sân -> ảnh
+        template = np.zeros(shape[:2], dtype=np.uint8)
+        for line in PITCH_LINES:
+            points, valid = project_points(pitch_to_image, sample_pitch_lines_of(line))
+            if valid.all():
+                cv2.polylines(template, [np.clip(np.round(points), -1e5, 1e5).astype(np.int32)], False, 255, thickness)
+        return template
+
+    def line_reprojection_error(self, line_mask, pitch_mask, homography, distance=None):
+        '''
+        Sai số chiếu lại (pixel, ảnh thu nhỏ): chiếu các điểm trên đường kẻ của mẫu sân lên ảnh, lấy khoảng cách tới pixel đường kẻ gần nhất
+        (cv2.distanceTransform, truyền distance để dùng lại khi tính cho nhiều homography) cho các điểm nằm trên mặt sân nhìn thấy được,
+        cắt ở outlier_distance rồi lấy trung bình.
+        Trả về None nếu có quá ít đường kẻ hoặc điểm nhìn thấy được.
+        '''
+        if np.count_nonzero(line_mask) < 50:
+            return None
+        points, valid = project_points(np.linalg.inv(homography), self.line_points)
+        height, width = line_mask.shape
+        valid &= (points[:, 0] >= 0) & (points[:, 0] < width) & (points[:, 1] >= 0) & (points[:, 1] < height)
+        pixels = points[valid].astype(np.int32)
+        pixels = pixels[pitch_mask[pixels[:, 1], pixels[:, 0]] > 0]
+        if len(pixels) < 30:
+            return None
+        if distance is None:
+            distance = cv2.distanceTransform((line_mask == 0).astype(np.uint8), cv2.DIST_L2, 3)
+        return float(np.minimum(distance[pixels[:, 1], pixels[:, 0]], self.outlier_distance).mean())
+
+    @staticmethod
+    def estimate_from_keypoints(image_points, pitch_points, ransac_threshold=0.5):
+        # homography ảnh -> sân từ ít nhất 4 cặp điểm (RANSAC, ngưỡng theo mét), sai số chiếu lại là khoảng cách (pixel) giữa điểm phát hiện và điểm sân chiếu lại lên ảnh
+        image_points = np.asarray(image_points, dtype=np.float64).reshape(-1, 2)
+        pitch_points = np.asarray(pitch_points, dtype=np.float64).reshape(-1, 2)
+        if len(image_points) < 4:
+            return None, None
+        homography, inliers = cv2.findHomography(image_points, pitch_points, cv2.RANSAC, ransac_threshold)
+        if homography is None:
+            return None, None
+        inliers = inliers.ravel() == 1
+        projected, valid = project_points(np.linalg.inv(homography), pitch_points[inliers])
+        if not valid.all():
+            return None, None
+        return homography, float(np.linalg.norm(projected - image_points[inliers], axis=1).mean())
+
+    def smooth_homographies(self, homographies, frame_size):
+        '''
+        Làm mượt homography theo thời gian: lấy tọa độ sân của 4 điểm cố định trên ảnh (4 góc ảnh thu vào 10%) ở mỗi khung hình,
+        trung bình trượt smoothing_window khung hình rồi tính lại homography từ 4 cặp điểm
+        '''
+        if self.smoothing_window <= 1 or len(homographies) < 2:
+            return homographies
+        width, height = frame_size
+        image_quad = np.array([[0.1 * width, 0.1 * height], [0.9 * width, 0.1 * height],
+                               [0.9 * width, 0.9 * height], [0.1 * width, 0.9 * height]], dtype=np.float64)
+        homogeneous = np.einsum('fij,nj->fni', homographies, np.column_stack([image_quad, np.ones(4)]))
+        pitch_quads = homogeneous[:, :, :2] / homogeneous[:, :, 2:] # (số khung hình, 4, 2)
+
+        half = min(self.smoothing_window // 2, len(pitch_quads) - 1)
+        # ở hai đầu video lấy đối xứng qua khung hình đầu/cuối (2*q[0] - q[k]) để camera đang lia đều không bị trễ
+        head = 2 * pitch_quads[:1] - pitch_quads[half:0:-1]
+        tail = 2 * pitch_quads[-1:] - pitch_quads[-2:-half - 2:-1]
+        padded = np.concatenate([head, pitch_quads, tail])
+        cumulative = np.concatenate([np.zeros((1,) + pitch_quads.shape[1:]), np.cumsum(padded, axis=0)])
+        window = 2 * half + 1
+        smoothed = (cumulative[window:] - cumulative[:-window]) / window
+
+        return np.array([cv2.getPerspectiveTransform(image_quad.astype(np.float32), quad.astype(np.float32)) for quad in smoothed])
+
+    def stats(self):
+        errors = list(self.reprojection_errors.values())
+        return {
+            'frames': self.frame_num,
+            'keyframes': self.num_keyframes,
+            'refined': self.num_refined,
+            'fallback_frames': self.num_fallback,
+            'mean_reprojection_error': float(np.mean(errors)) if errors else None,
+            'max_reprojection_error': float(np.max(errors)) if errors else None,
+        }
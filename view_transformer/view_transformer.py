@@ -1,18 +1,20 @@
 import numpy as np 
 import cv2
+import sys
+sys.path.append('../')
+from track_store import ObjectTracks
 
 class ViewTransformer(): # class này để biến đổi phối cảnh của các vị trí cầu thủ từ hình ảnh gốc sang hệ tọa độ sân bóng chuẩn hóa
     '''
     logic của class ViewTransformer:
     1. Khởi tạo các tham số cần thiết để thực hiện biến đổi phối cảnh (perspective transformation)
-    2. Hàm transform_point: 
-    biến đổi một điểm từ hệ tọa độ hình ảnh gốc sang hệ tọa độ sân bóng đã được chuẩn hóa
-       - Kiểm tra xem điểm có nằm trong đa giác xác định khu vực sân bóng không
-       - Sử dụng cv2.perspectiveTransform để thực hiện biến đổi phối cảnh
+    2. Hàm transform_points / transform_point: 
+    biến đổi nhiều điểm (hoặc một điểm) từ hệ tọa độ hình ảnh gốc sang hệ tọa độ sân bóng đã được chuẩn hóa
+       - Sử dụng cv2.perspectiveTransform một lần cho tất cả các điểm
+       - Nếu có ma trận riêng cho từng khung hình (set_homographies) thì mỗi điểm dùng ma trận của khung hình chứa nó
     3. Hàm add_transformed_position_to_tracks: thêm vị trí đã được biến đổi vào tracks của các đối tượng
-    - Duyệt qua từng đối tượng và khung hình trong tracks
-    - Lấy vị trí đã được điều chỉnh (position_adjusted) và biến đổi nó sử dụng hàm transform_point
-    - Cập nhật vị trí đã được biến đổi vào tracks dưới khóa 'position_transformed'
+    - Gom vị trí đã được điều chỉnh (position_adjusted) của tất cả đối tượng ở tất cả khung hình
+    - Biến đổi tất cả trong một lần bằng transform_points rồi gán lại vào tracks dưới khóa 'position_transformed'
     
             
     '''
@@ -37,37 +39,96 @@ class ViewTransformer(): # class này để biến đổi phối cảnh của c
         self.target_vertices = self.target_vertices.astype(np.float32) # chuyển đổi sang kiểu float32 để sử dụng với OpenCV
 
         self.perspective_transformer = cv2.getPerspectiveTransform(self.pixel_vertices, self.target_vertices)
+        self.homographies = None # ma trận riêng cho từng khung hình (set_homographies), None thì dùng perspective_transformer cho mọi khung hình
+        self.position_key = 'position_adjusted' # vị trí được biến đổi sang hệ tọa độ sân
 
-    def transform_point(self,point):
-        p = (int(point[0]),int(point[1])) # chuyển đổi điểm sang kiểu int để kiểm tra vị trí trong đa giác
-        
+    def set_homographies(self, homographies, position_key='position_adjusted'):
+        '''
+        Gán ma trận biến đổi riêng cho từng khung hình (camera di chuyển/zoom thì 4 góc sân không cố định):
+        - homographies[frame_num] là ma trận 3x3 của khung hình đó, None thì dùng ma trận mặc định perspective_transformer
+        - homographies=None thì tất cả các khung hình dùng chung ma trận mặc định như trước
+        - position_key là vị trí được biến đổi: homography ước lượng theo từng khung hình (PitchRegistration) đã tính cả chuyển động camera
+          nên phải dùng 'position' (vị trí trên ảnh) thay vì 'position_adjusted' (đã trừ chuyển động camera)
+        '''
+        self.position_key = position_key
+        if homographies is None:
+            self.homographies = None
+            return
+        self.homographies = np.array([self.perspective_transformer if homography is None else homography for homography in homographies],
+                                     dtype=np.float64).reshape(-1, 3, 3)
+
+    def get_homography(self, frame_num):
+        if self.homographies is None or not 0 <= frame_num < len(self.homographies):
+            return self.perspective_transformer
+        return self.homographies[frame_num]
+
+    def transform_points(self, points, frame_nums=None):
+        '''
+        logic hàm này là:
+        1. Biến đổi N điểm (mảng (N, 2)) trong một lần thay vì gọi cv2.perspectiveTransform cho từng điểm
+        2. Nếu không có ma trận riêng cho từng khung hình thì gọi cv2.perspectiveTransform đúng một lần với ma trận mặc định
+        3. Nếu có thì lấy ma trận của khung hình frame_nums[i] cho điểm i và nhân ma trận cho tất cả các điểm cùng lúc (np.einsum),
+           chia cho thành phần thứ ba giống cv2.perspectiveTransform (|w| quá nhỏ thì kết quả là 0)
+        Trả về mảng (N, 2) float32 giống transform_point.
+        '''
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if len(points) == 0:
+            return np.zeros((0, 2), dtype=np.float32)
+        if self.homographies is None or frame_nums is None:
+            return cv2.perspectiveTransform(points.reshape(-1, 1, 2), self.perspective_transformer).reshape(-1, 2)
+
+        frame_nums = np.asarray(frame_nums, dtype=np.int64)
+        in_range = (frame_nums >= 0) & (frame_nums < len(self.homographies))
+        homographies = np.where(in_range[:, None, None], self.homographies[np.clip(frame_nums, 0, len(self.homographies) - 1)],
+                                self.perspective_transformer)
+        homogeneous = np.einsum('nij,nj->ni', homographies, np.column_stack([points, np.ones(len(points))]))
+        w = homogeneous[:, 2:]
+        scale = np.divide(1.0, w, out=np.zeros_like(w), where=np.abs(w) > np.finfo(np.float32).eps)
+        return (homogeneous[:, :2] * scale).astype(np.float32)
+
+    def transform_point(self,point, frame_num=None):
         # Note: Removed is_inside check to allow transformation of all players
         # Even if they are outside the defined pitch boundaries in pixel space,
         # we still want to show their approximate positions on the tactical radar
         # is_inside = cv2.pointPolygonTest(self.pixel_vertices,p,False) >= 0
         # if not is_inside:
         #     return None
+        frame_nums = None if frame_num is None else [frame_num]
+        return self.transform_points(np.asarray(point).reshape(-1, 2), frame_nums) # một điểm là trường hợp N=1 của transform_points
 
-        reshaped_point = point.reshape(-1,1,2).astype(np.float32) # chuyển đổi điểm sang dạng phù hợp để sử dụng với cv2.perspectiveTransform
-        tranform_point = cv2.perspectiveTransform(reshaped_point,self.perspective_transformer) # thực hiện biến đổi phối cảnh 
-        # hàm cv2.perspectiveTransform để biến đổi điểm từ hệ tọa độ hình ảnh gốc sang hệ tọa độ sân bóng chuẩn hóa
-        return tranform_point.reshape(-1,2)
-
-    def add_transformed_position_to_tracks(self,tracks):
+    def add_transformed_position_to_tracks(self,tracks, start_frame=0):
         '''
         logic đoạn này là:
-        1. Duyệt qua từng đối tượng và khung hình trong tracks
-        2. Lấy vị trí đã được điều chỉnh (position_adjusted) và biến đổi nó sử dụng hàm transform_point
-        3. Cập nhật vị trí đã được biến đổi vào tracks dưới khóa 'position_transformed'
-        4. Trả về tracks đã được cập nhật
+        1. Gom position_adjusted (hoặc position_key) của tất cả các đối tượng (players, referees, ball) ở tất cả các khung hình vào một mảng,
+           cùng với số thứ tự khung hình của từng điểm (start_frame + vị trí trong tracks, dùng khi tracks chỉ là một đoạn của video)
+        2. Biến đổi tất cả các điểm trong một lần bằng transform_points
+        3. Gán kết quả trở lại tracks dưới khóa 'position_transformed' (tracks dạng cột thì gán cả cột bằng set_column)
         '''
+        targets = [] # (object_tracks dạng cột, các dòng) hoặc (None, list các track_info)
+        points, frame_nums = [], []
         for object, object_tracks in tracks.items():
-            for frame_num, track in enumerate(object_tracks):
-                for track_id, track_info in track.items():
-                    position = track_info['position_adjusted']
-                    position = np.array(position)
-                    position_transformed = self.transform_point(position)
-                    if position_transformed is not None:
-                        position_transformed = position_transformed.squeeze().tolist()
-                    tracks[object][frame_num][track_id]['position_transformed'] = position_transformed # thêm vị trí đã được biến đổi vào tracks
-                    # ['position_transformed'] là khóa mới để lưu vị trí đã được biến đổi
\ No newline at end of file
+            if isinstance(object_tracks, ObjectTracks):
+                positions, has_position = object_tracks.column(self.position_key)
+                rows = np.flatnonzero(has_position)
+                targets.append((object_tracks, rows))
+                points.append(positions[rows])
+                frame_nums.append(object_tracks.frame_index()[rows] + start_frame)
+                continue
+            track_infos = [track_info for track in object_tracks for track_info in track.values()]
+            targets.append((None, track_infos))
+            points.append(np.array([track_info[self.position_key] for track_info in track_infos], dtype=np.float32).reshape(-1, 2))
+            frame_nums.append(np.repeat(np.arange(len(object_tracks)) + start_frame, [len(track) for track in object_tracks]))
+
+        if not targets:
+            return
+        positions_transformed = self.transform_points(np.concatenate(points), np.concatenate(frame_nums))
+
+        offset = 0
+        for object_tracks, rows in targets:
+            values = positions_transformed[offset:offset + len(rows)]
+            offset += len(rows)
+            if object_tracks is not None:
+                object_tracks.set_column('position_transformed', values, rows)
+                continue
+            for track_info, position_transformed in zip(rows, values.tolist()):
+                track_info['position_transformed'] = position_transformed # thêm vị trí đã được biến đổi vào tracks